@@ -99,6 +99,25 @@ class FaceitPreferences(bpy.types.AddonPreferences):
         description="Automatically adjust the slider_min/max ranges of shape keys to the animation data",
         default=True,
     )
+    use_mocap_parse_cache: bpy.props.BoolProperty(
+        name="Cache Parsed Mocap Files",
+        description="Store parsed mocap files, so that importing the same file again skips parsing",
+        default=True,
+    )
+    mocap_cache_location: bpy.props.EnumProperty(
+        name="Cache Location",
+        items=(
+            ('USER', 'User Directory', 'Store the cache in the Blender user data directory'),
+            ('BLEND', 'Next to Blend File', 'Store the cache in a faceit_mocap_cache folder next to the blend file'),
+        ),
+        default='USER',
+    )
+    mocap_cache_size: bpy.props.IntProperty(
+        name="Cache Size (MB)",
+        description="Size limit of the mocap cache. The least recently used files are removed first",
+        default=512,
+        min=16,
+    )
 
     def draw(self, context):
         layout = self.layout
@@ -112,6 +131,14 @@ class FaceitPreferences(bpy.types.AddonPreferences):
         row.label(text="Animation Settings")
         row = col_left.row(align=True)
         row.prop(self, "dynamic_shape_key_ranges", icon='SHAPEKEY_DATA')
+        row = col_left.row(align=True)
+        row.prop(self, "use_mocap_parse_cache", icon='FILE_CACHE')
+        row.operator('faceit.clear_mocap_parse_cache', text='', icon='TRASH')
+        if self.use_mocap_parse_cache:
+            row = col_left.row(align=True)
+            row.prop(self, "mocap_cache_location", text='')
+            row = col_left.row(align=True)
+            row.prop(self, "mocap_cache_size")
 
         col_right = col.column(align=True)
         # col_right.use_property_split = True
@@ -0,0 +1,54 @@
+import hashlib
+
+import numpy as np
+
+# The inputs of a baked shape key that are compared by the incremental bake, in the order of the reported reasons.
+FINGERPRINT_COMPONENTS = (
+    ('pose', 'pose keys changed'),
+    ('corrective', 'corrective shape key changed'),
+    ('rest', 'rest pose changed'),
+    ('weights', 'weights changed'),
+    ('topology', 'mesh topology changed'),
+    ('basis', 'basis shape changed'),
+)
+# The reason for shape keys that have been baked before fingerprints were recorded.
+NO_FINGERPRINT_REASON = 'no fingerprint'
+# The decimals that are hashed for float values, float32 and float64 reads of the same data hash equally.
+FINGERPRINT_DECIMALS = 5
+
+
+def hash_values(*values) -> str:
+    '''Return a hex digest for strings and arrays. Floats are rounded to FINGERPRINT_DECIMALS.'''
+    digest = hashlib.blake2b(digest_size=16)
+    for value in values:
+        if isinstance(value, str):
+            digest.update(b's')
+            digest.update(value.encode('utf-8'))
+            continue
+        array = np.asarray(value)
+        if array.dtype.kind == 'f':
+            # + 0.0 turns -0.0 into 0.0
+            array = np.round(array.astype(np.float64), FINGERPRINT_DECIMALS) + 0.0
+        elif array.dtype.kind in 'biu':
+            array = array.astype(np.int64)
+        array = np.ascontiguousarray(array)
+        digest.update(f'{array.dtype.str}{array.shape}'.encode('utf-8'))
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def combine_fingerprints(*fingerprints) -> str:
+    '''Return one digest for several digests, e.g. for shape keys that depend on more than one expression.'''
+    return hash_values('\n'.join(fingerprints))
+
+
+def fingerprint_change_reason(stored, fingerprint) -> str:
+    '''Return why a shape key has to be baked again, an empty string if its inputs didn't change.
+    @stored: the recorded fingerprint {component: digest} or None.
+    @fingerprint: the current fingerprint (see FINGERPRINT_COMPONENTS).
+    '''
+    if not stored:
+        return NO_FINGERPRINT_REASON
+    reasons = [reason for component, reason in FINGERPRINT_COMPONENTS
+               if stored.get(component) != fingerprint.get(component)]
+    return ', '.join(reasons)
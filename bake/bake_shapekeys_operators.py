@@ -4,6 +4,8 @@ from addon_utils import check
 from bpy.props import BoolProperty, EnumProperty
 
 from .. panels.draw_utils import draw_text_block
+from .bake_fingerprints import combine_fingerprints, fingerprint_change_reason, hash_values
+from .bake_skinning import LinearBlendSkin, blender_matrices, skinning_matrices
 
 
 from ..core.detection_manager import get_expression_name_double_entries
@@ -15,6 +17,110 @@ from ..core import shape_key_utils
 from ..shape_keys.corrective_shape_keys_utils import (
     mute_corrective_shape_keys, reevaluate_corrective_shape_keys)
 
+# Object property with the fingerprints of the baked expression shape keys {expression: {component: digest}}.
+BAKE_FINGERPRINTS_PROPERTY = 'faceit_bake_fingerprints'
+# Scene property with the result of the last incremental bake {'skipped': lines, 'baked': lines}.
+BAKE_REPORT_PROPERTY = 'faceit_incremental_bake_report'
+
+
+def get_skinning_fallback_reason(obj, rig, armature_mod, use_corrective=False) -> str:
+    '''Return why the skinning bake engine can't deform obj, an empty string if it can.
+    The skinning input is read once, so the shape key mix must not change between the expressions.'''
+    if armature_mod is None:
+        return 'no armature modifier for the Faceit rig'
+    for mod in obj.modifiers:
+        if mod is not armature_mod and mod.show_viewport:
+            return f'bake modifier {mod.name}'
+    if (armature_mod.use_bone_envelopes or armature_mod.use_deform_preserve_volume or armature_mod.use_multi_modifier
+            or armature_mod.vertex_group or not armature_mod.use_vertex_groups):
+        return f'unsupported settings on the armature modifier {armature_mod.name}'
+    if obj.parent == rig:
+        return 'parented to the rig'
+    shape_keys = obj.data.shape_keys
+    if shape_keys and shape_keys.animation_data:
+        if shape_keys.animation_data.action:
+            return 'animated shape keys'
+        if any(not dr.mute for dr in shape_keys.animation_data.drivers):
+            return 'driven shape keys'
+    if use_corrective and shape_keys and any(sk.name.startswith('faceit_cc_') for sk in shape_keys.key_blocks):
+        return 'corrective shape keys'
+    return ''
+
+
+def get_deform_weights(obj, rig):
+    '''Return the vertex group assignments of the deforming bones: (vertex indices, bone indices, weights).
+    The bone indices refer to rig.data.bones.'''
+    bone_indices = {bone.name: i for i, bone in enumerate(rig.data.bones) if bone.use_deform}
+    group_bones = {vg.index: bone_indices[vg.name] for vg in obj.vertex_groups if vg.name in bone_indices}
+    vertex_indices, bones, weights = [], [], []
+    for v in obj.data.vertices:
+        for g in v.groups:
+            bone = group_bones.get(g.group)
+            if bone is not None and g.weight > 0:
+                vertex_indices.append(v.index)
+                bones.append(bone)
+                weights.append(g.weight)
+    return vertex_indices, bones, weights
+
+
+def read_bone_matrices(rig, dg):
+    '''Return the rest (matrix_local) and the evaluated pose matrices of all bones, in the order of rig.data.bones.'''
+    bones = rig.data.bones
+    flat = np.zeros(len(bones) * 16, dtype=np.float32)
+    bones.foreach_get('matrix_local', flat)
+    rest = blender_matrices(flat, len(bones))
+    pose_bones = rig.evaluated_get(dg).pose.bones
+    flat = np.zeros(len(pose_bones) * 16, dtype=np.float32)
+    pose_bones.foreach_get('matrix', flat)
+    pose = np.empty_like(rest)
+    pose[[bones.find(pb.name) for pb in pose_bones]] = blender_matrices(flat, len(pose_bones))
+    return rest, pose
+
+
+def get_pose_fingerprints(action, expression_list) -> dict:
+    '''Return the fingerprint of each expression pose: the values of the action fcurves on the expression frame.'''
+    fcurves = [fc for fc in action.fcurves if not fc.mute] if action else []
+    paths = '\n'.join(f'{fc.data_path}[{fc.array_index}]' for fc in fcurves)
+    return {
+        expression.name: hash_values(paths, np.array([fc.evaluate(expression.frame) for fc in fcurves]))
+        for expression in expression_list
+    }
+
+
+def get_object_fingerprints(obj, rig, expression_list, pose_fingerprints, basis_data, use_corrective=False) -> dict:
+    '''Return the fingerprint of every expression shape key of obj (see bake_fingerprints.FINGERPRINT_COMPONENTS).'''
+    mesh = obj.data
+    bones = rig.data.bones
+    bone_names = '\n'.join(bone.name for bone in bones)
+    rest = np.zeros(len(bones) * 16, dtype=np.float32)
+    bones.foreach_get('matrix_local', rest)
+    loop_vertices = np.zeros(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get('vertex_index', loop_vertices)
+    loop_totals = np.zeros(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get('loop_total', loop_totals)
+    shared = {
+        'rest': hash_values(bone_names, rest, np.array(rig.matrix_world.inverted() @ obj.matrix_world)),
+        'weights': hash_values(bone_names, *get_deform_weights(obj, rig)),
+        'topology': hash_values(np.array(len(mesh.vertices)), loop_vertices, loop_totals),
+        'basis': hash_values(basis_data),
+    }
+    key_blocks = mesh.shape_keys.key_blocks if mesh.shape_keys else {}
+    fingerprints = {}
+    for expression in expression_list:
+        corrective = ''
+        corr_sk = key_blocks.get('faceit_cc_' + expression.name) if use_corrective else None
+        if corr_sk:
+            co = np.zeros(len(mesh.vertices) * 3, dtype=np.float32)
+            corr_sk.data.foreach_get('co', co)
+            corrective = hash_values(co)
+        fingerprints[expression.name] = dict(shared, pose=pose_fingerprints[expression.name], corrective=corrective)
+    # mouthClose is baked relative to jawOpen
+    if 'mouthClose' in fingerprints and 'jawOpen' in fingerprints:
+        mouth_close, jaw_open = fingerprints['mouthClose'], fingerprints['jawOpen']
+        for component in ('pose', 'corrective'):
+            mouth_close[component] = combine_fingerprints(mouth_close[component], jaw_open[component])
+    return fingerprints
+
 
 def get_load_action_items(self, context):
     items = [
@@ -77,6 +183,26 @@ class FACEIT_OT_GenerateShapekeys(bpy.types.Operator):
              'Create a duplicate shape key with an index as suffix. Use this if you want to keep the existing shape key.'),
         ),
         default='OVERWRITE')
+    incremental_bake: BoolProperty(
+        name='Only Changed Expressions',
+        default=False,
+        description='Overwrite only the shape keys whose pose keys, rest pose, weights or mesh changed since they were baked. Changes to modifiers, bone constraints or drivers are not detected. Skipped shape keys are listed in the bake info.',
+    )
+    bake_engine: EnumProperty(
+        name='Bake Engine',
+        items=(
+            ('DEPSGRAPH', 'Scene',
+             'Evaluate the whole scene on every expression frame. Supports all modifiers, drivers and constraints.'),
+            ('SKINNING', 'Skinning',
+             'Pose the rig from the expression action and deform the meshes with linear blend skinning (NumPy). Objects with other bake modifiers, driven, animated or corrective shape keys or a rig parent are evaluated by the scene on the expression frames.'),
+        ),
+        default='DEPSGRAPH',
+    )
+    validate_bake_engine: BoolProperty(
+        name='Validate Skinning',
+        default=False,
+        description='Bake the scene evaluation and report the maximum deviation of the skinning result per object.',
+    )
 
     # TODO
     # Regenerate mouthClose
@@ -193,6 +319,21 @@ class FACEIT_OT_GenerateShapekeys(bpy.types.Operator):
             )
             row = box.row()
             row.prop(self, 'bake_duplicate_option', expand=True, icon='BLANK1')
+            if self.bake_duplicate_option == 'OVERWRITE':
+                row = box.row()
+                row.prop(self, 'incremental_bake', icon='BLANK1')
+        box = draw_text_block(
+            context,
+            layout,
+            heading="Bake Engine",
+            heading_icon='MOD_ARMATURE',
+            in_operator=True,
+        )
+        row = box.row()
+        row.prop(self, 'bake_engine', expand=True)
+        if self.bake_engine == 'SKINNING':
+            row = box.row()
+            row.prop(self, 'validate_bake_engine', icon='BLANK1')
         if self.faceit_original_rig:
             box = draw_text_block(
                 context,
@@ -213,6 +354,35 @@ class FACEIT_OT_GenerateShapekeys(bpy.types.Operator):
             row = box.row()
             row.prop(self, 'disable_auto_keying', icon='RADIOBUT_OFF')
 
+    def _prepare_skinning(self, dg, rig, obj_settings, use_corrective=False):
+        '''Read the skinning input of the objects that the skinning engine supports (see get_skinning_fallback_reason).
+        Their armature modifiers stay disabled while baking, unless the bake is validated.'''
+        rest_matrices = pose_matrices = None
+        fallback = []
+        for obj, settings in obj_settings.items():
+            armature_mod = next((m for m in obj.modifiers if m.type == 'ARMATURE' and m.object == rig), None)
+            reason = get_skinning_fallback_reason(obj, rig, armature_mod, use_corrective=use_corrective)
+            if reason:
+                fallback.append(f"{obj.name} ({reason})")
+                continue
+            # The coordinates that enter the armature modifier (shape keys mixed)
+            armature_mod.show_viewport = False
+            dg.update()
+            coords = shape_key_utils.get_mesh_data(obj, dg)
+            if self.validate_bake_engine:
+                armature_mod.show_viewport = True
+                dg.update()
+            else:
+                settings["skin_modifier"] = armature_mod.name
+            if rest_matrices is None:
+                rest_matrices, pose_matrices = read_bone_matrices(rig, dg)
+            skin = LinearBlendSkin(
+                coords, *get_deform_weights(obj, rig), np.array(rig.matrix_world.inverted() @ obj.matrix_world))
+            settings["skin"] = skin
+            settings["skin_rest"] = skin.deform(skinning_matrices(rest_matrices, pose_matrices))
+        if fallback:
+            self.report({'INFO'}, f"Skinning bake, scene evaluation for: {', '.join(fallback)}.")
+
     def execute(self, context):
         state_dict = futils.save_scene_state(context)
         scene = context.scene
@@ -285,32 +455,112 @@ class FACEIT_OT_GenerateShapekeys(bpy.types.Operator):
             mat_rest = obj.matrix_world.copy()
             obj_settings[obj].update(
                 {"basis_data": basis_data, "eval_data": eval_mesh_data, "matrix_world": mat_rest})
-        # Apply the difference matrix (object transforms) to the evaluated mesh data (shape keys and modifiers applied) and bake it as a shape key.
-        for expression in expression_list:
-            scene.frame_set(expression.frame)
+        # ------------ FINGERPRINTS --------------
+        # | - skip the shape keys whose inputs didn't change (incremental bake).
+        incremental = self.shapes_already_exist and self.incremental_bake and self.bake_duplicate_option == 'OVERWRITE'
+        pose_fingerprints = get_pose_fingerprints(
+            rig_obj.animation_data.action if rig_obj.animation_data else None, expression_list)
+        skipped_report = []
+        baked_report = []
+        for obj, settings in obj_settings.items():
+            fingerprints = get_object_fingerprints(
+                obj, rig_obj, expression_list, pose_fingerprints, settings["basis_data"],
+                use_corrective=scene.faceit_use_corrective_shapes)
+            settings.update({"fingerprints": fingerprints, "skip": set(), "baked": set()})
+            if not incremental:
+                continue
+            stored_fingerprints = obj.get(BAKE_FINGERPRINTS_PROPERTY, {})
+            for expression in expression_list:
+                if obj.data.shape_keys.key_blocks.get(expression.name) is None:
+                    reason = 'shape key missing'
+                else:
+                    stored = stored_fingerprints.get(expression.name)
+                    reason = fingerprint_change_reason(stored.to_dict() if stored else None, fingerprints[expression.name])
+                if reason:
+                    baked_report.append(f"{expression.name} ({obj.name}): {reason}")
+                else:
+                    settings["skip"].add(expression.name)
+                    skipped_report.append(f"{expression.name} ({obj.name}): unchanged")
+        if incremental:
+            scene[BAKE_REPORT_PROPERTY] = {"skipped": '\n'.join(skipped_report), "baked": '\n'.join(baked_report)}
+        elif BAKE_REPORT_PROPERTY in scene:
+            del scene[BAKE_REPORT_PROPERTY]
+        rig_action = None
+        pose_from_action = False
+        try:
+            if self.bake_engine == 'SKINNING':
+                if rig_obj.animation_data and rig_obj.animation_data.action:
+                    rig_action = rig_obj.animation_data.action
+                    self._prepare_skinning(dg, rig_obj, obj_settings, use_corrective=scene.faceit_use_corrective_shapes)
+                else:
+                    self.report({'WARNING'}, 'The skinning bake engine needs the expression action. Baking with the scene evaluation.')
+            skinned = any("skin" in settings for settings in obj_settings.values())
+            # The objects that fall back to the scene evaluation need the frame (corrective and animated shape keys).
+            pose_from_action = skinned and all("skin" in settings for settings in obj_settings.values())
+            if pose_from_action:
+                # The pose is applied from the action on every expression, the frame doesn't change.
+                rig_obj.animation_data.action = None
+            deviations = {}
+            # Apply the difference matrix (object transforms) to the evaluated mesh data (shape keys and modifiers applied) and bake it as a shape key.
+            for expression in expression_list:
+                if all(expression.name in settings["skip"] for settings in obj_settings.values()):
+                    continue
+                if pose_from_action:
+                    rig_obj.pose.apply_pose_from_action(rig_action, evaluation_time=expression.frame)
+                    dg.update()
+                else:
+                    scene.frame_set(expression.frame)
+                if skinned:
+                    bone_matrices = skinning_matrices(*read_bone_matrices(rig_obj, dg))
+                for obj, settings in obj_settings.items():
+                    if expression.name in settings["skip"]:
+                        continue
+                    basis_data = settings["basis_data"]
+                    eval_mesh_data = settings["eval_data"]
+                    mat_rest = settings["matrix_world"]
+                    mat_pose = obj.matrix_world.copy()
+                    if self.shapes_already_exist:
+                        if shape_key_utils.has_shape_keys(obj):
+                            sk = obj.data.shape_keys.key_blocks.get(expression.name)
+                            if sk:
+                                if self.bake_duplicate_option == 'OVERWRITE':
+                                    obj.shape_key_remove(sk)
+                                elif self.bake_duplicate_option == 'RENAME':
+                                    sk.name = get_expression_name_double_entries(sk.name, obj.data.shape_keys.key_blocks)
+                    skin = settings.get("skin")
+                    if skin is not None and not self.validate_bake_engine:
+                        sk_data = basis_data + skin.deform(bone_matrices) - settings["skin_rest"]
+                    else:
+                        # Get the evaluated mesh data (with modifiers and shape keys)
+                        exp_data = shape_key_utils.get_mesh_data(obj, dg)
+                        exp_data = basis_data + exp_data - eval_mesh_data
+                        # Apply the difference world matrix to the evaluated mesh data
+                        sk_data = shape_key_utils.apply_matrix_to_all_mesh_data(exp_data, mat_pose @ mat_rest.inverted())
+                        if skin is not None:
+                            # Validation only measures, the scene evaluation is baked.
+                            skin_data = basis_data + skin.deform(bone_matrices) - settings["skin_rest"]
+                            deviation = float(np.abs(skin_data - sk_data).max(initial=0.0))
+                            deviations[obj.name] = max(deviations.get(obj.name, 0.0), deviation)
+                    sk_data = np.asarray(sk_data, dtype=np.float32)
+                    # Bake the mesh data into a shape key
+                    shape = obj.shape_key_add(name=expression.name)
+                    shape.data.foreach_set('co', sk_data.ravel())
+                    if shape.name == expression.name:
+                        settings["baked"].add(expression.name)
+        finally:
+            # Restore the expression action and the armature modifiers, also when the bake failed.
+            if pose_from_action:
+                rig_obj.animation_data.action = rig_action
             for obj, settings in obj_settings.items():
-                basis_data = settings["basis_data"]
-                eval_mesh_data = settings["eval_data"]
-                mat_rest = settings["matrix_world"]
-                mat_pose = obj.matrix_world.copy()
-                if self.shapes_already_exist:
-                    if shape_key_utils.has_shape_keys(obj):
-                        sk = obj.data.shape_keys.key_blocks.get(expression.name)
-                        if sk:
-                            if self.bake_duplicate_option == 'OVERWRITE':
-                                obj.shape_key_remove(sk)
-                            elif self.bake_duplicate_option == 'RENAME':
-                                sk.name = get_expression_name_double_entries(sk.name, obj.data.shape_keys.key_blocks)
-                # Get the evaluated mesh data (with modifiers and shape keys)
-                exp_data = shape_key_utils.get_mesh_data(obj, dg)
-                exp_data = basis_data + exp_data - eval_mesh_data
-                # Apply the difference world matrix to the evaluated mesh data
-                sk_data = shape_key_utils.apply_matrix_to_all_mesh_data(exp_data, mat_pose @ mat_rest.inverted())
-                # Bake the mesh data into a shape key
-                shape = obj.shape_key_add(name=expression.name)
-                shape.data.foreach_set('co', sk_data.ravel())
+                if settings.get("skin_modifier"):
+                    obj.modifiers[settings["skin_modifier"]].show_viewport = True
+        if deviations:
+            self.report({'INFO'}, "Skinning bake, maximum deviation from the scene evaluation: {}.".format(
+                ', '.join(f"{name} {deviation:.6f}" for name, deviation in deviations.items())))
         if all(x in expression_list.keys() for x in ['mouthClose', 'jawOpen']):
             for obj in bake_objects:
+                if 'mouthClose' in obj_settings.get(obj, {}).get("skip", ()):
+                    continue
                 mouthClose_sk = obj.data.shape_keys.key_blocks.get('mouthClose')
                 jawOpen_sk = obj.data.shape_keys.key_blocks.get('jawOpen')
                 if not mouthClose_sk or not jawOpen_sk:
@@ -329,6 +579,15 @@ class FACEIT_OT_GenerateShapekeys(bpy.types.Operator):
                 new_sk_data = basis_sk_data + mClose_sk_data - jOpen_sk_data
                 mouthClose_sk.data.foreach_set('co', new_sk_data.ravel())
 
+        # Record the inputs of the baked shape keys for the next (incremental) bake.
+        for obj, settings in obj_settings.items():
+            stored_fingerprints = obj.get(BAKE_FINGERPRINTS_PROPERTY)
+            fingerprints = stored_fingerprints.to_dict() if stored_fingerprints else {}
+            fingerprints.update({name: settings["fingerprints"][name] for name in settings["baked"]})
+            obj[BAKE_FINGERPRINTS_PROPERTY] = fingerprints
+        if skipped_report:
+            self.report({'INFO'}, f"Skipped {len(skipped_report)} unchanged shape keys, see the bake info.")
+
         # ------------ MODIFIERS --------------
         # | - enable modifiers that have been enabled before.
         # | - hide corrective smooth
@@ -493,6 +752,8 @@ class FACEIT_OT_BackToRigging(bpy.types.Operator):
         for obj in faceit_objects:
             obj_item = scene.faceit_face_objects.get(obj.name)
             if not self.keep_baked_expressions:
+                if BAKE_FINGERPRINTS_PROPERTY in obj:
+                    del obj[BAKE_FINGERPRINTS_PROPERTY]
                 if shape_key_utils.has_shape_keys(obj):
                     for expression in expression_list:
                         sk = obj.data.shape_keys.key_blocks.get(expression.name)
@@ -590,12 +851,17 @@ class FACEIT_OT_BakeInfo(bpy.types.Operator):
             bake_actions_count += 1
             bake_actions.append(f"CRig->SK: {scene.faceit_bake_crig_to_sk_action.name}")
         
+        # Résultat du dernier bake incrémental
+        incremental_report = scene.get(BAKE_REPORT_PROPERTY, {})
+
         return {
             'bake_modifiers': bake_modifiers_count,
             'total_modifiers': total_modifiers,
             'shapes_generated': shapes_generated,
             'bake_actions': bake_actions_count,
-            'bake_actions_list': bake_actions
+            'bake_actions_list': bake_actions,
+            'skipped_expressions': incremental_report.get('skipped', '').splitlines(),
+            'rebaked_expressions': incremental_report.get('baked', '').splitlines(),
         }
 
     def execute(self, context):
@@ -615,6 +881,13 @@ class FACEIT_OT_BakeInfo(bpy.types.Operator):
             for action in bake_info['bake_actions_list']:
                 message += f"  - {action}\n"
         
+        if bake_info['skipped_expressions'] or bake_info['rebaked_expressions']:
+            message += "\nDernier bake incrémental :\n"
+            for line in bake_info['skipped_expressions']:
+                message += f"  - ignorée : {line}\n"
+            for line in bake_info['rebaked_expressions']:
+                message += f"  - rebakée : {line}\n"
+
         # Objets FaceIt
         from ..core import faceit_utils as futils
         faceit_objects = futils.get_faceit_objects_list()
@@ -0,0 +1,53 @@
+import numpy as np
+
+# The armature modifier leaves vertices with a smaller total weight undeformed.
+MIN_TOTAL_WEIGHT = 0.0001
+
+
+def blender_matrices(flat_values, count):
+    '''Convert the values of a foreach_get on a 4x4 matrix property (column major) to (count x 4 x 4) matrices.'''
+    return np.asarray(flat_values, dtype=np.float64).reshape(count, 4, 4).transpose(0, 2, 1)
+
+
+def transform_points(matrix, points):
+    '''Apply a 4x4 matrix to (n x 3) points.'''
+    return points @ matrix[:3, :3].T + matrix[:3, 3]
+
+
+def skinning_matrices(rest_matrices, pose_matrices):
+    '''Return the armature space deformation of each bone: pose matrix @ inverted rest matrix (matrix_local).'''
+    return pose_matrices @ np.linalg.inv(rest_matrices)
+
+
+class LinearBlendSkin:
+    '''The deformation of an armature modifier (vertex groups, no envelopes, no preserve volume) on fixed input
+    coordinates, evaluated for any pose in one vectorized pass.
+    @coords: (vertices x 3) object space coordinates that enter the armature modifier.
+    @vertex_indices, @bone_indices, @weights: one entry per vertex group assignment of a deforming bone.
+    @object_to_armature: armature.matrix_world.inverted() @ object.matrix_world.
+    '''
+
+    def __init__(self, coords, vertex_indices, bone_indices, weights, object_to_armature):
+        self.vertex_count = len(coords)
+        self.object_to_armature = np.asarray(object_to_armature, dtype=np.float64)
+        self.armature_to_object = np.linalg.inv(self.object_to_armature)
+        self.vertex_indices = np.asarray(vertex_indices, dtype=np.intp)
+        self.bone_indices = np.asarray(bone_indices, dtype=np.intp)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.coords = transform_points(self.object_to_armature, np.asarray(coords, dtype=np.float64))
+        total = np.bincount(self.vertex_indices, weights=self.weights, minlength=self.vertex_count)
+        self.deformed = total > MIN_TOTAL_WEIGHT
+        self.total_weight = np.where(self.deformed, total, 1.0)
+        # The input coordinates of every assignment
+        self._assigned_coords = self.coords[self.vertex_indices]
+
+    def deform(self, bone_matrices):
+        '''Return the deformed object space coordinates for the skinning matrices of all bones (see skinning_matrices).'''
+        matrices = np.asarray(bone_matrices, dtype=np.float64)[self.bone_indices]
+        moved = np.einsum('kij,kj->ki', matrices[:, :3, :3], self._assigned_coords) + matrices[:, :3, 3]
+        moved *= self.weights[:, np.newaxis]
+        coords = self.coords.copy()
+        for axis in range(3):
+            summed = np.bincount(self.vertex_indices, weights=moved[:, axis], minlength=self.vertex_count)
+            coords[self.deformed, axis] = summed[self.deformed] / self.total_weight[self.deformed]
+        return transform_points(self.armature_to_object, coords)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark: keyframe decimation of an imported take (mocap_decimation).
+Prints the kept keyframes and the time of the vectorized decimation of all channels for a few tolerances,
+and a plain recursive Ramer-Douglas-Peucker per channel for comparison.
+Run from anywhere: python benchmarks/bench_keyframe_decimation.py --seconds 300
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from mocap.mocap_decimation import decimation_mask  # noqa: E402
+from mocap.mocap_filters import filter_channels  # noqa: E402
+
+
+def synthetic_take(frame_count, channel_count, rng):
+    '''Shape values between 0 and 1: smoothed noise with idle stretches, like a recorded performance.'''
+    values = filter_channels(rng.normal(size=(frame_count, channel_count)), 'GAUSSIAN', 61, 12) * 3 + 0.3
+    values += rng.normal(size=values.shape) * 0.001
+    values[rng.random(values.shape) < 0.002] = 0
+    return np.clip(values, 0, 1)
+
+
+def recursive_mask(frames, values, tolerance):
+    keep = np.zeros(len(values), dtype=bool)
+    keep[[0, -1]] = True
+    segments = [(0, len(values) - 1)]
+    while segments:
+        start, end = segments.pop()
+        if end - start < 2:
+            continue
+        inner = np.arange(start + 1, end)
+        weight = (frames[inner] - frames[start]) / (frames[end] - frames[start])
+        error = np.abs(values[inner] - (values[start] + (values[end] - values[start]) * weight))
+        split = inner[np.argmax(error)]
+        if error.max() > tolerance:
+            keep[split] = True
+            segments += [(start, split), (split, end)]
+    return keep
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=300.0, help='Length of the synthetic take.')
+    parser.add_argument('--fps', type=float, default=60.0)
+    parser.add_argument('--channels', type=int, default=61, help='52 shapes and the head and eye rotations.')
+    args = parser.parse_args()
+
+    frame_count = int(args.seconds * args.fps)
+    frames = np.arange(frame_count, dtype=np.float64)
+    values = synthetic_take(frame_count, args.channels, np.random.default_rng(0))
+    print(f'{frame_count} frames x {args.channels} channels = {values.size} keyframes')
+    for tolerance in (0.0, 0.001, 0.005, 0.02):
+        start = time.perf_counter()
+        keep = decimation_mask(frames, values, tolerance)
+        elapsed = time.perf_counter() - start
+        print(f'tolerance {tolerance:<16} kept {keep.sum():>8} ({keep.mean():>6.1%}) in {elapsed * 1000:>7.1f} ms')
+    start = time.perf_counter()
+    reference = np.stack([recursive_mask(frames, values[:, c], 0.005) for c in range(args.channels)], axis=1)
+    elapsed = time.perf_counter() - start
+    print(f'recursive RDP per channel  kept {reference.sum():>8} ({reference.mean():>6.1%}) in {elapsed * 1000:>7.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: live smoothing cost per frame.
+Compares one deque moving average per channel (the former SmoothedValue) with the vectorized
+FilterBank (running sum SMA, EMA, One-Euro) on all 64 live channels, and the offline take filter.
+Run from anywhere: python benchmarks/bench_live_filters.py --window 10
+"""
+import argparse
+import sys
+import time
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from mocap.live_buffer import NUM_CHANNELS  # noqa: E402
+from mocap.live_filters import FilterBank  # noqa: E402
+
+
+class SmoothedValue:
+    def __init__(self, window_size):
+        self.values = deque(maxlen=window_size)
+
+    def add_value(self, value):
+        self.values.append(value)
+        return sum(self.values) / len(self.values)
+
+
+def bench_deque(data, window):
+    filters = [SmoothedValue(window) for _ in range(NUM_CHANNELS)]
+    start = time.perf_counter()
+    for values in data:
+        values = values.copy()
+        for i in range(NUM_CHANNELS):
+            values[i] = filters[i].add_value(float(values[i]))
+    return time.perf_counter() - start
+
+
+def bench_bank(data, times, filter_type, window):
+    bank = FilterBank(NUM_CHANNELS)
+    bank.set_filter(slice(None), filter_type, window=window, beta=0.5)
+    start = time.perf_counter()
+    for i in range(len(data)):
+        bank.update(data[i], times[i])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=20000)
+    parser.add_argument('--window', type=int, default=10)
+    args = parser.parse_args()
+
+    data = np.random.default_rng(0).random((args.frames, NUM_CHANNELS)).astype(np.float32)
+    times = np.arange(args.frames) / 60
+    print(f'{args.frames} frames, {NUM_CHANNELS} channels, window {args.window}')
+    elapsed = bench_deque(data, args.window)
+    print(f'{"deque per channel (SmoothedValue)":<36} {elapsed / args.frames * 1e6:>8.1f} us/frame')
+    for filter_type in ('SMA', 'EMA', 'ONE_EURO'):
+        elapsed = bench_bank(data, times, filter_type, args.window)
+        print(f'{"FilterBank " + filter_type:<36} {elapsed / args.frames * 1e6:>8.1f} us/frame')
+    for filter_type in ('SMA', 'EMA', 'ONE_EURO'):
+        bank = FilterBank(NUM_CHANNELS)
+        bank.set_filter(slice(None), filter_type, window=args.window, beta=0.5)
+        start = time.perf_counter()
+        bank.filter_take(times, data)
+        elapsed = time.perf_counter() - start
+        print(f'{"filter_take " + filter_type:<36} {elapsed * 1000:>8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Load test: several simulated actors streaming over localhost UDP to one multiplexed receiver thread
+(or one receiver thread per actor with --thread-per-actor). Reports sent vs. received frames per actor, no phone needed.
+Run from anywhere: python benchmarks/bench_live_receive.py --engine FACECAP --actors 4 --fps 120
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from mocap.live_buffer import FrameRingBuffer  # noqa: E402
+from mocap.live_simulator import ENGINES, ReplaySender, get_face_cap_shape_names, synthetic_session  # noqa: E402
+from mocap.osc_receiver import ActorStream, QueueManager, Receiver  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--engine', choices=ENGINES, default='FACECAP')
+    parser.add_argument('--actors', type=int, default=4)
+    parser.add_argument('--fps', type=float, default=120.0)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--burst', type=int, default=1)
+    parser.add_argument('--bundle', action='store_true')
+    parser.add_argument('--thread-per-actor', action='store_true')
+    args = parser.parse_args()
+
+    shape_names = get_face_cap_shape_names()
+    frame_count = int(args.seconds * args.fps)
+    session = synthetic_session(frame_count, fps=args.fps)
+    actors = []
+    receivers = []
+    shared_receiver = None if args.thread_per_actor else Receiver()
+    for i in range(args.actors):
+        frame_buffer = FrameRingBuffer(capacity=frame_count)
+        if shared_receiver is None:
+            receiver = Receiver(QueueManager(frame_buffer))
+            receiver.start(args.engine, '127.0.0.1', 0, shape_reference=shape_names)
+            receivers.append(receiver)
+            port = receiver.sock.getsockname()[1]
+        else:
+            stream = ActorStream(QueueManager(frame_buffer), args.engine, shape_reference=shape_names)
+            port = shared_receiver.add_stream(stream, '127.0.0.1', 0).sock.getsockname()[1]
+        sender = ReplaySender(args.engine, port=port, burst=args.burst,
+                              bundle=args.bundle, shape_names=shape_names, seed=i)
+        actors.append((frame_buffer, sender))
+    if shared_receiver is not None:
+        shared_receiver.start_streams()
+        receivers.append(shared_receiver)
+
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    threads = [sender.start_thread(*session) for _buffer, sender in actors]
+    for thread in threads:
+        thread.join()
+    time.sleep(0.2)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    for receiver in receivers:
+        receiver.stop()
+
+    print(f'{args.actors} actors x {args.fps:.0f} fps, {args.engine}, {len(receivers)} receiver thread(s), '
+          f'{elapsed:.2f} s, process cpu {cpu:.2f} s')
+    for i, (frame_buffer, sender) in enumerate(actors):
+        received = len(frame_buffer)
+        loss = 100 * (1 - received / sender.frames_sent)
+        print(f'actor {i}: {sender.frames_sent} frames sent, {received} received ({loss:.2f}% lost)')
+
+
+if __name__ == '__main__':
+    main()
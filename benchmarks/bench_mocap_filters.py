@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark: smoothing of an imported take (mocap_filters).
+Compares the former per-channel filters (a Python loop per frame for the median) with one
+filter_channels call on the whole (frames x channels) matrix.
+Run from anywhere: python benchmarks/bench_mocap_filters.py --seconds 300 --window 9
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from mocap.mocap_filters import filter_channels, gaussian_kernel  # noqa: E402
+
+
+def channel_median(data, kernel_size):
+    extended_data = np.pad(data, (kernel_size // 2, kernel_size // 2), 'reflect')
+    smoothed_data = np.copy(data)
+    for i in range(len(data)):
+        smoothed_data[i] = np.median(extended_data[i:i + kernel_size])
+    return smoothed_data
+
+
+def channel_filter(data, smooth_filter, window):
+    if smooth_filter == 'SMA':
+        return np.convolve(data, np.ones(window) / window, 'same')
+    if smooth_filter == 'MEDIAN':
+        return channel_median(data, window)
+    return np.convolve(data, gaussian_kernel(window), 'same')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=300.0, help='Length of the synthetic take.')
+    parser.add_argument('--fps', type=float, default=60.0)
+    parser.add_argument('--channels', type=int, default=61, help='52 shapes and the head and eye rotations.')
+    parser.add_argument('--window', type=int, default=9)
+    args = parser.parse_args()
+
+    frame_count = int(args.seconds * args.fps)
+    values = np.random.default_rng(0).random((frame_count, args.channels))
+    print(f'{frame_count} frames x {args.channels} channels, window {args.window}')
+    for smooth_filter in ('SMA', 'MEDIAN', 'GAUSSIAN'):
+        start = time.perf_counter()
+        for channel in range(args.channels):
+            channel_filter(values[:, channel], smooth_filter, args.window)
+        per_channel = time.perf_counter() - start
+        start = time.perf_counter()
+        filter_channels(values, smooth_filter, args.window)
+        matrix = time.perf_counter() - start
+        print(f'{smooth_filter:<9} per channel {per_channel * 1000:>9.1f} ms   filter_channels {matrix * 1000:>7.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: Face Cap OSC decoding, messages per second.
+Compares the per-message decoder (decode_face_cap_tile) with the cached
+struct decoder (decode_osc_packet) on single messages and on one bundle per frame.
+Run from anywhere: python benchmarks/bench_osc_decode.py
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from mocap.decode_face_cap_tile import build_bundle, build_message, decode_face_cap_tile, decode_osc_packet  # noqa: E402
+
+FRAMES = 2000
+
+
+def face_cap_frame(frame):
+    messages = [build_message('/W', (i, (frame % 100) / 100)) for i in range(52)]
+    messages.append(build_message('/HT', (0.1, 0.2, 0.3)))
+    messages.append(build_message('/HR', (10.0, 20.0, 30.0)))
+    messages.append(build_message('/ELR', (1.0, 2.0)))
+    messages.append(build_message('/ERR', (3.0, 4.0)))
+    return messages
+
+
+def bench(name, func, packets, message_count):
+    start = time.perf_counter()
+    for packet in packets:
+        func(packet)
+    elapsed = time.perf_counter() - start
+    print(f'{name:<40} {message_count / elapsed:>12,.0f} msg/s  ({elapsed * 1000:.1f} ms)')
+    return elapsed
+
+
+def main():
+    frames = [face_cap_frame(f) for f in range(FRAMES)]
+    messages = [m for frame in frames for m in frame]
+    bundles = [build_bundle(frame) for frame in frames]
+    count = len(messages)
+    print(f'{FRAMES} frames, {count} messages')
+    base = bench('decode_face_cap_tile (per message)', decode_face_cap_tile, messages, count)
+    fast = bench('decode_osc_packet (per message)', decode_osc_packet, messages, count)
+    bundle = bench('decode_osc_packet (bundle per frame)', decode_osc_packet, bundles, count)
+    print(f'speedup per message: {base / fast:.1f}x, bundled: {base / bundle:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
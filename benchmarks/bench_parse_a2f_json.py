@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark: time and peak memory of parsing an Audio2Face JSON export.
+Compares json.load + nested lists (the former A2FMocapImporter) with the streaming A2FStreamParser.
+Run from anywhere: python benchmarks/bench_parse_a2f_json.py --minutes 10
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.arkit_shapes import A2F  # noqa: E402
+from mocap.mocap_file_parsers import parse_a2f_file  # noqa: E402
+
+
+def write_a2f_file(path, frame_count, fps, shape_names, rng):
+    weights = rng.random((frame_count, len(shape_names))).round(6)
+    data = {'exportFps': fps, 'trackPath': 'take.wav', 'numPoses': len(shape_names), 'numFrames': frame_count,
+            'facsNames': shape_names, 'weightMat': weights.tolist()}
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=4)
+
+
+def parse_json_load(path, fps=24, record_frame_rate=30):
+    '''The former A2FMocapImporter.parse_animation_data.'''
+    timestamps = []
+    sk_animation_lists = []
+    with open(path, 'r') as f:
+        data = json.load(f)
+        for i, shape_key_values in enumerate(data['weightMat']):
+            timestamps.append(i * fps / record_frame_rate)
+            sk_animation_lists.append([float(v) for v in shape_key_values])
+    return timestamps, sk_animation_lists
+
+
+def measure(name, func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{name:<36} {elapsed * 1000:>10.1f} ms {peak / 1e6:>10.1f} MB peak')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--minutes', type=float, default=10.0, help='Length of the synthetic export.')
+    parser.add_argument('--fps', type=int, default=30)
+    args = parser.parse_args()
+
+    shape_names = list(A2F['Data'].keys())
+    frame_count = int(args.minutes * 60 * args.fps)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'take.json')
+        write_a2f_file(path, frame_count, args.fps, shape_names, np.random.default_rng(0))
+        print(f'{frame_count} frames x {len(shape_names)} poses, {os.path.getsize(path) / 1e6:.1f} MB JSON')
+        _timestamps, reference = measure('json.load + lists', parse_json_load, path)
+        take = measure('A2FStreamParser (parse_a2f_file)', parse_a2f_file, path, shape_names)
+        assert np.allclose(np.array(reference, dtype=np.float32), take.shape_values)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark: reconstruction of a recorded live take (LiveAnimator.parse_animation_data) on a synthetic take.
+Compares the frame matrix resampling (resample_to_frame_grid) with the per channel np.interp version
+and the message list parser it replaced (run on --legacy-frames frames, it keeps one tuple per OSC message).
+Run from anywhere: python benchmarks/bench_parse_live_take.py --frames 100000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from mocap.live_buffer import CHANNEL_GROUPS, EYE_L, EYE_R, HEAD_LOC, HEAD_ROT, SHAPES  # noqa: E402
+from mocap.live_simulator import synthetic_session  # noqa: E402
+from mocap.live_timing import resample_to_frame_grid, select_frame_times  # noqa: E402
+
+
+def recorded_take(frame_count, fps, loss, seed=0):
+    '''Synthetic take with lost frames and receive jitter, as stored by the ring buffer.'''
+    rng = np.random.default_rng(seed)
+    times, data, flags = synthetic_session(frame_count, fps=fps, seed=seed)
+    keep = rng.random(frame_count) >= loss
+    times = times[keep] + 1.7e9
+    receive_times = times + rng.exponential(0.004, len(times))
+    return receive_times, times, data[keep], flags[keep]
+
+
+def parse_matrix(receive_times, device_times, data, flags, fps):
+    times = select_frame_times(receive_times, device_times)
+    frames, values, _flags = resample_to_frame_grid(times, data, flags, fps, hold_edges=True)
+    return frames, values[:, SHAPES], values[:, HEAD_ROT], values[:, HEAD_LOC], values[:, EYE_L], values[:, EYE_R]
+
+
+def parse_per_channel(receive_times, device_times, data, flags, fps):
+    '''The previous version: one np.interp call per channel and Python lists for the importer.'''
+    times = select_frame_times(receive_times, device_times)
+    order = np.argsort(times, kind='stable')
+    positions = (times[order] - times[order[0]]) * fps
+    data = data[order]
+    flags = flags[order]
+    grid = np.arange(int(np.floor(positions[-1])) + 1, dtype=np.float64)
+    values = np.zeros((len(grid), data.shape[1]), dtype=np.float32)
+    for channels, flag in CHANNEL_GROUPS:
+        has_group = (flags & flag) != 0
+        group_positions = positions[has_group]
+        group_data = data[has_group, channels]
+        inside = (grid >= group_positions[0]) & (grid <= group_positions[-1])
+        for c in range(group_data.shape[1]):
+            values[inside, channels.start + c] = np.interp(grid[inside], group_positions, group_data[:, c])
+    return (grid.tolist(), values[:, SHAPES].tolist(), values[:, HEAD_ROT].tolist(), values[:, HEAD_LOC].tolist(),
+            values[:, EYE_L].tolist(), values[:, EYE_R].tolist())
+
+
+def to_messages(receive_times, data):
+    '''The recorded message list of the original recorder: (time, address, values) per OSC message.'''
+    messages = []
+    for t, values in zip(receive_times.tolist(), data.tolist()):
+        messages.extend((t, '/W', [i, v]) for i, v in enumerate(values[SHAPES]))
+        messages.append((t, '/HT', values[HEAD_LOC]))
+        messages.append((t, '/HR', values[HEAD_ROT]))
+        messages.append((t, '/ELR', values[EYE_L][:2]))
+        messages.append((t, '/ERR', values[EYE_R][:2]))
+    return messages
+
+
+def parse_messages(data, fps, frame_start=0):
+    '''The message list parser of the original LiveAnimator.parse_animation_data.'''
+    animation_timestamps = []
+    sk_animation_lists = []
+    shape_key_values = []
+    timestamp = None
+    first_timestamp = None
+    shape_idx = 0
+    last_shape_idx = 0
+    frame_number = 0
+    missing_frames = []
+    for _time, _address, _value in data:
+        if first_timestamp is None:
+            first_timestamp = _time
+        if _address == "/W":
+            shape_idx = _value[0]
+            if shape_idx < last_shape_idx:
+                if len(shape_key_values) == 52:
+                    animation_timestamps.append(timestamp)
+                    sk_animation_lists.append([v[1] for v in shape_key_values])
+                else:
+                    missing_frames.append(frame_number)
+                timestamp = None
+                shape_key_values = []
+        if timestamp is None:
+            timestamp = (_time - first_timestamp) * fps + frame_start
+        if _address == "/W":
+            shape_key_values.append(_value)
+        if _address in ("/ELR", "/ERR"):
+            if len(_value) < 3:
+                _value.append(0.0)
+        frame_number += 1
+        last_shape_idx = shape_idx
+    hr = [x[2] for x in data if x[1] == "/HR"]
+    ht = [x[2] for x in data if x[1] == "/HT"]
+    elr = [x[2] for x in data if x[1] == "/ELR"]
+    err = [x[2] for x in data if x[1] == "/ERR"]
+    head_rot = [x for i, x in enumerate(hr) if i not in missing_frames]
+    head_loc = [x for i, x in enumerate(ht) if i not in missing_frames]
+    eye_L = [x for i, x in enumerate(elr) if i not in missing_frames]
+    eye_R = [x for i, x in enumerate(err) if i not in missing_frames]
+    return animation_timestamps, sk_animation_lists, head_rot, head_loc, eye_L, eye_R
+
+
+def bench(name, func, *args, repeat=3):
+    best = min(_timed(func, *args) for _ in range(repeat))
+    print(f'{name:<48} {best * 1000:>10.1f} ms')
+    return best
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=100000)
+    parser.add_argument('--record-fps', type=float, default=60.0)
+    parser.add_argument('--scene-fps', type=float, default=24.0)
+    parser.add_argument('--loss', type=float, default=0.01, help='Fraction of lost frames.')
+    parser.add_argument('--legacy-frames', type=int, default=10000,
+                        help='Take length for the message list parser (0 to skip).')
+    args = parser.parse_args()
+
+    take = recorded_take(args.frames, args.record_fps, args.loss)
+    print(f'{len(take[0])} recorded frames ({args.frames / args.record_fps / 60:.1f} min at {args.record_fps:.0f} fps), '
+          f'scene at {args.scene_fps:.0f} fps')
+    fast = bench('frame matrix (resample_to_frame_grid)', parse_matrix, *take, args.scene_fps)
+    per_channel = bench('per channel np.interp + lists', parse_per_channel, *take, args.scene_fps)
+    print(f'speedup: {per_channel / fast:.1f}x')
+    reference = parse_per_channel(*take, args.scene_fps)
+    result = parse_matrix(*take, args.scene_fps)
+    error = np.abs(result[1] - np.array(reference[1])).max()
+    print(f'max shape difference to np.interp: {error:.2e}')
+    if args.legacy_frames:
+        legacy_take = recorded_take(args.legacy_frames, args.record_fps, args.loss)
+        messages = to_messages(legacy_take[0], legacy_take[2])
+        legacy = bench(f'message list parser ({args.legacy_frames} frames)', parse_messages, messages,
+                       args.scene_fps, repeat=1)
+        matrix = bench(f'frame matrix ({args.legacy_frames} frames)', parse_matrix, *legacy_take, args.scene_fps)
+        print(f'speedup: {legacy / matrix:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
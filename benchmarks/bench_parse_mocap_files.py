@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark: parsing of Face Cap TXT and Live Link Face CSV files.
+Compares the bulk parsers (mocap_file_parsers) with the csv module row parsers they replaced on synthetic takes,
+and a repeated import from the parse cache (mocap_parse_cache).
+Run from anywhere: python benchmarks/bench_parse_mocap_files.py --seconds 300
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.arkit_shapes import EPIC, FACECAP  # noqa: E402
+from mocap.mocap_file_parsers import parse_epic_file, parse_face_cap_file  # noqa: E402
+from mocap.mocap_parse_cache import ParseCache, parse_cached  # noqa: E402
+
+
+def write_face_cap_file(path, frame_count, fps, rng):
+    names = [shape_data['name'] for shape_data in FACECAP['Data'].values()]
+    values = rng.random((frame_count, 62))
+    with open(path, 'w') as f:
+        f.write('info,version,1.0\n')
+        f.write('bs,' + ','.join(names) + '\n')
+        for i, row in enumerate(values):
+            f.write(f'k,{int(i * 1000 / fps)},' + ','.join(f'{v:.6f}' for v in row) + '\n')
+
+
+def write_epic_file(path, frame_count, fps, rng):
+    names = [name[0].upper() + name[1:] for name in EPIC['Data'].keys()]
+    transforms = ['HeadYaw', 'HeadPitch', 'HeadRoll', 'LeftEyeYaw', 'LeftEyePitch', 'LeftEyeRoll',
+                  'RightEyeYaw', 'RightEyePitch', 'RightEyeRoll']
+    values = rng.random((frame_count, 61))
+    with open(path, 'w') as f:
+        f.write(','.join(['Timecode', 'BlendShapeCount'] + names + transforms) + '\n')
+        for i, row in enumerate(values):
+            seconds, frame = divmod(i, int(fps))
+            minutes, seconds = divmod(seconds, 60)
+            timecode = f'10:{minutes:02d}:{seconds:02d}:{frame:02d}.{i % 1000:03d}'
+            f.write(f'{timecode},61,' + ','.join(f'{v:.6f}' for v in row) + '\n')
+
+
+def parse_face_cap_rows(path, fps=24, record_frame_rate=1000):
+    '''The former FaceCapImporter.parse_animation_data.'''
+    timestamps, head_rot, head_loc, eye_L, eye_R, shapes = [], [], [], [], [], []
+    with open(path) as csvfile:
+        for row in csv.reader(csvfile):
+            if not row or row[0] != 'k':
+                continue
+            timestamps.append((float(row[1]) / record_frame_rate) * fps)
+            head_rot.append([float(v) for v in row[5:8]])
+            head_loc.append([float(v) for v in row[2:5]])
+            eye_L.append([float(row[8]), float(row[9]), 0.0])
+            eye_R.append([float(row[10]), float(row[11]), 0.0])
+            shapes.append([float(v) for v in row[12:]])
+    return timestamps, shapes
+
+
+def _convert_timecode_to_frames(timecode, framerate, recorded_framerate=60):
+    _zip_ft = zip((3600, 60, 1, 1 / recorded_framerate), timecode.split(':'))
+    return sum(f * float(t) for f, t in _zip_ft) * framerate
+
+
+def parse_epic_rows(path, fps=24, record_frame_rate=60):
+    '''The former EpicMocapImporter.parse_animation_data.'''
+    timestamps, shapes, head_rot, eye_L, eye_R = [], [], [], [], []
+    first_frame = None
+    with open(path) as csvfile:
+        for i, row in enumerate(csv.reader(csvfile)):
+            if not row or i == 0 or float(row[1]) == 0:
+                continue
+            if first_frame is None:
+                first_frame = _convert_timecode_to_frames(row[0], fps, record_frame_rate)
+            timestamps.append(_convert_timecode_to_frames(row[0], fps, record_frame_rate) - first_frame)
+            shapes.append([float(v) for v in row[2:54]])
+            head_rot.append([-float(row[55]), -float(row[54]), -float(row[56])])
+            eye_L.append([float(row[58]), float(row[57]), 0.0])
+            eye_R.append([float(row[61]), float(row[60]), 0.0])
+    return timestamps, shapes
+
+
+def bench(name, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    print(f'{name:<40} {elapsed * 1000:>10.1f} ms')
+    return elapsed, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=300.0, help='Length of the synthetic takes.')
+    parser.add_argument('--fps', type=float, default=60.0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frame_count = int(args.seconds * args.fps)
+    face_cap_names = [(name, shape_data['name']) for name, shape_data in FACECAP['Data'].items()]
+    with tempfile.TemporaryDirectory() as directory:
+        face_cap_path = os.path.join(directory, 'take.txt')
+        epic_path = os.path.join(directory, 'take.csv')
+        write_face_cap_file(face_cap_path, frame_count, args.fps, rng)
+        write_epic_file(epic_path, frame_count, args.fps, rng)
+        print(f'{frame_count} frames ({args.seconds / 60:.1f} min at {args.fps:.0f} fps), '
+              f'{os.path.getsize(face_cap_path) / 1e6:.1f} MB TXT, {os.path.getsize(epic_path) / 1e6:.1f} MB CSV')
+
+        rows, (_times, rows_shapes) = bench('Face Cap csv rows + float()', parse_face_cap_rows, face_cap_path)
+        bulk, take = bench('Face Cap bulk (parse_face_cap_file)', parse_face_cap_file, face_cap_path, face_cap_names)
+        assert np.allclose(np.array(rows_shapes, dtype=np.float32), take.shape_values)
+        print(f'speedup: {rows / bulk:.1f}x')
+
+        rows, (rows_times, rows_shapes) = bench('Epic csv rows + timecode per row', parse_epic_rows, epic_path)
+        bulk, take = bench('Epic bulk (parse_epic_file)', parse_epic_file, epic_path, list(EPIC['Data'].keys()))
+        assert np.allclose(np.array(rows_shapes, dtype=np.float32), take.shape_values)
+        assert np.allclose(rows_times, (take.times - take.times[0]) * 24)
+        print(f'speedup: {rows / bulk:.1f}x')
+
+        cache = ParseCache(os.path.join(directory, 'cache'))
+        def import_cached():
+            return parse_cached(parse_face_cap_file, face_cap_path, face_cap_names, cache=cache)
+        bench('Face Cap first import (parse + store)', import_cached)
+        cached, _take = bench('Face Cap repeated import (cache hit)', import_cached)
+        print(f'cache: {cache.size() / 1e6:.1f} MB, speedup over parsing: {bulk / cached:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,8 @@
 import bpy
 import numpy as np
 
+from .keyframe_arrays import KEYFRAME_ARRAY_ATTRS, merge_keyframe_arrays, new_keyframe_arrays, overwrite_range_mask
+
 MODIFIER_TYPES = [
     'GENERATOR',
     'FNGENERATOR',
@@ -32,6 +34,41 @@ def get_fcurve_from_bpy_struct(fcurves_struct, dp='', array_index=-1, replace=Fa
 
     return fc
 
+
+def ensure_action_channels(action, id_data=None, id_type='OBJECT'):
+    '''Return the struct that holds the fcurves and groups of an action for id_data.
+    Legacy actions (Blender < 4.4): the action itself.
+    Layered actions: the channelbag of the slot of id_data on the first keyframe strip. The layer, strip and slot
+    are created when missing, a new slot is assigned to id_data if it uses the action.
+    @id_data: the animated ID (object, shape key datablock), None for the first slot.
+    @id_type: the ID type of a new slot if id_data is None.
+    '''
+    if bpy.app.version < (4, 4, 0):
+        return action
+    anim_data = getattr(id_data, 'animation_data', None)
+    uses_action = anim_data is not None and anim_data.action == action
+    slot = anim_data.action_slot if uses_action else None
+    if slot is None:
+        if action.slots:
+            slot = action.slots[0]
+        else:
+            slot = action.slots.new(id_data.id_type if id_data else id_type, id_data.name if id_data else action.name)
+        if uses_action:
+            anim_data.action_slot = slot
+    layer = action.layers[0] if action.layers else action.layers.new('Layer')
+    strip = layer.strips[0] if layer.strips else layer.strips.new(type='KEYFRAME')
+    return strip.channelbag(slot, ensure=True)
+
+
+def ensure_fcurve(channels, data_path, index=0, group_name=''):
+    '''Find or create an fcurve in the channels returned by ensure_action_channels.'''
+    fc = channels.fcurves.find(data_path, index=index)
+    if fc is None:
+        fc = channels.fcurves.new(data_path, index=index)
+        if group_name:
+            fc.group = channels.groups.get(group_name) or channels.groups.new(group_name)
+    return fc
+
 # | ----------------- MODIFIERS -----------------------
 
 
@@ -301,8 +338,57 @@ def kf_data_to_numpy_array(fc, attr='co'):
 
 
 def frame_value_pairs_to_numpy_array(frames, values):
-    # kf_data = [x for co in zip(frames, values) for x in co]
-    return np.array(list(zip(frames, values)))
+    '''Return the keyframe data (frame, value rows) for equally long frames and values.'''
+    return np.column_stack((np.asarray(frames, dtype=np.float64), np.asarray(values, dtype=np.float64)))
+
+
+def read_keyframe_arrays(fc):
+    '''Return all keyframe point attributes of an fcurve, see keyframe_arrays.KEYFRAME_ARRAY_ATTRS.'''
+    count = len(fc.keyframe_points)
+    arrays = {}
+    for attr, size, dtype in KEYFRAME_ARRAY_ATTRS:
+        data = np.empty(count * size, dtype=dtype)
+        fc.keyframe_points.foreach_get(attr, data)
+        arrays[attr] = data.reshape(-1, size) if size > 1 else data
+    return arrays
+
+
+def resize_keyframe_points(fc, count):
+    '''Add keyframe points at the end so that the fcurve holds count points. If there are too many points, they
+    are cleared and count new points are added in one call. The points are overwritten by the bulk writers.
+    '''
+    difference = count - len(fc.keyframe_points)
+    if difference < 0:
+        fc.keyframe_points.clear()
+        difference = count
+    if difference > 0:
+        fc.keyframe_points.add(count=difference)
+
+
+def write_keyframe_arrays(fc, arrays):
+    '''Replace all keyframe points of an fcurve with the keyframe arrays ({attr: array}), one foreach_set per attribute.'''
+    resize_keyframe_points(fc, len(arrays['co']))
+    for attr, data in arrays.items():
+        fc.keyframe_points.foreach_set(attr, np.ravel(data))
+    fc.update()
+
+
+def write_keyframes(
+        fc, frames, values, interpolation=None, handle_type=None, join_with_existing=True, overwrite_old_range=True):
+    '''Write keyframes to an fcurve in one pass. The existing keyframe points are reused instead of cleared.
+    @interpolation, @handle_type: of the new keyframes, the defaults of the user preferences if None.
+    @join_with_existing: keep the existing keyframes, they keep their handles and interpolation.
+    @overwrite_old_range: the existing keyframes in the frame range of the new keyframes are replaced.
+    Returns the number of keyframe points.
+    '''
+    edit_prefs = bpy.context.preferences.edit
+    interpolation = interpolation or edit_prefs.keyframe_new_interpolation_type
+    handle_type = handle_type or edit_prefs.keyframe_new_handle_type
+    arrays = new_keyframe_arrays(frames, values, interpolation=interpolation, handle_type=handle_type)
+    if join_with_existing and len(fc.keyframe_points):
+        arrays = merge_keyframe_arrays(read_keyframe_arrays(fc), arrays, overwrite_old_range=overwrite_old_range)
+    write_keyframe_arrays(fc, arrays)
+    return len(arrays['co'])
 
 
 def populate_keyframe_points_from_np_array(
@@ -313,12 +399,16 @@ def populate_keyframe_points_from_np_array(
         print('ERROR: Can not find fcurve')
         return False
     if add:
+        if attr == 'co':
+            # New keyframes with default handles, the kept keyframes keep their own.
+            data = np.reshape(data, (-1, 2))
+            write_keyframes(fc, data[:, 0], data[:, 1], join_with_existing=join_with_existing,
+                            overwrite_old_range=overwrite_old_range)
+            return True
         if len(fc.keyframe_points) > 0 and join_with_existing:
             existing_kf_data = kf_data_to_numpy_array(fc, attr=attr)
             data = mix_kf_data_overwrite_range(existing_kf_data, data, overwrite_old_range=overwrite_old_range)
-        clear_fcurve_kf_points(fc)
-        count = data.shape[0]
-        fc.keyframe_points.add(count=count)
+        resize_keyframe_points(fc, data.shape[0])
     if data.shape[0] == len(fc.keyframe_points):
         fc.keyframe_points.foreach_set(attr, np.reshape(data, (-1, 1)))
         result = True
@@ -344,8 +434,8 @@ def mix_kf_data_overwrite_range(kf_data_old, kf_data_new, overwrite_old_range=Tr
     if overwrite_old_range:
         # Get all rows in first column --> frame values
         new_frames = kf_data_new[:, 0]
-        # Create a mask to remove new_frames range from the old data
-        mask = ((kf_data_old < min(new_frames)) | (kf_data_old > max(new_frames))).all(axis=1)
+        # Create a mask to remove new_frames range from the old data (frame column only)
+        mask = overwrite_range_mask(kf_data_old[:, 0], new_frames)
         kf_data_old = kf_data_old[mask, :]
     final_kf_data = np.vstack((kf_data_old, kf_data_new))
     return final_kf_data
@@ -0,0 +1,81 @@
+import numpy as np
+
+# The values of the keyframe enums in foreach_get / foreach_set (BEZT_IPO_*, HD_*)
+KEYFRAME_INTERPOLATION_VALUES = {
+    'CONSTANT': 0,
+    'LINEAR': 1,
+    'BEZIER': 2,
+    'BACK': 3,
+    'BOUNCE': 4,
+    'CIRC': 5,
+    'CUBIC': 6,
+    'ELASTIC': 7,
+    'EXPO': 8,
+    'QUAD': 9,
+    'QUART': 10,
+    'QUINT': 11,
+    'SINE': 12,
+}
+KEYFRAME_HANDLE_TYPE_VALUES = {
+    'FREE': 0,
+    'AUTO': 1,
+    'VECTOR': 2,
+    'ALIGNED': 3,
+    'AUTO_CLAMPED': 4,
+}
+# The keyframe point attributes that are written in bulk: (name, values per keyframe, dtype)
+KEYFRAME_ARRAY_ATTRS = (
+    ('co', 2, np.float32),
+    ('handle_left', 2, np.float32),
+    ('handle_right', 2, np.float32),
+    ('interpolation', 1, np.int32),
+    ('handle_left_type', 1, np.int32),
+    ('handle_right_type', 1, np.int32),
+)
+
+
+def new_keyframe_arrays(frames, values, interpolation='BEZIER', handle_type='AUTO_CLAMPED'):
+    '''Return the keyframe arrays {attr: array} for new keyframes. The handles sit on the keyframes,
+    auto handles are placed by FCurve.update().
+    '''
+    co = np.column_stack((np.asarray(frames, dtype=np.float32), np.asarray(values, dtype=np.float32)))
+    count = len(co)
+    handle_type = KEYFRAME_HANDLE_TYPE_VALUES[handle_type]
+    return {
+        'co': co,
+        'handle_left': co.copy(),
+        'handle_right': co.copy(),
+        'interpolation': np.full(count, KEYFRAME_INTERPOLATION_VALUES[interpolation], dtype=np.int32),
+        'handle_left_type': np.full(count, handle_type, dtype=np.int32),
+        'handle_right_type': np.full(count, handle_type, dtype=np.int32),
+    }
+
+
+def frame_range_mask(frames, frame_start, frame_end):
+    '''Return the mask of the frames in the closed range [frame_start, frame_end], subframes included.'''
+    frames = np.asarray(frames)
+    return (frames >= frame_start) & (frames <= frame_end)
+
+
+def overwrite_range_mask(old_frames, new_frames):
+    '''Return the mask of the old keyframes outside of the frame range of the new keyframes.'''
+    if not len(new_frames):
+        return np.ones(len(old_frames), dtype=bool)
+    return ~frame_range_mask(old_frames, np.min(new_frames), np.max(new_frames))
+
+
+def remove_keyframe_range(arrays, frame_start, frame_end):
+    '''Return the keyframe arrays ({attr: array}) without the keyframes in [frame_start, frame_end].'''
+    keep = ~frame_range_mask(arrays['co'][:, 0], frame_start, frame_end)
+    return {attr: data[keep] for attr, data in arrays.items()}
+
+
+def merge_keyframe_arrays(old, new, overwrite_old_range=True):
+    '''Join two sets of keyframe arrays ({attr: array}, see new_keyframe_arrays), sorted by frame.
+    @overwrite_old_range: the old keyframes in the frame range of the new keyframes are removed.
+    Keyframes on the same frame keep their order, old before new.
+    '''
+    keep = overwrite_range_mask(old['co'][:, 0], new['co'][:, 0]) if overwrite_old_range else slice(None)
+    merged = {attr: np.concatenate((old[attr][keep], new[attr])) for attr in new}
+    order = np.argsort(merged['co'][:, 0], kind='stable')
+    return {attr: data[order] for attr, data in merged.items()}
@@ -1,6 +1,6 @@
 
 import struct
-from typing import Tuple
+from typing import List, Tuple
 
 
 class ParseError(Exception):
@@ -54,7 +54,7 @@ def get_string(dgram: bytes, start_index: int) -> Tuple[str, int]:
         if offset > len(dgram[start_index:]):
             raise ParseError('Datagram is too short')
         data_str = dgram[start_index:start_index + offset]
-        return data_str.replace(b'\x00', b'').decode('utf-8'), start_index + offset
+        return bytes(data_str).replace(b'\x00', b'').decode('utf-8'), start_index + offset
     except IndexError as ie:
         raise ParseError('Could not parse datagram %s' % ie)
     except TypeError as te:
@@ -97,7 +97,8 @@ def get_float(dgram: bytes, start_index: int) -> Tuple[float, int]:
             # Noticed that Reaktor doesn't send the last bunch of \x00 needed to make
             # the float representation complete in some cases, thus we pad here to
             # account for that.
-            dgram = dgram + b'\x00' * (_FLOAT_DGRAM_LEN - len(dgram[start_index:]))
+            padded = bytes(dgram[start_index:]) + b'\x00' * (_FLOAT_DGRAM_LEN - len(dgram[start_index:]))
+            return struct.unpack('>f', padded)[0], start_index + _FLOAT_DGRAM_LEN
         return (
             struct.unpack('>f',
                           dgram[start_index:start_index + _FLOAT_DGRAM_LEN])[0],
@@ -106,6 +107,50 @@ def get_float(dgram: bytes, start_index: int) -> Tuple[float, int]:
         raise ParseError('Could not parse datagram %s' % e)
 
 
+def get_params(dgram: bytes, start_index: int, type_tag: str) -> Tuple[list, int]:
+    """Get the parameters of a message from the datagram, starting at pos start_index.
+    Args:
+    dgram: A datagram packet.
+    start_index: An index where the parameters start in the datagram.
+    type_tag: The type tag of the message without the leading ','.
+    Returns:
+    A tuple containing the parameters and the new end index.
+    Raises:
+    ParseError if the datagram could not be parsed.
+    """
+    index = start_index
+    params = []
+    param_stack = [params]
+    # Parse each parameter given its type.
+    for param in type_tag:
+        if param == "i":  # Integer.
+            val, index = get_int(dgram, index)
+        elif param == "f":  # Float.
+            val, index = get_float(dgram, index)
+        elif param == "s":  # String.
+            val, index = get_string(dgram, index)
+        elif param == "T":  # True.
+            val = True
+        elif param == "F":  # False.
+            val = False
+        elif param == "[":  # Array start.
+            array = []
+            param_stack[-1].append(array)
+            param_stack.append(array)
+        elif param == "]":  # Array stop.
+            if len(param_stack) < 2:
+                raise ParseError('Unexpected closing bracket in type tag: {0}'.format(type_tag))
+            param_stack.pop()
+        # TODO: Support more exotic types as described in the specification.
+        else:
+            continue
+        if param not in "[]":
+            param_stack[-1].append(val)
+    if len(param_stack) != 1:
+        raise ParseError('Missing closing bracket in type tag: {0}'.format(type_tag))
+    return params, index
+
+
 def decode_face_cap_tile(dgram) -> Tuple[str, list]:
 
     _dgram = dgram
@@ -122,40 +167,154 @@ def decode_face_cap_tile(dgram) -> Tuple[str, list]:
         if type_tag.startswith(','):
             type_tag = type_tag[1:]
 
-        params = []
-        param_stack = [params]
-        # Parse each parameter given its type.
-        for param in type_tag:
-            if param == "i":  # Integer.
-                val, index = get_int(_dgram, index)
-            elif param == "f":  # Float.
-                val, index = get_float(_dgram, index)
-            elif param == "s":  # String.
-                val, index = get_string(_dgram, index)
-            elif param == "T":  # True.
-                val = True
-            elif param == "F":  # False.
-                val = False
-            elif param == "[":  # Array start.
-                array = []
-                param_stack[-1].append(array)
-                param_stack.append(array)
-            elif param == "]":  # Array stop.
-                if len(param_stack) < 2:
-                    raise ParseError('Unexpected closing bracket in type tag: {0}'.format(type_tag))
-                param_stack.pop()
-            # TODO: Support more exotic types as described in the specification.
-            else:
-                continue
-            if param not in "[]":
-                param_stack[-1].append(val)
-        if len(param_stack) != 1:
-            raise ParseError('Missing closing bracket in type tag: {0}'.format(type_tag))
+        params, index = get_params(_dgram, index, type_tag)
         _parameters = params
         return (_address_regexp, params)
     except ParseError as pe:
         raise ParseError('Found incorrect datagram, ignoring it', pe)
 
+_BUNDLE_PREFIX = b'#bundle\x00'
+# Bundle header: '#bundle' string + 64 bit NTP time tag.
+_BUNDLE_HEADER_LEN = 16
+_BUNDLE_ELEMENT_SIZE = struct.Struct('>i')
+_BUNDLE_TIMETAG = struct.Struct('>Q')
+# Cached per message header (address + type tag bytes): (address, struct.Struct for the arguments) or None
+# if the type tag can't be unpacked with a fixed layout (strings, arrays, ...).
+_MESSAGE_LAYOUTS = {}
+_FIXED_SIZE_TYPES = {'i': 'i', 'f': 'f'}
+
+
+def _padded_end(dgram, start):
+    '''Return the index after the null terminated and 4 byte aligned string starting at start.'''
+    end = dgram.find(b'\x00', start)
+    if end < 0:
+        raise ParseError('Datagram is too short')
+    return end + _STRING_DGRAM_PAD - (end - start) % _STRING_DGRAM_PAD
+
+
+def _compile_message_layout(header):
+    address_end = _padded_end(header, 0)
+    address = header[:address_end].rstrip(b'\x00').decode('utf-8')
+    type_tag = header[address_end:].rstrip(b'\x00').decode('utf-8')
+    if type_tag.startswith(','):
+        type_tag = type_tag[1:]
+    if not all(param in _FIXED_SIZE_TYPES for param in type_tag):
+        return None
+    return address, struct.Struct('>' + ''.join(_FIXED_SIZE_TYPES[param] for param in type_tag))
+
+
+def _decode_message(dgram, start, end):
+    '''Decode the message in dgram[start:end]. Returns ((address, params), index after the message).'''
+    address_end = _padded_end(dgram, start)
+    if address_end >= end:
+        # No params is legit.
+        return None, end
+    if dgram[address_end] != 44:  # ','
+        # A message without type tag, the next message follows the address.
+        return None, address_end
+    args_start = _padded_end(dgram, address_end)
+    header = dgram[start:args_start]
+    try:
+        layout = _MESSAGE_LAYOUTS[header]
+    except KeyError:
+        layout = _MESSAGE_LAYOUTS[header] = _compile_message_layout(header)
+    if layout is None:
+        # Slow path for types without fixed size.
+        address, _ = get_string(dgram, start)
+        type_tag, _ = get_string(dgram, address_end)
+        params, index = get_params(dgram, args_start, type_tag[1:])
+        if index > end:
+            raise ParseError('Datagram is too short')
+        return (address, params), index
+    address, args_struct = layout
+    if args_start + args_struct.size > end:
+        raise ParseError('Datagram is too short')
+    return (address, args_struct.unpack_from(dgram, args_start)), args_start + args_struct.size
+
+
+def _decode_elements(dgram, start, end, messages):
+    if dgram.startswith(_BUNDLE_PREFIX, start):
+        unpack_size = _BUNDLE_ELEMENT_SIZE.unpack_from
+        index = start + _BUNDLE_HEADER_LEN
+        while index < end:
+            size = unpack_size(dgram, index)[0]
+            index += 4
+            element_end = index + size
+            if size <= 0 or element_end > end:
+                raise ParseError('Invalid bundle element size {}'.format(size))
+            if dgram[index] == 47:  # '/'
+                message, _ = _decode_message(dgram, index, element_end)
+                if message is not None:
+                    messages.append(message)
+            else:
+                _decode_elements(dgram, index, element_end, messages)
+            index = element_end
+        return
+    # A single message or several messages written back to back.
+    index = start
+    while index < end and dgram[index] == 47:  # '/'
+        message, index = _decode_message(dgram, index, end)
+        if message is not None:
+            messages.append(message)
+
+
+def is_bundle(dgram) -> bool:
+    return bytes(dgram[:len(_BUNDLE_PREFIX)]) == _BUNDLE_PREFIX
+
+
+def get_bundle_timetag(dgram) -> int:
+    '''Return the 64 bit NTP time tag of a bundle. 1 (immediately) for single messages.'''
+    if not is_bundle(dgram) or len(dgram) < _BUNDLE_HEADER_LEN:
+        return 1
+    return _BUNDLE_TIMETAG.unpack_from(dgram, len(_BUNDLE_PREFIX))[0]
+
+
+def decode_osc_packet(dgram) -> List[Tuple[str, tuple]]:
+    '''Decode all messages in an OSC packet: a message, several concatenated messages or a (nested) bundle.
+    Fixed size messages are unpacked with a cached struct.Struct per address and type tag.
+    Returns a list of (address, params).
+    '''
+    dgram = bytes(dgram)
+    messages = []
+    try:
+        _decode_elements(dgram, 0, len(dgram), messages)
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ParseError('Found incorrect datagram, ignoring it', e)
+    return messages
+
+
+def _build_string(value: str) -> bytes:
+    data = value.encode('utf-8') + b'\x00'
+    return data + b'\x00' * (-len(data) % _STRING_DGRAM_PAD)
+
+
+def build_message(address: str, params) -> bytes:
+    '''Build an OSC message datagram. Supports int, float, bool and str params.'''
+    type_tag = ','
+    args = b''
+    for param in params:
+        if isinstance(param, bool):
+            type_tag += 'T' if param else 'F'
+        elif isinstance(param, int):
+            type_tag += 'i'
+            args += struct.pack('>i', param)
+        elif isinstance(param, float):
+            type_tag += 'f'
+            args += struct.pack('>f', param)
+        elif isinstance(param, str):
+            type_tag += 's'
+            args += _build_string(param)
+        else:
+            raise BuildError('Unsupported parameter type {}'.format(type(param)))
+    return _build_string(address) + _build_string(type_tag) + args
+
+
+def build_bundle(messages, timetag=IMMEDIATELY) -> bytes:
+    '''Build an OSC bundle from a list of message (or bundle) datagrams.'''
+    elements = b''.join(_BUNDLE_ELEMENT_SIZE.pack(len(m)) + m for m in messages)
+    return _BUNDLE_PREFIX + _BUNDLE_TIMETAG.pack(timetag or 1) + elements
+
+
 # /W [31, 0.0]
 # /W [33, 0.1455814391374588]
 # /HT [0.6953338384628296, -18.356565475463867, -43.202964782714844]
@@ -1,27 +1,40 @@
 # https://www.ifacialmocap.com/for-developer/
 
-from operator import itemgetter
+from .live_buffer import EYE_L, EYE_R, FLAG_EYE_L, FLAG_EYE_R, FLAG_HEAD_LOC, FLAG_HEAD_ROT, FLAG_SHAPES, HEAD_LOC, HEAD_ROT, new_frame
+
+IFACIAL_MOCAP_FLAGS = FLAG_SHAPES | FLAG_HEAD_ROT | FLAG_HEAD_LOC | FLAG_EYE_L | FLAG_EYE_R
 
 
 def decode_ifacial_mocap(data, shape_reference):
-    return convert_ifacial_mocap_to_face_cap_format(data.decode('utf-8'), shape_reference)
+    return convert_ifacial_mocap_to_frame(str(data, 'utf-8'), shape_reference)
+
+
+def get_shape_index_dict(shape_reference):
+    '''Map the shape names to their channel index. Pass the result to decode_ifacial_mocap to avoid rebuilding it.'''
+    if isinstance(shape_reference, dict):
+        return shape_reference
+    return {shape_name: i for i, shape_name in enumerate(shape_reference)}
 
 
-def convert_ifacial_mocap_to_face_cap_format(data, shape_reference):
+def convert_ifacial_mocap_to_frame(data, shape_reference):
+    '''Converts the iFacialMocap text format to a frame record (values, flags) in the Face Cap format.'''
+    shape_indices = get_shape_index_dict(shape_reference)
     data = data.split('|')
-    animation_data = []
-    input_shapes = {shape.split('-')[0]: float(shape.split('-')[1]) /
-                    100 for shape in data[:54]}
-    for i, shape_name in enumerate(shape_reference):
-        value = input_shapes.get(shape_name, 0)  # Default to 0 if shape_name not found
-        animation_data.append(('/W', (i, value)))
+    values = new_frame()
+    for shape in data[:54]:
+        shape_name, _, value = shape.partition('-')
+        i = shape_indices.get(shape_name)
+        if i is not None:
+            values[i] = float(value) / 100
     head_data = data[54].split('#')[1].split(',')
-    head_rotation = head_data[:3]
-    animation_data.append(('/HR', [float(i) for i in head_rotation]))
-    head_translation = head_data[3:]
-    animation_data.append(('/HT', [float(i) for i in head_translation]))
-    eye_left_data = data[55].split('#')[1].split(',')
-    animation_data.append(('/ELR', [float(i) for i in eye_left_data]))
-    eye_right_data = data[56].split('#')[1].split(',')
-    animation_data.append(('/ERR', [float(i) for i in eye_right_data]))
-    return animation_data
+    _set_channels(values, HEAD_ROT, head_data[:3])
+    _set_channels(values, HEAD_LOC, head_data[3:])
+    _set_channels(values, EYE_L, data[55].split('#')[1].split(','))
+    _set_channels(values, EYE_R, data[56].split('#')[1].split(','))
+    return values, IFACIAL_MOCAP_FLAGS
+
+
+def _set_channels(values, channels, items):
+    channel_values = values[channels]
+    n = min(len(items), len(channel_values))
+    channel_values[:n] = [float(i) for i in items[:n]]
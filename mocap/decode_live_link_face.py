@@ -1,9 +1,22 @@
 import struct
 
+import numpy as np
+
+from .live_timing import frame_time_to_seconds
+from .live_buffer import EYE_L, EYE_R, FLAG_EYE_L, FLAG_EYE_R, FLAG_HEAD_ROT, FLAG_SHAPES, HEAD_ROT, NUM_SHAPES, SHAPES, new_frame
+
+LIVE_LINK_FACE_FLAGS = FLAG_SHAPES | FLAG_HEAD_ROT | FLAG_EYE_L | FLAG_EYE_R
+# Source indices and signs of the head/eye channels in face cap order: Yaw, Pitch, Roll -> Pitch, Yaw, Roll
+_HEAD_ROT_INDICES = np.array([53, 52, 54])
+_EYE_L_INDICES = np.array([56, 55])  # strip roll, otherwise 55:58
+_EYE_R_INDICES = np.array([59, 58])  # strip roll, otherwise 58:61
+_DATA_STRUCT = struct.Struct("!61f")
+_HEADER_STRUCT = struct.Struct("!if2ib")
+
 
 def decode_live_link_face(bytes_data: bytes):
     """ Decodes the given bytes (send from a PyLiveLinkFace App)
-    Returns only the motion capture data (61 floats), 
+    Returns the motion capture data (61 floats) as frame record (values, flags, device time in seconds),
     None otherwise.
     Thanks to Jim West for creating the PyLiveLinkFace project: https://github.com/JimWest/PyLiveLinkFace
     """
@@ -15,32 +28,23 @@ def decode_live_link_face(bytes_data: bytes):
     data = None
     if len(bytes_data) > name_end_pos + 16:
         # FFrameTime, FFrameRate and data length
-        _frame_number, _sub_frame, _fps, _denominator, data_length = struct.unpack(
-            "!if2ib", bytes_data[name_end_pos:name_end_pos + 17])
+        frame_number, sub_frame, fps, denominator, data_length = _HEADER_STRUCT.unpack_from(
+            bytes_data, name_end_pos)
         if data_length != 61:
             raise ValueError(
                 f'Blend shape length is {data_length} but should be 61, something is wrong with the data.')
-        data = struct.unpack(
-            "!61f", bytes_data[name_end_pos + 17:])
+        data = _DATA_STRUCT.unpack_from(bytes_data, name_end_pos + 17)
     if data:
-        return convert_live_link_face_to_face_cap_format(data)
+        values, flags = convert_live_link_face_to_frame(data)
+        return values, flags, frame_time_to_seconds(frame_number, sub_frame, fps, denominator)
 
 
-def convert_live_link_face_to_face_cap_format(data):
-    '''Converts the data from the PyLiveLinkFace App to the Face Cap format (used in faceit).'''
-    animation_data = []
-    for i, x in enumerate(data):
-        if i < 52:
-            animation_data.append(('/W', (i, x)))
-        else:
-            break
-    # append head_rotation_data
-    # animation_data.append(('/HR', data[52:55]))
-    animation_data.append(('/HR', [-data[53], -data[52], -data[54]]))
-    # append eye_left_rotation_data
-    animation_data.append(('/ELR', [data[56], data[55], 0.0])) # strip roll, otherwise 55:58
-    # Yaw, Pitch, Roll...
-    # roll can be discarded...
-    # append eye_right_rotation_data
-    animation_data.append(('/ERR', [data[59], data[58], 0.0])) # strip roll, otherwise 58:61
-    return animation_data
+def convert_live_link_face_to_frame(data):
+    '''Converts the data from the PyLiveLinkFace App to a frame record in the Face Cap format (used in faceit).'''
+    data = np.asarray(data, dtype=np.float32)
+    values = new_frame()
+    values[SHAPES] = data[:NUM_SHAPES]
+    values[HEAD_ROT] = -data[_HEAD_ROT_INDICES]
+    values[EYE_L][:2] = data[_EYE_L_INDICES]
+    values[EYE_R][:2] = data[_EYE_R_INDICES]
+    return values, LIVE_LINK_FACE_FLAGS
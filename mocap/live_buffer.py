@@ -0,0 +1,291 @@
+from threading import Lock
+
+import numpy as np
+
+# Channel layout of one live frame record.
+# 52 shape weights, followed by head rotation, head location and both eye rotations.
+NUM_SHAPES = 52
+SHAPES = slice(0, 52)
+HEAD_ROT = slice(52, 55)
+HEAD_LOC = slice(55, 58)
+EYE_L = slice(58, 61)
+EYE_R = slice(61, 64)
+NUM_CHANNELS = 64
+
+# Bit flags stored per frame to mark which channel groups have been received.
+FLAG_SHAPES = 1
+FLAG_HEAD_ROT = 2
+FLAG_HEAD_LOC = 4
+FLAG_EYE_L = 8
+FLAG_EYE_R = 16
+
+# (channel slice, flag) of every channel group.
+CHANNEL_GROUPS = (
+    (SHAPES, FLAG_SHAPES),
+    (HEAD_ROT, FLAG_HEAD_ROT),
+    (HEAD_LOC, FLAG_HEAD_LOC),
+    (EYE_L, FLAG_EYE_L),
+    (EYE_R, FLAG_EYE_R),
+)
+
+# Channel masks of all flag combinations, see flags_to_channel_mask.
+_CHANNEL_MASKS = []
+for _flags in range(32):
+    _mask = np.zeros(NUM_CHANNELS, dtype=bool)
+    for _channels, _flag in CHANNEL_GROUPS:
+        if _flags & _flag:
+            _mask[_channels] = True
+    _mask.flags.writeable = False
+    _CHANNEL_MASKS.append(_mask)
+
+
+def flags_to_channel_mask(flags):
+    '''Return the boolean mask of the channels that are set in the frame flags (read only).'''
+    return _CHANNEL_MASKS[int(flags) & 31]
+
+
+# OSC address -> (channel slice, flag)
+ADDRESS_CHANNELS = {
+    '/HR': (HEAD_ROT, FLAG_HEAD_ROT),
+    '/HT': (HEAD_LOC, FLAG_HEAD_LOC),
+    '/ELR': (EYE_L, FLAG_EYE_L),
+    '/ERR': (EYE_R, FLAG_EYE_R),
+}
+
+# 30 minutes at 60 fps, roughly 28 MB.
+DEFAULT_CAPACITY = 108000
+
+
+class FrameRingBuffer:
+    '''Fixed capacity, preallocated storage for live frames.
+    Written by the receiver thread, read by the timer callback and the importer.
+    When full, the oldest frames are overwritten and counted in overflow_count.
+    timestamps are on the local clock, device_timestamps hold the source clock (NaN if not sent).
+    '''
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, channels=NUM_CHANNELS):
+        self._lock = Lock()
+        self.channels = channels
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.capacity = max(int(capacity), 1)
+        self.timestamps = np.zeros(self.capacity, dtype=np.float64)
+        self.device_timestamps = np.full(self.capacity, np.nan, dtype=np.float64)
+        self.data = np.zeros((self.capacity, self.channels), dtype=np.float32)
+        self.flags = np.zeros(self.capacity, dtype=np.uint8)
+        # Total number of frames pushed since the last clear.
+        self.write_count = 0
+        # Frames that were overwritten before the importer could read them.
+        self.overflow_count = 0
+        # Frames the live consumer skipped because it fell behind the writer.
+        self.skipped_count = 0
+
+    def __len__(self):
+        return min(self.write_count, self.capacity)
+
+    @property
+    def nbytes(self):
+        return self.timestamps.nbytes + self.device_timestamps.nbytes + self.data.nbytes + self.flags.nbytes
+
+    def resize(self, capacity):
+        '''Reallocate the buffer if the capacity changed. Clears all stored frames in that case.'''
+        if int(capacity) == self.capacity:
+            return
+        with self._lock:
+            self._allocate(capacity)
+
+    def clear(self):
+        with self._lock:
+            self._reset_counters()
+
+    def _reset_counters(self):
+        self.write_count = 0
+        self.overflow_count = 0
+        self.skipped_count = 0
+
+    def push(self, timestamp, values, flags=0, device_timestamp=np.nan):
+        '''Copy one frame (array-like of length channels) into the buffer.'''
+        with self._lock:
+            idx = self.write_count % self.capacity
+            if self.write_count >= self.capacity:
+                self.overflow_count += 1
+            self.timestamps[idx] = timestamp
+            self.device_timestamps[idx] = device_timestamp
+            self.data[idx] = values
+            self.flags[idx] = flags
+            self.write_count += 1
+
+    def _ordered_indices(self, start, stop):
+        return np.arange(start, stop) % self.capacity
+
+    def read_since(self, cursor):
+        '''Return all frames written after cursor (a previous write_count).
+        Returns (new_cursor, timestamps, data, flags) as copies.
+        '''
+        with self._lock:
+            stop = self.write_count
+            start = max(cursor, stop - self.capacity)
+            if start > cursor:
+                self.skipped_count += start - cursor
+            idx = self._ordered_indices(start, stop)
+            return stop, self.timestamps[idx], self.data[idx], self.flags[idx]
+
+    def latest(self):
+        '''Return (cursor, timestamp, data, flags) of the newest frame or None.'''
+        with self._lock:
+            if not self.write_count:
+                return None
+            idx = (self.write_count - 1) % self.capacity
+            return self.write_count, self.timestamps[idx], self.data[idx].copy(), self.flags[idx]
+
+    def snapshot(self):
+        '''Return all stored frames in chronological order: (timestamps, data, flags).'''
+        with self._lock:
+            stop = self.write_count
+            start = max(0, stop - self.capacity)
+            idx = self._ordered_indices(start, stop)
+            return self.timestamps[idx], self.data[idx], self.flags[idx]
+
+    def snapshot_device_timestamps(self):
+        '''Return the device timestamps of all stored frames in chronological order (see snapshot).'''
+        with self._lock:
+            stop = self.write_count
+            start = max(0, stop - self.capacity)
+            return self.device_timestamps[self._ordered_indices(start, stop)]
+
+
+def new_frame():
+    '''Return an empty frame record.'''
+    return np.zeros(NUM_CHANNELS, dtype=np.float32)
+
+
+class FrameAssembler:
+    '''Assemble per-value OSC messages (Face Cap, Hallway Tile) into frame records.
+    A new frame starts when the shape index wraps around or when a head/eye address
+    is received a second time, regardless of the send order. Channels that are not sent
+    in every device frame keep their last received value.
+    '''
+
+    def __init__(self):
+        self._frame = new_frame()
+        self.reset()
+
+    def reset(self):
+        self._frame[:] = 0.0
+        self._flags = 0
+        self._timestamp = None
+        self._last_shape_idx = -1
+
+    def add_message(self, address, values, timestamp):
+        '''Write the message into the current frame.
+        Returns the completed previous frame as (timestamp, values, flags) or None.
+        '''
+        completed = None
+        if address == '/W':
+            shape_idx, value = values
+            if shape_idx <= self._last_shape_idx:
+                completed = self.flush()
+            self._last_shape_idx = shape_idx
+            self._frame[shape_idx] = value
+            self._flags |= FLAG_SHAPES
+        elif address in ADDRESS_CHANNELS:
+            channels, flag = ADDRESS_CHANNELS[address]
+            if self._flags & flag:
+                completed = self.flush()
+            frame_values = self._frame[channels]
+            frame_values[:] = 0.0
+            n = min(len(values), len(frame_values))
+            frame_values[:n] = values[:n]
+            self._flags |= flag
+        else:
+            return None
+        if self._timestamp is None:
+            self._timestamp = timestamp
+        return completed
+
+    def flush(self):
+        '''Return the current frame as (timestamp, values, flags) or None if it is empty.'''
+        completed = None
+        if self._flags:
+            completed = (self._timestamp, self._frame.copy(), self._flags)
+        self._flags = 0
+        self._timestamp = None
+        self._last_shape_idx = -1
+        return completed
+
+
+class JitterBuffer:
+    '''Hold live frames for a constant latency and interpolate them at the playback time.
+    Frames are ordered by timestamp, late frames (older than the playback time) are dropped
+    instead of being replayed as a backlog.
+    '''
+
+    def __init__(self, latency=0.05, channels=NUM_CHANNELS):
+        self.latency = latency
+        self.channels = channels
+        self.clear()
+
+    def clear(self):
+        self.timestamps = np.zeros(0, dtype=np.float64)
+        self.data = np.zeros((0, self.channels), dtype=np.float32)
+        self.flags = np.zeros(0, dtype=np.uint8)
+        self.last_sample_time = None
+        self._holding = False
+        # Frames that arrived after their playback time.
+        self.late_count = 0
+        # Number of times the playback ran out of frames (the last frame is held).
+        self.underrun_count = 0
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def add(self, timestamps, data, flags):
+        '''Add frames (arrays as returned by FrameRingBuffer.read_since).'''
+        if not len(timestamps):
+            return
+        if self.last_sample_time is not None:
+            on_time = timestamps > self.last_sample_time
+            self.late_count += int(len(on_time) - np.count_nonzero(on_time))
+            timestamps, data, flags = timestamps[on_time], data[on_time], flags[on_time]
+        timestamps = np.concatenate((self.timestamps, timestamps))
+        order = np.argsort(timestamps, kind='stable')
+        self.timestamps = timestamps[order]
+        self.data = np.concatenate((self.data, data))[order]
+        self.flags = np.concatenate((self.flags, flags))[order]
+
+    def sample(self, now):
+        '''Return the interpolated frame (values, flags) for the playback time now - latency.
+        Returns None if there is nothing new to apply.
+        '''
+        if not len(self.timestamps):
+            return None
+        t = now - self.latency
+        i = int(np.searchsorted(self.timestamps, t, side='right'))
+        if i == 0:
+            # Still filling up.
+            return None
+        self.last_sample_time = t
+        if i == len(self.timestamps):
+            # No newer frame yet, hold the last one. It only needs to be applied once.
+            self._drop(i - 1)
+            if self._holding:
+                return None
+            self._holding = True
+            self.underrun_count += 1
+            return self.data[-1].copy(), int(self.flags[-1])
+        self._holding = False
+        t0, t1 = self.timestamps[i - 1], self.timestamps[i]
+        alpha = (t - t0) / (t1 - t0) if t1 > t0 else 1.0
+        values = self.data[i - 1] + (self.data[i] - self.data[i - 1]) * np.float32(alpha)
+        # Only channel groups present in both frames can be interpolated.
+        flags = int(self.flags[i - 1] & self.flags[i])
+        # Frames before i - 1 are stale.
+        self._drop(i - 1)
+        return values, flags
+
+    def _drop(self, count):
+        if count > 0:
+            self.timestamps = self.timestamps[count:]
+            self.data = self.data[count:]
+            self.flags = self.flags[count:]
@@ -0,0 +1,226 @@
+import numpy as np
+
+from .live_buffer import CHANNEL_GROUPS
+
+# Filter types of the live filter bank.
+FILTER_NONE = 0
+FILTER_SMA = 1
+FILTER_EMA = 2
+FILTER_ONE_EURO = 3
+FILTER_TYPES = {'NONE': FILTER_NONE, 'SMA': FILTER_SMA, 'EMA': FILTER_EMA, 'ONE_EURO': FILTER_ONE_EURO}
+# The running sums of the moving average are recomputed from the history this often (float drift).
+SMA_RESUM_INTERVAL = 4096
+# Sample interval assumed for the first One-Euro update and for frames without timestamp.
+DEFAULT_FRAME_TIME = 1 / 60
+
+
+def ema_alpha_from_window(window):
+    '''The EMA smoothing factor with the same average age as a moving average of the window size.'''
+    return 2.0 / (np.asarray(window, dtype=np.float64) + 1.0)
+
+
+def _one_euro_alpha(cutoff, dt):
+    tau = 1.0 / (2 * np.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class FilterBank:
+    '''Causal filters for all channels of a live frame, updated with one vectorized call per frame.
+    Every channel has its own filter type and parameters:
+    SMA: moving average over the last window values, O(1) per update with running sums.
+    EMA: exponential moving average with smoothing factor alpha.
+    ONE_EURO: adaptive low pass (Casiez et al. 2012). Smooths slow motion with min_cutoff (Hz) and
+    follows fast motion with less lag, the cutoff increases by beta * speed (units per second).
+    The same bank filters a recorded take offline (filter_take), which reproduces the live preview.
+    '''
+
+    def __init__(self, channels):
+        self.channels = channels
+        self.filter_types = np.zeros(channels, dtype=np.uint8)
+        self.window = np.ones(channels, dtype=np.int64)
+        self.alpha = np.ones(channels, dtype=np.float64)
+        self.min_cutoff = np.ones(channels, dtype=np.float64)
+        self.beta = np.zeros(channels, dtype=np.float64)
+        self.d_cutoff = np.ones(channels, dtype=np.float64)
+        self._compile()
+
+    def set_filter(self, channels, filter_type, window=3, alpha=None, min_cutoff=1.0, beta=0.0, d_cutoff=1.0):
+        '''Set the filter of the channels (index, slice or mask). filter_type in FILTER_TYPES.
+        The EMA alpha defaults to the equivalent of the window size.'''
+        self.filter_types[channels] = FILTER_TYPES[filter_type]
+        self.window[channels] = max(int(window), 1)
+        self.alpha[channels] = ema_alpha_from_window(window) if alpha is None else alpha
+        self.min_cutoff[channels] = min_cutoff
+        self.beta[channels] = beta
+        self.d_cutoff[channels] = d_cutoff
+        self._compile()
+
+    def _compile(self):
+        self._sma = np.flatnonzero(self.filter_types == FILTER_SMA)
+        self._ema = np.flatnonzero(self.filter_types == FILTER_EMA)
+        self._one_euro = np.flatnonzero(self.filter_types == FILTER_ONE_EURO)
+        self._sma_window = self.window[self._sma]
+        self._history_size = int(self._sma_window.max()) if len(self._sma) else 1
+        self.reset()
+
+    def __bool__(self):
+        return bool(self.filter_types.any())
+
+    def reset(self):
+        '''Forget all past values (new recording).'''
+        self._value = np.zeros(self.channels, dtype=np.float64)
+        self._derivative = np.zeros(self.channels, dtype=np.float64)
+        self._initialized = np.zeros(self.channels, dtype=bool)
+        self._last_time = None
+        self._history = np.zeros((self._history_size, len(self._sma)), dtype=np.float64)
+        self._sum = np.zeros(len(self._sma), dtype=np.float64)
+        self._count = np.zeros(len(self._sma), dtype=np.int64)
+        self._position = np.zeros(len(self._sma), dtype=np.int64)
+        self._columns = np.arange(len(self._sma))
+
+    def update(self, values, timestamp=None, mask=None):
+        '''Filter one frame. Returns a new float32 array, channels without filter are passed through.
+        @timestamp: seconds, used by One-Euro to get the sample rate.
+        @mask: optional boolean array, only these channels hold new values (missing groups keep their state).
+        '''
+        out = np.array(values, dtype=np.float32)
+        dt = DEFAULT_FRAME_TIME
+        if timestamp is not None:
+            if self._last_time is not None and timestamp > self._last_time:
+                dt = timestamp - self._last_time
+            self._last_time = timestamp
+        if len(self._sma):
+            self._update_sma(out, mask)
+        if len(self._ema):
+            idx = self._ema if mask is None else self._ema[mask[self._ema]]
+            x = out[idx].astype(np.float64)
+            y = np.where(self._initialized[idx], self._value[idx] + self.alpha[idx] * (x - self._value[idx]), x)
+            self._value[idx] = y
+            self._initialized[idx] = True
+            out[idx] = y
+        if len(self._one_euro):
+            idx = self._one_euro if mask is None else self._one_euro[mask[self._one_euro]]
+            x = out[idx].astype(np.float64)
+            initialized = self._initialized[idx]
+            previous = self._value[idx]
+            derivative = np.where(initialized, (x - previous) / dt, 0.0)
+            derivative = self._derivative[idx] + _one_euro_alpha(self.d_cutoff[idx], dt) * (
+                derivative - self._derivative[idx])
+            cutoff = self.min_cutoff[idx] + self.beta[idx] * np.abs(derivative)
+            y = np.where(initialized, previous + _one_euro_alpha(cutoff, dt) * (x - previous), x)
+            self._value[idx] = y
+            self._derivative[idx] = derivative
+            self._initialized[idx] = True
+            out[idx] = y
+        return out
+
+    def _update_sma(self, out, mask):
+        columns = self._columns if mask is None else self._columns[mask[self._sma]]
+        if not len(columns):
+            return
+        idx = self._sma[columns]
+        x = out[idx].astype(np.float64)
+        window = self._sma_window[columns]
+        count = self._count[columns]
+        position = self._position[columns]
+        # Drop the value that leaves the window once it is full.
+        full = count >= window
+        oldest = self._history[(position - window) % self._history_size, columns]
+        self._sum[columns] += x - np.where(full, oldest, 0.0)
+        self._history[position % self._history_size, columns] = x
+        self._position[columns] = position + 1
+        count = np.minimum(count + 1, window)
+        self._count[columns] = count
+        if int(self._position.max()) % SMA_RESUM_INTERVAL == 0:
+            self._resum()
+        out[idx] = self._sum[columns] / count
+
+    def _resum(self):
+        for column in range(len(self._sma)):
+            count = self._count[column]
+            rows = (self._position[column] - 1 - np.arange(count)) % self._history_size
+            self._sum[column] = self._history[rows, column].sum()
+
+    def filter_take(self, timestamps, values, flags=None):
+        '''Filter a recorded take (frames x channels) offline with the same result as the live preview.
+        @flags: the frame flags, a channel group is only filtered on the frames that hold it (see live_buffer).
+        Moving and exponential averages are computed for the whole take at once, One-Euro frame by frame.
+        Returns the filtered float32 matrix. The live state of the bank is reset.
+        '''
+        self.reset()
+        filtered = np.array(values, dtype=np.float32)
+        if not self or not len(filtered):
+            return filtered
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        # Sample intervals as seen by update().
+        dt = np.full(len(timestamps), DEFAULT_FRAME_TIME)
+        steps = np.diff(timestamps)
+        dt[1:] = np.where(steps > 0, steps, DEFAULT_FRAME_TIME)
+        if flags is None:
+            segments = [(np.ones(self.channels, dtype=bool), slice(None))]
+        else:
+            segments = []
+            for channels, flag in CHANNEL_GROUPS:
+                mask = np.zeros(self.channels, dtype=bool)
+                mask[channels] = True
+                segments.append((mask, np.flatnonzero(flags & flag)))
+        for mask, rows in segments:
+            x = filtered[rows].astype(np.float64)
+            if not len(x):
+                continue
+            for window in np.unique(self.window[self._sma[mask[self._sma]]]):
+                columns = self._sma[mask[self._sma] & (self.window[self._sma] == window)]
+                x[:, columns] = trailing_mean(x[:, columns], int(window))
+            for alpha in np.unique(self.alpha[self._ema[mask[self._ema]]]):
+                columns = self._ema[mask[self._ema] & (self.alpha[self._ema] == alpha)]
+                x[:, columns] = exponential_average(x[:, columns], float(alpha))
+            columns = self._one_euro[mask[self._one_euro]]
+            if len(columns):
+                x[:, columns] = self._one_euro_take(x[:, columns], dt[rows], columns)
+            filtered[rows] = x
+        self.reset()
+        return filtered
+
+    def _one_euro_take(self, x, dt, columns):
+        min_cutoff = self.min_cutoff[columns]
+        beta = self.beta[columns]
+        derivative_alpha = _one_euro_alpha(self.d_cutoff[columns][None, :], dt[:, None])
+        two_pi_dt = 2 * np.pi * dt
+        out = np.empty_like(x)
+        value = x[0].copy()
+        derivative = np.zeros(len(columns))
+        out[0] = value
+        for i in range(1, len(x)):
+            derivative += derivative_alpha[i] * ((x[i] - value) / dt[i] - derivative)
+            cutoff = min_cutoff + beta * np.abs(derivative)
+            value += (x[i] - value) / (1.0 + 1.0 / (two_pi_dt[i] * cutoff))
+            out[i] = value
+        return out
+
+
+def trailing_mean(x, window):
+    '''Causal moving average of the columns of x over the last window rows (fewer at the start).'''
+    csum = np.cumsum(x, axis=0)
+    out = csum.copy()
+    out[window:] -= csum[:-window]
+    counts = np.minimum(np.arange(1, len(x) + 1), window)
+    return out / counts[:, None]
+
+
+def exponential_average(x, alpha, block_size=256):
+    '''Exponential moving average of the columns of x, starting at the first row.
+    Computed in blocks: each block is one matrix product with the decay matrix.'''
+    block_size = min(block_size, len(x))
+    decay = 1.0 - alpha
+    exponents = np.arange(block_size)
+    lags = exponents[:, None] - exponents[None, :]
+    kernel = np.where(lags >= 0, alpha * decay ** np.maximum(lags, 0), 0.0)
+    carry = decay ** (exponents + 1)
+    out = np.empty_like(x)
+    previous = x[0]
+    for start in range(0, len(x), block_size):
+        block = x[start:start + block_size]
+        n = len(block)
+        out[start:start + n] = kernel[:n, :n] @ block + carry[:n, None] * previous
+        previous = out[start + n - 1]
+    return out
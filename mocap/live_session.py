@@ -0,0 +1,129 @@
+import os
+import time
+
+import bpy
+
+from .live_buffer import DEFAULT_CAPACITY, FrameRingBuffer
+from .live_take_file import TakeWriter, new_take_path
+from .mocap_importers import LiveAnimator
+from .osc_receiver import ActorStream, QueueManager, Receiver
+
+
+def apply_live_frames(frame_buffer, animator, telemetry, applied_frame_cursor):
+    '''Apply the newest frame (or the jitter buffer sample) to the animation targets.
+    Returns the write_count of the last frame read from the buffer.'''
+    start = time.perf_counter()
+    jitter_buffer = animator.jitter_buffer
+    if jitter_buffer is not None:
+        applied_frame_cursor, timestamps, data, flags = frame_buffer.read_since(applied_frame_cursor)
+        jitter_buffer.add(timestamps, data, flags)
+        now = time.time()
+        frame = jitter_buffer.sample(now)
+        if frame is not None:
+            animator.process_frame(jitter_buffer.last_sample_time, *frame)
+            telemetry.record_tick(
+                len(jitter_buffer), now - jitter_buffer.last_sample_time, time.perf_counter() - start)
+        return applied_frame_cursor
+    latest = frame_buffer.latest()
+    if latest is not None and latest[0] != applied_frame_cursor:
+        queue_depth = latest[0] - applied_frame_cursor
+        applied_frame_cursor, timestamp, values, flags = latest
+        animator.process_frame(timestamp, values, flags)
+        telemetry.record_tick(queue_depth, time.time() - timestamp, time.perf_counter() - start)
+    return applied_frame_cursor
+
+
+class LiveActor:
+    '''One performer of a multi actor session: own frame buffer, clock, animator (targets, filters,
+    jitter buffer), take file and telemetry.'''
+
+    def __init__(self, name, engine, capacity=DEFAULT_CAPACITY):
+        self.name = name
+        self.engine = engine
+        self.frame_buffer = FrameRingBuffer(capacity=capacity)
+        self.queue_mgr = QueueManager(self.frame_buffer)
+        self.animator = LiveAnimator()
+        self.stream = None
+        self.applied_frame_cursor = 0
+        self.take_path = None
+
+    @property
+    def telemetry(self):
+        return self.stream.telemetry
+
+    def open_take_writer(self, directory, resume_path=None):
+        '''Stream the recording to a new take file in directory, or continue the take file at resume_path.'''
+        self.close_take_writer()
+        if resume_path is not None:
+            try:
+                self.queue_mgr.take_writer = TakeWriter.resume(resume_path, engine=self.engine)
+                self.take_path = resume_path
+                return
+            except (OSError, ValueError) as e:
+                print(f'Can\'t continue the take file {resume_path}: {e}')
+        take_path = new_take_path(directory, f'{bpy.path.clean_name(self.name)}_{self.engine}')
+        self.queue_mgr.take_writer = TakeWriter(take_path, engine=self.engine, start_time=time.time())
+        self.take_path = take_path
+
+    def close_take_writer(self):
+        if self.queue_mgr.take_writer is not None:
+            self.queue_mgr.take_writer.close()
+            self.queue_mgr.take_writer = None
+
+    def apply(self):
+        if self.frame_buffer:
+            self.applied_frame_cursor = apply_live_frames(
+                self.frame_buffer, self.animator, self.stream.telemetry, self.applied_frame_cursor)
+
+
+class LiveSession:
+    '''Several actors received by one multiplexed receiver thread and applied by one timer.'''
+
+    def __init__(self):
+        self.actors = {}
+        self.receiver = None
+
+    def __bool__(self):
+        return bool(self.actors)
+
+    @property
+    def enabled(self):
+        return self.receiver is not None and self.receiver.enabled
+
+    def add_actor(self, actor, address, port, source_address=''):
+        '''Register the actor and bind its socket. Raises OSError if the port can't be opened.'''
+        if self.receiver is None:
+            self.receiver = Receiver()
+        actor.stream = ActorStream(actor.queue_mgr, actor.engine, source_address=source_address)
+        actor.applied_frame_cursor = actor.frame_buffer.write_count
+        actor.queue_mgr.clock.reset()
+        self.receiver.add_stream(actor.stream, address, port)
+        self.actors[actor.name] = actor
+        return actor
+
+    def start(self):
+        self.receiver.start_streams()
+
+    def stop(self):
+        if self.receiver is not None:
+            self.receiver.stop()
+        for actor in self.actors.values():
+            actor.close_take_writer()
+
+    def process(self):
+        for actor in self.actors.values():
+            actor.apply()
+
+    def recorded_actors(self):
+        '''Return the actors that hold recorded frames or a take file.'''
+        return [actor for actor in self.actors.values()
+                if actor.frame_buffer or (actor.take_path is not None and os.path.isfile(actor.take_path))]
+
+    def clear(self):
+        '''Stop the session and drop all actors. Take files are kept on disk.'''
+        self.stop()
+        for actor in self.actors.values():
+            actor.queue_mgr.reset()
+            actor.animator.clear_animation_data()
+        self.actors = {}
+        self.receiver = None
@@ -0,0 +1,252 @@
+'''Replay recorded or synthetic live sessions over UDP in the wire format of the supported engines.
+Used by the receiver tests and load benchmarks. Stand-alone, run from the add-on directory:
+python -m mocap.live_simulator --engine EPIC --port 11111 --fps 60 --seconds 10
+'''
+import argparse
+import random
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+from .decode_face_cap_tile import build_bundle, build_message
+from .live_buffer import (EYE_L, EYE_R, FLAG_EYE_L, FLAG_EYE_R, FLAG_HEAD_LOC, FLAG_HEAD_ROT, FLAG_SHAPES, HEAD_LOC,
+                          HEAD_ROT, NUM_CHANNELS, NUM_SHAPES, SHAPES)
+from .live_timing import seconds_to_osc_timetag
+
+ENGINES = ('FACECAP', 'TILE', 'EPIC', 'IFACIALMOCAP')
+DEFAULT_PORTS = {'FACECAP': 9001, 'TILE': 9001, 'EPIC': 11111, 'IFACIALMOCAP': 49983}
+SYNTHETIC_FLAGS = FLAG_SHAPES | FLAG_HEAD_ROT | FLAG_HEAD_LOC | FLAG_EYE_L | FLAG_EYE_R
+
+_LLF_VERSION = struct.Struct('<i')
+_LLF_NAME_LENGTH = struct.Struct('!i')
+_LLF_HEADER = struct.Struct('!if2ib')
+_LLF_DATA = struct.Struct('!61f')
+_LLF_DEVICE_ID = b'FACEIT-SIMULATOR-0000-0000-000000000'.ljust(37, b'0')
+
+
+def synthetic_session(frame_count, fps=60, seed=0):
+    '''Return a smooth synthetic take (times, data, flags) in the live frame layout.
+    Shapes oscillate in [0, 1], head rotation and eyes in degrees, head location in cm.
+    '''
+    rng = np.random.default_rng(seed)
+    times = np.arange(frame_count, dtype=np.float64) / fps
+    frequencies = rng.uniform(0.1, 1.5, NUM_CHANNELS)
+    phases = rng.uniform(0, 2 * np.pi, NUM_CHANNELS)
+    data = np.sin(times[:, None] * frequencies * 2 * np.pi + phases).astype(np.float32)
+    data[:, SHAPES] = data[:, SHAPES] * 0.5 + 0.5
+    data[:, HEAD_ROT] *= 20.0
+    data[:, HEAD_LOC] *= 5.0
+    data[:, EYE_L] *= 15.0
+    data[:, EYE_R] *= 15.0
+    # No roll for the eyes.
+    data[:, EYE_L.stop - 1] = 0.0
+    data[:, EYE_R.stop - 1] = 0.0
+    return times, data, np.full(frame_count, SYNTHETIC_FLAGS, dtype=np.uint8)
+
+
+def encode_face_cap(values, flags, timestamp=None, bundle=False):
+    '''Encode a frame as Face Cap / Tile OSC. Returns a list of datagrams:
+    one datagram per message like the Face Cap app, or one bundle (with the timestamp as time tag).
+    '''
+    messages = []
+    if flags & FLAG_SHAPES:
+        messages.extend(build_message('/W', (i, float(v))) for i, v in enumerate(values[SHAPES]))
+    if flags & FLAG_HEAD_LOC:
+        messages.append(build_message('/HT', values[HEAD_LOC].tolist()))
+    if flags & FLAG_HEAD_ROT:
+        messages.append(build_message('/HR', values[HEAD_ROT].tolist()))
+    if flags & FLAG_EYE_L:
+        messages.append(build_message('/ELR', values[EYE_L][:2].tolist()))
+    if flags & FLAG_EYE_R:
+        messages.append(build_message('/ERR', values[EYE_R][:2].tolist()))
+    if not bundle:
+        return messages
+    timetag = seconds_to_osc_timetag(timestamp) if timestamp is not None else 1
+    return [build_bundle(messages, timetag)]
+
+
+def encode_live_link_face(values, device_time, fps=60, subject_name='iPhone'):
+    '''Encode a frame as Live Link Face packet, the inverse of decode_live_link_face.'''
+    data = np.zeros(61, dtype=np.float32)
+    data[:NUM_SHAPES] = values[SHAPES]
+    head_rot = values[HEAD_ROT]
+    data[[53, 52, 54]] = -head_rot
+    data[[56, 55]] = values[EYE_L][:2]
+    data[[59, 58]] = values[EYE_R][:2]
+    # Live Link Face sends the timecode (time of day) in frames.
+    frame_time = (device_time % 86400) * fps
+    frame_number = int(frame_time)
+    name = subject_name.encode('utf-8')
+    return b''.join((
+        _LLF_VERSION.pack(6),
+        _LLF_DEVICE_ID,
+        _LLF_NAME_LENGTH.pack(len(name)),
+        name,
+        _LLF_HEADER.pack(frame_number, frame_time - frame_number, fps, 1, 61),
+        _LLF_DATA.pack(*data.tolist()),
+    ))
+
+
+def encode_ifacial_mocap(values, shape_names):
+    '''Encode a frame as iFacialMocap text packet, the inverse of decode_ifacial_mocap.
+    Shape values are sent as integer percent. The decoder reads the first eye block into EYE_L.
+    '''
+    parts = [f'{name}-{int(round(float(v) * 100))}' for name, v in zip(shape_names, values[SHAPES])]
+    # The decoder expects 54 shape entries before the head block, pad with names it doesn't know.
+    parts.extend(f'unused{i}-0' for i in range(54 - len(parts)))
+    head = ','.join(f'{v:.4f}' for v in np.concatenate((values[HEAD_ROT], values[HEAD_LOC])))
+    parts.append(f'=head#{head}')
+    parts.append('rightEye#' + ','.join(f'{v:.4f}' for v in values[EYE_L]))
+    parts.append('leftEye#' + ','.join(f'{v:.4f}' for v in values[EYE_R]))
+    return ('|'.join(parts) + '|').encode('utf-8')
+
+
+class ReplaySender:
+    '''Send a take (times, data, flags) over UDP like a device would.
+    @speed: playback speed factor, 0 sends as fast as possible.
+    @burst: frames are held back and sent together in groups of this size (WiFi aggregation).
+    @loss: probability that a datagram is dropped.
+    @reorder: probability that a datagram is swapped with the next one.
+    @bundle: Face Cap/Tile only, send a bundle per frame instead of one datagram per message.
+    @shape_names: iFacialMocap only, the shape names in channel order.
+    '''
+
+    def __init__(self, engine, address='127.0.0.1', port=None, speed=1.0, burst=1, loss=0.0, reorder=0.0,
+                 bundle=False, shape_names=None, seed=0):
+        if engine not in ENGINES:
+            raise ValueError(f'Unknown engine {engine}, expected one of {ENGINES}.')
+        if engine == 'IFACIALMOCAP' and shape_names is None:
+            raise ValueError('iFacialMocap needs the shape names.')
+        self.engine = engine
+        self.target = (address, port or DEFAULT_PORTS[engine])
+        self.speed = speed
+        self.burst = max(int(burst), 1)
+        self.loss = loss
+        self.reorder = reorder
+        self.bundle = bundle
+        self.shape_names = shape_names
+        self._random = random.Random(seed)
+        self.stop_event = threading.Event()
+        self.frames_sent = 0
+        self.datagrams_sent = 0
+        self.datagrams_dropped = 0
+        self.datagrams_reordered = 0
+
+    def encode_frame(self, device_time, values, flags):
+        '''Return the datagrams of one frame in the wire format of the engine.'''
+        if self.engine in ('FACECAP', 'TILE'):
+            return encode_face_cap(values, flags, device_time, bundle=self.bundle)
+        if self.engine == 'EPIC':
+            return [encode_live_link_face(values, device_time)]
+        return [encode_ifacial_mocap(values, self.shape_names)]
+
+    def send(self, times, data, flags, loop=False):
+        '''Send the take, paced by its timestamps. Blocks until done or stop_event is set.'''
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            while True:
+                self._send_take(sock, times, data, flags)
+                if not loop or self.stop_event.is_set():
+                    break
+        finally:
+            sock.close()
+
+    def _send_take(self, sock, times, data, flags):
+        start = time.perf_counter()
+        # Device clock: the take times are sent relative to the current time.
+        device_start = time.time()
+        pending = []
+        for i in range(len(times)):
+            if self.stop_event.is_set():
+                return
+            relative_time = times[i] - times[0]
+            pending.extend(self.encode_frame(device_start + relative_time, data[i], int(flags[i])))
+            self.frames_sent += 1
+            if (i + 1) % self.burst and i + 1 < len(times):
+                continue
+            if self.speed > 0:
+                delay = start + relative_time / self.speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self._send_datagrams(sock, pending)
+            pending = []
+
+    def _send_datagrams(self, sock, datagrams):
+        rand = self._random.random
+        i = 0
+        while i < len(datagrams):
+            if self.reorder and i + 1 < len(datagrams) and rand() < self.reorder:
+                datagrams[i], datagrams[i + 1] = datagrams[i + 1], datagrams[i]
+                self.datagrams_reordered += 1
+            if self.loss and rand() < self.loss:
+                self.datagrams_dropped += 1
+            else:
+                sock.sendto(datagrams[i], self.target)
+                self.datagrams_sent += 1
+            i += 1
+
+    def start_thread(self, times, data, flags, loop=False):
+        '''Send the take in a daemon thread. Returns the thread.'''
+        thread = threading.Thread(target=self.send, args=(times, data, flags, loop), daemon=True)
+        thread.start()
+        return thread
+
+
+def load_take(path):
+    '''Load a recorded take file (see live_take_file) as (times, data, flags).'''
+    from .live_take_file import TakeFile
+    from .live_timing import select_frame_times
+    take = TakeFile(path)
+    timestamps, data, flags = take.snapshot()
+    times = select_frame_times(timestamps, take.snapshot_device_timestamps())
+    return np.array(times), np.array(data), np.array(flags)
+
+
+def get_face_cap_shape_names():
+    try:
+        from ..core.arkit_shapes import FACECAP
+    except ImportError:
+        # Started as python -m mocap.live_simulator from the add-on directory.
+        from core.arkit_shapes import FACECAP
+    return [shape_data['name'] for shape_data in FACECAP['Data'].values()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--engine', choices=ENGINES, default='FACECAP')
+    parser.add_argument('--address', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--take', help='Replay a recorded .fitake file instead of a synthetic take.')
+    parser.add_argument('--fps', type=float, default=60.0, help='Frame rate of the synthetic take.')
+    parser.add_argument('--seconds', type=float, default=10.0, help='Length of the synthetic take.')
+    parser.add_argument('--speed', type=float, default=1.0, help='Playback speed, 0 sends as fast as possible.')
+    parser.add_argument('--burst', type=int, default=1, help='Send frames in groups of this size.')
+    parser.add_argument('--loss', type=float, default=0.0, help='Datagram loss probability.')
+    parser.add_argument('--reorder', type=float, default=0.0, help='Datagram reorder probability.')
+    parser.add_argument('--bundle', action='store_true', help='Face Cap/Tile: one bundle per frame.')
+    parser.add_argument('--loop', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.take:
+        times, data, flags = load_take(args.take)
+    else:
+        times, data, flags = synthetic_session(int(args.seconds * args.fps), fps=args.fps, seed=args.seed)
+    sender = ReplaySender(
+        args.engine, args.address, args.port, speed=args.speed, burst=args.burst, loss=args.loss,
+        reorder=args.reorder, bundle=args.bundle, seed=args.seed,
+        shape_names=get_face_cap_shape_names() if args.engine == 'IFACIALMOCAP' else None,
+    )
+    print(f'Sending {len(times)} frames ({args.engine}) to {sender.target[0]}:{sender.target[1]}')
+    try:
+        sender.send(times, data, flags, loop=args.loop)
+    except KeyboardInterrupt:
+        pass
+    print(f'{sender.frames_sent} frames, {sender.datagrams_sent} datagrams sent, '
+          f'{sender.datagrams_dropped} dropped, {sender.datagrams_reordered} reordered')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+import os
+import time
+
+import numpy as np
+
+from .live_buffer import NUM_CHANNELS
+
+# Live takes are streamed to <blend directory>/faceit_takes/<engine>_<date>_<time>.fitake
+TAKE_DIR_NAME = 'faceit_takes'
+TAKE_FILE_EXTENSION = '.fitake'
+TAKE_FILE_MAGIC = b'FACEITTK'
+TAKE_FILE_VERSION = 1
+TAKE_HEADER_SIZE = 64
+TAKE_HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u4'),
+    ('channels', '<u4'),
+    ('record_size', '<u4'),
+    ('header_size', '<u4'),
+    # Index: number of complete records. Updated every TAKE_INDEX_INTERVAL frames and on close.
+    ('frame_count', '<u8'),
+    ('start_time', '<f8'),
+    ('engine', 'S16'),
+])
+# The file grows in chunks of this many records (one minute at 60 fps).
+TAKE_GROW_RECORDS = 3600
+TAKE_INDEX_INTERVAL = 60
+
+
+def take_record_dtype(channels=NUM_CHANNELS):
+    '''One fixed size frame record. flags is never 0 for a written frame.'''
+    return np.dtype([
+        ('timestamp', '<f8'),
+        ('device_timestamp', '<f8'),
+        ('flags', 'u1'),
+        ('pad', 'V7'),
+        ('data', '<f4', (channels,)),
+    ])
+
+
+def new_take_path(directory, engine):
+    '''Return a new take file path in directory.'''
+    name = f'{engine.lower()}_{time.strftime("%Y%m%d_%H%M%S")}'
+    path = os.path.join(directory, name + TAKE_FILE_EXTENSION)
+    i = 1
+    while os.path.exists(path):
+        path = os.path.join(directory, f'{name}_{i}{TAKE_FILE_EXTENSION}')
+        i += 1
+    return path
+
+
+def find_last_take(directory):
+    '''Return the most recently written take file in directory or None.'''
+    if not os.path.isdir(directory):
+        return None
+    paths = [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(TAKE_FILE_EXTENSION)]
+    if not paths:
+        return None
+    return max(paths, key=os.path.getmtime)
+
+
+class TakeWriter:
+    '''Append-only, memory mapped take file. Written by the receiver thread.
+    The file is preallocated in chunks, so that a take survives a crash of Blender
+    (the mapped pages belong to the OS). close() writes the index and truncates the file.
+    '''
+
+    def __init__(self, path, engine='', channels=NUM_CHANNELS, start_time=0.0):
+        self.path = path
+        self.record_dtype = take_record_dtype(channels)
+        self.frame_count = 0
+        header = np.zeros(1, dtype=TAKE_HEADER_DTYPE)
+        header['magic'] = TAKE_FILE_MAGIC
+        header['version'] = TAKE_FILE_VERSION
+        header['channels'] = channels
+        header['record_size'] = self.record_dtype.itemsize
+        header['header_size'] = TAKE_HEADER_SIZE
+        header['start_time'] = start_time
+        header['engine'] = engine.encode('ascii', 'replace')[:16]
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(header.tobytes().ljust(TAKE_HEADER_SIZE, b'\x00'))
+        self._header = np.memmap(path, dtype=TAKE_HEADER_DTYPE, mode='r+', shape=(1,))
+        self._records = None
+        self.capacity = 0
+        self._grow()
+
+    @classmethod
+    def resume(cls, path, engine=''):
+        '''Continue writing a closed take file (the receiver has been restarted).
+        The new frames are appended after the indexed frames. Raises ValueError if the file
+        is not a take file of engine.
+        '''
+        header = np.fromfile(path, dtype=TAKE_HEADER_DTYPE, count=1)
+        if len(header) != 1 or header['magic'][0] != TAKE_FILE_MAGIC:
+            raise ValueError(f'{path} is not a FaceIt take file.')
+        if header['version'][0] != TAKE_FILE_VERSION or header['header_size'][0] != TAKE_HEADER_SIZE:
+            raise ValueError(f'Take file version {header["version"][0]} can\'t be continued.')
+        if header['engine'][0] != engine.encode('ascii', 'replace')[:16]:
+            raise ValueError(f'{path} has been recorded with another engine.')
+        self = cls.__new__(cls)
+        self.path = path
+        self.record_dtype = take_record_dtype(int(header['channels'][0]))
+        if int(header['record_size'][0]) != self.record_dtype.itemsize:
+            raise ValueError('Unexpected record size in take file.')
+        available = (os.path.getsize(path) - TAKE_HEADER_SIZE) // self.record_dtype.itemsize
+        self.frame_count = min(int(header['frame_count'][0]), available)
+        self._header = np.memmap(path, dtype=TAKE_HEADER_DTYPE, mode='r+', shape=(1,))
+        self._records = None
+        self.capacity = self.frame_count
+        self._grow()
+        return self
+
+    def _grow(self):
+        if self._records is not None:
+            self._records.flush()
+        self.capacity += TAKE_GROW_RECORDS
+        with open(self.path, 'r+b') as f:
+            f.truncate(TAKE_HEADER_SIZE + self.capacity * self.record_dtype.itemsize)
+        self._records = np.memmap(self.path, dtype=self.record_dtype, mode='r+',
+                                  offset=TAKE_HEADER_SIZE, shape=(self.capacity,))
+
+    def append(self, timestamp, values, flags, device_timestamp=np.nan):
+        '''Write one frame record.'''
+        if self.frame_count == self.capacity:
+            self._grow()
+        record = self._records[self.frame_count]
+        record['timestamp'] = timestamp
+        record['device_timestamp'] = device_timestamp
+        record['data'] = values
+        record['flags'] = flags
+        self.frame_count += 1
+        if self.frame_count % TAKE_INDEX_INTERVAL == 0:
+            self._header['frame_count'] = self.frame_count
+
+    def flush(self):
+        self._header['frame_count'] = self.frame_count
+        self._records.flush()
+        self._header.flush()
+
+    def close(self):
+        '''Write the index and cut the preallocated space.'''
+        if self._records is None:
+            return
+        self.flush()
+        self._records = None
+        self._header = None
+        with open(self.path, 'r+b') as f:
+            f.truncate(TAKE_HEADER_SIZE + self.frame_count * self.record_dtype.itemsize)
+
+
+class TakeFile:
+    '''Read a take file. The frames are memory mapped, nothing is copied until the importer needs it.
+    Files that have not been closed (crash) are recovered: the frames written after the last index
+    update are found by their flags.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        header = np.fromfile(path, dtype=TAKE_HEADER_DTYPE, count=1)
+        if len(header) != 1 or header['magic'][0] != TAKE_FILE_MAGIC:
+            raise ValueError(f'{path} is not a FaceIt take file.')
+        if header['version'][0] > TAKE_FILE_VERSION:
+            raise ValueError(f'Take file version {header["version"][0]} is not supported.')
+        self.engine = header['engine'][0].decode('ascii', 'replace')
+        self.start_time = float(header['start_time'][0])
+        self.channels = int(header['channels'][0])
+        self.record_dtype = take_record_dtype(self.channels)
+        if int(header['record_size'][0]) != self.record_dtype.itemsize:
+            raise ValueError('Unexpected record size in take file.')
+        header_size = int(header['header_size'][0])
+        available = (os.path.getsize(path) - header_size) // self.record_dtype.itemsize
+        indexed = min(int(header['frame_count'][0]), available)
+        if available:
+            self.records = np.memmap(path, dtype=self.record_dtype, mode='r', offset=header_size, shape=(available,))
+        else:
+            self.records = np.zeros(0, dtype=self.record_dtype)
+        # Frames written after the last index update.
+        unindexed = self.records['flags'][indexed:] == 0
+        trailing = int(np.argmax(unindexed)) if unindexed.any() else len(unindexed)
+        self.frame_count = indexed + trailing
+        self.recovered_count = trailing
+
+    def __len__(self):
+        return self.frame_count
+
+    def snapshot(self):
+        '''Return (timestamps, data, flags) of all frames, see FrameRingBuffer.snapshot.'''
+        records = self.records[:self.frame_count]
+        return records['timestamp'], records['data'], records['flags']
+
+    def snapshot_device_timestamps(self):
+        return self.records['device_timestamp'][:self.frame_count]
@@ -0,0 +1,91 @@
+import time
+
+import numpy as np
+
+
+class LiveTargetPlan:
+    '''Precompiled mapping from the live shape channels to the target shape keys.
+    Compiled once when the receiver starts. Each frame is applied with one
+    foreach_get/foreach_set pair per shape key datablock.
+    '''
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        # (key, key_blocks, values, source_indices, key_block_indices, key_block_names) per shape key datablock
+        self.targets = []
+        self.amplify = np.ones(0, dtype=np.float32)
+        # Cost of the last apply call and a moving average, in seconds.
+        self.apply_time = 0.0
+        self.mean_apply_time = 0.0
+        self.apply_count = 0
+
+    def __bool__(self):
+        return bool(self.targets)
+
+    def compile(self, source_shape_reference, target_shapes_dict, retarget_shapes):
+        '''Build the index arrays from source channels to key blocks and the amplify vector.
+        @source_shape_reference: the shape names in channel order.
+        @target_shapes_dict: shape name -> list of shape keys (key blocks) to animate.
+        @retarget_shapes: the retarget shapes collection (holds the amplify values).
+        '''
+        self.clear()
+        self.amplify = np.ones(len(source_shape_reference), dtype=np.float32)
+        groups = {}
+        for source_idx, name in enumerate(source_shape_reference):
+            shape_keys = target_shapes_dict.get(name)
+            if not shape_keys:
+                continue
+            shape_item = retarget_shapes.get(name) if retarget_shapes is not None else None
+            if shape_item is not None:
+                self.amplify[source_idx] = shape_item.amplify
+            for sk in shape_keys:
+                key = sk.id_data
+                entry = groups.get(key.as_pointer())
+                if entry is None:
+                    entry = groups[key.as_pointer()] = (key, [], [])
+                entry[1].append(source_idx)
+                entry[2].append(sk.name)
+        for key, source_indices, key_block_names in groups.values():
+            self.targets.append(self._compile_target(key, np.array(source_indices, dtype=np.intp), key_block_names))
+
+    @staticmethod
+    def _compile_target(key, source_indices, key_block_names):
+        '''Return the target tuple of a shape key datablock. Key blocks that don't exist (anymore) are skipped.'''
+        key_blocks = key.key_blocks
+        key_block_indices = np.array([key_blocks.find(name) for name in key_block_names], dtype=np.intp)
+        found = key_block_indices >= 0
+        return (
+            key,
+            key_blocks,
+            np.zeros(len(key_blocks), dtype=np.float32),
+            source_indices[found],
+            key_block_indices[found],
+            [name for name, exists in zip(key_block_names, found) if exists],
+        )
+
+    def apply(self, weights):
+        '''Write the shape weights (in source channel order) to all targets.'''
+        start = time.perf_counter()
+        scaled = np.asarray(weights[:len(self.amplify)], dtype=np.float32) * self.amplify
+        removed = []
+        for i, target in enumerate(self.targets):
+            try:
+                if len(target[1]) != len(target[2]):
+                    # Shape keys have been added or removed during the session, the indices moved.
+                    target = self.targets[i] = self._compile_target(target[0], target[3], target[5])
+                key, key_blocks, values, source_indices, key_block_indices, _key_block_names = target
+                # Read the current values so that other shape keys keep their values.
+                key_blocks.foreach_get('value', values)
+                values[key_block_indices] = scaled[source_indices]
+                key_blocks.foreach_set('value', values)
+                key.update_tag()
+            except ReferenceError:
+                # The datablock has been removed during the session.
+                removed.append(target)
+        if removed:
+            self.targets = [target for target in self.targets if not any(target is r for r in removed)]
+        self.apply_time = time.perf_counter() - start
+        self.apply_count += 1
+        self.mean_apply_time += (self.apply_time - self.mean_apply_time) * 0.05
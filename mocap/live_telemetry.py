@@ -0,0 +1,161 @@
+import csv
+import json
+import time
+
+import numpy as np
+
+# Number of samples kept by the rolling statistics.
+TELEMETRY_WINDOW = 1024
+# Histogram bin edges in milliseconds for the timing statistics.
+HISTOGRAM_BINS_MS = (0, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, np.inf)
+
+
+class RollingStat:
+    '''The last TELEMETRY_WINDOW samples of a value. Adding a sample is a single array store.'''
+
+    def __init__(self, size=TELEMETRY_WINDOW):
+        self.samples = np.zeros(size, dtype=np.float64)
+        self.count = 0
+
+    def clear(self):
+        self.count = 0
+
+    def add(self, value):
+        self.samples[self.count % len(self.samples)] = value
+        self.count += 1
+
+    def window(self):
+        return self.samples[:min(self.count, len(self.samples))]
+
+    def summary(self, scale=1.0):
+        '''Return mean, percentiles and max of the window (multiplied by scale).'''
+        window = self.window() * scale
+        if not len(window):
+            return {'count': 0, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+        p50, p95, p99 = np.percentile(window, (50, 95, 99))
+        return {
+            'count': self.count,
+            'mean': float(window.mean()),
+            'p50': float(p50),
+            'p95': float(p95),
+            'p99': float(p99),
+            'max': float(window.max()),
+        }
+
+    def histogram(self, bins, scale=1.0):
+        return np.histogram(self.window() * scale, bins=bins)[0].tolist()
+
+
+class RateCounter:
+    '''Event counter with a rate (events per second) that is updated at most once per interval.'''
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.clear()
+
+    def clear(self):
+        self.count = 0
+        self._last_count = 0
+        self._last_time = time.perf_counter()
+        self._rate = 0.0
+
+    def add(self, n=1):
+        self.count += n
+
+    @property
+    def rate(self):
+        now = time.perf_counter()
+        elapsed = now - self._last_time
+        if elapsed >= self.interval:
+            self._rate = (self.count - self._last_count) / elapsed
+            self._last_count = self.count
+            self._last_time = now
+        return self._rate
+
+
+class LiveTelemetry:
+    '''Counters and rolling statistics of a live session.
+    The receiver thread records packets and decode errors, the timer records the apply ticks.
+    '''
+
+    def __init__(self):
+        self.packets = RateCounter()
+        self.bytes_received = 0
+        self.decode_errors = {}
+        self.decode_time = RollingStat()
+        self.queue_depth = RollingStat()
+        self.latency = RollingStat()
+        self.apply_time = RollingStat()
+        self.start_time = time.time()
+
+    def reset(self):
+        self.packets.clear()
+        self.bytes_received = 0
+        self.decode_errors = {}
+        self.decode_time.clear()
+        self.queue_depth.clear()
+        self.latency.clear()
+        self.apply_time.clear()
+        self.start_time = time.time()
+
+    def record_packet(self, nbytes, decode_seconds):
+        self.packets.add()
+        self.bytes_received += nbytes
+        self.decode_time.add(decode_seconds)
+
+    def record_error(self, error):
+        error_type = type(error)
+        name = error_type.__name__
+        if error_type.__module__ != 'builtins':
+            name = f'{error_type.__module__}.{name}'
+        self.decode_errors[name] = self.decode_errors.get(name, 0) + 1
+
+    @property
+    def error_count(self):
+        return sum(self.decode_errors.values())
+
+    def record_tick(self, queue_depth, latency, apply_seconds):
+        '''Record one applied frame: pending frames in the queue, receive to apply latency and apply cost.'''
+        self.queue_depth.add(queue_depth)
+        self.latency.add(latency)
+        self.apply_time.add(apply_seconds)
+
+    def summary(self):
+        '''Return all statistics as a dictionary. Times are in milliseconds.'''
+        return {
+            'duration_s': time.time() - self.start_time,
+            'packets': self.packets.count,
+            'packets_per_s': self.packets.rate,
+            'bytes_received': self.bytes_received,
+            'decode_errors': dict(self.decode_errors),
+            'decode_time_ms': self.decode_time.summary(1000),
+            'queue_depth': self.queue_depth.summary(),
+            'latency_ms': self.latency.summary(1000),
+            'apply_time_ms': self.apply_time.summary(1000),
+            'histogram_bins_ms': [b if np.isfinite(b) else 'inf' for b in HISTOGRAM_BINS_MS],
+            'decode_time_histogram': self.decode_time.histogram(HISTOGRAM_BINS_MS, 1000),
+            'latency_histogram': self.latency.histogram(HISTOGRAM_BINS_MS, 1000),
+            'apply_time_histogram': self.apply_time.histogram(HISTOGRAM_BINS_MS, 1000),
+        }
+
+    def write_json(self, filepath, **extra):
+        summary = self.summary()
+        summary.update(extra)
+        with open(filepath, 'w') as f:
+            json.dump(summary, f, indent=4)
+
+    def write_csv(self, filepath, **extra):
+        '''Write one row per statistic: name, value (flattened summary).'''
+        summary = self.summary()
+        summary.update(extra)
+        with open(filepath, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(('statistic', 'value'))
+            for key, value in summary.items():
+                if isinstance(value, dict):
+                    for sub_key, sub_value in value.items():
+                        writer.writerow((f'{key}.{sub_key}', sub_value))
+                elif isinstance(value, list):
+                    writer.writerow((key, ' '.join(str(v) for v in value)))
+                else:
+                    writer.writerow((key, value))
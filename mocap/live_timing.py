@@ -0,0 +1,178 @@
+import numpy as np
+
+from .live_buffer import CHANNEL_GROUPS
+
+# Seconds between the NTP epoch (1900) used by OSC time tags and the unix epoch (1970).
+NTP_UNIX_OFFSET = 2208988800
+# A device clock that deviates this much (seconds) from the prediction has been reset.
+CLOCK_RESET_THRESHOLD = 1.0
+# Number of time bins used to find the lower envelope of the transport delays.
+ENVELOPE_BINS = 10
+
+
+def osc_timetag_to_seconds(timetag):
+    '''Convert a 64 bit OSC (NTP) time tag to unix seconds. Returns None for the immediate time tag.'''
+    if timetag <= 1:
+        return None
+    return (timetag >> 32) - NTP_UNIX_OFFSET + (timetag & 0xFFFFFFFF) / 4294967296.0
+
+
+def seconds_to_osc_timetag(seconds):
+    '''Convert unix seconds to a 64 bit OSC (NTP) time tag.'''
+    seconds += NTP_UNIX_OFFSET
+    whole = int(seconds)
+    return (whole << 32) | int((seconds - whole) * 4294967296.0)
+
+
+def frame_time_to_seconds(frame_number, sub_frame, numerator, denominator):
+    '''Convert an Unreal FFrameTime / FFrameRate pair (Live Link Face) to seconds. None if the rate is invalid.'''
+    if numerator <= 0 or denominator <= 0:
+        return None
+    return (frame_number + sub_frame) * denominator / numerator
+
+
+class ClockSync:
+    '''Map a device clock onto the local clock (time.time()).
+    local = device + offset + drift * (device - first device time)
+    The offset follows the lower envelope of (receive - device), which is the minimal transport delay,
+    so network and scheduling delays don't end up in the mapped time. The drift is refitted
+    every refit_interval samples over a sliding window of samples.
+    '''
+
+    def __init__(self, window=600, refit_interval=30):
+        self.window = window
+        self.refit_interval = refit_interval
+        self._x = np.zeros(window, dtype=np.float64)
+        self._d = np.zeros(window, dtype=np.float64)
+        # Number of detected device clock resets (app restarts, timecode wrap around).
+        self.reset_count = 0
+        self.reset()
+
+    def reset(self):
+        self.origin = None
+        self.offset = 0.0
+        self.drift = 0.0
+        self.sample_count = 0
+
+    def __bool__(self):
+        return self.origin is not None
+
+    def add(self, device_time, receive_time):
+        '''Add a sample and return the device time mapped to the local clock.'''
+        if self.origin is not None:
+            expected = self.to_local(device_time)
+            if abs(receive_time - expected) > CLOCK_RESET_THRESHOLD:
+                self.reset()
+                self.reset_count += 1
+        if self.origin is None:
+            self.origin = device_time
+            self.offset = receive_time - device_time
+        x = device_time - self.origin
+        d = receive_time - device_time
+        idx = self.sample_count % self.window
+        self._x[idx] = x
+        self._d[idx] = d
+        self.sample_count += 1
+        # A sample with a smaller transport delay lowers the envelope immediately.
+        self.offset = min(self.offset, d - self.drift * x)
+        if self.sample_count % self.refit_interval == 0:
+            self._refit()
+        return self.to_local(device_time)
+
+    def _refit(self):
+        n = min(self.sample_count, self.window)
+        x = self._x[:n]
+        d = self._d[:n]
+        if n < ENVELOPE_BINS * 2 or np.ptp(x) <= 0.0:
+            return
+        # Fit the drift through the minimal delay of each time bin (lower envelope).
+        order = np.argsort(x)
+        bins = np.array_split(order, ENVELOPE_BINS)
+        min_indices = np.array([b[np.argmin(d[b])] for b in bins])
+        drift = np.polyfit(x[min_indices], d[min_indices], 1)[0]
+        self.drift = float(drift)
+        self.offset = float(np.min(d - drift * x))
+
+    def fit(self, device_times, receive_times):
+        '''Fit the offset and drift on all samples of a recorded take at once.
+        Returns the device times mapped to the local clock. The take must not contain a clock reset.
+        '''
+        device_times = np.asarray(device_times, dtype=np.float64)
+        receive_times = np.asarray(receive_times, dtype=np.float64)
+        self.reset()
+        self.window = len(device_times)
+        self.origin = float(np.min(device_times))
+        self._x = device_times - self.origin
+        self._d = receive_times - device_times
+        self.sample_count = len(device_times)
+        self.offset = float(np.min(self._d))
+        self._refit()
+        return self.to_local(device_times)
+
+    def to_local(self, device_time):
+        if self.origin is None:
+            return device_time
+        return device_time + self.offset + self.drift * (device_time - self.origin)
+
+
+def select_frame_times(receive_times, device_times):
+    '''Return the device timestamps mapped to the local clock (ClockSync fitted on the whole take) if every
+    frame has one and they cover the same time span as the receive timestamps (no clock reset during the take).
+    Otherwise return the receive timestamps.
+    '''
+    if len(device_times) < 2 or not np.isfinite(device_times).all():
+        return receive_times
+    device_span = np.ptp(device_times)
+    receive_span = np.ptp(receive_times)
+    if abs(device_span - receive_span) > CLOCK_RESET_THRESHOLD + 0.01 * receive_span:
+        return receive_times
+    return ClockSync(window=len(device_times)).fit(device_times, receive_times)
+
+
+def interpolation_weights(targets, positions):
+    '''Return (lower, upper, weight) for linear interpolation at the target positions:
+    value = values[lower] + (values[upper] - values[lower]) * weight. positions must be sorted.
+    Targets outside of positions get the first / last value.
+    '''
+    if len(positions) == 1:
+        zeros = np.zeros(len(targets), dtype=np.intp)
+        return zeros, zeros, np.zeros(len(targets), dtype=np.float64)
+    upper = np.clip(np.searchsorted(positions, targets, side='right'), 1, len(positions) - 1)
+    lower = upper - 1
+    span = positions[upper] - positions[lower]
+    # Duplicate positions (span 0) take the later value.
+    weight = np.divide(targets - positions[lower], span, out=np.ones(len(targets), dtype=np.float64), where=span > 0)
+    np.clip(weight, 0.0, 1.0, out=weight)
+    return lower, upper, weight
+
+
+def resample_to_frame_grid(times, data, flags, fps, frame_start=0, hold_edges=False):
+    '''Resample frames recorded at arbitrary times onto whole scene frames.
+    Each channel group is interpolated linearly from the frames that hold it, so gaps (lost frames)
+    are filled. Grid frames outside of the recorded range of a group are left at zero, or hold the first /
+    last value with hold_edges. The group flag is only set inside of the recorded range (missing data mask).
+    Returns (frames, values, flags) with frames as integers starting at frame_start.
+    '''
+    order = np.argsort(times, kind='stable')
+    positions = (times[order] - times[order[0]]) * fps
+    flags = flags[order]
+    grid = np.arange(int(np.floor(positions[-1])) + 1, dtype=np.float64)
+    values = np.zeros((len(grid), data.shape[1]), dtype=np.float32)
+    grid_flags = np.zeros(len(grid), dtype=np.uint8)
+    for channels, flag in CHANNEL_GROUPS:
+        has_group = (flags & flag) != 0
+        if not has_group.any():
+            continue
+        rows = order[has_group]
+        group_positions = positions[has_group]
+        inside = (grid >= group_positions[0]) & (grid <= group_positions[-1])
+        targets = grid if hold_edges else grid[inside]
+        lower, upper, weight = interpolation_weights(targets, group_positions)
+        lower_values = data[rows[lower], channels]
+        group_values = lower_values + (data[rows[upper], channels] - lower_values) * weight[:, None].astype(np.float32)
+        if hold_edges:
+            values[:, channels] = group_values
+        else:
+            values[inside, channels] = group_values
+        grid_flags[inside] |= flag
+    return grid.astype(np.int64) + frame_start, values, grid_flags
@@ -1,6 +1,4 @@
 
-import csv
-import json
 import math
 import os
 from math import radians
@@ -15,8 +13,7 @@ from mathutils import Euler, Vector, Quaternion, Matrix
 
 from ..core.faceit_data import get_a2f_shape_data, get_arkit_shape_data
 from ..core import faceit_utils as futils
-from ..core.fc_dr_utils import (frame_value_pairs_to_numpy_array,
-                                populate_keyframe_points_from_np_array)
+from ..core.fc_dr_utils import ensure_action_channels, ensure_fcurve, write_keyframes
 from ..core.pose_utils import reset_pb, reset_pose, restore_saved_pose, save_pose
 from ..core.retarget_list_utils import get_all_set_target_shapes
 from ..core.retarget_list_base import FaceRegionsBaseProperties
@@ -24,7 +21,12 @@ from ..core.shape_key_utils import get_shape_key_names_from_objects, set_slider_
 from ..ctrl_rig import control_rig_utils as ctrl_utils
 from ..ctrl_rig.control_rig_animation_operators import CRIG_ACTION_SUFFIX
 from ..panels.draw_utils import draw_ctrl_rig_action_layout, draw_eye_action_layout, draw_head_action_layout, draw_shapes_action_layout, draw_text_block
-from .mocap_utils import SmoothBaseProperties, gaussian_filter1d, get_scene_frame_rate, median_filter, moving_average_filter
+from .mocap_utils import SmoothBaseProperties, get_mocap_parse_cache, get_scene_frame_rate
+from .mocap_filters import filter_channels
+from .mocap_decimation import DEFAULT_DECIMATION_TOLERANCE, decimation_mask
+from .mocap_resample import resample_channels
+from .mocap_rotations import source_rotations_to_blender
+from .mocap_file_parsers import MocapFileError, read_a2f_header, read_epic_record_frame_rate
 from ..animate.animate_utils import convert_rotation_values, get_rotation_mode
 
 # Number of channels for each rotation mode
@@ -99,6 +101,20 @@ class MocapBase:
     head_loc_animation_lists = []
     eye_L_animation_lists = []
     eye_R_animation_lists = []
+    # Malformed rows and header warnings of the parsed file
+    parse_report = ''
+    # Parsed files are loaded from this cache (mocap_parse_cache.ParseCache) when set
+    parse_cache = None
+    # The shape values are already smoothed (batch import workers), skip the face and eye look filters
+    shapes_prefiltered = False
+    # Drop the keyframes that are within the tolerance of the straight line between their neighbours
+    use_keyframe_decimation = False
+    decimation_tolerance = DEFAULT_DECIMATION_TOLERANCE
+    # Resample the takes onto whole scene frames (mocap_resample.RESAMPLE_METHODS), NONE keys the recorded samples
+    resample_method = 'NONE'
+    # Keyframes written by recording_to_keyframes and keyframes before decimation
+    keyframes_kept = 0
+    keyframes_total = 0
 
     # Face Smoothing
     use_smoothing_face = False
@@ -392,13 +408,17 @@ class MocapBase:
         frames: list of timestamps
         anim_values: the animation values for this fcurve
         '''
-        mocap_keyframe_points = frame_value_pairs_to_numpy_array(frames, anim_values)
-        populate_keyframe_points_from_np_array(
-            fc,
-            mocap_keyframe_points,
-            add=True,
-            join_with_existing=True
-        )
+        self.keyframes_total += len(anim_values)
+        # None uses the keyframe interpolation of the preferences.
+        interpolation = None
+        if self.use_keyframe_decimation:
+            keep = decimation_mask(frames, anim_values, self.decimation_tolerance)
+            frames = np.asarray(frames)[keep]
+            anim_values = np.asarray(anim_values)[keep]
+            # The tolerance holds for straight segments between the kept keyframes, bezier segments overshoot.
+            interpolation = 'LINEAR'
+        self.keyframes_kept += len(anim_values)
+        write_keyframes(fc, frames, anim_values, interpolation=interpolation, join_with_existing=True)
 
     def parse_animation_data(self, data, frame_start=0, record_frame_rate=1000):
         '''Parse and populate the animation data into animation lists.'''
@@ -420,8 +440,36 @@ class MocapBase:
         self.head_loc_animation_lists = []
         self.eye_L_animation_lists = []
         self.eye_R_animation_lists = []
+        self.parse_report = ''
+
+    def _smooth_shape_values(self, sk_animation_lists):
+        '''Smooth the eye look and face shape columns (frames x shapes), one filter call per settings group.'''
+        if self.shapes_prefiltered:
+            return sk_animation_lists
+        smooth_shape_names = set(self.smooth_shape_names)
+        eye_columns = []
+        face_columns = []
+        for i, name in enumerate(self.source_shape_reference[:sk_animation_lists.shape[1]]):
+            if name.startswith('eyeLook') and self.use_smoothing_eye_bones:
+                eye_columns.append(i)
+            elif self.use_smoothing_face and name in smooth_shape_names:
+                face_columns.append(i)
+        if eye_columns:
+            sk_animation_lists[:, eye_columns] = filter_channels(
+                sk_animation_lists[:, eye_columns], self.smooth_filter_eye_bones, self.smooth_window_eye_bones)
+        if face_columns:
+            sk_animation_lists[:, face_columns] = filter_channels(
+                sk_animation_lists[:, face_columns], self.smooth_filter_face, self.smooth_window_face)
+        return sk_animation_lists
+
+    def _resample_to_scene_frames(self, values):
+        '''Resample a (frames x channels) matrix from the animation timestamps onto the scene frames.
+        Returns (frames, values).'''
+        return resample_channels(self.animation_timestamps, values, self.resample_method)
 
     def recording_to_keyframes(self) -> bool:
+        self.keyframes_kept = 0
+        self.keyframes_total = 0
         sk_animation_lists = self.sk_animation_lists
         # Test smoothing
         head_rot_animation_lists = self.head_rot_animation_lists
@@ -432,8 +480,10 @@ class MocapBase:
         if self.animate_shapes or self.animate_eye_shapes:
             if not self.sk_action:
                 print("Couldn't find a valid shape key action.")
-            if sk_animation_lists:
-                sk_animation_lists = np.array(sk_animation_lists)
+            if len(sk_animation_lists):
+                sk_animation_lists = self._smooth_shape_values(np.array(sk_animation_lists, dtype=np.float64))
+                sk_frames, sk_animation_lists = self._resample_to_scene_frames(sk_animation_lists)
+                sk_channels = ensure_action_channels(self.sk_action, id_type='KEY')
                 # Shape Key animation (isolate all individual animation curves and convert to keyframes)
                 for i, name in enumerate(self.source_shape_reference):
                     shape_keys = self.target_shapes_dict.get(name)
@@ -444,21 +494,6 @@ class MocapBase:
                     except IndexError:
                         print(f'failed at index {i}')
                         continue
-                    if name.startswith('eyeLook') and self.use_smoothing_eye_bones:
-                        if self.smooth_filter_eye_bones == 'SMA':
-                            anim_values = moving_average_filter(anim_values, self.smooth_window_eye_bones)
-                        elif self.smooth_filter_eye_bones == 'MEDIAN':
-                            anim_values = median_filter(anim_values, kernel_size=self.smooth_window_eye_bones)
-                        else:
-                            anim_values = gaussian_filter1d(anim_values, self.smooth_window_eye_bones, 2)
-                    # smooth values
-                    elif self.use_smoothing_face and name in self.smooth_shape_names:
-                        if self.smooth_filter_face == 'SMA':
-                            anim_values = moving_average_filter(anim_values, self.smooth_window_face)
-                        elif self.smooth_filter_face == 'MEDIAN':
-                            anim_values = median_filter(anim_values, kernel_size=self.smooth_window_face)
-                        else:
-                            anim_values = gaussian_filter1d(anim_values, self.smooth_window_face, 2)
                     amplify = self.retarget_shapes[name].amplify
                     anim_values *= amplify
                     shape_dps = set()
@@ -470,10 +505,8 @@ class MocapBase:
                         # print(min(min(sk.slider_max - 0.001, 0.0), min(anim_values)))
                         shape_dps.add(f"{sk.path_from_id()}.value")
                     for dp in shape_dps:
-                        fc = self.sk_action.fcurves.find(dp)
-                        if not fc:
-                            fc = self.sk_action.fcurves.new(dp)
-                        self._anim_values_to_keyframes(fc, self.animation_timestamps, anim_values)
+                        fc = ensure_fcurve(sk_channels, dp)
+                        self._anim_values_to_keyframes(fc, sk_frames, anim_values)
                         keyframes_added = True
 
         # Head Transform Animation
@@ -484,63 +517,61 @@ class MocapBase:
             if not self.head_obj.animation_data:
                 self.head_obj.animation_data_create()
             self.head_obj.animation_data.action = self.head_action
+            head_channels = ensure_action_channels(self.head_action, self.head_obj)
             if self.head_bone:
                 head_dp_base = f'pose.bones["{self.head_bone.name}"].'
             # Head Rotation
-            if self.animate_head_rotation and head_rot_animation_lists:
-                # print(head_rot_animation_lists)
-                head_rot_animation_lists = list(map(self._head_rotation_to_blender, head_rot_animation_lists))
-                head_rot_animation_lists = np.array(head_rot_animation_lists)
+            if self.animate_head_rotation and len(head_rot_animation_lists):
+                head_rot_animation_lists = source_rotations_to_blender(
+                    head_rot_animation_lists, self.source_rotation_units, self.flip_animation,
+                    self.initial_head_rotation if self.head_bone else None, self.head_rotation_mode)
+                if self.use_smoothing_head:
+                    head_rot_animation_lists = filter_channels(
+                        head_rot_animation_lists, self.smooth_filter_head, self.smooth_window_head)
+                head_rot_frames, head_rot_animation_lists = self._resample_to_scene_frames(head_rot_animation_lists)
                 for i in range(rot_channel_count):
                     try:
                         anim_values = head_rot_animation_lists[:, i]
                     except IndexError:
                         print('Index Error when getting anim values from head rot:')
                         continue
-                    if self.use_smoothing_head:
-                        if self.smooth_filter_head == 'SMA':
-                            anim_values = moving_average_filter(anim_values, self.smooth_window_head)
-                        elif self.smooth_filter_head == 'MEDIAN':
-                            anim_values = median_filter(anim_values, kernel_size=self.smooth_window_head)
-                        else:
-                            anim_values = gaussian_filter1d(anim_values, self.smooth_window_head, 2)
-                    fc = self.head_action.fcurves.find(head_dp_base + self.head_rotation_data_path, index=i)
-                    if not fc:
-                        fc = self.head_action.fcurves.new(head_dp_base + self.head_rotation_data_path, index=i)
-                    self._anim_values_to_keyframes(fc, self.animation_timestamps, anim_values)
+                    fc = ensure_fcurve(head_channels, head_dp_base + self.head_rotation_data_path, index=i)
+                    self._anim_values_to_keyframes(fc, head_rot_frames, anim_values)
                     keyframes_added = True
             # Head Location
-            if self.animate_head_location and head_loc_animation_lists:
+            if self.animate_head_location and len(head_loc_animation_lists):
                 head_loc_animation_lists = list(map(self._location_to_blender, head_loc_animation_lists))
                 head_loc_animation_lists = np.array(head_loc_animation_lists)
                 head_loc_animation_lists += self.initial_location_offset
+                if self.use_smoothing_head:
+                    head_loc_animation_lists = filter_channels(
+                        head_loc_animation_lists, self.smooth_filter_head, self.smooth_window_head)
+                head_loc_frames, head_loc_animation_lists = self._resample_to_scene_frames(head_loc_animation_lists)
                 for i in range(3):
                     try:
                         anim_values = head_loc_animation_lists[:, i]
                     except IndexError:
                         print('Index Error when getting anim values from head loc:')
                         continue
-                    if self.use_smoothing_head:
-                        if self.smooth_filter_head == 'SMA':
-                            anim_values = moving_average_filter(anim_values, self.smooth_window_head)
-                        elif self.smooth_filter_head == 'MEDIAN':
-                            anim_values = median_filter(anim_values, kernel_size=self.smooth_window_head)
-                        else:
-                            anim_values = gaussian_filter1d(anim_values, self.smooth_window_head, 2)
                     # blender_index = self.CHANNELS_FACECAP_TO_BLENDER_[i]
-                    fc = self.head_action.fcurves.find(head_dp_base + loc_dp, index=i)
-                    if not fc:
-                        fc = self.head_action.fcurves.new(head_dp_base + loc_dp, index=i)
-                    self._anim_values_to_keyframes(fc, self.animation_timestamps, anim_values)
+                    fc = ensure_fcurve(head_channels, head_dp_base + loc_dp, index=i)
+                    self._anim_values_to_keyframes(fc, head_loc_frames, anim_values)
                     keyframes_added = True
             # Eye Rotation
         if self.animate_eye_bones:
-            if self.eye_L_bone:
+            if self.eye_L_bone or self.eye_R_bone:
                 self.eye_rig.animation_data.action = self.eye_action
+                eye_channels = ensure_action_channels(self.eye_action, self.eye_rig)
+            if self.eye_L_bone and len(eye_L_animation_lists):
                 rot_channel_count_L = CHANNELS_ROTATION_MODE_DICT.get(self.eye_L_rotation_mode, 3)
                 eye_L_dp = f'pose.bones["{self.eye_L_bone.name}"].{self.eye_L_rotation_data_path}'
-                eye_L_animation_lists = list(map(self._eye_L_rotation_to_blender, eye_L_animation_lists))
-                eye_L_animation_lists = np.array(eye_L_animation_lists)
+                eye_L_animation_lists = source_rotations_to_blender(
+                    eye_L_animation_lists, self.source_rotation_units, self.flip_animation,
+                    self.initial_eye_L_rotation, self.eye_L_rotation_mode)
+                if self.use_smoothing_eye_bones:
+                    eye_L_animation_lists = filter_channels(
+                        eye_L_animation_lists, self.smooth_filter_eye_bones, self.smooth_window_eye_bones)
+                eye_L_frames, eye_L_animation_lists = self._resample_to_scene_frames(eye_L_animation_lists)
                 # Left Eye Rotation
                 for i in range(rot_channel_count_L):
                     try:
@@ -548,42 +579,28 @@ class MocapBase:
                     except IndexError:
                         print('Index Error when getting anim values from eye rot:')
                         continue
-                    if self.use_smoothing_eye_bones:
-                        if self.smooth_filter_eye_bones == 'SMA':
-                            anim_values = moving_average_filter(anim_values, self.smooth_window_eye_bones)
-                        elif self.smooth_filter_eye_bones == 'MEDIAN':
-                            anim_values = median_filter(anim_values, kernel_size=self.smooth_window_eye_bones)
-                        else:
-                            anim_values = gaussian_filter1d(anim_values, self.smooth_window_eye_bones, 2)
-                    fc = self.eye_action.fcurves.find(eye_L_dp, index=i)
-                    if not fc:
-                        fc = self.eye_action.fcurves.new(eye_L_dp, index=i, action_group=self.eye_L_bone.name)
-                    self._anim_values_to_keyframes(fc, self.animation_timestamps, anim_values)
+                    fc = ensure_fcurve(eye_channels, eye_L_dp, index=i, group_name=self.eye_L_bone.name)
+                    self._anim_values_to_keyframes(fc, eye_L_frames, anim_values)
                     keyframes_added = True
             # Right Eye Rotation
-            if self.eye_R_bone:
-                self.eye_rig.animation_data.action = self.eye_action
+            if self.eye_R_bone and len(eye_R_animation_lists):
                 rot_channel_count_R = CHANNELS_ROTATION_MODE_DICT.get(self.eye_R_rotation_mode, 3)
                 eye_R_dp = f'pose.bones["{self.eye_R_bone.name}"].{self.eye_R_rotation_data_path}'
-                eye_R_animation_lists = list(map(self._eye_R_rotation_to_blender, eye_R_animation_lists))
-                eye_R_animation_lists = np.array(eye_R_animation_lists)
+                eye_R_animation_lists = source_rotations_to_blender(
+                    eye_R_animation_lists, self.source_rotation_units, self.flip_animation,
+                    self.initial_eye_R_rotation, self.eye_R_rotation_mode)
+                if self.use_smoothing_eye_bones:
+                    eye_R_animation_lists = filter_channels(
+                        eye_R_animation_lists, self.smooth_filter_eye_bones, self.smooth_window_eye_bones)
+                eye_R_frames, eye_R_animation_lists = self._resample_to_scene_frames(eye_R_animation_lists)
                 for i in range(rot_channel_count_R):
                     try:
                         anim_values = eye_R_animation_lists[:, i]
                     except IndexError:
                         print('Index Error when getting anim values from eye rot:')
                         continue
-                    if self.use_smoothing_eye_bones:
-                        if self.smooth_filter_eye_bones == 'SMA':
-                            anim_values = moving_average_filter(anim_values, self.smooth_window_eye_bones)
-                        elif self.smooth_filter_eye_bones == 'MEDIAN':
-                            anim_values = median_filter(anim_values, kernel_size=self.smooth_window_eye_bones)
-                        else:
-                            anim_values = gaussian_filter1d(anim_values, self.smooth_window_eye_bones, 2)
-                    fc = self.eye_action.fcurves.find(eye_R_dp, index=i)
-                    if not fc:
-                        fc = self.eye_action.fcurves.new(eye_R_dp, index=i, action_group=self.eye_R_bone.name)
-                    self._anim_values_to_keyframes(fc, self.animation_timestamps, anim_values)
+                    fc = ensure_fcurve(eye_channels, eye_R_dp, index=i, group_name=self.eye_R_bone.name)
+                    self._anim_values_to_keyframes(fc, eye_R_frames, anim_values)
                     keyframes_added = True
         return keyframes_added
 
@@ -699,6 +716,32 @@ class MocapImporterBase(FaceRegionsBaseProperties, SmoothBaseProperties):
         name="Can Bake Control Rig",
         default=True,
     )
+    use_keyframe_decimation: BoolProperty(
+        name='Decimate Keyframes',
+        default=False,
+        description='Remove the keyframes that can be interpolated from their neighbours within the tolerance. The kept keyframes use linear interpolation.',
+    )
+    decimation_tolerance: FloatProperty(
+        name='Tolerance',
+        default=DEFAULT_DECIMATION_TOLERANCE,
+        min=0.0,
+        soft_max=0.1,
+        precision=4,
+        step=0.1,
+        description='The maximum deviation of the decimated curves from the recorded values (shape key values, radians or scene units). 0 only removes redundant keyframes.',
+    )
+    resample_method: EnumProperty(
+        name='Resample',
+        items=(
+            ('NONE', 'Source Frames', 'Keep the recorded samples, the keyframes can land on subframes.'),
+            ('LINEAR', 'Linear', 'Interpolate linearly between the recorded samples at every scene frame.'),
+            ('CUBIC', 'Cubic', 'Interpolate with a smooth spline through the recorded samples at every scene frame.'),
+            ('ANTIALIAS', 'Anti-Aliased',
+             'Filter the motion that is too fast for the scene frame rate, then interpolate linearly at every scene frame. Equals Linear for takes recorded below the scene frame rate.'),
+        ),
+        default='NONE',
+        description='Resample the recorded frames onto the scene frame rate.',
+    )
     record_frame_rate: FloatProperty(
         name="Record Frame Rate",
         description="The frame rate used to record the animation data.",
@@ -729,6 +772,8 @@ class MocapImporterBase(FaceRegionsBaseProperties, SmoothBaseProperties):
         self.target_shapes_prop_name = "faceit_arkit_retarget_shapes"
         self.engine_settings = None
         self.filename = ""
+        # Keyframes written by the last import and keyframes before decimation
+        self.keyframe_counts = (0, 0)
         # self.can_bake_control_rig = True
         self.can_import_head_location = True
         self.can_import_head_rotation = True
@@ -750,6 +795,61 @@ class MocapImporterBase(FaceRegionsBaseProperties, SmoothBaseProperties):
     def _get_engine_target_objects(self, scene):
         return getattr(scene, self.target_objects_prop_name)
 
+    def _get_shape_targets(self, scene):
+        '''Return the target objects and the retarget shapes of the shape key animation.'''
+        return futils.get_faceit_objects_list(), self._get_engine_target_shapes(scene)
+
+    def _get_shape_action(self, scene):
+        '''Return the action for the shape key animation of the target objects.'''
+        if scene.faceit_mocap_action is None or self.overwrite_method == 'REPLACE':
+            bpy.ops.faceit.new_action(
+                'EXEC_DEFAULT',
+                action_name=self.new_action_name,
+                overwrite_action=self.overwrite_method == 'REPLACE',
+                use_fake_user=True,
+            )
+        return scene.faceit_mocap_action
+
+    def _load_shape_action(self, mocap_action, target_objects):
+        '''Activate the imported shape key action on the target objects.'''
+        bpy.ops.faceit.populate_action(action_name=mocap_action.name, set_frame_current=False)
+
+    def _get_head_target(self, scene):
+        '''Return the head target object and the head bone name.'''
+        return scene.faceit_head_target_object, scene.faceit_head_sub_target
+
+    def _get_head_action(self, head_obj):
+        '''Return the action for the head animation, the active action of the head object if it's kept.'''
+        head_action = None
+        if head_obj.animation_data:
+            head_action = head_obj.animation_data.action
+        if head_action is None or self.overwrite_method == 'REPLACE':
+            bpy.ops.faceit.new_head_action(
+                'EXEC_DEFAULT',
+                overwrite_action=self.overwrite_method == 'REPLACE',
+                use_fake_user=True,
+            )
+            head_action = head_obj.animation_data.action
+        return head_action
+
+    def _get_eye_target(self, scene):
+        '''Return the eye target rig and the left and right eye bone names.'''
+        return scene.faceit_eye_target_rig, scene.faceit_eye_L_sub_target, scene.faceit_eye_R_sub_target
+
+    def _get_eye_action(self, eye_rig):
+        '''Return the action for the eye bone animation, the active action of the eye rig if it's kept.'''
+        eye_action = None
+        if eye_rig.animation_data:
+            eye_action = eye_rig.animation_data.action
+        if eye_action is None or self.overwrite_method == 'REPLACE':
+            bpy.ops.faceit.new_eye_action(
+                'EXEC_DEFAULT',
+                overwrite_action=self.overwrite_method == 'REPLACE',
+                use_fake_user=True,
+            )
+            eye_action = eye_rig.animation_data.action
+        return eye_action
+
     def invoke(self, context, event):
         self._get_engine_specific_settings(context)
         self.can_import_head_location = self.engine_settings.can_animate_head_location
@@ -765,40 +865,33 @@ class MocapImporterBase(FaceRegionsBaseProperties, SmoothBaseProperties):
         self.filename = self._get_clean_filename(self.engine_settings.filename)
         if self.engine_name == 'A2F':
             if getattr(self, "a2f_solver", None):
-                with open(self.engine_settings.filename, 'r') as f:
-                    data = json.load(f)
-                    if "exportFps" in data:
-                        self.record_frame_rate = data.get("exportFps")
-                        numPoses = data["numPoses"]
-                        if numPoses == 52:
-                            setattr(self, "a2f_solver", 'ARKIT')
-                            setattr(self, "found_solver", 'ARKIT')
-                        elif numPoses == 46:
-                            setattr(self, "a2f_solver", 'A2F')
-                            setattr(self, "found_solver", 'A2F')
-                        else:
-                            self.report(
-                                {'ERROR'},
-                                "It looks like you used a blendshape solver that is unknown in Faceit. Please reach out through discord or blendermarket for support.")
-                            return {'CANCELLED'}
+                # Only the members before weightMat, the export can be very large.
+                try:
+                    data = read_a2f_header(self.engine_settings.filename)
+                except MocapFileError as e:
+                    self.report({'ERROR'}, str(e))
+                    return {'CANCELLED'}
+                if "exportFps" in data:
+                    self.record_frame_rate = data.get("exportFps")
+                    numPoses = data.get("numPoses") or len(data.get("facsNames", ()))
+                    if numPoses == 52:
+                        setattr(self, "a2f_solver", 'ARKIT')
+                        setattr(self, "found_solver", 'ARKIT')
+                    elif numPoses == 46:
+                        setattr(self, "a2f_solver", 'A2F')
+                        setattr(self, "found_solver", 'A2F')
+                    else:
+                        self.report(
+                            {'ERROR'},
+                            "It looks like you used a blendshape solver that is unknown in Faceit. Please reach out through discord or blendermarket for support.")
+                        return {'CANCELLED'}
                 if self.a2f_solver == 'ARKIT':
                     self.can_bake_control_rig = True
         elif self.engine_name == 'EPIC':
             # Read the frame rate from the file:
-            with open(self.engine_settings.filename) as csvfile:
-                reader = csv.reader(csvfile)
-                timecodes = []
-                for i, row in enumerate(reader):
-                    if i == 0:
-                        continue
-                    elif i > 200:
-                        break
-                    timecodes.append(row[0])
-                    # Extract the frame values
-                frames = []
-                for tc in timecodes:
-                    frames.append(int(tc.split(':')[-1].split('.')[0]))
-                self.record_frame_rate = max(frames) + 1
+            record_frame_rate = read_epic_record_frame_rate(self.engine_settings.filename)
+            if record_frame_rate:
+                self.record_frame_rate = record_frame_rate
 
         ctrl_rig = context.scene.faceit_control_armature
         if ctrl_rig and self.can_bake_control_rig:
@@ -966,6 +1059,13 @@ class MocapImporterBase(FaceRegionsBaseProperties, SmoothBaseProperties):
         row.prop(self, 'overwrite_method', expand=True)
         row = layout.row()
         row.prop(self, 'frame_start', icon='CON_TRANSFORM')
+        row = layout.row()
+        row.prop(self, 'resample_method')
+        row = layout.row()
+        row.prop(self, 'use_keyframe_decimation', icon='IPO_LINEAR')
+        if self.use_keyframe_decimation:
+            row = layout.row()
+            row.prop(self, 'decimation_tolerance')
 
         layout.use_property_split = prop_split
 
@@ -1082,6 +1182,10 @@ class MocapImporterBase(FaceRegionsBaseProperties, SmoothBaseProperties):
         if soundstrip is not None:
             soundstrip.faceit_audio = True
 
+    def _get_parse_cache(self):
+        '''The cache for parsed mocap files (see mocap_parse_cache).'''
+        return get_mocap_parse_cache()
+
     def _get_raw_animation_data(self):
         '''Return the raw animation data. Filename or osc queue for live animation'''
         return self.engine_settings.filename
@@ -1162,16 +1266,8 @@ class MocapImporterBase(FaceRegionsBaseProperties, SmoothBaseProperties):
                 target_shapes = c_rig.faceit_crig_targets
             else:
                 # Get target action
-                if scene.faceit_mocap_action is None or self.overwrite_method == 'REPLACE':
-                    bpy.ops.faceit.new_action(
-                        'EXEC_DEFAULT',
-                        action_name=self.new_action_name,
-                        overwrite_action=self.overwrite_method == 'REPLACE',
-                        use_fake_user=True,
-                    )
-                mocap_action = scene.faceit_mocap_action
-                target_objects = futils.get_faceit_objects_list()
-                target_shapes = self._get_engine_target_shapes(scene)
+                mocap_action = self._get_shape_action(scene)
+                target_objects, target_shapes = self._get_shape_targets(scene)
 
             if not target_objects:
                 self.report(
@@ -1219,9 +1315,8 @@ class MocapImporterBase(FaceRegionsBaseProperties, SmoothBaseProperties):
         head_action = None
         if animate_loc or animate_rot:
             # Head Settings
-            head_obj = context.scene.faceit_head_target_object
+            head_obj, head_bone_name = self._get_head_target(scene)
             head_loc_multiplier = self.engine_settings.head_location_multiplier
-            head_bone_name = context.scene.faceit_head_sub_target
             saved_pose = None
             if head_obj:
                 if head_obj.type == 'ARMATURE':
@@ -1241,24 +1336,14 @@ class MocapImporterBase(FaceRegionsBaseProperties, SmoothBaseProperties):
                     head_bone_name=head_bone_name,
                     head_loc_mult=head_loc_multiplier,
                 )
-                if head_obj.animation_data:
-                    head_action = head_obj.animation_data.action
-                if head_action is None or self.overwrite_method == 'REPLACE':
-                    bpy.ops.faceit.new_head_action(
-                        'EXEC_DEFAULT',
-                        overwrite_action=self.overwrite_method == 'REPLACE',
-                        use_fake_user=True,
-                    )
-                    head_action = head_obj.animation_data.action
+                head_action = self._get_head_action(head_obj)
                 mocap_importer.set_head_action(head_action)
             if saved_pose:
                 restore_saved_pose(head_obj, saved_pose)
         if self.animate_eye_rotation_bones:
             saved_pose = None
-            eye_rig = context.scene.faceit_eye_target_rig
+            eye_rig, eye_L_bone_name, eye_R_bone_name = self._get_eye_target(scene)
             if eye_rig is not None:
-                eye_L_bone_name = context.scene.faceit_eye_L_sub_target
-                eye_R_bone_name = context.scene.faceit_eye_R_sub_target
                 futils.set_hide_obj(eye_rig, False)
                 saved_pose = save_pose(eye_rig)
                 eye_L_bone = eye_rig.pose.bones.get(eye_L_bone_name)
@@ -1280,18 +1365,8 @@ class MocapImporterBase(FaceRegionsBaseProperties, SmoothBaseProperties):
                         eye_R_bone_name=eye_R_bone_name,
                     )
                     # Set the bone action
-                    eye_action = None
                     if eye_rig is not head_obj or head_action is None:
-                        if eye_rig.animation_data:
-                            eye_action = eye_rig.animation_data.action
-                        if (eye_action is None or self.overwrite_method == 'REPLACE'):
-                            bpy.ops.faceit.new_eye_action(
-                                'EXEC_DEFAULT',
-                                overwrite_action=self.overwrite_method == 'REPLACE',
-                                use_fake_user=True,
-                            )
-                            eye_action = eye_rig.animation_data.action
-                        mocap_importer.set_eye_action(eye_action)
+                        mocap_importer.set_eye_action(self._get_eye_action(eye_rig))
                     else:
                         mocap_importer.set_eye_action(head_action)
                 else:
@@ -1300,16 +1375,33 @@ class MocapImporterBase(FaceRegionsBaseProperties, SmoothBaseProperties):
                 restore_saved_pose(eye_rig, saved_pose)
         # Process & Import Animation
         mocap_importer.fps = get_scene_frame_rate()
-        mocap_importer.parse_animation_data(
-            raw_animation_data,
-            frame_start=self.frame_start,
-            record_frame_rate=self.record_frame_rate
-        )
+        mocap_importer.parse_cache = self._get_parse_cache()
+        try:
+            mocap_importer.parse_animation_data(
+                raw_animation_data,
+                frame_start=self.frame_start,
+                record_frame_rate=self.record_frame_rate
+            )
+        except (MocapFileError, OSError) as e:
+            self.report({'ERROR'}, f"Failed to read the mocap file: {e}")
+            futils.restore_scene_state(context, state_dict)
+            return {'CANCELLED'}
+        if mocap_importer.parse_report:
+            print(mocap_importer.parse_report)
+            self.report({'WARNING'}, mocap_importer.parse_report)
+        mocap_importer.resample_method = self.resample_method
+        mocap_importer.use_keyframe_decimation = self.use_keyframe_decimation
+        mocap_importer.decimation_tolerance = self.decimation_tolerance
         result = mocap_importer.recording_to_keyframes()
         if result == False:
             self.report({'ERROR'}, "Failed to import animation data.")
             futils.restore_scene_state(context, state_dict)
             return {'CANCELLED'}
+        self.keyframe_counts = (mocap_importer.keyframes_kept, mocap_importer.keyframes_total)
+        if self.use_keyframe_decimation and mocap_importer.keyframes_total:
+            self.report({'INFO'}, "Kept {} of {} keyframes ({:.0%}).".format(
+                mocap_importer.keyframes_kept, mocap_importer.keyframes_total,
+                mocap_importer.keyframes_kept / mocap_importer.keyframes_total))
         if self.set_scene_frame_range:
             if (animate_rot or animate_loc) and mocap_importer.head_action:
                 try:
@@ -1336,7 +1428,7 @@ class MocapImporterBase(FaceRegionsBaseProperties, SmoothBaseProperties):
                     futils.restore_scene_state(context, state_dict)
                     return {'CANCELLED'}
             else:
-                bpy.ops.faceit.populate_action(action_name=mocap_action.name, set_frame_current=False)
+                self._load_shape_action(mocap_action, target_objects)
                 if self.set_scene_frame_range:
                     if animate_shapes and mocap_action is not None and mocap_action.fcurves:
                         try:
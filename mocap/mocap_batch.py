@@ -0,0 +1,339 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+
+import numpy as np
+
+from .mocap_file_parsers import (MocapFileError, parse_a2f_file, parse_epic_file, parse_face_cap_file,
+                                 read_a2f_header, read_epic_record_frame_rate)
+from .mocap_filters import filter_channels
+from .mocap_parse_cache import ParseCache, parse_cached, take_from_arrays, take_to_arrays
+
+# File extension of the takes of each mocap engine.
+BATCH_FILE_EXTENSIONS = {
+    'FACECAP': '.txt',
+    'EPIC': '.csv',
+    'A2F': '.json',
+}
+# Record frame rate of the takes that don't store it (Face Cap times are milliseconds).
+DEFAULT_RECORD_FRAME_RATES = {
+    'FACECAP': 1000,
+    'EPIC': 60,
+    'A2F': 60,
+}
+# Blender ID names are limited to 63 bytes.
+MAX_ACTION_NAME_LENGTH = 63
+# The workers run this module with the add-on directory as working directory: python -m mocap.mocap_batch <manifest>
+# The add-on package itself is never imported, it needs bpy.
+WORKER_MODULE = 'mocap.mocap_batch'
+WORKER_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULT_EXTENSION = '.json'
+# Number of poses of the Audio2Face blendshape solvers.
+A2F_SOLVER_POSES = {52: 'ARKIT', 46: 'A2F'}
+
+
+def scan_take_files(directory, engine, recursive=False):
+    '''Return the paths of all takes of the engine in directory, sorted by their relative path.'''
+    extension = BATCH_FILE_EXTENSIONS[engine]
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [name for name in dirs if not name.startswith('.')] if recursive else []
+        for name in files:
+            if name.lower().endswith(extension) and not name.startswith('.'):
+                paths.append(os.path.join(root, name))
+    return sorted(paths, key=lambda path: _relative_name(directory, path))
+
+
+def _relative_name(directory, path):
+    '''The relative path without extension, with _ as separator.'''
+    name = os.path.splitext(os.path.relpath(path, directory))[0]
+    return name.replace(os.sep, '_').replace('/', '_')
+
+
+def _truncate_name(name, suffix=''):
+    '''Truncate name so that name + suffix fits in a Blender ID name.'''
+    size = MAX_ACTION_NAME_LENGTH - len(suffix.encode())
+    return name.encode()[:size].decode(errors='ignore') + suffix
+
+
+def batch_action_names(directory, paths, prefix=''):
+    '''Return a unique action name for every take: prefix + the relative path without extension.
+    Names that collide after truncation get a numbered suffix in the order of paths.
+    '''
+    names = []
+    used = set()
+    for path in paths:
+        base_name = prefix + _relative_name(directory, path)
+        name = _truncate_name(base_name)
+        number = 2
+        while name.lower() in used:
+            name = _truncate_name(base_name, f'_{number}')
+            number += 1
+        used.add(name.lower())
+        names.append(name)
+    return names
+
+
+def split_jobs(jobs, count):
+    '''Split the jobs into count shares of about the same total file size, largest takes first.'''
+    shares = [[] for _ in range(max(1, count))]
+    totals = [0] * len(shares)
+    sizes = {}
+    for job in jobs:
+        try:
+            sizes[job['index']] = os.path.getsize(job['path'])
+        except OSError:
+            sizes[job['index']] = 0
+    for job in sorted(jobs, key=lambda job: (-sizes[job['index']], job['index'])):
+        share = totals.index(min(totals))
+        shares[share].append(job)
+        totals[share] += sizes[job['index']]
+    return [share for share in shares if share]
+
+
+def python_executable():
+    '''The Python interpreter for the workers or None.
+    Blender versions before 2.91 report the Blender binary as sys.executable.'''
+    if 'python' in os.path.basename(sys.executable).lower():
+        return sys.executable
+    return None
+
+
+def default_process_count(job_count):
+    '''One worker per core, leave one core to Blender.'''
+    return max(1, min(job_count, (os.cpu_count() or 2) - 1))
+
+
+def parse_take(job, result, cache=None):
+    '''Parse the take of a batch job. Returns the MocapFileData and its shape names.
+    The record frame rate and Audio2Face solver found in the file are written to result.
+    '''
+    path = job['path']
+    engine = job['engine']
+    if engine == 'FACECAP':
+        # The manifest is JSON, restore the tuples of accepted spellings (and the parse cache key).
+        shape_names = [tuple(names) if isinstance(names, list) else names for names in job['shape_names']]
+        take = parse_cached(parse_face_cap_file, path, shape_names, cache=cache)
+    elif engine == 'EPIC':
+        shape_names = job['shape_names']
+        record_frame_rate = float(read_epic_record_frame_rate(path) or job['record_frame_rate'])
+        result['record_frame_rate'] = record_frame_rate
+        take = parse_cached(parse_epic_file, path, shape_names, record_frame_rate=record_frame_rate, cache=cache)
+    elif engine == 'A2F':
+        header = read_a2f_header(path)
+        pose_count = header.get('numPoses') or len(header.get('facsNames', ()))
+        solver = A2F_SOLVER_POSES.get(pose_count)
+        if solver is None:
+            raise MocapFileError(f'Unknown Audio2Face blendshape solver with {pose_count} poses.')
+        result['solver'] = solver
+        result['record_frame_rate'] = header.get('exportFps', job['record_frame_rate'])
+        shape_names = job['shape_names'][solver]
+        take = parse_cached(parse_a2f_file, path, shape_names, cache=cache)
+    else:
+        raise ValueError(f'Unknown mocap engine {engine}.')
+    return take, shape_names
+
+
+def smooth_shape_columns(shape_values, shape_names, smoothing):
+    '''Smooth the shape columns in place, one filter call per (filter, window) group of columns.
+    @smoothing: maps shape names to (filter, window), see mocap_filters.filter_channels.
+    '''
+    groups = {}
+    for i, names in enumerate(shape_names):
+        name = names if isinstance(names, str) else names[0]
+        settings = smoothing.get(name)
+        if settings:
+            groups.setdefault(tuple(settings), []).append(i)
+    for (smooth_filter, window), columns in groups.items():
+        shape_values[:, columns] = filter_channels(shape_values[:, columns], smooth_filter, window)
+
+
+def run_job(job, cache=None):
+    '''Parse and smooth a take, write it to the job output (.npz). Returns the result dict.'''
+    result = {
+        'index': job['index'],
+        'path': job['path'],
+        'output': job['output'],
+        'frames': 0,
+        'record_frame_rate': job['record_frame_rate'],
+        'solver': None,
+        'parse_time': 0.0,
+        'filter_time': 0.0,
+        'report': '',
+        'error': '',
+    }
+    try:
+        start = time.perf_counter()
+        take, shape_names = parse_take(job, result, cache=cache)
+        result['parse_time'] = time.perf_counter() - start
+        if not len(take):
+            raise MocapFileError('No frames found.')
+        start = time.perf_counter()
+        smooth_shape_columns(take.shape_values, shape_names, job['smoothing'])
+        result['filter_time'] = time.perf_counter() - start
+        with open(job['output'], 'wb') as f:
+            np.savez(f, **take_to_arrays(take))
+        result['frames'] = len(take)
+        result['report'] = take.report()
+    except (MocapFileError, OSError, ValueError) as e:
+        result['error'] = str(e) or type(e).__name__
+    return result
+
+
+def _write_json(path, data):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
+
+def main(argv=None):
+    '''Worker process: run the jobs of a manifest, write a result file per job.'''
+    argv = sys.argv[1:] if argv is None else argv
+    with open(argv[0]) as f:
+        manifest = json.load(f)
+    cache = ParseCache(**manifest['cache']) if manifest.get('cache') else None
+    for job in manifest['jobs']:
+        try:
+            result = run_job(job, cache=cache)
+        except Exception as e:
+            # One broken take must not fail the remaining jobs of this worker.
+            traceback.print_exc()
+            result = {'index': job['index'], 'path': job['path'], 'error': f'{type(e).__name__}: {e}'}
+        _write_json(os.path.join(manifest['results'], f'{job["index"]}{RESULT_EXTENSION}'), result)
+    return 0
+
+
+class BatchRunner:
+    '''Run batch jobs in worker processes and collect the results.
+    Every worker gets a share of the jobs in a manifest file and writes a result file per finished take,
+    poll() returns the new results without blocking.
+    '''
+
+    def __init__(self, jobs, process_count=0, cache=None):
+        self.jobs = jobs
+        self.process_count = process_count or default_process_count(len(jobs))
+        self.cache = cache
+        self.work_directory = None
+        self.processes = []
+        # Without a Python interpreter the jobs run one per poll() in this process.
+        self.inline_jobs = []
+        self.results = {}
+
+    @property
+    def done(self):
+        return len(self.results) == len(self.jobs)
+
+    def start(self):
+        self.work_directory = tempfile.mkdtemp(prefix='faceit_batch_')
+        for job in self.jobs:
+            job['output'] = os.path.join(self.work_directory, f'{job["index"]}.npz')
+        cache = None
+        if self.cache is not None:
+            cache = {'directory': self.cache.directory, 'max_size': self.cache.max_size}
+        executable = python_executable()
+        if executable is None:
+            self.process_count = 0
+            self.inline_jobs = sorted(self.jobs, key=lambda job: job['index'])
+            return
+        for i, share in enumerate(split_jobs(self.jobs, self.process_count)):
+            manifest_path = os.path.join(self.work_directory, f'manifest_{i}.json')
+            _write_json(manifest_path, {'jobs': share, 'results': self.work_directory, 'cache': cache})
+            process = subprocess.Popen(
+                [executable, '-m', WORKER_MODULE, manifest_path],
+                cwd=WORKER_DIRECTORY,
+                stdin=subprocess.DEVNULL,
+                creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0),
+            )
+            self.processes.append((process, share))
+
+    def poll(self):
+        '''Return the results finished since the last call, in job order.'''
+        if self.inline_jobs:
+            job = self.inline_jobs.pop(0)
+            result = run_job(job, cache=self.cache)
+            self.results[job['index']] = result
+            return [result]
+        # Check the exit codes before reading the results, a worker may write its last result in between.
+        exited = [(process, share) for process, share in self.processes if process.poll() is not None]
+        finished = []
+        for name in os.listdir(self.work_directory):
+            if not name.endswith(RESULT_EXTENSION) or name.startswith('manifest'):
+                continue
+            index = int(name[:-len(RESULT_EXTENSION)])
+            if index in self.results:
+                continue
+            with open(os.path.join(self.work_directory, name)) as f:
+                result = json.load(f)
+            self.results[index] = result
+            finished.append(result)
+        for process, share in exited:
+            for job in share:
+                if job['index'] not in self.results:
+                    result = {'index': job['index'], 'path': job['path'],
+                              'error': f'The worker process exited with code {process.returncode}.'}
+                    self.results[job['index']] = result
+                    finished.append(result)
+        return sorted(finished, key=lambda result: result['index'])
+
+    def load_take(self, result):
+        '''Return the parsed and smoothed take (MocapFileData) of a successful result.'''
+        with np.load(result['output'], allow_pickle=False) as arrays:
+            take = take_from_arrays(arrays)
+        os.remove(result['output'])
+        return take
+
+    def close(self):
+        '''Stop the remaining workers and remove the work directory.'''
+        for process, _share in self.processes:
+            if process.poll() is None:
+                process.terminate()
+        for process, _share in self.processes:
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.processes = []
+        if self.work_directory:
+            shutil.rmtree(self.work_directory, ignore_errors=True)
+            self.work_directory = None
+
+
+def format_batch_report(results, elapsed, process_count, skipped=0):
+    '''Return the summary line and a table of all takes (sorted by action name).
+    @results: the worker results, completed by the importer with action, write_time and error.
+    @skipped: the number of takes that were not imported because their action exists.
+    '''
+    failed = [result for result in results if result.get('error')]
+    parse_time = sum(result.get('parse_time', 0.0) for result in results)
+    filter_time = sum(result.get('filter_time', 0.0) for result in results)
+    write_time = sum(result.get('write_time', 0.0) for result in results)
+    keyframes = sum(result.get('keyframes', 0) for result in results)
+    recorded_keyframes = sum(result.get('recorded_keyframes', 0) for result in results)
+    workers = f'{process_count} processes' if process_count else 'Blender'
+    summary = (f'Imported {len(results) - len(failed)} of {len(results)} takes in {elapsed:.1f} s '
+               f'(parse {parse_time:.1f} s, filter {filter_time:.1f} s in {workers}, write {write_time:.1f} s)')
+    if keyframes < recorded_keyframes:
+        summary += f', kept {keyframes} of {recorded_keyframes} keyframes'
+    if failed:
+        summary += f', {len(failed)} failed'
+    if skipped:
+        summary += f', {skipped} skipped'
+    summary += '.'
+    lines = [f'{"Action":<40} {"Frames":>7} {"Keys":>9} {"Parse":>8} {"Filter":>8} {"Write":>8}  Status']
+    for result in sorted(results, key=lambda result: result.get('action', '')):
+        status = result.get('error') or result.get('report') or 'OK'
+        lines.append(
+            f'{result.get("action", ""):<40} {result.get("frames", 0):>7} {result.get("keyframes", 0):>9} '
+            f'{result.get("parse_time", 0.0) * 1000:>6.0f}ms {result.get("filter_time", 0.0) * 1000:>6.0f}ms '
+            f'{result.get("write_time", 0.0) * 1000:>6.0f}ms  {status}')
+    return summary, lines
+
+
+if __name__ == '__main__':
+    sys.exit(main())
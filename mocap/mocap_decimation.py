@@ -0,0 +1,77 @@
+import numpy as np
+
+# Default maximum deviation of the decimated curves (shape key values, radians, scene units).
+DEFAULT_DECIMATION_TOLERANCE = 0.005
+# Segments of more keyframes than this are halved instead of split at the largest error. Plain Ramer-Douglas-Peucker
+# needs a pass per kept key on noisy curves, this costs about 1% more keys.
+MAX_SPLIT_SEGMENT = 256
+
+
+def decimation_mask(frames, values, tolerance=DEFAULT_DECIMATION_TOLERANCE):
+    '''Return the mask of the keyframes to keep, so that the straight lines between the kept keyframes stay
+    within tolerance of every dropped value (Ramer-Douglas-Peucker with the vertical distance).
+    All channels are decimated together, every pass splits all segments that are still out of tolerance
+    at their largest error. Runs of identical or collinear values are always removed.
+    @frames: the keyframe times (frames), increasing.
+    @values: (frames,) or (frames x channels) values.
+    @tolerance: the maximum deviation in value units.
+    '''
+    frames = np.asarray(frames, dtype=np.float64)
+    values = np.nan_to_num(np.asarray(values, dtype=np.float64))
+    single_channel = values.ndim == 1
+    if single_channel:
+        values = values[:, np.newaxis]
+    frame_count, channel_count = values.shape
+    keep = np.zeros((channel_count, frame_count), dtype=bool)
+    if frame_count <= 2:
+        keep[:] = True
+        return keep[0] if single_channel else keep.T
+    keep[:, [0, -1]] = True
+    # The channels one after the other, the first and last key of every channel split them.
+    keep = keep.ravel()
+    times = np.tile(frames, channel_count)
+    values = values.T.ravel()
+    # The points of the segments that may still be split and the kept keys around them
+    candidates = np.flatnonzero(~keep)
+    start = candidates // frame_count * frame_count
+    end = start + frame_count - 1
+    while candidates.size:
+        # The candidates are sorted, the candidates of a segment are contiguous.
+        group_starts = np.flatnonzero(np.r_[True, start[1:] != start[:-1]])
+        group_sizes = np.diff(np.r_[group_starts, candidates.size])
+        segment_start = start[group_starts]
+        segment_end = end[group_starts]
+        duration = times[segment_end] - times[segment_start]
+        slope = np.divide(values[segment_end] - values[segment_start], duration,
+                          out=np.zeros(duration.size), where=duration != 0)
+        line = values[segment_start].repeat(group_sizes) + slope.repeat(group_sizes) * (
+            times[candidates] - times[segment_start].repeat(group_sizes))
+        error = np.abs(values[candidates] - line)
+        group_max = np.maximum.reduceat(error, group_starts)
+        split = group_max > tolerance
+        if not split.any():
+            break
+        # Split every segment that is out of tolerance at its first point with the largest error.
+        at_max = np.flatnonzero(error == group_max.repeat(group_sizes))
+        first = at_max[np.r_[True, start[at_max[1:]] != start[at_max[:-1]]]]
+        segment_split = candidates[first]
+        # Long segments are halved, see MAX_SPLIT_SEGMENT.
+        long_segment = segment_end - segment_start > MAX_SPLIT_SEGMENT
+        segment_split[long_segment] = (segment_start[long_segment] + segment_end[long_segment]) // 2
+        keep[segment_split[split]] = True
+        split_point = segment_split.repeat(group_sizes)
+        remaining = split.repeat(group_sizes) & (candidates != split_point)
+        candidates = candidates[remaining]
+        split_point = split_point[remaining]
+        start = np.where(candidates > split_point, split_point, start[remaining])
+        end = np.where(candidates < split_point, split_point, end[remaining])
+    keep = keep.reshape(channel_count, frame_count)
+    return keep[0] if single_channel else keep.T
+
+
+def decimate_keyframes(frames, values, tolerance=DEFAULT_DECIMATION_TOLERANCE):
+    '''Return the frames and values of the keyframes kept by decimation_mask for a single channel.'''
+    frames = np.asarray(frames)
+    values = np.asarray(values)
+    keep = decimation_mask(frames, values, tolerance)
+    return frames[keep], values[keep]
@@ -0,0 +1,446 @@
+import json
+import os
+
+import numpy as np
+
+# Bump when the parsed output changes, cached takes of older versions are parsed again (mocap_parse_cache).
+PARSER_VERSION = 1
+# Face Cap TXT: k,<ms since start>,head location (3),head rotation (3),eye L (2),eye R (2),blendshapes...
+FACE_CAP_FRAME_TAG = 'k'
+FACE_CAP_SHAPES_TAG = 'bs'
+FACE_CAP_TRANSFORM_COLUMNS = 10
+# Live Link Face CSV: Timecode,BlendShapeCount,blendshapes (52),head (3),eye L (3),eye R (3)
+EPIC_SHAPE_COLUMN = 2
+EPIC_SHAPE_COUNT = 52
+EPIC_TRANSFORM_COLUMNS = 9
+# Seconds per SMPTE timecode field (hh:mm:ss:ff), the frame field is divided by the record frame rate.
+TIMECODE_FIELDS = 4
+# Audio2Face JSON: the weightMat rows are streamed in blocks of this many characters.
+A2F_WEIGHTS_KEY = '"weightMat"'
+A2F_READ_SIZE = 1024 ** 2
+# Characters per weightMat row used to preallocate the matrix when numFrames is missing (grows if needed).
+A2F_ESTIMATED_ROW_SIZE = 1024
+# Whitespace and opening brackets are removed from the rows, the closing brackets separate them.
+_A2F_ROW_TRANSLATION = str.maketrans('', '', ' \t\r\n[')
+# Rows are converted in blocks of this size to locate the malformed rows when the bulk conversion fails.
+MALFORMED_SEARCH_BLOCK = 1024
+
+
+class MocapFileError(Exception):
+    '''The file can't be imported (no frames, wrong header).'''
+
+
+class MocapFileData:
+    '''The numeric block of a mocap file.
+    times: float64 time of every frame in the unit of the file.
+    values: float32 matrix (frames x columns) of the numeric columns after the time.
+    shape_values: view on the blendshape columns in the order of the expected shape names (missing shapes are 0).
+    malformed_rows: (line number, reason) of all rows that were skipped (frame index for JSON files).
+    warnings: header mismatches.
+    '''
+
+    def __init__(self, times, values, shape_values, malformed_rows=None, warnings=None, row_name='line'):
+        self.times = times
+        self.values = values
+        self.shape_values = shape_values
+        self.malformed_rows = malformed_rows or []
+        self.warnings = warnings or []
+        self.row_name = row_name
+
+    def __len__(self):
+        return len(self.times)
+
+    def report(self, max_lines=10):
+        '''Return a one line summary of the malformed rows and header warnings, or an empty string.'''
+        messages = list(self.warnings)
+        if self.malformed_rows:
+            lines = ', '.join(str(line) for line, _reason in self.malformed_rows[:max_lines])
+            if len(self.malformed_rows) > max_lines:
+                lines += ', ...'
+            messages.append(f'Skipped {len(self.malformed_rows)} malformed rows ({self.row_name}s {lines}).')
+        return ' '.join(messages)
+
+
+def _normalized(name):
+    return name.strip().lower()
+
+
+def match_shape_columns(header_names, expected_names):
+    '''Return the header column of every expected shape (-1 if missing), the missing and the unknown names.
+    @header_names: the blendshape names found in the file.
+    @expected_names: one entry per shape, a name or a tuple of accepted spellings. Compared case insensitive.
+    '''
+    header_index = {}
+    for i, name in enumerate(header_names):
+        header_index.setdefault(_normalized(name), i)
+    order = np.full(len(expected_names), -1, dtype=np.int64)
+    missing = []
+    for i, names in enumerate(expected_names):
+        if isinstance(names, str):
+            names = (names,)
+        for name in names:
+            column = header_index.get(_normalized(name))
+            if column is not None:
+                order[i] = column
+                break
+        else:
+            missing.append(names[0])
+    found = set(order[order >= 0].tolist())
+    unknown = [name for i, name in enumerate(header_names) if i not in found]
+    return order, missing, unknown
+
+
+def _header_warnings(missing, unknown):
+    warnings = []
+    if missing:
+        warnings.append(f'Missing shapes in the file header: {", ".join(missing)}.')
+    if unknown:
+        warnings.append(f'Unknown shapes in the file header: {", ".join(unknown)}.')
+    return warnings
+
+
+def _select_shapes(shape_block, order):
+    '''Reorder the blendshape columns to the expected order. Returns a view if the file has the expected order.'''
+    if np.array_equal(order, np.arange(len(order))) and shape_block.shape[1] >= len(order):
+        return shape_block[:, :len(order)]
+    shape_values = np.zeros((len(shape_block), len(order)), dtype=shape_block.dtype)
+    found = (order >= 0) & (order < shape_block.shape[1])
+    shape_values[:, found] = shape_block[:, order[found]]
+    return shape_values
+
+
+def _to_matrix(lines, line_numbers, column_count, usecols=None):
+    '''Convert the text rows to a float64 matrix with one np.loadtxt call.
+    Rows with the wrong number of fields, text cells or non finite values are dropped.
+    Returns the matrix, the line numbers of the kept rows and the malformed rows (line number, reason).
+    '''
+    malformed = []
+    field_counts = np.fromiter((line.count(',') + 1 for line in lines), dtype=np.int64, count=len(lines))
+    line_numbers = np.asarray(line_numbers, dtype=np.int64)
+    wrong_count = np.flatnonzero(field_counts != column_count)
+    for i in wrong_count.tolist():
+        malformed.append((int(line_numbers[i]), f'expected {column_count} fields, found {field_counts[i]}'))
+    if len(wrong_count):
+        keep = field_counts == column_count
+        lines = [line for line, k in zip(lines, keep.tolist()) if k]
+        line_numbers = line_numbers[keep]
+    width = column_count if usecols is None else len(usecols)
+    if not lines:
+        return np.zeros((0, width)), line_numbers, malformed
+    try:
+        matrix = np.loadtxt(lines, delimiter=',', dtype=np.float64, usecols=usecols, ndmin=2)
+    except ValueError:
+        matrix, keep, text_rows = _to_matrix_by_blocks(lines, width, usecols)
+        malformed.extend((int(line_numbers[i]), 'could not convert a field to a number') for i in text_rows)
+        line_numbers = line_numbers[keep]
+    finite = np.isfinite(matrix).all(axis=1)
+    if not finite.all():
+        malformed.extend((int(line), 'not a finite number') for line in line_numbers[~finite].tolist())
+        matrix = matrix[finite]
+        line_numbers = line_numbers[finite]
+    malformed.sort()
+    return matrix, line_numbers, malformed
+
+
+def _to_matrix_by_blocks(lines, width, usecols):
+    '''Slow path of _to_matrix: convert blocks of rows, only the blocks that fail are converted row by row.'''
+    blocks = []
+    keep = np.ones(len(lines), dtype=bool)
+    text_rows = []
+    for start in range(0, len(lines), MALFORMED_SEARCH_BLOCK):
+        block = lines[start:start + MALFORMED_SEARCH_BLOCK]
+        try:
+            blocks.append(np.loadtxt(block, delimiter=',', dtype=np.float64, usecols=usecols, ndmin=2))
+            continue
+        except ValueError:
+            pass
+        for i, line in enumerate(block, start):
+            try:
+                blocks.append(np.loadtxt([line], delimiter=',', dtype=np.float64, usecols=usecols, ndmin=2))
+            except ValueError:
+                keep[i] = False
+                text_rows.append(i)
+    matrix = np.concatenate(blocks) if blocks else np.zeros((0, width))
+    return matrix, keep, text_rows
+
+
+def timecodes_to_seconds(timecodes, record_frame_rate):
+    '''Convert SMPTE timecodes to seconds in one pass.
+    @timecodes: float matrix (frames x 4) of the hh, mm, ss and ff fields (ff can hold subframes).
+    '''
+    scale = np.array((3600.0, 60.0, 1.0, 1.0 / record_frame_rate))
+    return np.asarray(timecodes, dtype=np.float64) @ scale
+
+
+def _read_lines(path):
+    with open(path) as f:
+        return f.read().splitlines()
+
+
+def parse_face_cap_file(path, shape_names):
+    '''Parse a Face Cap TXT file.
+    @shape_names: the expected blendshape names (see match_shape_columns).
+    times are in milliseconds since the start of the recording,
+    values: head location (3), head rotation (3), eye L (2), eye R (2), blendshapes.
+    '''
+    lines = _read_lines(path)
+    header_names = None
+    frame_lines = []
+    line_numbers = []
+    for i, line in enumerate(lines, 1):
+        tag = line.split(',', 1)[0]
+        if tag == FACE_CAP_FRAME_TAG:
+            frame_lines.append(line)
+            line_numbers.append(i)
+        elif tag == FACE_CAP_SHAPES_TAG and header_names is None:
+            header_names = [name for name in line.split(',')[1:] if name and not _is_number(name)]
+    if not frame_lines:
+        raise MocapFileError(f'No frames found in {path}.')
+    warnings = []
+    if header_names is None:
+        # Older exports have no shape names, the shapes are in Face Cap order.
+        order = np.arange(len(shape_names))
+        shape_count = len(shape_names)
+    else:
+        order, missing, unknown = match_shape_columns(header_names, shape_names)
+        warnings = _header_warnings(missing, unknown)
+        shape_count = len(header_names)
+    column_count = 2 + FACE_CAP_TRANSFORM_COLUMNS + shape_count
+    matrix, _line_numbers, malformed = _to_matrix(
+        frame_lines, line_numbers, column_count, usecols=range(1, column_count))
+    if not len(matrix):
+        raise MocapFileError(f'No valid frames found in {path}. {len(malformed)} malformed rows.')
+    values = matrix[:, 1:].astype(np.float32)
+    shape_values = _select_shapes(values[:, FACE_CAP_TRANSFORM_COLUMNS:], order)
+    return MocapFileData(matrix[:, 0], values, shape_values, malformed, warnings)
+
+
+def parse_epic_file(path, shape_names, record_frame_rate=60):
+    '''Parse a Live Link Face CSV file.
+    @shape_names: the expected blendshape names (see match_shape_columns).
+    times are in seconds (timecode), frames without blendshape values (BlendShapeCount 0) are skipped,
+    values: blendshape count, blendshapes, head yaw, pitch, roll, eye L and eye R yaw, pitch, roll.
+    '''
+    lines = _read_lines(path)
+    if not lines:
+        raise MocapFileError(f'{path} is empty.')
+    header = lines[0].split(',')
+    column_count = len(header)
+    if column_count < EPIC_SHAPE_COLUMN + EPIC_SHAPE_COUNT + EPIC_TRANSFORM_COLUMNS:
+        raise MocapFileError(f'Unexpected header in {path}: {column_count} columns.')
+    header_names = header[EPIC_SHAPE_COLUMN:column_count - EPIC_TRANSFORM_COLUMNS]
+    order, missing, unknown = match_shape_columns(header_names, shape_names)
+    warnings = _header_warnings(missing, unknown)
+    frame_lines = []
+    line_numbers = []
+    for i, line in enumerate(lines[1:], 2):
+        if not line:
+            continue
+        count_field = line.split(',', 2)[1:2]
+        if count_field and _is_number(count_field[0]) and float(count_field[0]) == 0:
+            # No values in this frame
+            continue
+        # The timecode hh:mm:ss:ff becomes 4 numeric columns.
+        frame_lines.append(line.replace(':', ',', TIMECODE_FIELDS - 1))
+        line_numbers.append(i)
+    matrix, _line_numbers, malformed = _to_matrix(frame_lines, line_numbers, column_count + TIMECODE_FIELDS - 1)
+    if not len(matrix):
+        raise MocapFileError(f'No frames with blendshape values found in {path}.')
+    times = timecodes_to_seconds(matrix[:, :TIMECODE_FIELDS], record_frame_rate)
+    values = matrix[:, TIMECODE_FIELDS:].astype(np.float32)
+    shape_values = _select_shapes(values[:, 1:1 + len(header_names)], order)
+    transforms = values[:, -EPIC_TRANSFORM_COLUMNS:]
+    values = np.concatenate((values[:, :1], shape_values, transforms), axis=1)
+    return MocapFileData(times, values, values[:, 1:1 + len(order)], malformed, warnings)
+
+
+def read_epic_record_frame_rate(path, max_rows=200):
+    '''Guess the record frame rate of a Live Link Face CSV file from the frame field of the first timecodes.'''
+    with open(path) as f:
+        f.readline()
+        timecodes = [line[:line.find(',')] for _i, line in zip(range(max_rows), f)]
+    frame_fields = [timecode.rsplit(':', 1)[-1] for timecode in timecodes if timecode.count(':') == TIMECODE_FIELDS - 1]
+    if not frame_fields:
+        return None
+    frames = np.floor(np.array(frame_fields, dtype=np.float64))
+    return int(frames.max()) + 1
+
+
+class A2FStreamParser:
+    '''Incremental parser of Audio2Face JSON exports.
+    The weightMat rows are converted block by block into a preallocated float32 matrix, so memory use is bounded
+    by the output size and the read size (json.load holds every weight as a Python float).
+    step() parses the next block and returns the progress (0 - 1), result() returns the MocapFileData.
+    '''
+
+    def __init__(self, path, shape_names, read_size=A2F_READ_SIZE):
+        self.path = path
+        self.shape_names = shape_names
+        self.read_size = read_size
+        self.file_size = max(os.path.getsize(path), 1)
+        self.header = {}
+        self.done = False
+        self._file = open(path, 'r')
+        self._read_count = 0
+        self._state = 'HEADER'
+        self._text = ''
+        self._weights = None
+        self._row_count = 0
+        self._frame_count = 0
+        self._frame_rows = []
+        self._malformed = []
+
+    @property
+    def progress(self):
+        return min(self._read_count / self.file_size, 1.0)
+
+    def close(self):
+        self._file.close()
+
+    def step(self):
+        '''Read and parse the next block of the file. Raises MocapFileError if the file has no weightMat.'''
+        if self.done:
+            return 1.0
+        chunk = self._file.read(self.read_size)
+        self._read_count += len(chunk)
+        at_end = not chunk
+        self._text += chunk
+        if self._state == 'HEADER':
+            self._parse_header(at_end)
+        if self._state == 'ROWS':
+            self._parse_rows()
+        if self._state == 'TRAILER' and at_end:
+            self.header.update(_parse_json_fragment(self._text))
+            self._text = ''
+            self._finish()
+        elif at_end:
+            self.close()
+            raise MocapFileError(f'Unexpected end of file in {self.path}.')
+        return self.progress
+
+    def _parse_header(self, at_end):
+        key = self._text.find(A2F_WEIGHTS_KEY)
+        start = self._text.find('[', key) if key >= 0 else -1
+        if start < 0:
+            if at_end:
+                self.close()
+                raise MocapFileError(f'No weightMat found in {self.path}.')
+            return
+        self.header = _parse_json_fragment(self._text[:key])
+        frame_count = self.header.get('numFrames') or int(self.file_size / A2F_ESTIMATED_ROW_SIZE)
+        self._pose_count = self.header.get('numPoses') or len(self.header.get('facsNames') or ())
+        self._weights = np.zeros((max(int(frame_count), 1), self._pose_count), dtype=np.float32)
+        self._text = self._text[start + 1:]
+        self._state = 'ROWS'
+
+    def _parse_rows(self):
+        # Rows hold no brackets, the closing bracket of weightMat is the first ] without a [.
+        last_close = self._text.rfind(']')
+        if last_close < 0:
+            return
+        if self._text.count(']', 0, last_close + 1) > self._text.count('[', 0, last_close + 1):
+            weights_end = self._find_weights_end()
+            rows_text = self._text[:weights_end]
+            self._text = self._text[weights_end + 1:]
+            self._state = 'TRAILER'
+        else:
+            rows_text = self._text[:last_close + 1]
+            self._text = self._text[last_close + 1:]
+        rows = rows_text.translate(_A2F_ROW_TRANSLATION).split(']')[:-1]
+        self._add_rows([row.lstrip(',') for row in rows])
+
+    def _find_weights_end(self):
+        position = 0
+        while True:
+            row_start = self._text.find('[', position)
+            close = self._text.find(']', position)
+            if row_start < 0 or close < row_start:
+                return close
+            position = self._text.find(']', row_start) + 1
+
+    def _add_rows(self, rows):
+        if not rows:
+            return
+        if not self._pose_count:
+            self._pose_count = rows[0].count(',') + 1
+            self._weights = np.zeros((len(self._weights), self._pose_count), dtype=np.float32)
+        frames = range(self._row_count, self._row_count + len(rows))
+        self._row_count += len(rows)
+        matrix, frames, malformed = _to_matrix(rows, frames, self._pose_count)
+        self._malformed.extend(malformed)
+        end = self._frame_count + len(matrix)
+        if end > len(self._weights):
+            weights = np.zeros((max(end, 2 * len(self._weights)), self._pose_count), dtype=np.float32)
+            weights[:self._frame_count] = self._weights[:self._frame_count]
+            self._weights = weights
+        self._weights[self._frame_count:end] = matrix
+        self._frame_rows.append(frames)
+        self._frame_count = end
+
+    def _finish(self):
+        self.close()
+        self.done = True
+        self._weights = self._weights[:self._frame_count]
+
+    def result(self):
+        '''Return the parsed MocapFileData (times are frame indices).'''
+        if not self.done:
+            raise MocapFileError(f'{self.path} is not parsed yet.')
+        if not self._frame_count:
+            raise MocapFileError(f'No valid frames found in {self.path}.')
+        warnings = []
+        header_names = self.header.get('facsNames')
+        if header_names:
+            order, missing, unknown = match_shape_columns(header_names, self.shape_names)
+            warnings = _header_warnings(missing, unknown)
+        else:
+            order = np.arange(len(self.shape_names))
+        times = np.concatenate(self._frame_rows).astype(np.float64)
+        values = self._weights
+        return MocapFileData(times, values, _select_shapes(values, order), self._malformed, warnings,
+                             row_name='frame')
+
+
+def _parse_json_fragment(text):
+    '''Parse the members of a JSON object fragment (the text around weightMat) into a dict.'''
+    text = text.strip().lstrip('{').rstrip('}').strip().strip(',')
+    try:
+        return json.loads('{' + text + '}')
+    except ValueError:
+        return {}
+
+
+def read_a2f_header(path, read_size=A2F_READ_SIZE):
+    '''Return the members of an Audio2Face JSON export that precede weightMat (exportFps, numPoses, ...).
+    Raises MocapFileError if the file has no weightMat.'''
+    text = ''
+    with open(path, 'r') as f:
+        while True:
+            chunk = f.read(read_size)
+            text += chunk
+            key = text.find(A2F_WEIGHTS_KEY)
+            if key >= 0:
+                return _parse_json_fragment(text[:key])
+            if not chunk:
+                raise MocapFileError(f'No weightMat found in {path}.')
+
+
+def parse_a2f_file(path, shape_names):
+    '''Parse an Audio2Face JSON export. times are frame indices, values the weight matrix.
+    @shape_names: the expected blendshape names, compared with the facsNames of the file.
+    '''
+    parser = A2FStreamParser(path, shape_names)
+    try:
+        while not parser.done:
+            parser.step()
+    finally:
+        parser.close()
+    return parser.result()
+
+
+def _is_number(text):
+    try:
+        float(text)
+    except ValueError:
+        return False
+    return True
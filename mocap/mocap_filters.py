@@ -0,0 +1,48 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Filters of the mocap import settings
+SMOOTH_FILTERS = ('SMA', 'MEDIAN', 'GAUSSIAN')
+# Standard deviation (frames) of the gaussian filter
+GAUSSIAN_SIGMA = 2
+# The signal is extended with its first / last value at the borders, for every filter and take length.
+EDGE_MODE = 'edge'
+
+
+def _pad_time_axis(values, window):
+    '''Extend the time axis (0) so that a window centered like np.convolve(mode='same') fits every frame.'''
+    pad_width = [(window // 2, (window - 1) // 2)] + [(0, 0)] * (values.ndim - 1)
+    return np.pad(values, pad_width, mode=EDGE_MODE)
+
+
+def gaussian_kernel(size, sigma=GAUSSIAN_SIGMA):
+    '''Returns a 1D Gaussian kernel of size samples, normalized to a sum of 1.'''
+    x = np.arange(size) - (size - 1) / 2
+    g = np.exp(-x**2 / (2 * sigma**2))
+    return g / g.sum()
+
+
+def filter_channels(values, smooth_filter='SMA', window=3, sigma=GAUSSIAN_SIGMA):
+    '''Smooth all channels of an animation along the time axis in one vectorized call.
+    @values: (frames,) or (frames x channels) values.
+    @smooth_filter: SMA (moving average), MEDIAN or GAUSSIAN.
+    @window: the number of frames in the filter window.
+    @sigma: the standard deviation of the gaussian filter in frames.
+    Returns a new float64 array with the shape of values.
+    '''
+    if smooth_filter not in SMOOTH_FILTERS:
+        raise ValueError(f'Unknown filter {smooth_filter}.')
+    values = np.asarray(values, dtype=np.float64)
+    window = int(window)
+    if window <= 1 or not len(values):
+        return values.copy()
+    padded = _pad_time_axis(values, window)
+    if smooth_filter == 'SMA':
+        # Running sums, O(1) per frame for any window size.
+        sums = np.cumsum(padded, axis=0)
+        sums = np.concatenate((np.zeros_like(sums[:1]), sums))
+        return (sums[window:] - sums[:-window]) / window
+    windows = sliding_window_view(padded, window, axis=0)
+    if smooth_filter == 'MEDIAN':
+        return np.median(windows, axis=-1)
+    return windows @ gaussian_kernel(window, sigma)
@@ -1,11 +1,17 @@
-from collections import deque
+from math import pi
 import bpy
-import csv
-import json
+import numpy as np
 
 from .mocap_base import MocapBase
+from .live_target_plan import LiveTargetPlan
+from .live_timing import resample_to_frame_grid, select_frame_times
+from .live_buffer import (EYE_L, EYE_R, FLAG_EYE_L, FLAG_EYE_R, FLAG_HEAD_LOC, FLAG_HEAD_ROT, FLAG_SHAPES, HEAD_LOC,
+                          HEAD_ROT, NUM_CHANNELS, NUM_SHAPES, SHAPES, JitterBuffer, flags_to_channel_mask)
+from .live_filters import FilterBank
+from .mocap_file_parsers import (EPIC_TRANSFORM_COLUMNS, MocapFileData, parse_a2f_file, parse_epic_file,
+                                 parse_face_cap_file)
+from .mocap_parse_cache import parse_cached
 from ..core.faceit_data import get_face_cap_shape_data, get_epic_shape_data, get_a2f_shape_data
-from ..core.shape_key_utils import set_slider_max
 
 
 class FaceCapImporter(MocapBase):
@@ -17,30 +23,30 @@ class FaceCapImporter(MocapBase):
 
     def parse_animation_data(self, data, frame_start=0, record_frame_rate=1000):
         self.clear_animation_data()
-        with open(data) as csvfile:
-            reader = csv.reader(csvfile)
-            for row in reader:
-                if not row:
-                    continue
-                if row[0] != 'k':
-                    continue
-                # Nano seconds since last frame
-                current_frame = frame_start + (float(row[1]) / record_frame_rate) * self.fps
-                self.animation_timestamps.append(current_frame)
-                if self.animate_head_rotation:
-                    self.head_rot_animation_lists.append([float(v) for v in row[5:8]])
-                if self.animate_head_location:
-                    self.head_loc_animation_lists.append([float(v) for v in row[2:5]])
-                # Eyes Motion
-                if self.animate_eye_bones:
-                    self.eye_L_animation_lists.append([float(row[8]), float(row[9]), 0.0])
-                    self.eye_R_animation_lists.append([float(row[10]), float(row[11]), 0.0])
-                # Blendshapes Motion
-                if self.animate_shapes:
-                    self.sk_animation_lists.append([float(v) for v in row[12:]])
+        # The bs header holds the Face Cap names (browDown_L), accept the ARKit names too.
+        if isinstance(data, MocapFileData):
+            # Parsed by the batch import workers.
+            take = data
+        else:
+            shape_names = [(name, shape_data['name']) for name, shape_data in get_face_cap_shape_data().items()]
+            take = parse_cached(parse_face_cap_file, data, shape_names, cache=self.parse_cache)
+        self.parse_report = take.report()
+        # Milliseconds since the start of the recording
+        self.animation_timestamps = frame_start + (take.times / record_frame_rate) * self.fps
+        if self.animate_head_rotation:
+            self.head_rot_animation_lists = take.values[:, 3:6]
+        if self.animate_head_location:
+            self.head_loc_animation_lists = take.values[:, 0:3]
+        # Eyes Motion
+        if self.animate_eye_bones:
+            self.eye_L_animation_lists = _pad_eye_rotation(take.values[:, 6:8])
+            self.eye_R_animation_lists = _pad_eye_rotation(take.values[:, 8:10])
+        # Blendshapes Motion
+        if self.animate_shapes:
+            self.sk_animation_lists = take.shape_values
 
         # initialize the first frame location offset
-        if self.animate_head_location and self.head_loc_animation_lists:
+        if self.animate_head_location and len(self.head_loc_animation_lists):
             self._get_initial_location_offset(self.head_loc_animation_lists[0])
 
 
@@ -53,12 +59,15 @@ class A2FMocapImporter(MocapBase):
     def parse_animation_data(self, data, frame_start=0, record_frame_rate=60):
         self.clear_animation_data()
         if self.animate_shapes:
-            with open(data, 'r') as f:
-                data = json.load(f)
-                for i, shape_key_values in enumerate(data['weightMat']):
-                    current_frame = frame_start + i * self.fps / record_frame_rate
-                    self.animation_timestamps.append(current_frame)
-                    self.sk_animation_lists.append([float(v) for v in shape_key_values])
+            if isinstance(data, MocapFileData):
+                # Streamed by the modal import operator or parsed by the batch import workers.
+                take = data
+            else:
+                # The source shape reference is set by the operator (A2F or ARKit solver).
+                take = parse_cached(parse_a2f_file, data, self.source_shape_reference, cache=self.parse_cache)
+            self.parse_report = take.report()
+            self.animation_timestamps = frame_start + take.times * self.fps / record_frame_rate
+            self.sk_animation_lists = take.shape_values
 
 
 class EpicMocapImporter(MocapBase):
@@ -70,164 +79,114 @@ class EpicMocapImporter(MocapBase):
 
     def parse_animation_data(self, data, frame_start=0, record_frame_rate=60):
         self.clear_animation_data()
-        first_frame = None
-        with open(data) as csvfile:
-            reader = csv.reader(csvfile)
-            for i, row in enumerate(reader):
-                if not row:
-                    continue
-                if i == 0:
-                    continue
-                if float(row[1]) == 0:
-                    # No values in this frame
-                    continue
-                if first_frame is None:
-                    first_frame = self._convert_timecode_to_frames(
-                        row[0], self.fps, recorded_framerate=record_frame_rate) - frame_start
-                self.animation_timestamps.append(self._convert_timecode_to_frames(
-                    row[0], self.fps, recorded_framerate=record_frame_rate) - first_frame)
-
-                # Blendshapes Motion
-                if self.animate_shapes:
-                    self.sk_animation_lists.append([float(v) for v in row[2:54]])
-                # Head Motion
-                if self.animate_head_rotation:
-                    head_rot = []
-                    # bring to face cap compatible format.
-                    head_rot.append(-float(row[55]))
-                    head_rot.append(-float(row[54]))
-                    head_rot.append(-float(row[56]))
-                    self.head_rot_animation_lists.append(head_rot)
-                # Eyes Motion
-                if self.animate_eye_bones:
-                    eye_L_rot = []
-                    eye_L_rot.append(float(row[58]))
-                    eye_L_rot.append(float(row[57]))
-                    eye_L_rot.append(0.0)
-                    self.eye_L_animation_lists.append(eye_L_rot)
-                    eye_R_rot = []
-                    eye_R_rot.append(float(row[61]))
-                    eye_R_rot.append(float(row[60]))
-                    eye_R_rot.append(0.0)
-                    self.eye_R_animation_lists.append(eye_R_rot)
-                    # self.eye_L_animation_lists.append([float(v) for v in row[57:60]])
-                    # self.eye_R_animation_lists.append([float(v) for v in row[60:63]])
-
-    def _convert_timecode_to_frames(self, timecode, framerate, start=None, recorded_framerate=60):
-        '''This function converts an SMPTE timecode into frames
-        @timecode [str]: format hh:mm:ss:ff
-        @start [str]: optional timecode to start at
-        '''
-        def _seconds(value):
-            '''convert value to seconds
-            @value [str, int, float]: either timecode or frames
-            '''
-            if isinstance(value, str):  # value seems to be a timestamp
-                _zip_ft = zip((3600, 60, 1, 1 / recorded_framerate), value.split(':'))
-                return sum(f * float(t) for f, t in _zip_ft)
-            elif isinstance(value, (int, float)):  # frames
-                return value / framerate
-            else:
-                return 0
-
-        def _frames(seconds):
-            '''convert seconds to frames
-            @seconds [int]: the number of seconds
-            '''
-            return seconds * framerate
-
-        return _frames(_seconds(timecode) - _seconds(start))
-
-
-class SmoothedValue:
-    def __init__(self, window_size):
-        self.window_size = window_size
-        self.values = deque(maxlen=window_size)
+        if isinstance(data, MocapFileData):
+            # Parsed by the batch import workers.
+            take = data
+        else:
+            take = parse_cached(parse_epic_file, data, self.source_shape_reference,
+                                record_frame_rate=record_frame_rate, cache=self.parse_cache)
+        self.parse_report = take.report()
+        # Timecodes to scene frames, starting at frame_start.
+        frames = take.times * self.fps
+        self.animation_timestamps = frames - frames[0] + frame_start
+        # Blendshapes Motion
+        if self.animate_shapes:
+            self.sk_animation_lists = take.shape_values
+        transforms = take.values[:, -EPIC_TRANSFORM_COLUMNS:]
+        # Head Motion
+        if self.animate_head_rotation:
+            # bring to face cap compatible format (pitch, yaw, roll).
+            self.head_rot_animation_lists = -transforms[:, [1, 0, 2]]
+        # Eyes Motion
+        if self.animate_eye_bones:
+            self.eye_L_animation_lists = _pad_eye_rotation(transforms[:, [4, 3]])
+            self.eye_R_animation_lists = _pad_eye_rotation(transforms[:, [7, 6]])
 
-    def add_value(self, value):
-        self.values.append(value)
-        return self.get_smoothed_value()
 
-    def get_smoothed_value(self):
-        if self.values:
-            return sum(self.values) / len(self.values)
-        return 0.0  # or some default value if no data has been added yet
+def _pad_eye_rotation(values):
+    '''Return the (pitch, yaw) eye rotations as (frames x 3) with a zero roll.'''
+    eye_rotation = np.zeros((len(values), 3), dtype=np.float32)
+    eye_rotation[:, :2] = values
+    return eye_rotation
 
 
 class LiveAnimator(MocapBase):
     '''Animate the target values live and populate animations from recorded data.'''
-    smoothing_windows = {}
+    live_target_plan = LiveTargetPlan()
+    smooth_shape_indices = []
+    jitter_buffer = None
+    # Live smoothing of all channels, see compile_live_filters.
+    filter_bank = None
+    # Filter imported takes with the filter bank, so that the keyframes match the live preview.
+    apply_live_filter = False
 
     def init_new_recording(self):
-        self.smoothing_windows = {}
+        self.live_target_plan = LiveTargetPlan()
+        self.smooth_shape_indices = []
+        self.filter_bank = None
+        if self.jitter_buffer is not None:
+            self.jitter_buffer.clear()
         self.initial_location_offset = None
         self.head_bone = None
         self.head_action = None
         self.head_obj = None
 
-    def process_data(self, data):
-        _timestamp, address, params = data
-        if (self.animate_shapes or self.animate_eye_shapes) and address == '/W':
-            value = params[1]
-            name = self.source_shape_reference[params[0]]
-            if self.use_smoothing_face and name in self.smooth_shape_names:
-                smoothed_value_obj = self.smoothing_windows.setdefault(
-                    name, SmoothedValue(window_size=self.smooth_window_face))
-                value = smoothed_value_obj.add_value(value)
-            self._set_shape_key_values(name, value)
-        elif self.animate_head_rotation and address == '/HR':  # head rotation.
-            if self.use_smoothing_head:
-                smoothed_values = []
-                for i, value in enumerate(params):
-                    smoothed_value_obj = self.smoothing_windows.setdefault(
-                        address + str(i), SmoothedValue(window_size=self.smooth_window_head))
-                    smoothed_value = smoothed_value_obj.add_value(value)
-                    smoothed_values.append(smoothed_value)
-                params = smoothed_values
-            self._set_head_rotation(params)
-        elif self.animate_head_location and address == '/HT':  # Head translation.
+    def set_jitter_buffer(self, use_jitter_buffer, latency=0.05):
+        '''Play the live frames back with a constant latency (seconds) and interpolate between them.'''
+        if use_jitter_buffer:
+            self.jitter_buffer = JitterBuffer(latency=latency)
+        else:
+            self.jitter_buffer = None
+
+    def process_frame(self, timestamp, values, flags):
+        '''Apply a live frame (see live_buffer channel layout) to the animation targets.'''
+        if self.filter_bank:
+            values = self.filter_bank.update(values, timestamp, flags_to_channel_mask(flags))
+        if (self.animate_shapes or self.animate_eye_shapes) and flags & FLAG_SHAPES and self.live_target_plan:
+            self.live_target_plan.apply(values[SHAPES])
+        if self.animate_head_rotation and flags & FLAG_HEAD_ROT:  # head rotation.
+            self._set_head_rotation(values[HEAD_ROT].tolist())
+        if self.animate_head_location and flags & FLAG_HEAD_LOC:  # Head translation.
+            params = values[HEAD_LOC].tolist()
             if not self.initial_location_offset:
                 self._get_initial_location_offset(params)
-            if self.use_smoothing_head:
-                smoothed_values = []
-                for i, value in enumerate(params):
-                    smoothed_value_obj = self.smoothing_windows.setdefault(
-                        address + str(i), SmoothedValue(window_size=self.smooth_window_head))
-                    smoothed_value = smoothed_value_obj.add_value(value)
-                    smoothed_values.append(smoothed_value)
-                params = smoothed_values
             self._set_head_location(params)
-        elif self.animate_eye_bones and address == '/ELR':
-            if self.use_smoothing_eye_bones:
-                smoothed_values = []
-                for i, value in enumerate(params):
-                    smoothed_value_obj = self.smoothing_windows.setdefault(
-                        address + str(i), SmoothedValue(window_size=self.smooth_window_eye_bones))
-                    smoothed_value = smoothed_value_obj.add_value(value)
-                    smoothed_values.append(smoothed_value)
-                params = smoothed_values
-            self._set_eye_L_rotation(params)
-        elif self.animate_eye_bones and address == '/ERR':
-            if self.use_smoothing_eye_bones:
-                smoothed_values = []
-                for i, value in enumerate(params):
-                    smoothed_value_obj = self.smoothing_windows.setdefault(
-                        address + str(i), SmoothedValue(window_size=self.smooth_window_eye_bones))
-                    smoothed_value = smoothed_value_obj.add_value(value)
-                    smoothed_values.append(smoothed_value)
-                params = smoothed_values
-            self._set_eye_R_rotation(params)
-
-    def _set_shape_key_values(self, name, value):
-        '''Animate the specified shape key on all registered objects'''
-        target_shapes = self.target_shapes_dict[name]
-        amplify = self.retarget_shapes[name].amplify
-        for sk in target_shapes:
-            val = value * amplify
-            # if self.dynamic_sk_ranges:
-            #     set_slider_max(sk, val)
-            # set_slider_min(sk, )
-            sk.value = val
+        if self.animate_eye_bones and flags & FLAG_EYE_L:
+            self._set_eye_L_rotation(values[EYE_L].tolist())
+        if self.animate_eye_bones and flags & FLAG_EYE_R:
+            self._set_eye_R_rotation(values[EYE_R].tolist())
+
+    def compile_live_filters(self, filter_type='SMA', min_cutoff=1.0, beta=0.0):
+        '''Build the filter bank from the smoothing settings. Call after compile_live_target_plan.
+        @filter_type: SMA, EMA or ONE_EURO. The smooth windows set the SMA window and the equivalent EMA factor.
+        @min_cutoff, beta: One-Euro parameters. beta is given for shape values (0-1), rotations in degrees
+        and locations use a scaled beta.
+        '''
+        filter_bank = FilterBank(NUM_CHANNELS)
+        rotation_scale = 180 / pi if self.source_rotation_units == 'DEG' else 1.0
+        if self.use_smoothing_face and self.smooth_shape_indices:
+            filter_bank.set_filter(
+                self.smooth_shape_indices, filter_type, window=self.smooth_window_face,
+                min_cutoff=min_cutoff, beta=beta)
+        if self.use_smoothing_head:
+            filter_bank.set_filter(
+                HEAD_ROT, filter_type, window=self.smooth_window_head, min_cutoff=min_cutoff,
+                beta=beta / rotation_scale)
+            filter_bank.set_filter(
+                HEAD_LOC, filter_type, window=self.smooth_window_head, min_cutoff=min_cutoff, beta=beta)
+        if self.use_smoothing_eye_bones:
+            for channels in (EYE_L, EYE_R):
+                filter_bank.set_filter(
+                    channels, filter_type, window=self.smooth_window_eye_bones, min_cutoff=min_cutoff,
+                    beta=beta / rotation_scale)
+        self.filter_bank = filter_bank if filter_bank else None
+
+    def compile_live_target_plan(self):
+        '''Precompile the shape key targets for the live session. Call after set_shape_targets.'''
+        source_shape_reference = self.source_shape_reference[:NUM_SHAPES]
+        self.live_target_plan.compile(source_shape_reference, self.target_shapes_dict, self.retarget_shapes)
+        smooth_shape_names = set(self.smooth_shape_names)
+        self.smooth_shape_indices = [i for i, name in enumerate(source_shape_reference) if name in smooth_shape_names]
 
     def _set_head_rotation(self, value):
         obj = self.head_obj
@@ -270,67 +229,25 @@ class LiveAnimator(MocapBase):
                 setattr(obj_R, self.eye_R_rotation_data_path, new_rot)
 
     def parse_animation_data(self, data, frame_start=0, record_frame_rate=1000):
-        '''Parse the recorded messages into readable animation data'''
+        '''Parse the recorded frames (FrameRingBuffer or TakeFile) into readable animation data.
+        The take is resampled to a (frames x channels) matrix in one pass, the animation lists are views into it.'''
         if not data:
             return
         self.clear_animation_data()
-
-        shape_key_values = []
-        timestamp = None
-        first_timestamp = None
-
-        shape_idx = 0
-        last_shape_idx = 0
-        frame_number = 0
-        missing_frames = []
-
-        # Collect shape data and timestamps
-        for i, frame_data in enumerate(data):
-            _time, _address, _value = frame_data
-            if first_timestamp is None:
-                first_timestamp = _time
-            if _address == "/W":
-                shape_idx = _value[0]
-                if shape_idx < last_shape_idx:
-                    # New Frame
-                    if len(shape_key_values) == 52:
-                        self.animation_timestamps.append(timestamp)
-                        self.sk_animation_lists.append([v[1] for v in shape_key_values])
-                    else:
-                        missing_frames.append(frame_number)
-                        print(f"frame {frame_number} not complete. Found only {len(shape_key_values)} expression values.")
-
-                    timestamp = None
-                    shape_key_values = []
-
-            if timestamp is None:
-                timestamp = (_time - first_timestamp) * self.fps + frame_start
-            if _address == "/W":
-                shape_key_values.append(_value)
-            if _address in ("/ELR", "/ERR"):
-                if len(_value) < 3:
-                    _value.append(0.0)
-
-            frame_number += 1
-            last_shape_idx = shape_idx
-
-        hr = [x[2] for x in data if x[1] == "/HR"]
-        ht = [x[2] for x in data if x[1] == "/HT"]
-        elr = [x[2] for x in data if x[1] == "/ELR"]
-        err = [x[2] for x in data if x[1] == "/ERR"]
-
-        self.head_rot_animation_lists = [x for i, x in enumerate(hr) if i not in missing_frames]
-        self.head_loc_animation_lists = [x for i, x in enumerate(ht) if i not in missing_frames]
-        self.eye_L_animation_lists = [x for i, x in enumerate(elr) if i not in missing_frames]
-        self.eye_R_animation_lists = [x for i, x in enumerate(err) if i not in missing_frames]
-
-        # print(len(self.animation_timestamps))
-        # print(len(self.eye_L_animation_lists))
-        # print(len(self.eye_R_animation_lists))
-        # print(len(self.head_rot_animation_lists))
-        # print(len(self.head_loc_animation_lists))
-        # self.left_eye_rot_animation_lists = [x[2] for x in data if x[1] == "/ELL"]
-        # self.right_eye_rot_animation_lists = [x[2] for x in data if x[1] == "/ELR"]
+        timestamps, values, flags = data.snapshot()
+        # Prefer the device clock, the receive times include network and scheduling delays.
+        timestamps = select_frame_times(timestamps, data.snapshot_device_timestamps())
+        if self.apply_live_filter and self.filter_bank:
+            values = self.filter_bank.filter_take(timestamps, values, flags)
+        # Channels that start late or end early hold their first / last value instead of jumping to zero.
+        frames, values, _flags = resample_to_frame_grid(
+            timestamps, values, flags, self.fps, frame_start, hold_edges=True)
+        self.animation_timestamps = frames
+        self.sk_animation_lists = values[:, SHAPES]
+        self.head_rot_animation_lists = values[:, HEAD_ROT]
+        self.head_loc_animation_lists = values[:, HEAD_LOC]
+        self.eye_L_animation_lists = values[:, EYE_L]
+        self.eye_R_animation_lists = values[:, EYE_R]
 
     @ staticmethod
     def _get_mean_timestamp(timestamps):
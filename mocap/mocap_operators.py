@@ -1,6 +1,7 @@
 import csv
-import json
 import os
+import time
+import zipfile
 from bpy_extras.io_utils import ImportHelper
 from .mocap_importers import A2FMocapImporter, FaceCapImporter, EpicMocapImporter
 from .mocap_base import MocapImporterBase
@@ -9,13 +10,25 @@ from ..core import retarget_list_utils as rutils
 from ..core import faceit_utils as futils
 from ..core import faceit_data as fdata
 from ..core.retarget_list_base import FaceRegionsBaseProperties
+from ..ctrl_rig import control_rig_utils as ctrl_utils
+from ..ctrl_rig.control_rig_animation_operators import CRIG_ACTION_SUFFIX
 import bpy
-from bpy.props import BoolProperty, EnumProperty, IntProperty, FloatProperty
+from bpy.props import BoolProperty, EnumProperty, IntProperty, FloatProperty, StringProperty
 from mathutils import Matrix
-from .mocap_utils import add_zero_keyframe, remove_frame_range
+from .mocap_utils import add_zero_keyframe, get_mocap_cache_directory, remove_frame_range
+from .mocap_parse_cache import ParseCache, parser_cache_key
+from .mocap_file_parsers import A2FStreamParser, MocapFileError, parse_a2f_file, read_a2f_header
+from .mocap_batch import (BATCH_FILE_EXTENSIONS, DEFAULT_RECORD_FRAME_RATES, BatchRunner, batch_action_names,
+                          format_batch_report, scan_take_files)
 from .osc_operators import get_head_base_transform
 
 
+# Seconds of parsing per timer event of the modal Audio2Face import.
+A2F_MODAL_STEP_TIME = 0.05
+# Interval of the timer that collects the batch import results.
+BATCH_MODAL_TIMER_INTERVAL = 0.1
+
+
 class FACEIT_OT_ResetExpressionValues(bpy.types.Operator):
     '''Reset all expression values to 0'''
     bl_idname = 'faceit.reset_expression_values'
@@ -122,6 +135,12 @@ class FACEIT_OT_ImportA2FMocap(MocapImporterBase, bpy.types.Operator):
     bl_idname = 'faceit.import_a2f_mocap'
     bl_label = 'Import Nvidia Audio2Face JSON'
 
+    # Set by the modal weightMat reader (see execute)
+    _parsed_take = None
+    _stream_parser = None
+    _cache_key = None
+    _timer = None
+
     a2f_solver: EnumProperty(
         name='Solver',
         items=(
@@ -148,6 +167,355 @@ class FACEIT_OT_ImportA2FMocap(MocapImporterBase, bpy.types.Operator):
     def _get_mocap_importer(self):
         return A2FMocapImporter()
 
+    def _get_source_shape_names(self):
+        if self.a2f_solver == 'A2F':
+            return list(fdata.get_a2f_shape_data().keys())
+        return list(fdata.get_arkit_shape_data().keys())
+
+    def _get_raw_animation_data(self):
+        if self._parsed_take is not None:
+            return self._parsed_take
+        return super()._get_raw_animation_data()
+
+    def execute(self, context):
+        '''Stream the weightMat in a modal loop (progress, Esc cancels), then import the parsed take.'''
+        if self._parsed_take is not None or not self.animate_shapes:
+            return super().execute(context)
+        filename = self.engine_settings.filename
+        shape_names = self._get_source_shape_names()
+        cache = self._get_parse_cache()
+        if cache is not None:
+            self._cache_key = parser_cache_key(parse_a2f_file, filename, shape_names)
+            self._parsed_take = cache.load(self._cache_key)
+            if self._parsed_take is not None:
+                return super().execute(context)
+        try:
+            self._stream_parser = A2FStreamParser(filename, shape_names)
+        except OSError as e:
+            self.report({'ERROR'}, f"Failed to read the mocap file: {e}")
+            return {'CANCELLED'}
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(0.01, window=context.window)
+        wm.progress_begin(0, 100)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self._end_stream(context)
+            self.report({'WARNING'}, "Audio2Face import cancelled.")
+            return {'CANCELLED'}
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+        parser = self._stream_parser
+        start = time.perf_counter()
+        try:
+            while not parser.done and time.perf_counter() - start < A2F_MODAL_STEP_TIME:
+                parser.step()
+            take = parser.result() if parser.done else None
+        except (MocapFileError, OSError) as e:
+            self._end_stream(context)
+            self.report({'ERROR'}, f"Failed to read the mocap file: {e}")
+            return {'CANCELLED'}
+        if take is None:
+            context.window_manager.progress_update(int(parser.progress * 100))
+            context.workspace.status_text_set(f"Reading Audio2Face JSON: {parser.progress:.0%} (Esc to cancel)")
+            return {'RUNNING_MODAL'}
+        self._end_stream(context)
+        cache = self._get_parse_cache()
+        if cache is not None:
+            try:
+                cache.store(self._cache_key, take)
+            except OSError as e:
+                print(f'Could not write the mocap cache file: {e}')
+        self._parsed_take = take
+        return super().execute(context)
+
+    def _end_stream(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        context.workspace.status_text_set(None)
+        self._stream_parser.close()
+
+
+class FACEIT_OT_BatchImportMocap(MocapImporterBase, bpy.types.Operator):
+    '''Import all recorded takes in a folder as new shape key actions. The files are parsed and smoothed in background processes'''
+    bl_idname = 'faceit.batch_import_mocap'
+    bl_label = 'Batch Import Folder'
+
+    # Set by the modal batch import (see execute)
+    _runner = None
+    _action_names = None
+    _pending = None
+    _results = None
+    _skipped = 0
+    _parsed_take = None
+    _use_control_rig = False
+    _start_time = 0.0
+    _timer = None
+    # The Audio2Face solver of the current take, read from the file by the workers.
+    a2f_solver = None
+
+    directory: StringProperty(
+        name='Folder',
+        subtype='DIR_PATH',
+        options={'SKIP_SAVE'},
+    )
+    engine: EnumProperty(
+        name='Format',
+        items=(
+            ('FACECAP', 'Face Cap TXT', 'Import the TXT files generated by the Face Cap app.'),
+            ('EPIC', 'Live Link Face CSV', 'Import the CSV files generated by the Live Link Face app.'),
+            ('A2F', 'Audio2Face JSON', 'Import the JSON files generated by Audio2Face.'),
+        ),
+        default='FACECAP',
+    )
+    include_subfolders: BoolProperty(
+        name='Include Subfolders',
+        default=False,
+        description='Import the takes in subfolders too. The subfolder names are part of the action names.',
+    )
+    action_prefix: StringProperty(
+        name='Action Prefix',
+        default='',
+        description='Prefix for the action names. The action names are the file paths relative to the folder.',
+    )
+    skip_existing_actions: BoolProperty(
+        name='Skip Existing Actions',
+        default=False,
+        description='Skip the takes with an existing action. Otherwise the existing actions are replaced.',
+    )
+    process_count: IntProperty(
+        name='Processes',
+        default=0,
+        min=0,
+        max=64,
+        description='Number of background processes that parse the takes. 0 uses all cores but one.',
+    )
+
+    def __init__(self):
+        super().__init__()
+        self.target_shapes_prop_name = "faceit_arkit_retarget_shapes"
+        self.can_import_head_location = False
+        self.can_import_head_rotation = False
+        self.can_import_eye_transforms = False
+
+    def _get_mocap_importer(self):
+        if self.engine == 'EPIC':
+            mocap_importer = EpicMocapImporter()
+        elif self.engine == 'A2F':
+            mocap_importer = A2FMocapImporter()
+        else:
+            mocap_importer = FaceCapImporter()
+        mocap_importer.shapes_prefiltered = True
+        return mocap_importer
+
+    def _get_raw_animation_data(self):
+        if self._parsed_take is not None:
+            return self._parsed_take
+        return self.directory
+
+    def _get_source_shape_names(self):
+        '''The shape names for the workers, Audio2Face takes pick a solver from the file.'''
+        if self.engine == 'FACECAP':
+            return [(name, shape_data['name']) for name, shape_data in fdata.get_face_cap_shape_data().items()]
+        if self.engine == 'EPIC':
+            return list(fdata.get_epic_shape_data().keys())
+        return {
+            'A2F': list(fdata.get_a2f_shape_data().keys()),
+            'ARKIT': list(fdata.get_arkit_shape_data().keys()),
+        }
+
+    def _get_shape_smoothing(self, scene):
+        '''The filter and window per shape name, applied by the workers (see MocapBase.recording_to_keyframes).'''
+        smoothing = {}
+        smooth_regions = self.smooth_regions.get_active_regions()
+        target_shapes_prop_names = ["faceit_arkit_retarget_shapes"]
+        if self.engine == 'A2F':
+            target_shapes_prop_names.append("faceit_a2f_retarget_shapes")
+        for prop_name in target_shapes_prop_names:
+            for shape_item in getattr(scene, prop_name):
+                name = shape_item.name
+                if name.startswith('eyeLook') and self.smooth_eye_look_animation:
+                    smoothing[name] = (self.smoothing_filter_eye_bones, self.smooth_window_eye_bones)
+                elif self.use_smooth_face_filter and smooth_regions.get(shape_item.region.lower()):
+                    smoothing[name] = (self.smoothing_filter_face, self.smooth_window_face)
+        return smoothing
+
+    def invoke(self, context, event):
+        self.engine_name = self.engine
+        self._get_engine_specific_settings(context)
+        ctrl_rig = context.scene.faceit_control_armature
+        self.can_bake_control_rig = bool(ctrl_rig) and ctrl_utils.is_control_rig_connected(ctrl_rig)
+        if self.engine_settings.filename:
+            self.directory = os.path.dirname(self.engine_settings.filename)
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+    def draw(self, context):
+        layout = self.layout
+        col = layout.column(align=True)
+        col.label(text='Takes')
+        col.prop(self, 'engine', text='')
+        col.prop(self, 'include_subfolders', icon='FILE_FOLDER')
+        col.separator()
+        col.label(text='Action Settings')
+        col.prop(self, 'action_prefix', text='', icon='ACTION')
+        col.prop(self, 'skip_existing_actions', icon='FILE_TICK')
+        col.prop(self, 'frame_start', icon='CON_TRANSFORM')
+        col.prop(self, 'resample_method', text='')
+        col.separator()
+        col.label(text='Shapes Animation')
+        col.prop(self, 'animate_shapes', icon='BLANK1')
+        col.prop(self, 'animate_eye_rotation_shapes', text='Eye Look Shapes', icon='BLANK1')
+        if self.can_bake_control_rig and self.animate_shapes:
+            col.prop(self, 'bake_to_control_rig', icon='CON_ARMATURE')
+        col.prop(self, 'use_smooth_face_filter', text='Smooth Face', icon='MOD_SMOOTH')
+        if self.use_smooth_face_filter:
+            col.prop(self, 'smoothing_filter_face', text='')
+            col.prop(self, 'smooth_window_face')
+        col.prop(self, 'smooth_eye_look_animation', icon='MOD_SMOOTH')
+        if self.smooth_eye_look_animation:
+            col.prop(self, 'smoothing_filter_eye_bones', text='')
+            col.prop(self, 'smooth_window_eye_bones')
+        col.prop(self, 'use_keyframe_decimation', icon='IPO_LINEAR')
+        if self.use_keyframe_decimation:
+            col.prop(self, 'decimation_tolerance')
+        col.separator()
+        col.prop(self, 'process_count')
+
+    def execute(self, context):
+        '''Start the workers, the parsed takes are written to actions one per timer event (see modal).'''
+        if self._parsed_take is not None:
+            return super().execute(context)
+        self.engine_name = self.engine
+        self._get_engine_specific_settings(context)
+        # Head and eye transforms are keyed into the head / eye target actions, only shapes are batched.
+        self.animate_head_location = False
+        self.animate_head_rotation = False
+        self.animate_eye_rotation_bones = False
+        self.set_scene_frame_range = False
+        self.load_audio_file = False
+        self.overwrite_method = 'REPLACE'
+        if not (self.animate_shapes or self.animate_eye_rotation_shapes):
+            self.report({'ERROR'}, "You need to enable at least one type of motion!")
+            return {'CANCELLED'}
+        directory = bpy.path.abspath(self.directory)
+        if not os.path.isdir(directory):
+            self.report({'ERROR'}, f"The folder {directory} doesn't exist.")
+            return {'CANCELLED'}
+        paths = scan_take_files(directory, self.engine, recursive=self.include_subfolders)
+        if not paths:
+            self.report({'WARNING'}, f"No {BATCH_FILE_EXTENSIONS[self.engine]} files found in {directory}.")
+            return {'CANCELLED'}
+        self._use_control_rig = self.bake_to_control_rig and self.can_bake_control_rig
+        shape_names = self._get_source_shape_names()
+        smoothing = self._get_shape_smoothing(context.scene)
+        self._action_names = {}
+        self._pending = []
+        self._results = []
+        self._skipped = 0
+        jobs = []
+        action_suffix = CRIG_ACTION_SUFFIX if self._use_control_rig else ''
+        for index, (path, action_name) in enumerate(zip(paths, batch_action_names(directory, paths, self.action_prefix))):
+            if self.skip_existing_actions and action_name + action_suffix in bpy.data.actions:
+                self._skipped += 1
+                continue
+            self._action_names[index] = action_name
+            jobs.append({
+                'index': index,
+                'path': path,
+                'engine': self.engine,
+                'shape_names': shape_names,
+                'record_frame_rate': DEFAULT_RECORD_FRAME_RATES[self.engine],
+                'smoothing': smoothing,
+            })
+        if not jobs:
+            self.report({'INFO'}, f"All {self._skipped} takes have been imported already.")
+            return {'CANCELLED'}
+        self._start_time = time.perf_counter()
+        self._runner = BatchRunner(jobs, process_count=self.process_count, cache=self._get_parse_cache())
+        try:
+            self._runner.start()
+        except OSError as e:
+            self._runner.close()
+            self.report({'ERROR'}, f"Failed to start the batch import: {e}")
+            return {'CANCELLED'}
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(BATCH_MODAL_TIMER_INTERVAL, window=context.window)
+        wm.progress_begin(0, len(jobs))
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self._end_batch(context)
+            self._report_batch()
+            self.report({'WARNING'}, "Batch import cancelled.")
+            return {'CANCELLED'}
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+        if not self._pending:
+            self._pending.extend(self._runner.poll())
+        if self._pending:
+            # One take per timer event, the UI stays responsive.
+            self._import_result(context, self._pending.pop(0))
+        total = len(self._runner.jobs)
+        if len(self._results) < total:
+            context.window_manager.progress_update(len(self._results))
+            context.workspace.status_text_set(f"Batch import: {len(self._results)} of {total} takes (Esc to cancel)")
+            return {'RUNNING_MODAL'}
+        self._end_batch(context)
+        self._report_batch()
+        return {'FINISHED'}
+
+    def _import_result(self, context, result):
+        '''Write the action of a finished take.'''
+        result['action'] = self._action_names[result['index']]
+        self._results.append(result)
+        if result.get('error'):
+            return
+        start = time.perf_counter()
+        try:
+            self._parsed_take = self._runner.load_take(result)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+            result['error'] = f"Failed to load the parsed take: {e}"
+            return
+        self.new_action_name = result['action']
+        self.record_frame_rate = result['record_frame_rate']
+        self.a2f_solver = result.get('solver')
+        if self._use_control_rig:
+            # The 46 Audio2Face poses can't drive the control rig.
+            self.bake_to_control_rig = self.a2f_solver != 'A2F'
+        try:
+            state = super().execute(context)
+        finally:
+            self._parsed_take = None
+        result['write_time'] = time.perf_counter() - start
+        if 'FINISHED' not in state:
+            result['error'] = "Failed to write the action, see the reports."
+        else:
+            result['keyframes'], result['recorded_keyframes'] = self.keyframe_counts
+
+    def _end_batch(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        context.workspace.status_text_set(None)
+        self._runner.close()
+
+    def _report_batch(self):
+        summary, lines = format_batch_report(
+            self._results, time.perf_counter() - self._start_time, self._runner.process_count, skipped=self._skipped)
+        print(summary)
+        print('\n'.join(lines))
+        failed = [result['action'] for result in self._results if result.get('error')]
+        if failed:
+            self.report({'WARNING'}, f"{summary} Failed: {', '.join(failed)}. See the console for details.")
+        else:
+            self.report({'INFO'}, summary)
+
 
 class FACEIT_OT_AddZeroKeyframe(FaceRegionsBaseProperties, bpy.types.Operator):
     '''Add a 0.0 keyframe for all target shapes in the specified list(s)'''
@@ -603,19 +971,19 @@ class FACEIT_OT_LoadAudio2FaceJSONFile(bpy.types.Operator, FACEIT_OT_MotionFileI
     engine_settings = None
 
     def execute(self, context):
-        with open(self.filepath, 'r') as f:
-            data = json.load(f)
-            if not data.get("weightMat"):
-                self.report({'ERROR'}, "The specified file is not valid.")
-                return {'CANCELLED'}
-            if self.auto_load_audio:
-                audio_path = ''
-                audio_path = data.get("trackPath")
-                if audio_path:
-                    if os.path.isfile(audio_path):
-                        self.engine_settings.audio_filename = audio_path
-                    else:
-                        self.report({'WARNING'}, "Couldn't find a valid audio file.")
+        try:
+            data = read_a2f_header(self.filepath)
+        except (MocapFileError, OSError):
+            self.report({'ERROR'}, "The specified file is not valid.")
+            return {'CANCELLED'}
+        if self.auto_load_audio:
+            audio_path = ''
+            audio_path = data.get("trackPath")
+            if audio_path:
+                if os.path.isfile(audio_path):
+                    self.engine_settings.audio_filename = audio_path
+                else:
+                    self.report({'WARNING'}, "Couldn't find a valid audio file.")
         self.engine_settings.filename = self.filepath
         # Update UI
         for region in context.area.regions:
@@ -726,6 +1094,24 @@ class FACEIT_OT_ClearMotionFile(bpy.types.Operator):
         return {'FINISHED'}
 
 
+class FACEIT_OT_ClearMocapParseCache(bpy.types.Operator):
+    '''Remove all cached mocap files. The next import parses the files again'''
+    bl_idname = 'faceit.clear_mocap_parse_cache'
+    bl_label = 'Clear Mocap Cache'
+    bl_options = {'INTERNAL'}
+
+    def execute(self, context):
+        directories = {get_mocap_cache_directory('USER'), get_mocap_cache_directory('BLEND')}
+        count = 0
+        size = 0
+        for directory in directories:
+            removed_count, removed_size = ParseCache(directory).clear()
+            count += removed_count
+            size += removed_size
+        self.report({'INFO'}, f"Removed {count} cached mocap files ({size / 1024 ** 2:.1f} MB).")
+        return {'FINISHED'}
+
+
 class FACEIT_OT_DisableEyeLookShapeKeysFromSelectedObjects(bpy.types.Operator):
     bl_idname = 'faceit.disable_eye_look_shape_keys_from_selected_objects'
     bl_label = 'Disable Eye Look Shape Keys'
@@ -0,0 +1,204 @@
+import hashlib
+import os
+import zipfile
+
+import numpy as np
+
+from .mocap_file_parsers import PARSER_VERSION, MocapFileData
+
+# Parsed takes are cached in <blend directory>/faceit_mocap_cache or in the user data directory.
+CACHE_DIR_NAME = 'faceit_mocap_cache'
+CACHE_FILE_EXTENSION = '.npz'
+# Default size limit of the cache directory (bytes), the least recently used takes are removed first.
+DEFAULT_CACHE_SIZE = 512 * 1024 ** 2
+HASH_CHUNK_SIZE = 1024 ** 2
+
+
+def file_content_hash(path):
+    '''Return the hex digest of the file content.'''
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_cache_key(path, parser_name, *params):
+    '''The cache key of a parsed file: content hash, parser name and version and the parse parameters.'''
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f'{parser_name}:{PARSER_VERSION}:{params!r}:'.encode())
+    digest.update(file_content_hash(path).encode())
+    return digest.hexdigest()
+
+
+def _shape_column(take):
+    '''Return the first column of take.values that shape_values is a view of, or None if it is a copy.'''
+    values = take.values
+    shape_values = take.shape_values
+    if (shape_values.dtype != values.dtype or shape_values.strides != values.strides
+            or len(shape_values) != len(values) or not np.shares_memory(shape_values, values)):
+        return None
+    offset = shape_values.__array_interface__['data'][0] - values.__array_interface__['data'][0]
+    column, remainder = divmod(offset, values.itemsize)
+    if remainder or not 0 <= column <= values.shape[1] - shape_values.shape[1]:
+        return None
+    return column
+
+
+def take_to_arrays(take):
+    '''The arrays of a MocapFileData. A shape_values view is stored as its column in values.'''
+    lines = [line for line, _reason in take.malformed_rows]
+    reasons = [reason for _line, reason in take.malformed_rows]
+    shape_column = _shape_column(take)
+    if shape_column is None:
+        shape_values = {'shape_values': take.shape_values}
+    else:
+        shape_values = {'shape_columns': np.array((shape_column, take.shape_values.shape[1]))}
+    return {
+        'times': take.times,
+        'values': take.values,
+        **shape_values,
+        'malformed_lines': np.array(lines, dtype=np.int64),
+        'malformed_reasons': np.array(reasons, dtype=np.str_),
+        'warnings': np.array(take.warnings, dtype=np.str_),
+        'row_name': np.array(take.row_name),
+    }
+
+
+def take_from_arrays(arrays):
+    malformed_rows = list(zip(arrays['malformed_lines'].tolist(), arrays['malformed_reasons'].tolist()))
+    values = arrays['values']
+    if 'shape_columns' in arrays:
+        start, count = arrays['shape_columns'].tolist()
+        shape_values = values[:, start:start + count]
+    else:
+        shape_values = arrays['shape_values']
+    return MocapFileData(
+        arrays['times'],
+        values,
+        shape_values,
+        malformed_rows,
+        arrays['warnings'].tolist(),
+        row_name=str(arrays['row_name']),
+    )
+
+
+class ParseCache:
+    '''Parsed mocap files stored as compressed .npz files, keyed by parse_cache_key.
+    The modification time of a cache file is its last use, the least recently used files are removed
+    when the directory grows beyond max_size bytes.
+    '''
+
+    def __init__(self, directory, max_size=DEFAULT_CACHE_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+
+    def path(self, key):
+        return os.path.join(self.directory, key + CACHE_FILE_EXTENSION)
+
+    def load(self, key):
+        '''Return the cached MocapFileData or None.'''
+        path = self.path(key)
+        if not os.path.isfile(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as arrays:
+                take = take_from_arrays(arrays)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+            print(f'Removing invalid mocap cache file {path}: {e}')
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return take
+
+    def store(self, key, take):
+        '''Write the parsed take and evict the least recently used files beyond the size limit.'''
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        # Write to a temporary file first, a cache file is never read half written.
+        # The batch import workers may store the same take at the same time.
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(temp_path, 'wb') as f:
+                np.savez_compressed(f, **take_to_arrays(take))
+            os.replace(temp_path, path)
+        except BaseException:
+            # The temporary file isn't a cache entry, the eviction would never remove it.
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        self.evict(keep=path)
+
+    def entries(self):
+        '''Return (path, size, last use) of all cache files, least recently used first.'''
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(CACHE_FILE_EXTENSION):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        entries.sort(key=lambda entry: entry[2])
+        return entries
+
+    def size(self):
+        return sum(size for _path, size, _mtime in self.entries())
+
+    def evict(self, keep=None):
+        '''Remove the least recently used files until the cache fits in max_size. Returns the removed count.'''
+        entries = self.entries()
+        total = sum(size for _path, size, _mtime in entries)
+        removed = 0
+        for path, size, _mtime in entries:
+            if total <= self.max_size:
+                break
+            if path == keep:
+                continue
+            if self._remove(path):
+                total -= size
+                removed += 1
+        return removed
+
+    def clear(self):
+        '''Remove all cache files. Returns the number of removed files and bytes.'''
+        entries = self.entries()
+        removed = [size for path, size, _mtime in entries if self._remove(path)]
+        return len(removed), sum(removed)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            return False
+        return True
+
+
+def parser_cache_key(parser, path, *args, **kwargs):
+    '''The cache key of parser(path, *args, **kwargs).'''
+    return parse_cache_key(path, parser.__name__, args, sorted(kwargs.items()))
+
+
+def parse_cached(parser, path, *args, cache=None, **kwargs):
+    '''Return parser(path, *args, **kwargs). With a cache, a file with the same content is only parsed once.'''
+    if cache is None:
+        return parser(path, *args, **kwargs)
+    key = parser_cache_key(parser, path, *args, **kwargs)
+    take = cache.load(key)
+    if take is None:
+        take = parser(path, *args, **kwargs)
+        try:
+            cache.store(key, take)
+        except OSError as e:
+            print(f'Could not write the mocap cache file: {e}')
+    return take
@@ -0,0 +1,81 @@
+import numpy as np
+
+from .live_timing import interpolation_weights
+from .mocap_filters import filter_channels
+
+# Resampling of the imported takes onto the scene frames. NONE keeps the recorded samples as (subframe) keyframes.
+RESAMPLE_METHODS = ('NONE', 'LINEAR', 'CUBIC', 'ANTIALIAS')
+# The anti-aliasing gaussian has a standard deviation of this many scene frames (in source samples per frame).
+ANTIALIAS_SIGMA = 0.5
+
+
+def scene_frame_grid(frames):
+    '''Return the whole scene frames covered by the (fractional) source frames, the first and last frame rounded.'''
+    if not len(frames):
+        return np.empty(0, dtype=np.float64)
+    return np.arange(np.round(np.min(frames)), np.round(np.max(frames)) + 1, dtype=np.float64)
+
+
+def source_samples_per_frame(frames):
+    '''Return the median number of source samples per scene frame.'''
+    steps = np.diff(np.sort(frames))
+    steps = steps[steps > 0]
+    if not steps.size:
+        return 1.0
+    return 1.0 / float(np.median(steps))
+
+
+def _cubic_tangents(frames, values):
+    '''Finite difference tangents (value per frame) for a cubic Hermite spline through all samples.'''
+    tangents = np.zeros_like(values)
+    if len(frames) < 2:
+        return tangents
+    # Central differences inside, one sided differences at the first / last sample.
+    previous = np.r_[0, np.arange(len(frames) - 1)]
+    following = np.r_[np.arange(1, len(frames)), len(frames) - 1]
+    span = frames[following] - frames[previous]
+    np.divide(values[following] - values[previous], span[:, np.newaxis], out=tangents, where=span[:, np.newaxis] > 0)
+    return tangents
+
+
+def resample_channels(frames, values, method='LINEAR'):
+    '''Resample all channels of a take from the source frames onto whole scene frames in one pass.
+    @frames: the (fractional) scene frame of every sample.
+    @values: (samples,) or (samples x channels) values.
+    @method: LINEAR, CUBIC (Hermite spline through the samples) or ANTIALIAS (gaussian low pass at the scene
+        frame rate, then linear). ANTIALIAS equals LINEAR for takes that are recorded slower than the scene frame rate.
+    The scene frames outside of the recorded range hold the first / last value.
+    Returns (scene frames, values) as float64 arrays.
+    '''
+    if method not in RESAMPLE_METHODS:
+        raise ValueError(f'Unknown resample method {method}.')
+    frames = np.asarray(frames, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    if method == 'NONE' or not len(frames):
+        return frames.copy(), values.copy()
+    single_channel = values.ndim == 1
+    if single_channel:
+        values = values[:, np.newaxis]
+    order = np.argsort(frames, kind='stable')
+    frames = frames[order]
+    values = values[order]
+    grid = scene_frame_grid(frames)
+    if method == 'ANTIALIAS':
+        samples_per_frame = source_samples_per_frame(frames)
+        if samples_per_frame > 1:
+            sigma = ANTIALIAS_SIGMA * samples_per_frame
+            values = filter_channels(values, 'GAUSSIAN', 2 * int(np.ceil(3 * sigma)) + 1, sigma)
+    lower, upper, weight = interpolation_weights(grid, frames)
+    weight = weight[:, np.newaxis]
+    if method == 'CUBIC':
+        tangents = _cubic_tangents(frames, values)
+        span = (frames[upper] - frames[lower])[:, np.newaxis]
+        weight2 = weight * weight
+        weight3 = weight2 * weight
+        resampled = ((2 * weight3 - 3 * weight2 + 1) * values[lower]
+                     + (weight3 - 2 * weight2 + weight) * span * tangents[lower]
+                     + (3 * weight2 - 2 * weight3) * values[upper]
+                     + (weight3 - weight2) * span * tangents[upper])
+    else:
+        resampled = values[lower] + (values[upper] - values[lower]) * weight
+    return grid, resampled[:, 0] if single_channel else resampled
@@ -0,0 +1,160 @@
+import numpy as np
+
+# Rotation channels per rotation mode (rotation_euler, rotation_quaternion, rotation_axis_angle)
+ROTATION_MODE_CHANNELS = {
+    'EULER': 3,
+    'QUATERNION': 4,
+    'AXIS_ANGLE': 4,
+}
+# Below this cos(y) the euler conversion is in gimbal lock (mathutils uses 16 * FLT_EPSILON).
+GIMBAL_LOCK_EPSILON = 16 * np.finfo(np.float32).eps
+
+
+def quaternion_multiply(a, b):
+    '''Hamilton product of (..., 4) quaternions (w, x, y, z), like a @ b in mathutils.'''
+    aw, ax, ay, az = np.moveaxis(np.asarray(a, dtype=np.float64), -1, 0)
+    bw, bx, by, bz = np.moveaxis(np.asarray(b, dtype=np.float64), -1, 0)
+    return np.stack((
+        aw * bw - ax * bx - ay * by - az * bz,
+        aw * bx + ax * bw + ay * bz - az * by,
+        aw * by - ax * bz + ay * bw + az * bx,
+        aw * bz + ax * by - ay * bx + az * bw,
+    ), axis=-1)
+
+
+def quaternion_conjugate(q):
+    '''Conjugate (inverse of unit quaternions) of (..., 4) quaternions.'''
+    return np.asarray(q, dtype=np.float64) * (1.0, -1.0, -1.0, -1.0)
+
+
+def expmap_to_quaternions(vectors):
+    '''Convert (frames x 3) rotation vectors (axis * angle) to unit quaternions, like mathutils.Quaternion(vector).'''
+    vectors = np.asarray(vectors, dtype=np.float64)
+    angle = np.linalg.norm(vectors, axis=-1)
+    axis = np.divide(vectors, angle[..., np.newaxis], out=np.zeros_like(vectors), where=angle[..., np.newaxis] > 0)
+    # mathutils wraps the angle to [-pi, pi]
+    half_angle = (np.mod(angle + np.pi, 2 * np.pi) - np.pi) / 2
+    quaternions = np.concatenate((np.cos(half_angle)[..., np.newaxis], axis * np.sin(half_angle)[..., np.newaxis]), axis=-1)
+    quaternions[angle == 0] = (1.0, 0.0, 0.0, 0.0)
+    return quaternions
+
+
+def euler_to_quaternions(euler):
+    '''Convert (frames x 3) XYZ euler angles (radians) to unit quaternions.'''
+    half = np.asarray(euler, dtype=np.float64) / 2
+    cx, cy, cz = np.moveaxis(np.cos(half), -1, 0)
+    sx, sy, sz = np.moveaxis(np.sin(half), -1, 0)
+    return np.stack((
+        cx * cy * cz + sx * sy * sz,
+        sx * cy * cz - cx * sy * sz,
+        cx * sy * cz + sx * cy * sz,
+        cx * cy * sz - sx * sy * cz,
+    ), axis=-1)
+
+
+def quaternions_to_matrices(q):
+    '''Convert (frames x 4) quaternions to (frames x 3 x 3) rotation matrices (column vectors).'''
+    q = np.asarray(q, dtype=np.float64)
+    q = q / np.linalg.norm(q, axis=-1, keepdims=True)
+    w, x, y, z = np.moveaxis(q, -1, 0)
+    return np.stack((
+        np.stack((1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)), axis=-1),
+        np.stack((2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)), axis=-1),
+        np.stack((2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)), axis=-1),
+    ), axis=-2)
+
+
+def matrices_to_euler(matrices):
+    '''Convert (frames x 3 x 3) rotation matrices to XYZ euler angles. Of the two solutions the one with the
+    smaller sum of absolute angles is used, like Matrix.to_euler() in mathutils.
+    '''
+    m = np.asarray(matrices, dtype=np.float64)
+    cy = np.hypot(m[..., 0, 0], m[..., 1, 0])
+    locked = cy <= GIMBAL_LOCK_EPSILON
+    euler = np.stack((
+        np.where(locked, np.arctan2(-m[..., 1, 2], m[..., 1, 1]), np.arctan2(m[..., 2, 1], m[..., 2, 2])),
+        np.arctan2(-m[..., 2, 0], cy),
+        np.where(locked, 0.0, np.arctan2(m[..., 1, 0], m[..., 0, 0])),
+    ), axis=-1)
+    flipped = np.stack((
+        np.arctan2(-m[..., 2, 1], -m[..., 2, 2]),
+        np.arctan2(-m[..., 2, 0], -cy),
+        np.arctan2(-m[..., 1, 0], -m[..., 0, 0]),
+    ), axis=-1)
+    use_flipped = ~locked & (np.abs(flipped).sum(axis=-1) < np.abs(euler).sum(axis=-1))
+    return np.where(use_flipped[..., np.newaxis], flipped, euler)
+
+
+def quaternions_to_euler(q):
+    '''Convert (frames x 4) quaternions to XYZ euler angles, like Quaternion.to_euler().'''
+    return matrices_to_euler(quaternions_to_matrices(q))
+
+
+def quaternions_to_axis_angle(q):
+    '''Convert (frames x 4) quaternions to (frames x 4) axis angle rotations (angle, x, y, z).'''
+    q = np.asarray(q, dtype=np.float64)
+    q = q / np.linalg.norm(q, axis=-1, keepdims=True)
+    half_angle = np.arccos(np.clip(q[..., 0], -1.0, 1.0))
+    sin_half = np.sin(half_angle)
+    sin_half = np.where(np.abs(sin_half) < 0.0005, 1.0, sin_half)
+    axis = q[..., 1:] / sin_half[..., np.newaxis]
+    # A zero rotation points along Y like in mathutils.
+    axis[(axis == 0).all(axis=-1)] = (0.0, 1.0, 0.0)
+    return np.concatenate(((2 * half_angle)[..., np.newaxis], axis), axis=-1)
+
+
+def make_quaternions_continuous(q):
+    '''Flip the sign of the quaternions that lie in the opposite hemisphere of their predecessor, so that the
+    fcurves don't jump between q and -q (the same rotation).
+    '''
+    q = np.array(q, dtype=np.float64)
+    if len(q) < 2:
+        return q
+    flips = np.einsum('ij,ij->i', q[1:], q[:-1]) < 0
+    sign = np.where(np.cumsum(np.r_[False, flips]) % 2, -1.0, 1.0)
+    return q * sign[:, np.newaxis]
+
+
+def unwrap_euler(euler):
+    '''Remove the 2 pi jumps of (frames x 3) euler angles.'''
+    euler = np.asarray(euler, dtype=np.float64)
+    if not len(euler):
+        return euler.copy()
+    return np.unwrap(euler, axis=0)
+
+
+def quaternions_to_rotation_mode(q, rotation_mode):
+    '''Convert continuous (frames x 4) quaternions to the channels of the rotation mode (see ROTATION_MODE_CHANNELS).'''
+    if rotation_mode == 'QUATERNION':
+        return q
+    if rotation_mode == 'AXIS_ANGLE':
+        return quaternions_to_axis_angle(q)
+    return unwrap_euler(quaternions_to_euler(q))
+
+
+def source_rotations_to_blender(values, units='DEG', flip=False, initial_rotation=None, rotation_mode='EULER'):
+    '''Convert all recorded rotations (frames x 3, XYZ euler angles of the capture app) to Blender rotation channels.
+    Vectorized MocapBase._head_rotation_to_blender, the result is continuous over the frames.
+    @units: DEG or RAD.
+    @flip: mirror the rotations (flip_animation).
+    @initial_rotation: the rest rotation quaternion of the target bone, None for objects.
+    @rotation_mode: EULER, QUATERNION or AXIS_ANGLE.
+    Returns (frames x channels) values.
+    '''
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim != 2 or not len(values):
+        return np.empty((0, ROTATION_MODE_CHANNELS.get(rotation_mode, 3)))
+    if values.shape[1] < 3:
+        values = np.pad(values, ((0, 0), (0, 3 - values.shape[1])))
+    rot = values[:, :3]
+    if units == 'DEG':
+        rot = np.radians(rot)
+    if flip:
+        rot = rot * (1.0, -1.0, -1.0)
+    # Capture to Blender coordinates (swap y and z and invert y)
+    q = expmap_to_quaternions(np.stack((rot[:, 0], -rot[:, 2], rot[:, 1]), axis=-1))
+    if initial_rotation is not None:
+        # The conjugated rotation relative to the rest rotation: initial^-1 @ q @ initial
+        initial = np.asarray(tuple(initial_rotation), dtype=np.float64)
+        q = quaternion_multiply(quaternion_multiply(quaternion_conjugate(initial), q), initial)
+    return quaternions_to_rotation_mode(make_quaternions_continuous(q), rotation_mode)
@@ -1,10 +1,13 @@
 
+import os
+
 import bpy
 from bpy.props import BoolProperty, IntProperty, EnumProperty, PointerProperty
-import numpy as np
 
 from ..core.retarget_list_base import FaceRegionsBase, FaceRegionsBaseProperties
-from ..core.fc_dr_utils import kf_data_to_numpy_array, populate_keyframe_points_from_np_array
+from ..core.fc_dr_utils import read_keyframe_arrays, write_keyframe_arrays
+from ..core.keyframe_arrays import remove_keyframe_range
+from .mocap_parse_cache import CACHE_DIR_NAME, ParseCache
 from datetime import datetime
 
 
@@ -19,50 +22,40 @@ def get_scene_frame_rate():
     return bpy.context.scene.render.fps / bpy.context.scene.render.fps_base
 
 
+def get_mocap_cache_directory(location='USER'):
+    '''The parse cache directory next to the blend file (BLEND) or in the user data directory (USER).
+    Unsaved blend files always use the user data directory.'''
+    if location == 'BLEND' and bpy.data.filepath:
+        return os.path.join(os.path.dirname(bpy.data.filepath), CACHE_DIR_NAME)
+    return bpy.utils.user_resource('DATAFILES', path=CACHE_DIR_NAME)
+
+
+def get_mocap_parse_cache():
+    '''Return the parse cache for imported mocap files or None if it is disabled in the preferences.'''
+    prefs = bpy.context.preferences.addons["faceit"].preferences
+    if not prefs.use_mocap_parse_cache:
+        return None
+    return ParseCache(get_mocap_cache_directory(prefs.mocap_cache_location), prefs.mocap_cache_size * 1024 ** 2)
+
+
 def add_zero_keyframe(fcurves, frame) -> None:
     for fc in fcurves:
         fc.keyframe_points.insert(frame, 0.0, options={'FAST'})
 
 
 def remove_frame_range(action, fcurves, frame_start, frame_end) -> None:
-    '''Remove all keyframes from fcurves inbetween frame_start and frame_end'''
-    remove_first_frames = False
-    # Workaround for numpy bug, masking doesn't work when frame_start == 0
-    if frame_start == 0:
-        remove_first_frames = True
-        frame_start = 2
-
+    '''Remove all keyframes from fcurves inbetween frame_start and frame_end (both included).
+    The remaining keyframes are written back in one pass, fcurves without remaining keyframes are removed.
+    '''
     for fc in fcurves:
-
-        kf_data = kf_data_to_numpy_array(fc)
-        mask = ((kf_data < frame_start) | (kf_data > frame_end)).all(axis=1)
-
-        if np.all(mask == 1):
+        kf_arrays = read_keyframe_arrays(fc)
+        remaining = remove_keyframe_range(kf_arrays, frame_start, frame_end)
+        if len(remaining['co']) == len(kf_arrays['co']):
             continue
-        elif not np.any(mask == 1):
+        if not len(remaining['co']):
             action.fcurves.remove(fc)
             continue
-
-        # Mask out overlapping frame range from existing fcurves
-        dp = fc.data_path
-        action.fcurves.remove(fc)
-        fc = action.fcurves.new(dp)
-
-        kf_data = kf_data[mask, :]
-        if remove_first_frames:
-            kf_data = np.delete(kf_data, [0, 1], axis=0)
-
-        populate_keyframe_points_from_np_array(
-            fc, kf_data, add=True)
-
-        if remove_first_frames:
-            # Remove keyframes that are not covered by mask
-            # For some reason Blender doesn't always remove all kf -> range(3) for safety
-            for _ in range(3):
-                for kf in fc.keyframe_points:
-                    frame = kf.co.x
-                    if 0 <= frame <= frame_end:
-                        fc.keyframe_points.remove(kf)
+        write_keyframe_arrays(fc, remaining)
 
 
 def get_action(self, action_name):
@@ -76,40 +69,6 @@ def get_action(self, action_name):
     return action
 
 
-def moving_average_filter(data, window_size):
-    window = np.ones(int(window_size)) / float(window_size)
-    return np.convolve(data, window, 'same')
-
-
-def median_filter(data, kernel_size=3):
-    # Handle edge cases by reflecting the data at the borders
-    extended_data = np.pad(data, (kernel_size // 2, kernel_size // 2), 'reflect')
-    smoothed_data = np.copy(data)
-
-    for i in range(len(data)):
-        # Take a window of data centered at the current point
-        window = extended_data[i:i + kernel_size]
-        # Replace the current value with the median of the window
-        smoothed_data[i] = np.median(window)
-    return smoothed_data
-
-
-def gaussian_kernel(size, sigma):
-    """ Returns a 1D Gaussian kernel. """
-    size = int(size) // 2
-    x = np.arange(-size, size + 1)
-    norm = 1 / (np.sqrt(2 * np.pi) * sigma)
-    g = np.exp(-x**2 / (2 * sigma**2)) * norm
-    return g
-
-
-def gaussian_filter1d(data, size, sigma):
-    """ Applies a 1D Gaussian filter to a data array. """
-    kernel = gaussian_kernel(size, sigma)
-    # Convolve the data with the kernel using the 'valid' mode to avoid introducing artifacts
-    return np.convolve(data, kernel, mode='same')
-
-
 def remap(value, A, B, C, D):
     # Linearly remaps a value from the range [A, B] to the range [C, D]
     return C + (value - A) * (D - C) / (B - A)
@@ -1,13 +1,20 @@
+import os
+import tempfile
+import time
 import bpy
 from math import pi as PI
 
 from bpy.app.handlers import persistent
+from bpy.props import BoolProperty, EnumProperty, StringProperty
+from bpy_extras.io_utils import ExportHelper
 
 from ..properties.mocap_scene_properties import Mocap_Engine_Properties
 from ..core.faceit_data import get_engine_settings, get_shape_data_for_mocap_engine
 from .mocap_base import MocapImporterBase
 from .mocap_importers import LiveAnimator
 from .osc_receiver import QueueManager, Receiver, osc_queue
+from .live_session import LiveActor, LiveSession, apply_live_frames
+from .live_take_file import TAKE_DIR_NAME, TAKE_HEADER_SIZE, TakeFile, TakeWriter, find_last_take, new_take_path
 from ..core.faceit_utils import get_faceit_objects_list, restore_scene_state, save_scene_state, ui_refresh_all, get_faceit_control_armature, set_active_object, get_object_mode_from_context_mode, clear_active_object, set_hide_obj
 from ..core.pose_utils import get_edit_bone_roll, reset_pb, reset_pose, restore_saved_pose, save_pose
 from ..ctrl_rig.control_rig_utils import get_crig_objects_list, is_control_rig_connected
@@ -18,23 +25,30 @@ live_animator: LiveAnimator = LiveAnimator()
 reconnect_ctrl_rig: bool = False
 head_base_rotation = None
 head_base_location = None
+# write_count of the last frame that has been applied to the targets
+applied_frame_cursor = 0
+# Take file of the current (or recovered) recording.
+live_take_path = None
+# Multi actor session, see FACEIT_OT_LiveSessionStart.
+live_session: LiveSession = LiveSession()
 
 
-update_queries = 60
 queries_per_second = 200
 
 
 def process_osc_queue():
-    '''runs persistent and processes all incoming messages.'''
-    global osc_queue
+    '''runs persistent and applies the newest frame in the osc queue.'''
+    global applied_frame_cursor
     if osc_queue and receiver.enabled:
-        anim_list = osc_queue[:-update_queries:-1]
-        for _ in range(update_queries):
-            if not anim_list:
-                break
-            else:
-                data = anim_list.pop()
-                live_animator.process_data(data)
+        applied_frame_cursor = apply_live_frames(osc_queue, live_animator, receiver.telemetry, applied_frame_cursor)
+        return 1 / queries_per_second
+    return .01
+
+
+def process_live_session():
+    '''runs persistent and applies the newest frame of each actor in the live session.'''
+    if live_session.enabled:
+        live_session.process()
         return 1 / queries_per_second
     return .01
 
@@ -43,55 +57,169 @@ def get_head_base_transform():
     return head_base_rotation, head_base_location
 
 
+def get_live_take_path():
+    return live_take_path
+
+
+def get_take_directory():
+    '''Take files are written next to the blend file. Unsaved files use the system temp directory.'''
+    if bpy.data.filepath:
+        return os.path.join(os.path.dirname(bpy.data.filepath), TAKE_DIR_NAME)
+    return os.path.join(tempfile.gettempdir(), TAKE_DIR_NAME)
+
+
+def open_take_writer(engine, resume=False):
+    '''Stream the new recording to a take file. With resume the current take file is continued.'''
+    global live_take_path
+    close_take_writer()
+    if resume and live_take_path is not None:
+        try:
+            queue_mgr.take_writer = TakeWriter.resume(live_take_path, engine=engine)
+            return
+        except (OSError, ValueError) as e:
+            print(f'Can\'t continue the take file {live_take_path}: {e}')
+    take_path = new_take_path(get_take_directory(), engine)
+    queue_mgr.take_writer = TakeWriter(take_path, engine=engine, start_time=time.time())
+    live_take_path = take_path
+
+
+def close_take_writer():
+    if queue_mgr.take_writer is not None:
+        queue_mgr.take_writer.close()
+        queue_mgr.take_writer = None
+
+
+def configure_live_animator(context, animator, engine, engine_settings, objects, target_shapes, head_obj=None,
+                            head_bone_name='', eye_rig=None, eye_L_bone_name='', eye_R_bone_name=''):
+    '''Prepare the animator for a new live recording: motion types, smoothing, jitter buffer and targets.'''
+    animate_loc = engine_settings.animate_head_location
+    animate_rot = engine_settings.animate_head_rotation
+    animate_eye_bones = engine_settings.animate_eye_rotation_bones
+    animate_eye_shapes = engine_settings.animate_eye_rotation_shapes
+    animate_shapes = engine_settings.animate_shapes
+    animator.set_jitter_buffer(
+        use_jitter_buffer=engine_settings.use_jitter_buffer,
+        latency=engine_settings.jitter_buffer_latency / 1000,
+    )
+    animator.init_new_recording()
+    animator.set_rotation_units(engine_settings.rotation_units)
+    # Shapes animation properties
+    animator.flip_animation = engine_settings.mirror_x
+    animator.animate_shapes = animate_shapes
+    animator.animate_head_location = animate_loc
+    animator.animate_head_rotation = animate_rot
+    animator.animate_eye_shapes = animate_eye_shapes
+    animator.animate_eye_bones = animate_eye_bones
+    if animate_eye_shapes or animate_eye_bones:
+        animator.set_eye_bones_smoothing(
+            use_smoothing=engine_settings.smooth_eye_look_animation,
+            smooth_filter='SMA',
+            smooth_window=engine_settings.smooth_window_eye_bones
+
+        )
+    if animate_shapes or animate_eye_shapes:
+        animator.set_use_region_filter(engine_settings.use_regions_filter)
+        animator.set_face_smoothing(
+            use_smoothing=engine_settings.use_smooth_face_filter,
+            smooth_filter='SMA',
+            smooth_regions=engine_settings.smooth_regions.get_active_regions(),
+            smooth_window=engine_settings.smooth_window_face,
+        )
+        animator.set_face_regions_dict(engine_settings.region_filter.get_active_regions())
+        source_shape_ref = list(get_shape_data_for_mocap_engine(engine))
+        animator.set_source_shape_reference(source_shape_ref)
+        animator.set_shape_targets(
+            objects=objects,
+            retarget_shapes=target_shapes,
+            animate_eye_look_shapes=animate_eye_shapes,
+            only_eye_look=not animate_shapes,
+        )
+        animator.compile_live_target_plan()
+    # Head animation properties
+    if animate_loc or animate_rot:
+        head_loc_multiplier = engine_settings.head_location_multiplier
+        saved_pose = None
+        if head_obj and head_obj.type == 'ARMATURE':
+            set_active_object(head_obj.name)
+            set_hide_obj(head_obj, False)
+            # It's important to reset the pose before setting the head targets to get accurate rotation data.
+            saved_pose = save_pose(head_obj)
+            reset_pose(head_obj)
+            dg = context.evaluated_depsgraph_get()
+            dg.update()
+        animator.set_head_targets(
+            head_obj=head_obj,
+            head_bone_name=head_bone_name,
+            head_loc_mult=head_loc_multiplier,
+        )
+        animator.set_head_smoothing(
+            use_smoothing=engine_settings.smooth_head,
+            smooth_filter='SMA',
+            smooth_window=engine_settings.smooth_window_head,
+        )
+        if saved_pose:
+            restore_saved_pose(head_obj, saved_pose)
+    if animate_eye_bones:
+        saved_pose = None
+        if eye_rig is not None:
+            set_hide_obj(eye_rig, False)
+            saved_pose = save_pose(eye_rig)
+            eye_L_bone = eye_rig.pose.bones.get(eye_L_bone_name)
+            if eye_L_bone:
+                reset_pb(eye_L_bone)
+            eye_R_bone = eye_rig.pose.bones.get(eye_R_bone_name)
+            if eye_R_bone:
+                reset_pb(eye_R_bone)
+            dg = context.evaluated_depsgraph_get()
+            dg.update()
+            animator.set_eye_targets(
+                eye_rig=eye_rig,
+                eye_L_bone_name=eye_L_bone_name,
+                eye_R_bone_name=eye_R_bone_name,
+            )
+        if saved_pose:
+            restore_saved_pose(eye_rig, saved_pose)
+    animator.compile_live_filters(
+        filter_type=engine_settings.live_filter,
+        min_cutoff=engine_settings.live_filter_min_cutoff,
+        beta=engine_settings.live_filter_beta,
+    )
+
+
+def has_enabled_motion(engine_settings):
+    return (engine_settings.animate_head_location or engine_settings.animate_head_rotation
+            or engine_settings.animate_shapes or engine_settings.animate_eye_rotation_bones
+            or engine_settings.animate_eye_rotation_shapes)
+
+
 class FACEIT_OT_ReceiverStart(bpy.types.Operator):
     '''Start receiving animation data from the given connection. Enable the recorder in order to import recorded data'''
     bl_idname = "faceit.receiver_start"
     bl_label = "Start Receiver"
     bl_options = {'INTERNAL'}
 
+    @classmethod
+    def poll(cls, context):
+        return not live_session.enabled
+
     def execute(self, context):
-        global receiver, live_animator, reconnect_ctrl_rig
+        global receiver, live_animator, reconnect_ctrl_rig, applied_frame_cursor, live_take_path
         bpy.app.timers.register(process_osc_queue, persistent=True)
         state_dict = save_scene_state(context)
         live_animator.clear_animation_targets()
         scene = context.scene
         engine_settings: Mocap_Engine_Properties = get_engine_settings(scene.faceit_live_source)
-        animate_loc = engine_settings.animate_head_location
-        animate_rot = engine_settings.animate_head_rotation
-        animate_eye_bones = engine_settings.animate_eye_rotation_bones
-        animate_eye_shapes = engine_settings.animate_eye_rotation_shapes
-        animate_shapes = engine_settings.animate_shapes
-        if not (animate_loc or animate_rot or animate_shapes or animate_eye_bones or animate_eye_shapes):
+        if not has_enabled_motion(engine_settings):
             self.report({'ERROR'}, "You need to enable at least one type of motion.")
             return {'CANCELLED'}
-        live_animator.init_new_recording()
-        live_animator.set_rotation_units(engine_settings.rotation_units)
-        # Shapes animation properties
-        live_animator.flip_animation = engine_settings.mirror_x
-        live_animator.animate_shapes = animate_shapes
-        live_animator.animate_head_location = animate_loc
-        live_animator.animate_head_rotation = animate_rot
-        live_animator.animate_eye_shapes = animate_eye_shapes
-        live_animator.animate_eye_bones = animate_eye_bones
-        if animate_eye_shapes or animate_eye_bones:
-            live_animator.set_eye_bones_smoothing(
-                use_smoothing=engine_settings.smooth_eye_look_animation,
-                smooth_filter='SMA',
-                smooth_window=engine_settings.smooth_window_eye_bones
-
-            )
-        if animate_shapes or animate_eye_shapes:
-            live_animator.set_use_region_filter(engine_settings.use_regions_filter)
-            live_animator.set_face_smoothing(
-                use_smoothing=engine_settings.use_smooth_face_filter,
-                smooth_filter='SMA',
-                smooth_regions=engine_settings.smooth_regions.get_active_regions(),
-                smooth_window=engine_settings.smooth_window_face,
-            )
-            live_animator.set_face_regions_dict(engine_settings.region_filter.get_active_regions())
-            source_shape_ref = list(get_shape_data_for_mocap_engine(scene.faceit_live_source))
-            live_animator.set_source_shape_reference(source_shape_ref)
-            # Get objects and target shapes
+        # Frames that have not been cleared belong to the same take, the take file is continued.
+        resume_take = bool(osc_queue)
+        osc_queue.resize(engine_settings.live_buffer_capacity)
+        applied_frame_cursor = osc_queue.write_count
+        queue_mgr.clock.reset()
+        # Get objects and target shapes
+        objects = target_shapes = None
+        if engine_settings.animate_shapes or engine_settings.animate_eye_rotation_shapes:
             ctrl_rig = scene.faceit_control_armature
             reconnect_ctrl_rig = False
             if ctrl_rig:
@@ -112,74 +240,40 @@ class FACEIT_OT_ReceiverStart(bpy.types.Operator):
                     self.report(
                         {'WARNING'},
                         "You need to populate the ARKit target shapes list in the Shapes tab or select a valid control rig.")
-
-            live_animator.set_shape_targets(
-                objects=objects,
-                retarget_shapes=target_shapes,
-                animate_eye_look_shapes=animate_eye_shapes,
-                only_eye_look=not animate_shapes,
-            )
-        # Head animation properties
-        if animate_loc or animate_rot:
-            head_loc_multiplier = engine_settings.head_location_multiplier
-            head_obj = scene.faceit_head_target_object
-            head_bone_name = scene.faceit_head_sub_target
-            saved_pose = None
-            if head_obj:
-                if head_obj.type == 'ARMATURE':
-                    set_active_object(head_obj.name)
-                    set_hide_obj(head_obj, False)
-                    # It's important to reset the pose before setting the head targets to get accurate rotation data.
-                    saved_pose = save_pose(head_obj)
-                    reset_pose(head_obj)
-                    dg = context.evaluated_depsgraph_get()
-                    dg.update()
+        head_obj = scene.faceit_head_target_object
+        if (engine_settings.animate_head_location or engine_settings.animate_head_rotation) and head_obj:
+            if head_obj.type != 'ARMATURE':
+                global head_base_rotation, head_base_location
+                if head_obj.rotation_mode == 'QUATERNION':
+                    head_base_rotation = head_obj.rotation_quaternion.copy()
+                elif head_obj.rotation_mode == 'AXIS_ANGLE':
+                    head_base_rotation = head_obj.rotation_axis_angle[:]
                 else:
-                    global head_base_rotation, head_base_location
-                    if head_obj.rotation_mode == 'QUATERNION':
-                        head_base_rotation = head_obj.rotation_quaternion.copy()
-                    elif head_obj.rotation_mode == 'AXIS_ANGLE':
-                        head_base_rotation = head_obj.rotation_axis_angle[:]
-                    else:
-                        head_base_rotation = head_obj.rotation_euler.copy()
-                    head_base_location = head_obj.location.copy()
-            live_animator.set_head_targets(
-                head_obj=head_obj,
-                head_bone_name=head_bone_name,
-                head_loc_mult=head_loc_multiplier,
-            )
-            live_animator.set_head_smoothing(
-                use_smoothing=engine_settings.smooth_head,
-                smooth_filter='SMA',
-                smooth_window=engine_settings.smooth_window_head,
-            )
-            if saved_pose:
-                restore_saved_pose(head_obj, saved_pose)
-        if animate_eye_bones:
-            saved_pose = None
-            eye_rig = context.scene.faceit_eye_target_rig
-            if eye_rig is not None:
-                eye_L_bone_name = context.scene.faceit_eye_L_sub_target
-                eye_R_bone_name = context.scene.faceit_eye_R_sub_target
-                set_hide_obj(eye_rig, False)
-                saved_pose = save_pose(eye_rig)
-                eye_L_bone = eye_rig.pose.bones.get(eye_L_bone_name)
-                if eye_L_bone:
-                    reset_pb(eye_L_bone)
-                eye_R_bone = eye_rig.pose.bones.get(eye_R_bone_name)
-                if eye_R_bone:
-                    reset_pb(eye_R_bone)
-                dg = context.evaluated_depsgraph_get()
-                dg.update()
-                live_animator.set_eye_targets(
-                    eye_rig=eye_rig,
-                    eye_L_bone_name=eye_L_bone_name,
-                    eye_R_bone_name=eye_R_bone_name,
-                )
-            if saved_pose:
-                restore_saved_pose(eye_rig, saved_pose)
+                    head_base_rotation = head_obj.rotation_euler.copy()
+                head_base_location = head_obj.location.copy()
+        configure_live_animator(
+            context,
+            live_animator,
+            scene.faceit_live_source,
+            engine_settings,
+            objects,
+            target_shapes,
+            head_obj=head_obj,
+            head_bone_name=scene.faceit_head_sub_target,
+            eye_rig=scene.faceit_eye_target_rig,
+            eye_L_bone_name=scene.faceit_eye_L_sub_target,
+            eye_R_bone_name=scene.faceit_eye_R_sub_target,
+        )
         # if bpy.context.screen.is_animation_playing:
         #     bpy.ops.screen.animation_cancel()
+        if engine_settings.record_to_file:
+            try:
+                open_take_writer(scene.faceit_live_source, resume=resume_take)
+            except OSError as e:
+                self.report({'WARNING'}, f'Can\'t write the take file: {e}')
+        else:
+            # The importer would prefer the take file of the previous recording over the frame buffer.
+            live_take_path = None
         try:
             receiver.start(scene.faceit_live_source, engine_settings.address, engine_settings.port)
         except OSError as e:
@@ -193,6 +287,7 @@ class FACEIT_OT_ReceiverStart(bpy.types.Operator):
     def cancel(self, context):
         global receiver
         receiver.stop()
+        close_take_writer()
         queue_mgr.reset()
         return {'CANCELLED'}
 
@@ -200,6 +295,7 @@ class FACEIT_OT_ReceiverStart(bpy.types.Operator):
 def stop_receiver():
     '''Stop the receiver.'''
     receiver.stop()
+    close_take_writer()
     try:
         bpy.app.timers.unregister(process_osc_queue)
     except ValueError:
@@ -214,7 +310,10 @@ def cancel_recording():
 
 
 def clear_data():
-    '''Clear the OSC queue and the live data.'''
+    '''Clear the OSC queue and the live data. Take files are kept on disk.'''
+    global live_take_path
+    close_take_writer()
+    live_take_path = None
     # Reset the OSC queue
     queue_mgr.reset()
     live_animator.clear_animation_data()
@@ -247,16 +346,43 @@ class FACEIT_OT_ImportLiveMocap(MocapImporterBase, bpy.types.Operator):
     bl_label = "Import OSC Recording"
     bl_description = "Import the recorded data to an animation."
 
+    actor_name: StringProperty(
+        name='Actor',
+        description='Import the recording of this actor of the live session to the actor targets.',
+        options={'SKIP_SAVE', 'HIDDEN'},
+    )
+    use_live_filter: BoolProperty(
+        name='Use Live Filters',
+        default=True,
+        description='Filter the take with the filters of the live preview, so that the keyframes match the preview. Replaces the smoothing options below.',
+    )
+
     @classmethod
     def poll(cls, context):
         return super().poll(context)
 
+    def draw(self, context):
+        if self._get_mocap_importer().filter_bank:
+            row = self.layout.row(align=True)
+            row.prop(self, 'use_live_filter', icon='MOD_SMOOTH')
+        super().draw(context)
+
+    def execute(self, context):
+        mocap_importer = self._get_mocap_importer()
+        mocap_importer.apply_live_filter = self.use_live_filter
+        if self.use_live_filter and mocap_importer.filter_bank:
+            self.use_smooth_face_filter = False
+            self.smooth_head = False
+            self.smooth_eye_look_animation = False
+        return super().execute(context)
+
     def _get_engine_specific_settings(self, context):
         self.engine_name = context.scene.faceit_live_source
         self.engine_settings: Mocap_Engine_Properties = context.scene.faceit_live_mocap_settings.get(self.engine_name)
-        self.animate_shapes = live_animator.animate_shapes
-        self.animate_head_rotation = live_animator.animate_head_rotation
-        self.animate_head_location = live_animator.animate_head_location
+        mocap_importer = self._get_mocap_importer()
+        self.animate_shapes = mocap_importer.animate_shapes
+        self.animate_head_rotation = mocap_importer.animate_head_rotation
+        self.animate_head_location = mocap_importer.animate_head_location
         self.can_import_head_rotation = self.engine_settings.animate_head_rotation
         self.can_import_head_location = self.engine_settings.animate_head_location
         self.can_import_eye_transforms = self.engine_settings.can_animate_eye_rotation
@@ -268,22 +394,24 @@ class FACEIT_OT_ImportLiveMocap(MocapImporterBase, bpy.types.Operator):
         self.smooth_window_head = self.engine_settings.smooth_window_head
         self.animate_eye_rotation_shapes = self.engine_settings.animate_eye_rotation_shapes
         self.animate_eye_rotation_bones = self.engine_settings.animate_eye_rotation_shapes
-        self.use_region_filter = live_animator.use_region_filter
-        self.flip_animation = live_animator.flip_animation
+        self.use_region_filter = mocap_importer.use_region_filter
+        self.flip_animation = mocap_importer.flip_animation
         self.filename = ""
 
     def invoke(self, context, event):
         global reconnect_ctrl_rig
         self._get_engine_specific_settings(context)
         self.new_action_name = "LiveRecording"
-        if not osc_queue:
+        if not self._has_recorded_data():
             self.report({'WARNING'}, "No recorded data found.")
             return {'CANCELLED'}
-        faceit_objects = get_faceit_objects_list()
-        if not faceit_objects:
+        if not self.actor_name and not get_faceit_objects_list():
             self.report({'WARNING'}, "You need to register the character meshes in the setup tab.")
         self.set_active_regions(self.engine_settings.region_filter.get_active_regions())
-        if get_faceit_control_armature():
+        if self.actor_name:
+            # The take is imported to the shape keys of the actor targets.
+            self.bake_to_control_rig = self.can_bake_control_rig = False
+        elif get_faceit_control_armature():
             if reconnect_ctrl_rig:
                 self.bake_to_control_rig = True
             self.can_bake_control_rig = True
@@ -292,12 +420,398 @@ class FACEIT_OT_ImportLiveMocap(MocapImporterBase, bpy.types.Operator):
         wm = context.window_manager
         return wm.invoke_props_dialog(self)
 
+    def _get_actor(self):
+        '''Return the live session actor and its properties, (None, None) for the single receiver.'''
+        if not self.actor_name:
+            return None, None
+        return live_session.actors.get(self.actor_name), bpy.context.scene.faceit_live_actors.get(self.actor_name)
+
     def _get_mocap_importer(self):
+        actor, _actor_props = self._get_actor()
+        if actor is not None:
+            return actor.animator
         return live_animator
 
+    def _get_recording(self):
+        '''Return the take file path (or None) and the frame buffer of the recording.'''
+        actor, _actor_props = self._get_actor()
+        if actor is not None:
+            return actor.take_path, actor.frame_buffer
+        return live_take_path, osc_queue
+
+    def _has_recorded_data(self):
+        '''Check for recorded frames without mapping the take file (that would keep it locked on Windows).'''
+        take_path, frame_buffer = self._get_recording()
+        if take_path is not None and os.path.isfile(take_path) and os.path.getsize(take_path) > TAKE_HEADER_SIZE:
+            return True
+        return bool(frame_buffer)
+
     def _get_raw_animation_data(self):
-        '''Return the raw animation data. Filename or osc queue for live animation'''
-        return osc_queue
+        '''Return the raw animation data. Filename or osc queue for live animation.
+        Prefer the take file, it holds the whole take even if the osc queue overflowed.
+        The frames are parsed from the take file or the frame buffer directly, without a copy.'''
+        take_path, frame_buffer = self._get_recording()
+        if take_path is not None:
+            try:
+                return TakeFile(take_path)
+            except (OSError, ValueError) as e:
+                print(f'Can\'t read the take file {take_path}: {e}')
+        return frame_buffer
+
+    def _get_shape_targets(self, scene):
+        _actor, actor_props = self._get_actor()
+        if actor_props is not None:
+            return get_live_actor_targets(scene, actor_props)
+        return super()._get_shape_targets(scene)
+
+    def _get_shape_action(self, scene):
+        _actor, actor_props = self._get_actor()
+        if actor_props is not None:
+            return get_actor_action(actor_props, self.new_action_name, replace=self.overwrite_method == 'REPLACE')
+        return super()._get_shape_action(scene)
+
+    def _load_shape_action(self, mocap_action, target_objects):
+        _actor, actor_props = self._get_actor()
+        if actor_props is None:
+            return super()._load_shape_action(mocap_action, target_objects)
+        for obj in target_objects:
+            shape_keys = obj.data.shape_keys
+            if shape_keys is None:
+                continue
+            if not shape_keys.animation_data:
+                shape_keys.animation_data_create()
+            shape_keys.animation_data.action = mocap_action
+
+    def _get_head_target(self, scene):
+        _actor, actor_props = self._get_actor()
+        if actor_props is not None:
+            return actor_props.head_target_object, actor_props.head_sub_target
+        return super()._get_head_target(scene)
+
+    def _get_head_action(self, head_obj):
+        _actor, actor_props = self._get_actor()
+        if actor_props is not None:
+            return get_actor_action(
+                actor_props, 'Head', replace=self.overwrite_method == 'REPLACE', id_data=head_obj)
+        return super()._get_head_action(head_obj)
+
+    def _get_eye_target(self, scene):
+        _actor, actor_props = self._get_actor()
+        if actor_props is not None:
+            return actor_props.eye_target_rig, actor_props.eye_L_sub_target, actor_props.eye_R_sub_target
+        return super()._get_eye_target(scene)
+
+    def _get_eye_action(self, eye_rig):
+        _actor, actor_props = self._get_actor()
+        if actor_props is not None:
+            return get_actor_action(
+                actor_props, 'Eyes', replace=self.overwrite_method == 'REPLACE', id_data=eye_rig)
+        return super()._get_eye_action(eye_rig)
+
+
+class FACEIT_OT_ExportLiveTelemetry(bpy.types.Operator, ExportHelper):
+    '''Write the statistics of the live receiver (throughput, decode errors, latency, apply time) to a JSON or CSV file'''
+    bl_idname = "faceit.export_live_telemetry"
+    bl_label = "Export Live Statistics"
+    bl_options = {'INTERNAL'}
+
+    filepath: StringProperty(
+        subtype="FILE_PATH",
+        default="faceit_live_statistics"
+    )
+    filter_glob: StringProperty(
+        default="*.json;*.csv",
+        options={'HIDDEN'},
+    )
+    file_format: EnumProperty(
+        name='Format',
+        items=(
+            ('JSON', 'JSON', 'Nested statistics including the histograms.'),
+            ('CSV', 'CSV', 'One row per statistic.'),
+        ),
+    )
+    filename_ext = ".json"
+
+    def check(self, context):
+        self.filename_ext = ".csv" if self.file_format == 'CSV' else ".json"
+        return super().check(context)
+
+    def execute(self, context):
+        scene = context.scene
+        extra = {
+            'engine': scene.faceit_live_source,
+            'recorded_frames': len(osc_queue),
+            'overwritten_frames': osc_queue.overflow_count,
+            'skipped_frames': osc_queue.skipped_count,
+            'shape_key_apply_ms': live_animator.live_target_plan.mean_apply_time * 1000,
+        }
+        try:
+            if self.file_format == 'CSV':
+                receiver.telemetry.write_csv(self.filepath, **extra)
+            else:
+                receiver.telemetry.write_json(self.filepath, **extra)
+        except OSError as e:
+            self.report({'ERROR'}, f"Can't write the statistics: {e}")
+            return {'CANCELLED'}
+        self.report({'INFO'}, f"Saved the live statistics to {self.filepath}")
+        return {'FINISHED'}
+
+
+class FACEIT_OT_RecoverLiveTake(bpy.types.Operator):
+    '''Load the last take file written by the live recorder. Recovers takes that have not been imported, e.g. after a crash'''
+    bl_idname = "faceit.recover_live_take"
+    bl_label = "Recover Last Take"
+    bl_options = {'INTERNAL'}
+
+    @classmethod
+    def poll(cls, context):
+        return not context.scene.faceit_osc_receiver_enabled
+
+    def execute(self, context):
+        global live_take_path
+        take_dir = get_take_directory()
+        take_path = find_last_take(take_dir)
+        if take_path is None:
+            self.report({'WARNING'}, f"No take files found in {take_dir}.")
+            return {'CANCELLED'}
+        try:
+            take = TakeFile(take_path)
+        except (OSError, ValueError) as e:
+            self.report({'ERROR'}, f"Can't read the take file: {e}")
+            return {'CANCELLED'}
+        if not take:
+            self.report({'WARNING'}, f"The take {os.path.basename(take_path)} holds no frames.")
+            return {'CANCELLED'}
+        clear_data()
+        live_take_path = take_path
+        scene = context.scene
+        if take.engine and take.engine != scene.faceit_live_source:
+            try:
+                scene.faceit_live_source = take.engine
+            except TypeError:
+                pass
+        engine_settings: Mocap_Engine_Properties = get_engine_settings(scene.faceit_live_source)
+        live_animator.set_source_shape_reference(list(get_shape_data_for_mocap_engine(scene.faceit_live_source)))
+        live_animator.set_rotation_units(engine_settings.rotation_units)
+        self.report({'INFO'}, f"Recovered {len(take)} frames from {os.path.basename(take_path)}.")
+        return bpy.ops.faceit.import_live_mocap('INVOKE_DEFAULT')
+
+
+def get_live_actor_targets(scene, actor_props):
+    '''Return the shape key target objects and the retarget shapes of an actor.'''
+    if actor_props.control_rig is not None:
+        return get_crig_objects_list(actor_props.control_rig), actor_props.control_rig.faceit_crig_targets
+    objects = []
+    if actor_props.target_collection is not None:
+        objects = [obj for obj in actor_props.target_collection.all_objects if obj.type == 'MESH']
+    return objects, scene.faceit_arkit_retarget_shapes
+
+
+def get_actor_action(actor_props, action_name, replace=False, id_data=None):
+    '''Return the action of an actor, named after the actor. If id_data is passed, its active action is kept
+    (unless replace is True) and the new action is assigned to it.'''
+    if id_data is not None and not replace and id_data.animation_data and id_data.animation_data.action:
+        return id_data.animation_data.action
+    action_name = f'{actor_props.name}_{action_name}'
+    action = bpy.data.actions.get(action_name)
+    if action and replace:
+        bpy.data.actions.remove(action, do_unlink=True)
+        action = None
+    if action is None:
+        action = bpy.data.actions.new(name=action_name)
+        action.use_fake_user = True
+    if id_data is not None:
+        if not id_data.animation_data:
+            id_data.animation_data_create()
+        id_data.animation_data.action = action
+    return action
+
+
+def stop_live_session():
+    '''Stop the multi actor session. The recorded frames are kept for the import.'''
+    live_session.stop()
+    try:
+        bpy.app.timers.unregister(process_live_session)
+    except ValueError:
+        pass
+    bpy.context.scene.faceit_live_session_enabled = False
+
+
+class FACEIT_OT_AddLiveActor(bpy.types.Operator):
+    '''Add an actor to the multi actor live session'''
+    bl_idname = "faceit.add_live_actor"
+    bl_label = "Add Actor"
+    bl_options = {'INTERNAL', 'UNDO'}
+
+    @classmethod
+    def poll(cls, context):
+        return not context.scene.faceit_live_session_enabled
+
+    def execute(self, context):
+        scene = context.scene
+        actors = scene.faceit_live_actors
+        names = {item.name for item in actors}
+        i = len(actors) + 1
+        while f'Actor {i}' in names:
+            i += 1
+        item = actors.add()
+        item.name = f'Actor {i}'
+        item.engine = scene.faceit_live_source
+        engine_settings = get_engine_settings(item.engine)
+        # Each actor listens on its own port by default.
+        used_ports = {actor.port for actor in actors if actor is not item}
+        port = engine_settings.port
+        while port in used_ports:
+            port += 1
+        item.port = port
+        scene.faceit_live_actor_index = len(actors) - 1
+        return {'FINISHED'}
+
+
+class FACEIT_OT_RemoveLiveActor(bpy.types.Operator):
+    '''Remove the active actor from the multi actor live session'''
+    bl_idname = "faceit.remove_live_actor"
+    bl_label = "Remove Actor"
+    bl_options = {'INTERNAL', 'UNDO'}
+
+    @classmethod
+    def poll(cls, context):
+        scene = context.scene
+        return scene.faceit_live_actors and not scene.faceit_live_session_enabled
+
+    def execute(self, context):
+        scene = context.scene
+        scene.faceit_live_actors.remove(scene.faceit_live_actor_index)
+        scene.faceit_live_actor_index = max(0, min(scene.faceit_live_actor_index, len(scene.faceit_live_actors) - 1))
+        return {'FINISHED'}
+
+
+class FACEIT_OT_LiveSessionStart(bpy.types.Operator):
+    '''Start receiving all enabled actors. One receiver thread serves all devices, each actor animates its own targets'''
+    bl_idname = "faceit.live_session_start"
+    bl_label = "Start Session"
+    bl_options = {'INTERNAL'}
+
+    @classmethod
+    def poll(cls, context):
+        scene = context.scene
+        return (any(actor.enabled for actor in scene.faceit_live_actors)
+                and not scene.faceit_live_session_enabled and not receiver.enabled)
+
+    def execute(self, context):
+        scene = context.scene
+        state_dict = save_scene_state(context)
+        # The take files of the recorded actors are continued until the session data is cleared.
+        previous_takes = {actor.name: actor.take_path for actor in live_session.recorded_actors()}
+        live_session.clear()
+        for actor_props in scene.faceit_live_actors:
+            if not actor_props.enabled:
+                continue
+            engine_settings: Mocap_Engine_Properties = get_engine_settings(actor_props.engine)
+            if not has_enabled_motion(engine_settings):
+                self.report({'WARNING'}, f"{actor_props.name}: You need to enable at least one type of motion.")
+                continue
+            objects, target_shapes = get_live_actor_targets(scene, actor_props)
+            if engine_settings.animate_shapes or engine_settings.animate_eye_rotation_shapes:
+                if not objects:
+                    self.report({'WARNING'}, f"{actor_props.name}: No target objects found in the target collection.")
+                elif actor_props.control_rig is not None and is_control_rig_connected(actor_props.control_rig):
+                    self.report(
+                        {'WARNING'}, f"{actor_props.name}: The control rig drivers override the live animation.")
+            actor = LiveActor(actor_props.name, actor_props.engine, capacity=engine_settings.live_buffer_capacity)
+            configure_live_animator(
+                context,
+                actor.animator,
+                actor_props.engine,
+                engine_settings,
+                objects,
+                target_shapes,
+                head_obj=actor_props.head_target_object,
+                head_bone_name=actor_props.head_sub_target,
+                eye_rig=actor_props.eye_target_rig,
+                eye_L_bone_name=actor_props.eye_L_sub_target,
+                eye_R_bone_name=actor_props.eye_R_sub_target,
+            )
+            try:
+                live_session.add_actor(actor, actor_props.address, actor_props.port, actor_props.source_address)
+            except OSError as e:
+                print('Socket error:', e.strerror)
+                self.report({'ERROR'}, f'{actor_props.name}: Port {actor_props.port} is already in use!')
+                live_session.clear()
+                restore_scene_state(context, state_dict)
+                return {'CANCELLED'}
+            if engine_settings.record_to_file:
+                try:
+                    actor.open_take_writer(get_take_directory(), resume_path=previous_takes.get(actor.name))
+                except OSError as e:
+                    self.report({'WARNING'}, f'{actor_props.name}: Can\'t write the take file: {e}')
+        if not live_session:
+            self.report({'ERROR'}, "No actor could be started.")
+            restore_scene_state(context, state_dict)
+            return {'CANCELLED'}
+        live_session.start()
+        bpy.app.timers.register(process_live_session, persistent=True)
+        scene.faceit_live_session_enabled = True
+        restore_scene_state(context, state_dict)
+        return {'FINISHED'}
+
+
+class FACEIT_OT_LiveSessionStop(bpy.types.Operator):
+    '''Stop the multi actor session. You can import the recording of each actor after stopping the session'''
+    bl_idname = "faceit.live_session_stop"
+    bl_label = "Stop Session"
+    bl_options = {'INTERNAL'}
+
+    def execute(self, context):
+        stop_live_session()
+        return {'FINISHED'}
+
+
+class FACEIT_OT_ImportLiveActorTake(bpy.types.Operator):
+    '''Import the recording of an actor. The take is imported with the live import settings to the targets of the actor'''
+    bl_idname = "faceit.import_live_actor_take"
+    bl_label = "Import Actor Take"
+    bl_options = {'INTERNAL'}
+
+    actor_name: StringProperty(
+        name='Actor',
+        options={'SKIP_SAVE'},
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return not (context.scene.faceit_live_session_enabled or context.scene.faceit_osc_receiver_enabled)
+
+    def execute(self, context):
+        actor = live_session.actors.get(self.actor_name)
+        if actor is None or actor not in live_session.recorded_actors():
+            self.report({'WARNING'}, "No recorded data found.")
+            return {'CANCELLED'}
+        if context.scene.faceit_live_actors.get(self.actor_name) is None:
+            self.report({'WARNING'}, f"The actor {self.actor_name} has been removed.")
+            return {'CANCELLED'}
+        context.scene.faceit_live_source = actor.engine
+        engine_settings: Mocap_Engine_Properties = get_engine_settings(actor.engine)
+        actor.animator.set_source_shape_reference(list(get_shape_data_for_mocap_engine(actor.engine)))
+        actor.animator.set_rotation_units(engine_settings.rotation_units)
+        actor.animator.flip_animation = engine_settings.mirror_x
+        # The take file or the frame buffer of the actor is imported to the actor targets.
+        return bpy.ops.faceit.import_live_mocap('INVOKE_DEFAULT', actor_name=self.actor_name)
+
+
+class FACEIT_OT_ClearLiveSession(bpy.types.Operator):
+    '''Clear the recorded data of all actors (Destructive). Take files are kept on disk'''
+    bl_idname = "faceit.clear_live_session"
+    bl_label = "Clear Session Data"
+    bl_options = {'INTERNAL'}
+
+    @classmethod
+    def poll(cls, context):
+        return not context.scene.faceit_live_session_enabled
+
+    def execute(self, context):
+        live_session.clear()
+        return {'FINISHED'}
 
 
 class FACEIT_OT_ClearLiveData(bpy.types.Operator):
@@ -332,6 +846,8 @@ class FACEIT_OT_ReceiverCancel(bpy.types.Operator):
 def close_osc_on_scene_save(self, context):
     # abort live connection, don't write data.
     bpy.ops.faceit.receiver_cancel()
+    if live_session.enabled:
+        stop_live_session()
 
 
 def register():
@@ -1,123 +1,299 @@
-
+import selectors
 import socket
+import struct
 import time
-from threading import Thread, Event
+from threading import Thread
 
-from ..core.faceit_data import get_face_cap_shape_data
+import numpy as np
 
-from .decode_ifacialmocap import decode_ifacial_mocap
+from .decode_ifacialmocap import decode_ifacial_mocap, get_shape_index_dict
 from .decode_live_link_face import decode_live_link_face
-from .decode_face_cap_tile import decode_face_cap_tile
+from .decode_face_cap_tile import ParseError, decode_osc_packet, get_bundle_timetag
+from .live_buffer import FrameAssembler, FrameRingBuffer
+from .live_telemetry import LiveTelemetry
+from .live_timing import ClockSync, osc_timetag_to_seconds
 
-osc_queue = []
-# Exit event handles when the thread is ended.
-exit_event = Event()
+# Recorded live frames. Bounded, see FrameRingBuffer.
+osc_queue = FrameRingBuffer()
+# UDP payloads can't be larger than this. OSC bundles easily exceed the old 1024 bytes limit.
+MAX_DATAGRAM_SIZE = 65536
+# Ask the OS for a larger receive buffer to survive network bursts.
+SOCKET_RECEIVE_BUFFER_SIZE = 1 << 20
 
 
 class QueueManager:
-    '''Parse and queue incoming osc messages with current timestamp.'''
+    '''Queue incoming frame records with a timestamp on the local clock.
+    Frames that carry a device timestamp are mapped onto the local clock through the clock sync,
+    all others are stamped with the receive time.
+    '''
+
+    def __init__(self, frame_buffer=None):
+        self.frame_buffer = frame_buffer if frame_buffer is not None else osc_queue
+        # Assembles the per-value OSC messages (Face Cap, Tile) into frames.
+        self.assembler = FrameAssembler()
+        # Estimates offset and drift between the device clock and the local clock.
+        self.clock = ClockSync()
+        # Streams the frames to a take file (TakeWriter) when set.
+        self.take_writer = None
+
+    def _push(self, timestamp, values, flags, device_timestamp=np.nan):
+        self.frame_buffer.push(timestamp, values, flags, device_timestamp)
+        if self.take_writer is not None:
+            self.take_writer.append(timestamp, values, flags, device_timestamp)
+
+    def queue_frame(self, values, flags, device_timestamp=None):
+        '''Queue a complete frame record (see live_buffer channel layout).'''
+        timestamp = self._get_timestamp()
+        if device_timestamp is None:
+            self._push(timestamp, values, flags)
+        else:
+            timestamp = self.clock.add(device_timestamp, timestamp)
+            self._push(timestamp, values, flags, device_timestamp)
+
+    def queue_messages(self, messages, device_timestamp=None):
+        '''Queue all OSC messages of one datagram (bundle) as a complete frame.'''
+        self.commit()
+        timestamp = self._get_timestamp()
+        add_message = self.assembler.add_message
+        for address, values in messages:
+            completed = add_message(address, values, timestamp)
+            if completed is not None:
+                self._push(*completed)
+        completed = self.assembler.flush()
+        if completed is not None:
+            self.queue_frame(completed[1], completed[2], device_timestamp)
 
     def queue_data(self, target, values):
-        '''Queue the data with the current timestamp.'''
-        global osc_queue
+        '''Add a single OSC message to the current frame. Queues the frame once it is complete.'''
         # shapes: /W, values: [0.0, 0.0, 0.0, ...]
         # head rotation: /HR, values: [0.0, 0.0, 0.0, 0.0]
         # head translation: /HT, values: [0.0, 0.0, 0.0]
         # eye rotation: /ERL, values: [0.0, 0.0, 0.0, 0.0]
         # eye rotation right: /ERR, values: [0.0, 0.0, 0.0]
-        osc_queue.append([self._get_timestamp(), target, values])
+        completed = self.assembler.add_message(target, values, self._get_timestamp())
+        if completed is not None:
+            self._push(*completed)
+
+    def commit(self):
+        '''Queue the frame that is currently assembled.'''
+        completed = self.assembler.flush()
+        if completed is not None:
+            self._push(*completed)
 
     def _get_timestamp(self):
         return time.time()
 
     def reset(self):
         '''Clear the OSC queue for the next stream.'''
-        global osc_queue
-        osc_queue.clear()
+        self.assembler.reset()
+        self.clock.reset()
+        self.frame_buffer.clear()
+
+
+class ActorStream:
+    '''The datagrams of one device: decoded with its engine into its own queue and telemetry.
+    @source_address: only accept datagrams from this IP address. Empty accepts all senders.
+    @shape_reference: the iFacialMocap shape names in channel order. Defaults to the Face Cap names.
+    '''
+
+    def __init__(self, queue_mgr, engine='FACECAP', source_address='', shape_reference=None, telemetry=None):
+        self.queue_mgr = queue_mgr
+        # engine in ['EPIC', FACECAP, TILE, IFacialMocap]
+        self.engine = engine
+        self.source_address = source_address
+        self.shape_reference = None
+        if engine == 'IFACIALMOCAP':
+            if shape_reference is None:
+                from ..core.faceit_data import get_face_cap_shape_data
+                shape_reference = [target_data['name'] for target_data in get_face_cap_shape_data().values()]
+            self.shape_reference = get_shape_index_dict(shape_reference)
+        # Packet, error and timing statistics of the stream.
+        self.telemetry = telemetry if telemetry is not None else LiveTelemetry()
+        # The socket the stream receives on, set by the receiver.
+        self.sock = None
+
+    def accepts(self, source_address):
+        return not self.source_address or self.source_address == source_address
+
+    def decode(self, data):
+        try:
+            if self.engine in ('FACECAP', 'TILE', ):
+                messages = decode_osc_packet(data)
+                if len(messages) > 1:
+                    # Bundles and multi-message datagrams hold a whole frame.
+                    self.queue_mgr.queue_messages(messages, osc_timetag_to_seconds(get_bundle_timetag(data)))
+                else:
+                    for message in messages:
+                        self.queue_mgr.queue_data(*message)
+            else:
+                if self.engine == 'EPIC':
+                    frame = decode_live_link_face(data)
+                else:
+                    frame = decode_ifacial_mocap(data, self.shape_reference)
+                if frame is None:
+                    return
+                self.queue_mgr.queue_frame(*frame)
+        except (ValueError, IndexError, struct.error, ParseError) as e:
+            self.telemetry.record_error(e)
+            print('Packet contained no data')
+            print(e)
+        except KeyError as e:
+            self.telemetry.record_error(e)
+            print('KeyError:', e)
 
 
 class Receiver:
-    ''' Handle opening and closing of udp socket, Receive OSC messages and add to queue'''
+    ''' Handle opening and closing of the udp sockets. Receives the datagrams of one or more devices
+    (ActorStream) in a single thread: all sockets are multiplexed with one selector. Streams that share
+    a port are told apart by the source address of the datagrams.
+    '''
     sock = None
     queue_mgr = None
     run_thread = None
     enabled = False
-    shape_reference = []
     # engine in ['EPIC', FACECAP, TILE, IFacialMocap]
     engine = 'FACECAP'
 
-    def __init__(self, queue_mgr):
+    def __init__(self, queue_mgr=None):
         self.queue_mgr = queue_mgr
+        # Preallocated receive buffer, reused for every datagram.
+        self._buffer = bytearray(MAX_DATAGRAM_SIZE)
+        self._view = memoryview(self._buffer)
+        self._selector = None
+        # Socket pair used to wake up the selector when the receiver is stopped.
+        self._wakeup_recv = None
+        self._wakeup_send = None
+        # (address, port) -> (socket, list of streams)
+        self._sockets = {}
+        self.streams = []
+        # Datagrams no stream accepted (source address filter).
+        self.unrouted_count = 0
+        # Packet, error and timing statistics of the single device session (see start).
+        self.telemetry = LiveTelemetry()
 
     def run(self):
-        # Receive messages continuously. Run while the socket is open.
+        # Wait for incoming datagrams until the wakeup socket is written to.
+        selector = self._selector
         while True:
-            if exit_event.is_set():
-                break
-            if self.sock is None:
-                time.sleep(0.1)
-                print('thread is sleeping.')
-                continue
+            for key, _mask in selector.select():
+                if key.fileobj is self._wakeup_recv:
+                    return
+                self._drain_socket(key.fileobj, key.data)
 
-            data = None
+    def _drain_socket(self, sock, streams):
+        '''Receive and decode all pending datagrams of the socket.'''
+        recvfrom_into = sock.recvfrom_into
+        buffer = self._buffer
+        view = self._view
+        perf_counter = time.perf_counter
+        # Skip the routing for the common case of one device per port.
+        single_stream = streams[0] if len(streams) == 1 and not streams[0].source_address else None
+        while True:
             try:
-                data, _address = self.sock.recvfrom(1024)
-            except BlockingIOError as e:
-                print('Blocking error:', e)
-            except AttributeError as e:
-                print('Socket error:', e)
+                nbytes, address = recvfrom_into(buffer)
+            except BlockingIOError:
+                # No more pending datagrams.
+                return
             except OSError as e:
                 print('Packet error:', e.strerror)
+                return
+            if not nbytes:
+                continue
+            stream = single_stream
+            if stream is None:
+                stream = next((s for s in streams if s.accepts(address[0])), None)
+                if stream is None:
+                    self.unrouted_count += 1
+                    continue
+            start = perf_counter()
+            stream.decode(view[:nbytes])
+            stream.telemetry.record_packet(nbytes, perf_counter() - start)
+
+    def add_stream(self, stream, address, port):
+        '''Bind the socket for the stream or share an already bound socket. Call before start_streams.'''
+        # Port 0 binds a new socket to a free port.
+        entry = self._sockets.get((address, port)) if port else None
+        if entry is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_RECEIVE_BUFFER_SIZE)
+            except OSError:
+                pass
+            sock.setblocking(False)
+            try:
+                sock.bind((address, port))
+            except OSError:
+                sock.close()
+                raise
+            entry = self._sockets[(address, sock.getsockname()[1])] = (sock, [])
+        sock, streams = entry
+        # Streams with a source filter are tried first, the catch-all stream last.
+        streams.append(stream)
+        streams.sort(key=lambda s: not s.source_address)
+        stream.sock = sock
+        self.streams.append(stream)
+        return stream
 
-            if data:
-                try:
-                    if self.engine in ('FACECAP', 'TILE', ):
-                        target, value = decode_face_cap_tile(data)
-                        self.queue_mgr.queue_data(target, value)
-                    elif self.engine == 'EPIC':
-                        data = decode_live_link_face(data)
-                        if data is None:
-                            continue
-                        for target, value in data:
-                            self.queue_mgr.queue_data(target, value)
-                    else:
-                        data = decode_ifacial_mocap(data, self.shape_reference)
-                        if data is None:
-                            continue
-                        for target, value in data:
-                            self.queue_mgr.queue_data(target, value)
-                except ValueError as e:
-                    print('Packet contained no data')
-                    print(e)
-                except KeyError as e:
-                    print('KeyError:', e)
-
-    def start(self, engine, address, port):
-        ''' Open the socket, start the thread. '''
+    def start(self, engine, address, port, shape_reference=None):
+        ''' Open the socket for a single device, start the thread.
+        @shape_reference: the iFacialMocap shape names in channel order. Defaults to the Face Cap names.
+        '''
         self.engine = engine
-        if self.engine == 'IFACIALMOCAP':
-            self.shape_reference = [target_data['name'] for target_data in get_face_cap_shape_data().values()]
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.sock.setblocking(1)
-        self.sock.bind((address, port))
-        print(f'Start listening to OSC on Port {port}')
+        stream = ActorStream(self.queue_mgr, engine, shape_reference=shape_reference, telemetry=self.telemetry)
+        try:
+            self.add_stream(stream, address, port)
+        except OSError:
+            self._close_sockets()
+            raise
+        self.sock = stream.sock
+        self.start_streams()
+
+    def start_streams(self):
+        '''Start the receiving thread for all added streams.'''
+        self._wakeup_recv, self._wakeup_send = socket.socketpair()
+        self._wakeup_recv.setblocking(False)
+        self._selector = selectors.DefaultSelector()
+        for (_address, port), (sock, streams) in self._sockets.items():
+            self._selector.register(sock, selectors.EVENT_READ, streams)
+            print(f'Start listening to OSC on Port {port}')
+        self._selector.register(self._wakeup_recv, selectors.EVENT_READ)
+        for stream in self.streams:
+            stream.telemetry.reset()
+        self.unrouted_count = 0
         # Start the thread
-        exit_event.clear()
-        self.run_thread = Thread(target=self.run)
+        self.run_thread = Thread(target=self.run, daemon=True)
         self.run_thread.start()
         self.enabled = True
 
+    def _close_sockets(self):
+        for sock, _streams in self._sockets.values():
+            sock.close()
+        self._sockets = {}
+        self.streams = []
+        self.sock = None
+
     def stop(self):
-        ''' Close the socket, end the thread. '''
+        ''' Wake up and end the thread, close the sockets. '''
         self.enabled = False
-        if self.sock is not None:
-            # Close the socket
-            self.sock.close()
-            self.sock = None
-            # End the thread
-            print("Stopped listening to OSC.")
-        else:
-            pass
-        exit_event.set()
+        if self._wakeup_send is not None:
+            try:
+                self._wakeup_send.send(b'\x00')
+            except OSError:
+                pass
         if self.run_thread is not None:
             self.run_thread.join()
+            self.run_thread = None
+        if self._selector is not None:
+            self._selector.close()
+            self._selector = None
+        for sock in (self._wakeup_recv, self._wakeup_send):
+            if sock is not None:
+                sock.close()
+        self._wakeup_recv = self._wakeup_send = None
+        streams = self.streams
+        if self._sockets:
+            self._close_sockets()
+            print("Stopped listening to OSC.")
+        # Keep the last (possibly incomplete) frame.
+        for stream in streams:
+            stream.queue_mgr.commit()
@@ -63,6 +63,18 @@ class FACEIT_PT_BakeExpressions(FACEIT_PT_BaseBake, Panel):
         status_icon = '✓' if bake_info['shapes_generated'] else '○'
         row.label(text=f"🔥 Bake - Modifiers: {bake_info['bake_modifiers']} | Actions: {bake_info['bake_actions']} | SK: {status_icon}", icon='INFO')
         row.operator('faceit.bake_info', text='', icon='QUESTION')
+        # Expressions ignorées par le dernier bake incrémental
+        skipped = bake_info['skipped_expressions']
+        if skipped:
+            row = box.row()
+            row.label(text=f"Skipped (unchanged): {len(skipped)} | Re-baked: {len(bake_info['rebaked_expressions'])}",
+                      icon='SHAPEKEY_DATA')
+            for line in skipped[:5]:
+                row = box.row()
+                row.label(text=line)
+            if len(skipped) > 5:
+                row = box.row()
+                row.label(text=f"... {len(skipped) - 5} more")
         col.separator()
         
         col.use_property_split = True
@@ -7,6 +7,7 @@ from ..core.faceit_data import get_engine_settings
 from .draw_utils import draw_eye_targets_layout, draw_head_targets_layout, draw_shapes_action_layout
 from .ui import FACEIT_PT_Base, FACEIT_PT_BaseSub
 from ..mocap.osc_receiver import osc_queue
+from ..mocap.osc_operators import get_live_take_path, live_animator, live_session, queue_mgr, receiver
 from ..panels.draw_utils import draw_text_block
 from ..ctrl_rig.control_rig_utils import is_control_rig_connected
 
@@ -131,6 +132,13 @@ class FACEIT_PT_MocapImporters(FACEIT_PT_BaseMocap, bpy.types.Panel):
     def poll(cls, context):
         return super().poll(context)
 
+    def draw(self, context):
+        layout = self.layout
+        prefs = context.preferences.addons["faceit"].preferences
+        row = layout.row(align=True)
+        row.prop(prefs, 'use_mocap_parse_cache', icon='FILE_CACHE')
+        row.operator('faceit.clear_mocap_parse_cache', text='', icon='TRASH')
+
 
 class FACEIT_PT_MocapA2F(FACEIT_PT_BaseSub, bpy.types.Panel):
     bl_label = 'Audio2Face'
@@ -165,6 +173,9 @@ class FACEIT_PT_MocapA2F(FACEIT_PT_BaseSub, bpy.types.Panel):
 
         row.operator('faceit.import_a2f_mocap', icon='IMPORT')
         row.enabled = (a2f_mocap_settings.filename != '')
+        row = col.row(align=True)
+        row.operator_context = 'INVOKE_DEFAULT'
+        row.operator('faceit.batch_import_mocap', icon='DOCUMENTS').engine = 'A2F'
 
 
 class FACEIT_PT_MocapFaceCap(FACEIT_PT_BaseSub, bpy.types.Panel):
@@ -198,6 +209,9 @@ class FACEIT_PT_MocapFaceCap(FACEIT_PT_BaseSub, bpy.types.Panel):
 
         row.operator('faceit.import_face_cap_mocap', icon='IMPORT')
         row.enabled = (face_cap_mocap_settings.filename != '')
+        row = col.row(align=True)
+        row.operator_context = 'INVOKE_DEFAULT'
+        row.operator('faceit.batch_import_mocap', icon='DOCUMENTS').engine = 'FACECAP'
 
 
 class FACEIT_PT_MocapEpic(FACEIT_PT_BaseSub, bpy.types.Panel):
@@ -231,6 +245,9 @@ class FACEIT_PT_MocapEpic(FACEIT_PT_BaseSub, bpy.types.Panel):
 
         row.operator('faceit.import_epic_mocap', icon='IMPORT')
         row.enabled = (ue_mocap_settings.filename != '')
+        row = col.row(align=True)
+        row.operator_context = 'INVOKE_DEFAULT'
+        row.operator('faceit.batch_import_mocap', icon='DOCUMENTS').engine = 'EPIC'
 
 
 class FACEIT_PT_MocapLive(FACEIT_PT_BaseMocap, bpy.types.Panel):
@@ -247,7 +264,7 @@ class FACEIT_PT_MocapLive(FACEIT_PT_BaseMocap, bpy.types.Panel):
         layout = self.layout
         scene = context.scene
 
-        recorded_data_found = bool(osc_queue)
+        recorded_data_found = bool(osc_queue) or get_live_take_path() is not None
         receiver_enabled = scene.faceit_osc_receiver_enabled
         col = layout.column(align=True)
         row = col.row(align=False)
@@ -277,10 +294,44 @@ class FACEIT_PT_MocapLive(FACEIT_PT_BaseMocap, bpy.types.Panel):
         else:
             row.operator("faceit.receiver_stop", icon='PAUSE')
 
-        if osc_queue and not receiver_enabled:
+        if recorded_data_found and not receiver_enabled:
             row = col.row(align=True)
             row.operator("faceit.import_live_mocap", icon='IMPORT')
             row.operator("faceit.clear_live_data", icon='X')
+        elif not receiver_enabled:
+            row = col.row(align=True)
+            row.operator("faceit.recover_live_take", icon='RECOVER_LAST')
+        if osc_queue:
+            row = col.row(align=True)
+            row.label(text=f"Recorded Frames: {len(osc_queue)} / {osc_queue.capacity}")
+            live_target_plan = live_animator.live_target_plan
+            if receiver_enabled and live_target_plan.apply_count:
+                row = col.row(align=True)
+                row.label(text=f"Shape Keys Apply: {live_target_plan.mean_apply_time * 1000:.2f} ms / frame")
+            jitter_buffer = live_animator.jitter_buffer
+            if receiver_enabled and jitter_buffer is not None and (jitter_buffer.late_count or jitter_buffer.underrun_count):
+                row = col.row(align=True)
+                row.label(text=f"Late Frames: {jitter_buffer.late_count}, Underruns: {jitter_buffer.underrun_count}")
+            telemetry = receiver.telemetry
+            if receiver_enabled and telemetry.packets.count:
+                latency = telemetry.latency.summary(1000)
+                apply_time = telemetry.apply_time.summary(1000)
+                row = col.row(align=True)
+                row.label(text=f"Packets: {telemetry.packets.rate:.0f}/s, Errors: {telemetry.error_count}")
+                row = col.row(align=True)
+                row.label(text=f"Latency: {latency['p50']:.1f} ms (p95 {latency['p95']:.1f} ms)")
+                row = col.row(align=True)
+                row.label(text=f"Apply: {apply_time['mean']:.2f} ms (p95 {apply_time['p95']:.2f} ms)")
+            if telemetry.packets.count:
+                row = col.row(align=True)
+                row.operator("faceit.export_live_telemetry", icon='EXPORT')
+            clock = queue_mgr.clock
+            if receiver_enabled and clock:
+                row = col.row(align=True)
+                row.label(text=f"Device Clock Drift: {clock.drift * 1e6:.0f} ppm", icon='TIME')
+            if osc_queue.overflow_count:
+                row = col.row(align=True)
+                row.label(text=f"Buffer Full! {osc_queue.overflow_count} frames overwritten.", icon='ERROR')
 
         recorder_settings_box = col.box()
         recorder_settings_box.enabled = not (recorded_data_found or receiver_enabled)
@@ -296,6 +347,21 @@ class FACEIT_PT_MocapLive(FACEIT_PT_BaseMocap, bpy.types.Panel):
         row.prop(engine_settings, "show_record_options", icon=icon, emboss=False)
         if not engine_settings.show_record_options:
             return
+        row = col.row(align=True)
+        row.prop(engine_settings, "live_buffer_capacity")
+        row = col.row(align=True)
+        row.prop(engine_settings, "record_to_file", icon='FILE_TICK')
+        row = col.row(align=True)
+        row.prop(engine_settings, "use_jitter_buffer", icon='TIME')
+        sub = row.row(align=True)
+        sub.enabled = engine_settings.use_jitter_buffer
+        sub.prop(engine_settings, "jitter_buffer_latency")
+        row = col.row(align=True)
+        row.prop(engine_settings, "live_filter", icon='MOD_SMOOTH')
+        if engine_settings.live_filter == 'ONE_EURO':
+            row = col.row(align=True)
+            row.prop(engine_settings, "live_filter_min_cutoff")
+            row.prop(engine_settings, "live_filter_beta")
         # col.separator()
         animate_loc = engine_settings.animate_head_location and engine_settings.can_animate_head_location
         animate_rot = engine_settings.animate_head_rotation and engine_settings.can_animate_head_rotation
@@ -448,6 +514,97 @@ class FACEIT_PT_MocapLive(FACEIT_PT_BaseMocap, bpy.types.Panel):
                     row.prop(engine_settings, 'smooth_window_eye_bones')
 
 
+class FACEIT_UL_LiveActors(bpy.types.UIList):
+
+    def draw_item(self, context, layout, data, item, icon, active_data, active_propname):
+        if self.layout_type in {'DEFAULT', 'COMPACT'}:
+            row = layout.row(align=True)
+            row.prop(item, 'enabled', text='')
+            sub = row.row(align=True)
+            sub.enabled = item.enabled
+            sub.prop(item, 'name', text='', emboss=False, icon='USER')
+            sub.label(text=f"{item.engine.title()} : {item.port}")
+        else:
+            layout.alignment = 'CENTER'
+            layout.label(text='',)
+
+
+class FACEIT_PT_MocapLiveSession(FACEIT_PT_BaseSub, bpy.types.Panel):
+    bl_label = 'Multi Actor Session'
+    bl_idname = 'FACEIT_PT_MocapLiveSession'
+    bl_parent_id = 'FACEIT_PT_MocapLive'
+
+    @classmethod
+    def poll(cls, context):
+        return super().poll(context)
+
+    def draw(self, context):
+        layout = self.layout
+        scene = context.scene
+        session_enabled = scene.faceit_live_session_enabled
+
+        col = layout.column(align=True)
+        row = col.row()
+        row.template_list('FACEIT_UL_LiveActors', '', scene, 'faceit_live_actors', scene, 'faceit_live_actor_index')
+        col_ul = row.column(align=True)
+        col_ul.operator('faceit.add_live_actor', text='', icon='ADD')
+        col_ul.operator('faceit.remove_live_actor', text='', icon='REMOVE')
+
+        actors = scene.faceit_live_actors
+        index = scene.faceit_live_actor_index
+        if 0 <= index < len(actors):
+            actor_props = actors[index]
+            box = col.box()
+            box.enabled = not session_enabled
+            sub = box.column(align=True)
+            sub.use_property_split = True
+            sub.use_property_decorate = False
+            sub.prop(actor_props, 'engine')
+            sub.prop(actor_props, 'address')
+            sub.prop(actor_props, 'port')
+            sub.prop(actor_props, 'source_address')
+            sub.separator()
+            sub.prop(actor_props, 'target_collection')
+            sub.prop(actor_props, 'control_rig')
+            sub.separator()
+            sub.prop(actor_props, 'head_target_object')
+            head_obj = actor_props.head_target_object
+            if head_obj and head_obj.type == 'ARMATURE':
+                sub.prop_search(actor_props, 'head_sub_target', head_obj.data, 'bones', icon='BONE_DATA')
+            sub.prop(actor_props, 'eye_target_rig')
+            eye_rig = actor_props.eye_target_rig
+            if eye_rig:
+                sub.prop_search(actor_props, 'eye_L_sub_target', eye_rig.data, 'bones', icon='BONE_DATA')
+                sub.prop_search(actor_props, 'eye_R_sub_target', eye_rig.data, 'bones', icon='BONE_DATA')
+            sub.label(text="Motion and filter settings are taken from the live source settings.", icon='INFO')
+
+        col.separator()
+        row = col.row(align=True)
+        if not session_enabled:
+            row.operator('faceit.live_session_start', icon='PLAY')
+        else:
+            row.operator('faceit.live_session_stop', icon='PAUSE')
+        for actor in live_session.actors.values():
+            box = col.box()
+            sub = box.column(align=True)
+            row = sub.row(align=True)
+            row.label(text=f"{actor.name}: {len(actor.frame_buffer)} Frames", icon='USER')
+            if not session_enabled and actor in live_session.recorded_actors():
+                row.operator('faceit.import_live_actor_take', text='', icon='IMPORT').actor_name = actor.name
+            telemetry = actor.telemetry
+            if session_enabled and telemetry.packets.count:
+                latency = telemetry.latency.summary(1000)
+                row = sub.row(align=True)
+                row.label(text=f"Packets: {telemetry.packets.rate:.0f}/s, Errors: {telemetry.error_count}, "
+                          f"Latency: {latency['p50']:.1f} ms")
+            if actor.frame_buffer.overflow_count:
+                row = sub.row(align=True)
+                row.label(text=f"Buffer Full! {actor.frame_buffer.overflow_count} frames overwritten.", icon='ERROR')
+        if live_session and not session_enabled:
+            row = col.row(align=True)
+            row.operator('faceit.clear_live_session', icon='X')
+
+
 # class FACEIT_PT_MocapUtils(FACEIT_PT_BaseMocap, bpy.types.Panel):
 #     bl_label = 'Other Tools and Utilities'
 #     bl_idname = 'FACEIT_PT_MocapUtils'
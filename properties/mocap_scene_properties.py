@@ -13,6 +13,7 @@ except ImportError:
         SoundSequence = None
 
 from ..mocap.mocap_utils import SmoothBaseProperties
+from ..mocap.live_buffer import DEFAULT_CAPACITY
 
 from ..core.retarget_list_base import FaceRegionsBase
 
@@ -99,6 +100,56 @@ class Mocap_Engine_Properties(SmoothBaseProperties, PropertyGroup):
         description="When this option is enabled the rotation of the eyes (eye bones) is animated/recorded. A mix with shapes might be required if your eyelids are not driven by the bone rotation.",
         default=True
     )
+    live_buffer_capacity: IntProperty(
+        name='Buffer Capacity',
+        default=DEFAULT_CAPACITY,
+        min=600,
+        soft_max=432000,
+        description='The maximum number of frames kept for a live recording. When the buffer is full, the oldest frames are overwritten. 60 frames per second are about 15 KB.',
+    )
+    record_to_file: BoolProperty(
+        name='Save Take File',
+        default=True,
+        description='Stream the recording to a take file in the faceit_takes folder next to the blend file (temp folder for unsaved files). Long takes don\'t need to fit into memory and can be recovered after a crash.',
+    )
+    use_jitter_buffer: BoolProperty(
+        name='Jitter Buffer',
+        default=False,
+        description='Delay the live preview by a constant latency and interpolate between the received frames. Smooths out irregular network delivery (WiFi).',
+    )
+    jitter_buffer_latency: IntProperty(
+        name='Latency (ms)',
+        default=50,
+        min=10,
+        soft_min=30,
+        soft_max=80,
+        max=250,
+        description='The playback delay of the jitter buffer in milliseconds. Higher values absorb more jitter but delay the preview.',
+    )
+    live_filter: EnumProperty(
+        name='Live Filter',
+        items=(
+            ('SMA', 'Moving Average', 'Average of the last values within the smooth window. Adds lag to fast motion.'),
+            ('EMA', 'Exponential', 'Exponential moving average, equivalent to the smooth window. Less lag than the moving average.'),
+            ('ONE_EURO', 'One Euro', 'Adaptive filter: smooths slow motion (jitter) strongly and follows fast motion (lip shapes) with little lag.'),
+        ),
+        default='SMA',
+        description='The filter used for the smoothing of the live preview.',
+    )
+    live_filter_min_cutoff: FloatProperty(
+        name='Min Cutoff',
+        default=1.0,
+        min=0.01,
+        soft_max=10.0,
+        description='One Euro: the cutoff frequency (Hz) for slow motion. Lower values remove more jitter but add lag.',
+    )
+    live_filter_beta: FloatProperty(
+        name='Speed Coefficient',
+        default=0.5,
+        min=0.0,
+        soft_max=10.0,
+        description='One Euro: how fast the cutoff increases with the speed of the motion. Higher values reduce the lag of fast motion.',
+    )
     can_animate_head_location: BoolProperty(
         default=True
     )
@@ -110,6 +161,91 @@ class Mocap_Engine_Properties(SmoothBaseProperties, PropertyGroup):
     )
 
 
+LIVE_SOURCE_ITEMS = (
+    ('FACECAP', 'Face Cap', 'Face Cap App '),
+    ('TILE', 'Hallway Cube', 'Hallway Cube'),
+    ('EPIC', 'Live Link Face', 'Epic Live Link Face '),
+    ('IFACIALMOCAP', 'iFacialMocap', 'iFacialMocap '),
+)
+
+
+def is_armature_object(self, obj):
+    return obj.type == 'ARMATURE'
+
+
+def update_live_actor_engine(self, context):
+    '''Use the default port of the engine settings.'''
+    engine_settings = context.scene.faceit_live_mocap_settings.get(self.engine)
+    if engine_settings is not None:
+        self.port = engine_settings.port
+
+
+class Live_Actor_Properties(PropertyGroup):
+    '''One performer of a multi actor live session. Motion and filter settings are taken from the engine settings.'''
+    name: StringProperty(
+        name='Name',
+        default='Actor',
+    )
+    enabled: BoolProperty(
+        name='Enabled',
+        default=True,
+        description='Receive and animate this actor in the live session.',
+    )
+    engine: EnumProperty(
+        name='Live Source',
+        items=LIVE_SOURCE_ITEMS,
+        default='FACECAP',
+        update=update_live_actor_engine,
+    )
+    address: StringProperty(
+        name='Address',
+        default='0.0.0.0',
+        description='The local address to listen on.',
+    )
+    port: IntProperty(
+        name='Port',
+        default=9001,
+        description='Actors can share a port if they are told apart by their source address.',
+    )
+    source_address: StringProperty(
+        name='Device IP',
+        default='',
+        description='Only accept data sent from this IP address (the phone of the actor). Leave empty to accept any sender on the port.',
+    )
+    target_collection: PointerProperty(
+        name='Target Collection',
+        type=bpy.types.Collection,
+        description='The meshes in this collection are animated with the ARKit target shapes list of the scene.',
+    )
+    control_rig: PointerProperty(
+        name='Control Rig',
+        type=Object,
+        poll=is_armature_object,
+        description='Optional. Animate the target objects and expressions of this control rig instead of the target collection.',
+    )
+    head_target_object: PointerProperty(
+        type=Object,
+        name='Head Object',
+        description='The head target object of this actor. MESH or ARMATURE',
+    )
+    head_sub_target: StringProperty(
+        name='Head Bone',
+        description='The target bone for the head animation.',
+    )
+    eye_target_rig: PointerProperty(
+        type=Object,
+        name='Eye Rig',
+        poll=is_armature_object,
+        description='The eye rig of this actor. ARMATURE',
+    )
+    eye_L_sub_target: StringProperty(
+        name='Eye L Bone',
+    )
+    eye_R_sub_target: StringProperty(
+        name='Eye R Bone',
+    )
+
+
 def shapes_action_poll(self, action):
     '''Check if the action is suitable for shape key animation.'''
     return any(['key_block' in fc.data_path for fc in action.fcurves]) or len(action.fcurves) == 0
@@ -220,12 +356,7 @@ def register():
 
     Scene.faceit_live_source = EnumProperty(
         name="Live Source",
-        items=(
-            ('FACECAP', 'Face Cap', 'Face Cap App '),
-            ('TILE', 'Hallway Cube', 'Hallway Cube'),
-            ('EPIC', 'Live Link Face', 'Epic Live Link Face '),
-            ('IFACIALMOCAP', 'iFacialMocap', 'iFacialMocap '),
-        ),
+        items=LIVE_SOURCE_ITEMS,
         default='FACECAP'
     )
     Scene.faceit_osc_receiver_enabled = BoolProperty(
@@ -238,6 +369,21 @@ def register():
         description="Disconnect the control rig drivers while recording.",
         default=True,
     )
+    ############## Multi Actor Live Session ##################
+
+    Scene.faceit_live_actors = CollectionProperty(
+        type=Live_Actor_Properties,
+        name='Live Actors',
+    )
+    Scene.faceit_live_actor_index = IntProperty(
+        name='Active Actor',
+        default=0,
+    )
+    Scene.faceit_live_session_enabled = BoolProperty(
+        name="Live Session Enabled",
+        default=False,
+        description="Multi actor session running."
+    )
 
 
 def unregister():
@@ -249,3 +395,6 @@ def unregister():
     del Scene.faceit_head_target_object
     del Scene.faceit_head_sub_target
     del Scene.faceit_auto_disconnect_ctrl_rig
+    del Scene.faceit_live_actors
+    del Scene.faceit_live_actor_index
+    del Scene.faceit_live_session_enabled
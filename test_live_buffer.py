@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Test du tampon circulaire (FrameRingBuffer) utilisé pour l'enregistrement live
+Ne dépend pas de bpy, peut être lancé hors de Blender
+"""
+
+def test_push_and_snapshot():
+    """Test l'ordre chronologique des frames enregistrées"""
+    print("=== TEST PUSH / SNAPSHOT ===")
+    import numpy as np
+    from mocap.live_buffer import FrameRingBuffer, NUM_CHANNELS, FLAG_SHAPES
+
+    buffer = FrameRingBuffer(capacity=8)
+    for i in range(5):
+        buffer.push(float(i), np.full(NUM_CHANNELS, i, dtype=np.float32), FLAG_SHAPES)
+    timestamps, data, flags = buffer.snapshot()
+    assert len(buffer) == 5
+    assert timestamps.tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert data[:, 0].tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert (flags == FLAG_SHAPES).all()
+    assert buffer.overflow_count == 0
+    print("✅ Frames restituées dans l'ordre")
+
+
+def test_overflow():
+    """Test l'écrasement des plus anciennes frames quand le tampon est plein"""
+    print("\n=== TEST DÉBORDEMENT ===")
+    import numpy as np
+    from mocap.live_buffer import FrameRingBuffer, NUM_CHANNELS
+
+    buffer = FrameRingBuffer(capacity=4)
+    for i in range(10):
+        buffer.push(float(i), np.zeros(NUM_CHANNELS))
+    timestamps, _data, _flags = buffer.snapshot()
+    assert len(buffer) == 4
+    assert timestamps.tolist() == [6.0, 7.0, 8.0, 9.0]
+    assert buffer.overflow_count == 6
+    print("✅ 6 frames écrasées, les 4 plus récentes conservées")
+
+
+def test_read_since():
+    """Test la lecture incrémentale par le timer"""
+    print("\n=== TEST LECTURE INCRÉMENTALE ===")
+    import numpy as np
+    from mocap.live_buffer import FrameRingBuffer, NUM_CHANNELS
+
+    buffer = FrameRingBuffer(capacity=4)
+    cursor = 0
+    for i in range(3):
+        buffer.push(float(i), np.zeros(NUM_CHANNELS))
+    cursor, timestamps, _data, _flags = buffer.read_since(cursor)
+    assert cursor == 3 and timestamps.tolist() == [0.0, 1.0, 2.0]
+    for i in range(3, 10):
+        buffer.push(float(i), np.zeros(NUM_CHANNELS))
+    cursor, timestamps, _data, _flags = buffer.read_since(cursor)
+    assert cursor == 10 and timestamps.tolist() == [6.0, 7.0, 8.0, 9.0]
+    assert buffer.skipped_count == 3
+    assert buffer.latest()[1] == 9.0
+    buffer.clear()
+    assert not buffer and buffer.latest() is None
+    print("✅ Curseur, frames sautées et remise à zéro OK")
+
+
+def test_frame_assembler():
+    """Test l'assemblage des messages OSC Face Cap en frames"""
+    print("\n=== TEST ASSEMBLAGE FACE CAP ===")
+    from mocap.live_buffer import FrameAssembler, HEAD_ROT, EYE_L, FLAG_SHAPES, FLAG_HEAD_ROT, FLAG_EYE_L
+
+    assembler = FrameAssembler()
+    assert assembler.add_message('/HR', [1.0, 2.0, 3.0], 0.0) is None
+    for i in range(52):
+        assert assembler.add_message('/W', (i, i / 100), 0.1) is None
+    assert assembler.add_message('/ELR', [4.0, 5.0], 0.2) is None
+    timestamp, values, flags = assembler.add_message('/W', (0, 0.5), 1.0)
+    assert timestamp == 0.0
+    assert flags == FLAG_SHAPES | FLAG_HEAD_ROT | FLAG_EYE_L
+    assert values[HEAD_ROT].tolist() == [1.0, 2.0, 3.0]
+    assert values[EYE_L].tolist() == [4.0, 5.0, 0.0]
+    assert abs(values[51] - 0.51) < 1e-6
+    timestamp, values, flags = assembler.flush()
+    assert timestamp == 1.0 and flags == FLAG_SHAPES and values[0] == 0.5
+    assert assembler.flush() is None
+    print("✅ Une frame par cycle d'index de shapes")
+
+
+def test_decode_live_link_face():
+    """Test le décodage d'un paquet Live Link Face en frame"""
+    print("\n=== TEST DÉCODAGE LIVE LINK FACE ===")
+    import struct
+    from mocap.decode_live_link_face import decode_live_link_face
+    from mocap.live_buffer import HEAD_ROT, EYE_L, EYE_R, SHAPES
+
+    name = b'iPhone'
+    data = [i / 100 for i in range(61)]
+    packet = struct.pack('<i', 6) + b'0' * 37 + struct.pack('!i', len(name)) + name
+    packet += struct.pack('!if2ib', 120, 0.0, 60, 1, 61) + struct.pack('!61f', *data)
+    values, _flags, device_time = decode_live_link_face(packet)
+    assert device_time == 2.0
+    assert abs(values[SHAPES][10] - 0.1) < 1e-6
+    assert [round(v, 2) for v in values[HEAD_ROT]] == [-0.53, -0.52, -0.54]
+    assert [round(v, 2) for v in values[EYE_L]] == [0.56, 0.55, 0.0]
+    assert [round(v, 2) for v in values[EYE_R]] == [0.59, 0.58, 0.0]
+    print("✅ Shapes, tête et yeux au format Face Cap")
+
+
+def test_decode_osc_bundle():
+    """Test le décodage des bundles OSC et des datagrammes multi-messages"""
+    print("\n=== TEST BUNDLES OSC ===")
+    from mocap.decode_face_cap_tile import build_bundle, build_message, decode_face_cap_tile, decode_osc_packet
+
+    messages = [build_message('/W', (i, i / 100)) for i in range(52)]
+    messages.append(build_message('/HR', (1.0, 2.0, 3.0)))
+    decoded = decode_osc_packet(build_bundle(messages))
+    assert len(decoded) == 53
+    assert decoded[10][0] == '/W' and decoded[10][1][0] == 10
+    assert decoded[-1] == ('/HR', (1.0, 2.0, 3.0))
+    assert decode_osc_packet(messages[0] + messages[-1]) == [decoded[0], decoded[-1]]
+    address, params = decode_face_cap_tile(messages[5])
+    assert decode_osc_packet(messages[5]) == [(address, tuple(params))]
+    # Un message de taille variable (chaîne) suivi d'autres messages dans le même datagramme
+    text = build_message('/name', ('actor', 2, True))
+    assert decode_osc_packet(text + messages[0] + messages[-1]) == [
+        ('/name', ['actor', 2, True]), decoded[0], decoded[-1]]
+    print("✅ Un datagramme = une frame complète")
+
+
+def test_jitter_buffer():
+    """Test la lecture retardée et interpolée des frames live"""
+    print("\n=== TEST JITTER BUFFER ===")
+    import numpy as np
+    from mocap.live_buffer import JitterBuffer, NUM_CHANNELS, FLAG_SHAPES
+
+    def frames(timestamps):
+        timestamps = np.array(timestamps, dtype=np.float64)
+        data = np.repeat(timestamps[:, None], NUM_CHANNELS, axis=1).astype(np.float32)
+        return timestamps, data, np.full(len(timestamps), FLAG_SHAPES, dtype=np.uint8)
+
+    jitter = JitterBuffer(latency=0.05)
+    # Frames arrivées dans le désordre
+    jitter.add(*frames([0.1, 0.0, 0.05]))
+    assert jitter.sample(0.04) is None
+    values, flags = jitter.sample(0.075)
+    assert abs(values[0] - 0.025) < 1e-6 and flags == FLAG_SHAPES
+    # Frame en retard : plus ancienne que le temps de lecture
+    jitter.add(*frames([0.02, 0.15]))
+    assert jitter.late_count == 1
+    values, _flags = jitter.sample(0.175)
+    assert abs(values[0] - 0.125) < 1e-6
+    assert len(jitter) == 2
+    # Plus de nouvelles frames : la dernière est tenue une seule fois
+    assert jitter.sample(0.3)[0][0] == np.float32(0.15)
+    assert jitter.sample(0.31) is None
+    assert jitter.underrun_count == 1
+    print("✅ Réordonnancement, interpolation et frames en retard OK")
+
+
+def test_clock_sync():
+    """Test l'estimation du décalage et de la dérive de l'horloge de l'appareil"""
+    print("\n=== TEST SYNCHRO HORLOGE ===")
+    import numpy as np
+    from mocap.live_timing import ClockSync
+
+    rng = np.random.default_rng(0)
+    clock = ClockSync(window=600, refit_interval=30)
+    device_times = np.arange(1200) / 60
+    # Décalage de 100 s, dérive de 200 ppm, délai réseau de 5 à 40 ms
+    local_times = 100.0 + device_times * (1 + 200e-6)
+    delays = 0.005 + rng.exponential(0.01, len(device_times))
+    for device_time, receive_time in zip(device_times, local_times + delays):
+        mapped = clock.add(device_time, receive_time)
+    assert abs(clock.drift - 200e-6) < 50e-6
+    assert abs(mapped - local_times[-1] - 0.005) < 0.002
+    # Remise à zéro de l'horloge de l'appareil (redémarrage de l'app)
+    clock.add(0.0, local_times[-1] + 0.02)
+    assert clock.reset_count == 1
+    # Ajustement sur toute la prise enregistrée
+    mapped = ClockSync().fit(device_times, local_times + delays)
+    assert np.abs(mapped - local_times - 0.005).max() < 0.002
+    print("✅ Dérive et délai minimal estimés, réinitialisation détectée")
+
+
+def test_resample_to_frame_grid():
+    """Test le rééchantillonnage des frames enregistrées sur les frames de la scène"""
+    print("\n=== TEST RÉÉCHANTILLONNAGE ===")
+    import numpy as np
+    from mocap.live_buffer import NUM_CHANNELS, FLAG_SHAPES, FLAG_HEAD_ROT, HEAD_ROT
+    from mocap.live_timing import resample_to_frame_grid, select_frame_times
+
+    # 60 fps enregistré, scène à 24 fps, arrivée dans le désordre
+    times = np.array([0.0, 2 / 60, 1 / 60, 3 / 60, 4 / 60, 5 / 60])
+    data = np.zeros((len(times), NUM_CHANNELS), dtype=np.float32)
+    data[:, 0] = times * 60
+    data[:, HEAD_ROT] = (times * 60)[:, None]
+    flags = np.full(len(times), FLAG_SHAPES, dtype=np.uint8)
+    flags[:3] |= FLAG_HEAD_ROT
+    frames, values, grid_flags = resample_to_frame_grid(times, data, flags, 24, frame_start=10)
+    assert frames.tolist() == [10, 11, 12]
+    assert np.allclose(values[:, 0], [0.0, 2.5, 5.0])
+    assert grid_flags.tolist() == [FLAG_SHAPES | FLAG_HEAD_ROT, FLAG_SHAPES, FLAG_SHAPES]
+    assert values[1, HEAD_ROT].tolist() == [0.0, 0.0, 0.0]
+    # Bords maintenus : valeur de la dernière frame reçue, masque inchangé
+    _frames, held, held_flags = resample_to_frame_grid(times, data, flags, 24, frame_start=10, hold_edges=True)
+    assert held[1, HEAD_ROT].tolist() == [2.0, 2.0, 2.0] and (held_flags == grid_flags).all()
+    # Trou de 10 frames comblé par interpolation, comparé à np.interp
+    gap_times = np.delete(np.arange(40) / 60, np.arange(15, 25))
+    gap_data = np.random.default_rng(0).random((len(gap_times), NUM_CHANNELS)).astype(np.float32)
+    gap_flags = np.full(len(gap_times), FLAG_SHAPES | FLAG_HEAD_ROT, dtype=np.uint8)
+    frames, values, grid_flags = resample_to_frame_grid(gap_times, gap_data, gap_flags, 60)
+    assert len(frames) == 40 and (grid_flags == FLAG_SHAPES | FLAG_HEAD_ROT).all()
+    assert np.allclose(values[:, 3], np.interp(frames, gap_times * 60, gap_data[:, 3]), atol=1e-6)
+    receive_times = times + 0.3
+    assert select_frame_times(receive_times, np.full(len(times), np.nan)) is receive_times
+    assert np.allclose(select_frame_times(receive_times, times), receive_times)
+    print("✅ Frames entières, groupes de canaux partiels")
+
+
+def test_take_file():
+    """Test l'écriture du fichier de prise et la récupération après un crash"""
+    print("\n=== TEST FICHIER DE PRISE ===")
+    import os
+    import tempfile
+    import numpy as np
+    from mocap.live_buffer import NUM_CHANNELS, FLAG_SHAPES
+    from mocap.live_take_file import TAKE_GROW_RECORDS, TakeFile, TakeWriter, find_last_take, new_take_path
+
+    with tempfile.TemporaryDirectory() as take_dir:
+        path = new_take_path(take_dir, 'EPIC')
+        writer = TakeWriter(path, engine='EPIC')
+        count = TAKE_GROW_RECORDS + 10
+        for i in range(count):
+            writer.append(i / 60, np.full(NUM_CHANNELS, i, dtype=np.float32), FLAG_SHAPES, device_timestamp=float(i))
+        writer.close()
+        take = TakeFile(path)
+        timestamps, data, flags = take.snapshot()
+        assert len(take) == count and take.engine == 'EPIC' and take.recovered_count == 0
+        assert data[-1, 0] == count - 1 and flags.tolist() == [FLAG_SHAPES] * count
+        assert take.snapshot_device_timestamps()[5] == 5.0
+        del take, timestamps, data, flags
+
+        # Récepteur relancé : la prise continue dans le même fichier
+        writer = TakeWriter.resume(path, engine='EPIC')
+        for i in range(5):
+            writer.append(100.0 + i, np.full(NUM_CHANNELS, -1, dtype=np.float32), FLAG_SHAPES)
+        writer.close()
+        take = TakeFile(path)
+        timestamps, data, flags = take.snapshot()
+        assert len(take) == count + 5 and data[count - 1, 0] == count - 1 and data[count, 0] == -1
+        assert timestamps[-1] == 104.0
+        del take, timestamps, data, flags
+        try:
+            TakeWriter.resume(path, engine='A2F')
+            assert False, "Une prise d'un autre moteur ne doit pas être continuée"
+        except ValueError:
+            pass
+
+        # Fichier non fermé : l'index n'est à jour que toutes les 60 frames
+        crash_path = new_take_path(take_dir, 'EPIC')
+        writer = TakeWriter(crash_path, engine='EPIC')
+        for i in range(75):
+            writer.append(i / 60, np.zeros(NUM_CHANNELS), FLAG_SHAPES)
+        writer._records.flush()
+        take = TakeFile(crash_path)
+        assert len(take) == 75 and take.recovered_count == 15
+        assert find_last_take(take_dir) in (path, crash_path)
+        del take, writer
+    print("✅ Index, lecture memmap, prise continuée et frames récupérées")
+
+
+def test_filter_bank():
+    """Test les filtres live (moyenne glissante, exponentielle, One-Euro) et le filtrage hors ligne"""
+    print("\n=== TEST BANC DE FILTRES ===")
+    import math
+    from collections import deque
+    import numpy as np
+    from mocap.live_buffer import FLAG_HEAD_ROT, NUM_CHANNELS, flags_to_channel_mask
+    from mocap.live_filters import FilterBank
+
+    rng = np.random.default_rng(0)
+    count = 500
+    data = rng.random((count, NUM_CHANNELS)).astype(np.float32)
+    times = np.cumsum(rng.uniform(0.01, 0.03, count))
+    bank = FilterBank(NUM_CHANNELS)
+    bank.set_filter(slice(0, 52), 'SMA', window=5)
+    bank.set_filter(slice(52, 58), 'EMA', window=4)
+    bank.set_filter(slice(58, 64), 'ONE_EURO', min_cutoff=1.0, beta=0.5)
+    live = np.array([bank.update(data[i], times[i]) for i in range(count)])
+
+    # Références scalaires
+    window = deque(maxlen=5)
+    sma = []
+    for v in data[:, 3].tolist():
+        window.append(v)
+        sma.append(sum(window) / len(window))
+    assert np.allclose(live[:, 3], sma, atol=1e-6)
+    ema = [float(data[0, 53])]
+    for v in data[1:, 53].tolist():
+        ema.append(ema[-1] + 0.4 * (v - ema[-1]))
+    assert np.allclose(live[:, 53], ema, atol=1e-6)
+
+    def alpha(cutoff, dt):
+        return 1 / (1 + 1 / (2 * math.pi * cutoff * dt))
+    value, derivative, one_euro = float(data[0, 60]), 0.0, [float(data[0, 60])]
+    for i in range(1, count):
+        dt = times[i] - times[i - 1]
+        derivative += alpha(1.0, dt) * ((data[i, 60] - value) / dt - derivative)
+        value += alpha(1.0 + 0.5 * abs(derivative), dt) * (data[i, 60] - value)
+        one_euro.append(value)
+    assert np.allclose(live[:, 60], one_euro, atol=1e-6)
+
+    # Hors ligne : identique à l'aperçu live, y compris avec des groupes manquants
+    assert np.allclose(bank.filter_take(times, data), live, atol=1e-6)
+    flags = np.full(count, 31, dtype=np.uint8)
+    flags[rng.random(count) < 0.2] = 31 - FLAG_HEAD_ROT
+    bank.reset()
+    live = np.array([bank.update(data[i], times[i], flags_to_channel_mask(flags[i])) for i in range(count)])
+    assert np.allclose(bank.filter_take(times, data, flags), live, atol=1e-6)
+    print("✅ SMA, EMA et One-Euro conformes, filtrage hors ligne identique au live")
+
+
+def test_live_target_plan():
+    """Test l'application live quand des shape keys sont ajoutées ou supprimées pendant la session"""
+    print("\n=== TEST PLAN DE CIBLES LIVE ===")
+    import numpy as np
+    from mocap.live_target_plan import LiveTargetPlan
+
+    class FakeKeyBlock:
+        def __init__(self, name, id_data):
+            self.name = name
+            self.id_data = id_data
+            self.value = 0.0
+
+    class FakeKeyBlocks(list):
+        def find(self, name):
+            return next((i for i, kb in enumerate(self) if kb.name == name), -1)
+
+        def foreach_get(self, attr, values):
+            # Comme Blender, la taille du tableau doit correspondre
+            if len(values) != len(self):
+                raise RuntimeError("internal error setting the array")
+            values[:] = [getattr(kb, attr) for kb in self]
+
+        def foreach_set(self, attr, values):
+            if len(values) != len(self):
+                raise RuntimeError("internal error setting the array")
+            for kb, value in zip(self, values):
+                setattr(kb, attr, float(value))
+
+    class FakeKey:
+        def __init__(self, names):
+            self.key_blocks = FakeKeyBlocks(FakeKeyBlock(name, self) for name in names)
+
+        def as_pointer(self):
+            return id(self)
+
+        def update_tag(self):
+            pass
+
+    key = FakeKey(['Basis', 'jawOpen', 'mouthClose'])
+    source = ['jawOpen', 'mouthClose']
+    plan = LiveTargetPlan()
+    plan.compile(source, {name: [key.key_blocks[key.key_blocks.find(name)]] for name in source}, None)
+    plan.apply(np.array([0.5, 0.25]))
+    assert [kb.value for kb in key.key_blocks] == [0.0, 0.5, 0.25]
+
+    # Shape key ajoutée pendant la session: pas d'erreur, les valeurs restent en place
+    key.key_blocks.append(FakeKeyBlock('extra', key))
+    key.key_blocks[-1].value = 0.75
+    plan.apply(np.array([0.1, 0.2]))
+    assert np.allclose([kb.value for kb in key.key_blocks], [0.0, 0.1, 0.2, 0.75])
+
+    # Shape key supprimée avant les cibles: les indices sont recalculés
+    del key.key_blocks[0]
+    plan.apply(np.array([0.3, 0.4]))
+    assert np.allclose([kb.value for kb in key.key_blocks], [0.3, 0.4, 0.75])
+
+    # Cible supprimée: les autres continuent d'être animées
+    del key.key_blocks[0]
+    plan.apply(np.array([0.6, 0.7]))
+    assert np.allclose([kb.value for kb in key.key_blocks], [0.7, 0.75])
+    print("✅ Plan recompilé quand le nombre de shape keys change")
+
+
+if __name__ == "__main__":
+    print("Test du tampon circulaire live FaceIt")
+    print("=" * 45)
+
+    test_push_and_snapshot()
+    test_overflow()
+    test_read_since()
+    test_frame_assembler()
+    test_decode_live_link_face()
+    test_decode_osc_bundle()
+    test_jitter_buffer()
+    test_clock_sync()
+    test_resample_to_frame_grid()
+    test_take_file()
+    test_filter_bank()
+    test_live_target_plan()
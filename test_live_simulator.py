@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Test du récepteur live avec le simulateur UDP (live_simulator), sans téléphone
+Envoie des prises synthétiques sur localhost dans le format de chaque moteur
+Ne dépend pas de bpy, peut être lancé hors de Blender
+"""
+
+def receive_session(engine, frame_count=60, **sender_options):
+    """Envoie une prise synthétique au récepteur et retourne (prise envoyée, frames reçues, sender, récepteur)"""
+    import time
+    from mocap.live_buffer import FrameRingBuffer
+    from mocap.live_simulator import ReplaySender, get_face_cap_shape_names, synthetic_session
+    from mocap.osc_receiver import QueueManager, Receiver
+
+    shape_names = get_face_cap_shape_names()
+    frame_buffer = FrameRingBuffer(capacity=frame_count * 2)
+    queue_mgr = QueueManager(frame_buffer)
+    receiver = Receiver(queue_mgr)
+    receiver.start(engine, '127.0.0.1', 0, shape_reference=shape_names)
+    port = receiver.sock.getsockname()[1]
+    session = synthetic_session(frame_count, fps=120)
+    sender = ReplaySender(engine, port=port, speed=0, shape_names=shape_names, **sender_options)
+    try:
+        sender.send(*session)
+        # Laisse le temps au thread de vider le socket
+        deadline = time.time() + 2.0
+        # Un datagramme par frame, sauf Face Cap sans bundle (dernière frame complétée à l'arrêt)
+        if sender.bundle or engine in ('EPIC', 'IFACIALMOCAP'):
+            expected_count = sender.datagrams_sent
+        else:
+            expected_count = frame_count - 1
+        while len(frame_buffer) < expected_count and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        receiver.stop()
+    return session, frame_buffer.snapshot(), sender, receiver
+
+
+def test_round_trip_all_engines():
+    """Test l'encodage et le décodage de chaque format moteur"""
+    print("=== TEST ALLER-RETOUR PAR MOTEUR ===")
+    import numpy as np
+    from mocap.live_buffer import SHAPES, HEAD_ROT, EYE_L
+
+    for engine, tolerance in (('FACECAP', 1e-6), ('TILE', 1e-6), ('EPIC', 1e-6), ('IFACIALMOCAP', 0.006)):
+        (_times, data, flags), (timestamps, received, received_flags), _sender, _receiver = receive_session(engine)
+        assert len(received) == len(data), (engine, len(received))
+        assert (received_flags & flags == received_flags).all()
+        assert np.abs(received[:, SHAPES] - data[:, SHAPES]).max() < tolerance, engine
+        assert np.abs(received[:, HEAD_ROT] - data[:, HEAD_ROT]).max() < 1e-3, engine
+        assert np.abs(received[:, EYE_L][:, :2] - data[:, EYE_L][:, :2]).max() < 1e-3, engine
+        assert np.isfinite(timestamps).all()
+        print(f"✅ {engine}: {len(received)} frames")
+
+
+def test_face_cap_per_message():
+    """Test Face Cap sans bundle (comme l'app) : un datagramme par message, et avec un bundle par frame"""
+    print("\n=== TEST FACE CAP MESSAGES SÉPARÉS ===")
+    import numpy as np
+    from mocap.live_buffer import SHAPES
+
+    (_times, data, _flags), (_timestamps, received, _received_flags), sender, _receiver = receive_session(
+        'FACECAP', bundle=False)
+    # La dernière frame n'est complétée qu'à l'arrêt du récepteur
+    assert len(received) == len(data)
+    assert sender.datagrams_sent == len(data) * 56
+    assert np.abs(received[:, SHAPES] - data[:, SHAPES]).max() < 1e-6
+    (_times, data, _flags), (_timestamps, received, _received_flags), sender, _receiver = receive_session(
+        'FACECAP', bundle=True)
+    assert len(received) == len(data) and sender.datagrams_sent == len(data)
+    assert np.abs(received[:, SHAPES] - data[:, SHAPES]).max() < 1e-6
+    print("✅ Frames assemblées à partir des messages et des bundles")
+
+
+def test_loss_and_reorder():
+    """Test la perte et le réordonnancement des paquets"""
+    print("\n=== TEST PERTE / DÉSORDRE ===")
+    _session, (_timestamps, received, _flags), sender, _receiver = receive_session(
+        'EPIC', frame_count=200, burst=4, loss=0.1, reorder=0.2, seed=1)
+    assert sender.datagrams_dropped > 0 and sender.datagrams_reordered > 0
+    assert sender.datagrams_sent + sender.datagrams_dropped == 200
+    assert len(received) == sender.datagrams_sent
+    print(f"✅ {sender.datagrams_dropped} perdus, {sender.datagrams_reordered} réordonnés, {len(received)} reçus")
+
+
+def test_telemetry():
+    """Test les compteurs du récepteur et l'export JSON / CSV"""
+    print("\n=== TEST TÉLÉMÉTRIE ===")
+    import json
+    import os
+    import socket
+    import tempfile
+    import time
+
+    _session, _received, _sender, receiver = receive_session('EPIC', frame_count=50)
+    telemetry = receiver.telemetry
+    assert telemetry.packets.count == 50 and telemetry.decode_time.count == 50
+    assert telemetry.error_count == 0
+    # Paquet tronqué : erreur de décodage comptée par type
+    receiver.start('EPIC', '127.0.0.1', 0)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.sendto(b'\x00' * 20, receiver.sock.getsockname())
+    sock.close()
+    deadline = time.time() + 2.0
+    while not receiver.telemetry.packets.count and time.time() < deadline:
+        time.sleep(0.01)
+    receiver.stop()
+    assert receiver.telemetry.decode_errors == {'struct.error': 1}, receiver.telemetry.decode_errors
+    receiver.telemetry.record_tick(2, 0.004, 0.001)
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, 'stats.json')
+        receiver.telemetry.write_json(json_path, engine='EPIC')
+        with open(json_path) as f:
+            stats = json.load(f)
+        assert stats['engine'] == 'EPIC' and stats['latency_ms']['p50'] == 4.0
+        csv_path = os.path.join(directory, 'stats.csv')
+        receiver.telemetry.write_csv(csv_path)
+        with open(csv_path) as f:
+            assert 'apply_time_ms.mean,1.0' in f.read()
+    print("✅ Paquets, erreurs par type, latence et export")
+
+
+def test_multi_actor():
+    """Test plusieurs acteurs servis par un seul thread : ports séparés et filtre par IP source"""
+    print("\n=== TEST MULTI-ACTEURS ===")
+    import time
+    import numpy as np
+    from mocap.live_buffer import SHAPES, FrameRingBuffer
+    from mocap.live_simulator import ReplaySender, synthetic_session
+    from mocap.osc_receiver import ActorStream, QueueManager, Receiver
+
+    frame_count = 60
+    buffers = {name: FrameRingBuffer(capacity=frame_count * 2) for name in ('epic', 'facecap', 'other', 'filtered')}
+    receiver = Receiver()
+    # Deux acteurs sur le même port, séparés par l'adresse source
+    epic = receiver.add_stream(ActorStream(QueueManager(buffers['epic']), 'EPIC', source_address='127.0.0.1'),
+                               '127.0.0.1', 0)
+    epic_port = epic.sock.getsockname()[1]
+    receiver.add_stream(ActorStream(QueueManager(buffers['other']), 'EPIC', source_address='10.9.9.9'),
+                        '127.0.0.1', epic_port)
+    facecap = receiver.add_stream(ActorStream(QueueManager(buffers['facecap']), 'FACECAP'), '127.0.0.1', 0)
+    filtered = receiver.add_stream(
+        ActorStream(QueueManager(buffers['filtered']), 'EPIC', source_address='10.9.9.9'), '127.0.0.1', 0)
+    assert len(receiver._sockets) == 3 and epic.sock is not facecap.sock
+    receiver.start_streams()
+    epic_session = synthetic_session(frame_count, fps=120, seed=1)
+    facecap_session = synthetic_session(frame_count, fps=120, seed=2)
+    try:
+        threads = [
+            ReplaySender('EPIC', port=epic_port, speed=0).start_thread(*epic_session),
+            ReplaySender('FACECAP', port=facecap.sock.getsockname()[1], speed=0, bundle=True).start_thread(
+                *facecap_session),
+            ReplaySender('EPIC', port=filtered.sock.getsockname()[1], speed=0).start_thread(*epic_session),
+        ]
+        for thread in threads:
+            thread.join()
+        deadline = time.time() + 2.0
+        while (len(buffers['epic']) < frame_count or len(buffers['facecap']) < frame_count
+               or receiver.unrouted_count < frame_count) and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        receiver.stop()
+    assert len(buffers['epic']) == frame_count and len(buffers['facecap']) == frame_count
+    assert not buffers['other'] and not buffers['filtered']
+    assert receiver.unrouted_count == frame_count
+    _timestamps, received, _flags = buffers['facecap'].snapshot()
+    assert np.abs(received[:, SHAPES] - facecap_session[1][:, SHAPES]).max() < 1e-6
+    _timestamps, received, _flags = buffers['epic'].snapshot()
+    assert np.abs(received[:, SHAPES] - epic_session[1][:, SHAPES]).max() < 1e-6
+    assert epic.telemetry.packets.count == frame_count and facecap.telemetry.packets.count == frame_count
+    print("✅ Trois ports, un thread, routage par IP source et télémétrie par acteur")
+
+
+if __name__ == "__main__":
+    print("Test du récepteur live avec le simulateur UDP")
+    print("=" * 45)
+
+    test_round_trip_all_engines()
+    test_face_cap_per_message()
+    test_loss_and_reorder()
+    test_telemetry()
+    test_multi_actor()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Test de la lecture des fichiers mocap (Face Cap TXT, Live Link Face CSV, Audio2Face JSON)
+Ne dépend pas de bpy, peut être lancé hors de Blender
+"""
+
+def _write(directory, name, text):
+    import os
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write(text)
+    return path
+
+
+def test_face_cap_file():
+    """Test la lecture d'un fichier Face Cap et le signalement des lignes invalides"""
+    print("=== TEST FACE CAP TXT ===")
+    import tempfile
+    import numpy as np
+    from core.arkit_shapes import FACECAP
+    from mocap.mocap_file_parsers import parse_face_cap_file
+
+    shape_names = [(name, shape_data['name']) for name, shape_data in FACECAP['Data'].items()]
+    file_names = [shape_data['name'] for shape_data in FACECAP['Data'].values()]
+    rows = ['info,version,1.0', 'bs,' + ','.join(file_names)]
+    for i in range(5):
+        transforms = [i * 0.1] * 10
+        shapes = [i / 10 + s / 1000 for s in range(52)]
+        rows.append('k,' + ','.join(str(v) for v in [i * 16] + transforms + shapes))
+    # Ligne 5 : texte, ligne 8 : colonnes manquantes
+    rows.insert(4, 'k,32,' + ','.join(['abc'] * 62))
+    rows.append('k,100,0.5,0.5')
+    with tempfile.TemporaryDirectory() as directory:
+        take = parse_face_cap_file(_write(directory, 'take.txt', '\n'.join(rows)), shape_names)
+    assert len(take) == 5
+    assert take.times.tolist() == [0, 16, 32, 48, 64]
+    assert take.values.dtype == np.float32 and take.values.shape == (5, 62)
+    assert np.allclose(take.shape_values[2, :3], [0.2, 0.201, 0.202])
+    assert [line for line, _reason in take.malformed_rows] == [5, 9]
+    assert 'lines 5, 9' in take.report()
+    assert not take.warnings
+    print("✅ 5 frames lues, lignes 5 et 9 signalées")
+
+
+def test_epic_file():
+    """Test la conversion des timecodes SMPTE et la validation de l'en-tête Live Link Face"""
+    print("\n=== TEST LIVE LINK FACE CSV ===")
+    import tempfile
+    import numpy as np
+    from core.arkit_shapes import EPIC
+    from mocap.mocap_file_parsers import parse_epic_file, read_epic_record_frame_rate, timecodes_to_seconds
+
+    shape_names = list(EPIC['Data'].keys())
+    # Les deux premières shapes sont échangées dans le fichier.
+    header_names = [name[0].upper() + name[1:] for name in shape_names]
+    header_names[0], header_names[1] = header_names[1], header_names[0]
+    transforms = ['HeadYaw', 'HeadPitch', 'HeadRoll', 'LeftEyeYaw', 'LeftEyePitch', 'LeftEyeRoll',
+                  'RightEyeYaw', 'RightEyePitch', 'RightEyeRoll']
+    rows = [','.join(['Timecode', 'BlendShapeCount'] + header_names + transforms)]
+    for frame in range(58, 62):
+        timecode = f'10:00:{frame // 60:02d}:{frame % 60}.5'
+        shapes = [0.0] * 52
+        shapes[0] = frame
+        rows.append(','.join([timecode, '61'] + [str(v) for v in shapes + [0.1] * 9]))
+    rows.insert(2, ','.join(['10:00:00:58.7', '0'] + ['0'] * 61))
+    rows.insert(4, ','.join(['10:00:00:59.7', '0.0'] + ['0'] * 61))
+    rows.insert(5, ','.join(['10:00:00:59.8', ' 0'] + ['0'] * 61))
+    with tempfile.TemporaryDirectory() as directory:
+        path = _write(directory, 'take.csv', '\n'.join(rows))
+        take = parse_epic_file(path, shape_names, record_frame_rate=60)
+        record_frame_rate = read_epic_record_frame_rate(path)
+    assert len(take) == 4 and not take.malformed_rows and not take.warnings
+    assert np.allclose(take.times - take.times[0], np.arange(4) / 60)
+    assert np.isclose(take.times[0], 36000 + 58.5 / 60)
+    # La colonne échangée est remise dans l'ordre attendu.
+    assert take.shape_values[:, 0].tolist() == [0.0] * 4
+    assert take.shape_values[:, 1].tolist() == [58.0, 59.0, 60.0, 61.0]
+    assert record_frame_rate == 60
+    assert np.isclose(timecodes_to_seconds([[1, 2, 3, 12]], 24)[0], 3723.5)
+    print("✅ Timecodes convertis, frame vide ignorée, colonnes réordonnées")
+
+
+def test_a2f_file():
+    """Test la lecture d'un export Audio2Face avec des frames incomplètes"""
+    print("\n=== TEST AUDIO2FACE JSON ===")
+    import json
+    import tempfile
+    from core.arkit_shapes import A2F
+    from mocap.mocap_file_parsers import MocapFileError, parse_a2f_file
+
+    shape_names = list(A2F['Data'].keys())
+    weights = [[i / 10] * 46 for i in range(4)]
+    weights[2] = weights[2][:40]
+    data = {'exportFps': 30, 'numPoses': 46, 'facsNames': shape_names[:45] + ['unknownPose'], 'weightMat': weights}
+    with tempfile.TemporaryDirectory() as directory:
+        take = parse_a2f_file(_write(directory, 'take.json', json.dumps(data)), shape_names)
+        try:
+            parse_a2f_file(_write(directory, 'empty.json', json.dumps({'weightMat': []})), shape_names)
+            assert False, 'MocapFileError attendue'
+        except MocapFileError:
+            pass
+    assert take.times.tolist() == [0, 1, 3]
+    assert [frame for frame, _reason in take.malformed_rows] == [2]
+    assert take.shape_values[:, 45].tolist() == [0.0] * 3
+    assert len(take.warnings) == 2 and 'lipSuck' in take.warnings[0] and 'unknownPose' in take.warnings[1]
+    print("✅ Frame 2 signalée, shape manquante et inconnue rapportées")
+
+
+def test_a2f_stream():
+    """Test la lecture par blocs d'un export Audio2Face indenté"""
+    print("\n=== TEST LECTURE PAR BLOCS AUDIO2FACE ===")
+    import json
+    import tempfile
+    import numpy as np
+    from core.arkit_shapes import A2F
+    from mocap.mocap_file_parsers import A2FStreamParser, read_a2f_header
+
+    shape_names = list(A2F['Data'].keys())
+    weights = np.random.default_rng(0).random((300, 46)).round(5)
+    # Sans numFrames et facsNames après weightMat : la matrice grandit et l'en-tête est lu à la fin.
+    data = {'exportFps': 30, 'numPoses': 46, 'weightMat': weights.tolist(), 'facsNames': shape_names}
+    with tempfile.TemporaryDirectory() as directory:
+        path = _write(directory, 'take.json', json.dumps(data, indent=4))
+        parser = A2FStreamParser(path, shape_names, read_size=4096)
+        progress = []
+        while not parser.done:
+            progress.append(parser.step())
+        take = parser.result()
+        header = read_a2f_header(path, read_size=64)
+    assert len(progress) > 10 and progress == sorted(progress) and progress[-1] == 1.0
+    assert take.values.dtype == np.float32 and take.values.shape == (300, 46)
+    assert np.allclose(take.shape_values, weights)
+    assert take.times.tolist() == list(range(300))
+    assert parser.header['facsNames'] == shape_names and not take.warnings
+    assert header == {'exportFps': 30, 'numPoses': 46}
+    print(f"✅ 300 frames lues en {len(progress)} blocs, en-tête lu avant weightMat")
+
+
+def test_parse_cache():
+    """Test le cache des fichiers lus (clé de contenu, éviction LRU, effacement)"""
+    print("\n=== TEST CACHE DE LECTURE ===")
+    import os
+    import tempfile
+    import time
+    import numpy as np
+    from mocap.mocap_file_parsers import parse_face_cap_file
+    from mocap.mocap_parse_cache import ParseCache, parse_cached
+
+    calls = []
+
+    def parse_face_cap_counted(path, shape_names):
+        calls.append(path)
+        return parse_face_cap_file(path, shape_names)
+
+    shape_names = [f'shape{i}' for i in range(3)]
+    rows = ['bs,shape0,shape1,shape2'] + [f'k,{i * 16},' + ','.join(['0.5'] * 10 + [str(i)] * 3) for i in range(50)]
+    with tempfile.TemporaryDirectory() as directory:
+        path = _write(directory, 'take.txt', '\n'.join(rows + ['k,1,2']))
+        cache = ParseCache(os.path.join(directory, 'cache'))
+        first = parse_cached(parse_face_cap_counted, path, shape_names, cache=cache)
+        second = parse_cached(parse_face_cap_counted, path, shape_names, cache=cache)
+        assert len(calls) == 1
+        assert np.array_equal(first.values, second.values) and np.array_equal(first.times, second.times)
+        assert np.array_equal(first.shape_values, second.shape_values)
+        assert second.malformed_rows == first.malformed_rows == [(52, 'expected 15 fields, found 3')]
+        # Autre contenu : nouvelle clé
+        _write(directory, 'take.txt', '\n'.join(rows))
+        parse_cached(parse_face_cap_counted, path, shape_names, cache=cache)
+        assert len(calls) == 2 and len(cache.entries()) == 2
+        # Le fichier le moins récemment utilisé est supprimé en premier.
+        oldest, newest = [entry[0] for entry in cache.entries()]
+        os.utime(newest, (time.time() - 100, time.time() - 100))
+        cache.max_size = cache.size() - 1
+        assert cache.evict() == 1
+        assert [entry[0] for entry in cache.entries()] == [oldest]
+        count, size = cache.clear()
+        assert count == 1 and size > 0 and not cache.entries()
+        # Écriture échouée : pas de fichier temporaire orphelin
+        try:
+            cache.store('broken', object())
+        except AttributeError:
+            pass
+        else:
+            raise AssertionError('store should fail')
+        assert not os.listdir(cache.directory)
+    print("✅ Deuxième import lu depuis le cache, éviction LRU et effacement")
+
+
+def test_batch_import():
+    """Test l'import d'un dossier de prises par des processus (noms, lissage, erreurs, rapport)"""
+    print("\n=== TEST IMPORT PAR LOTS ===")
+    import os
+    import tempfile
+    import time
+    import numpy as np
+    from mocap.mocap_batch import BatchRunner, batch_action_names, format_batch_report, scan_take_files
+    from mocap.mocap_filters import filter_channels
+
+    shape_names = [['shape0', 'shapeZero'], ['shape1', 'shapeOne']]
+    rows = ['bs,shape0,shape1'] + [f'k,{i * 16},' + ','.join(['0.5'] * 10 + [str(i % 3), str(i)]) for i in range(30)]
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, 'day2'))
+        _write(directory, 'take_b.txt', '\n'.join(rows))
+        _write(directory, 'take_a.txt', '\n'.join(rows[:10]))
+        _write(os.path.join(directory, 'day2'), 'take_a.txt', '\n'.join(rows))
+        _write(directory, 'broken.txt', 'bs,shape0,shape1')
+        _write(directory, 'notes.csv', 'a,b')
+        assert len(scan_take_files(directory, 'FACECAP')) == 3
+        paths = scan_take_files(directory, 'FACECAP', recursive=True)
+        names = batch_action_names(directory, paths, prefix='D1_')
+        assert names == ['D1_broken', 'D1_day2_take_a', 'D1_take_a', 'D1_take_b']
+        assert batch_action_names(directory, paths[:1] * 2 + [os.path.join(directory, 'x' * 80 + '.txt')]) == [
+            'broken', 'broken_2', 'x' * 63]
+        jobs = [{'index': i, 'path': path, 'engine': 'FACECAP', 'shape_names': shape_names, 'record_frame_rate': 1000,
+                 'smoothing': {'shape0': ['SMA', 3]}} for i, path in enumerate(paths)]
+        runner = BatchRunner(jobs, process_count=2)
+        runner.start()
+        results = []
+        try:
+            deadline = time.time() + 60
+            while not runner.done and time.time() < deadline:
+                results.extend(runner.poll())
+                time.sleep(0.01)
+            takes = {result['index']: runner.load_take(result) for result in results if not result['error']}
+        finally:
+            runner.close()
+    assert len(runner.processes) == 0 and runner.work_directory is None
+    assert sorted(result['index'] for result in results) == [0, 1, 2, 3]
+    assert [result['error'] != '' for result in sorted(results, key=lambda r: r['index'])] == [True, False, False, False]
+    take = takes[3]
+    assert len(take) == 30 and take.shape_values.shape == (30, 2)
+    assert np.allclose(take.shape_values[:, 0], filter_channels(np.arange(30) % 3, 'SMA', 3))
+    assert take.shape_values[:, 1].tolist() == list(range(30))
+    for result, name in zip(sorted(results, key=lambda r: r['index']), names):
+        result['action'] = name
+    summary, lines = format_batch_report(results, 1.0, 2, skipped=1)
+    assert summary.startswith('Imported 3 of 4 takes') and '1 failed, 1 skipped' in summary
+    assert len(lines) == 5 and lines[1].startswith('D1_broken') and 'No frames found' in lines[1]
+    print("✅ 4 prises en 2 processus, lissage appliqué, prise vide signalée")
+
+
+if __name__ == "__main__":
+    print("Test de la lecture des fichiers mocap FaceIt")
+    print("=" * 45)
+
+    test_face_cap_file()
+    test_epic_file()
+    test_a2f_file()
+    test_a2f_stream()
+    test_parse_cache()
+    test_batch_import()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Test du traitement des keyframes de la mocap importée (décimation, filtrage, rééchantillonnage, fusion, suppression, rotations)
+Ne dépend pas de bpy, peut être lancé hors de Blender
+"""
+
+def _reference_decimation(frames, values, tolerance):
+    """Ramer-Douglas-Peucker récursif (distance verticale), une courbe"""
+    import numpy as np
+    keep = np.zeros(len(values), dtype=bool)
+    keep[[0, -1]] = True
+    segments = [(0, len(values) - 1)]
+    while segments:
+        start, end = segments.pop()
+        if end - start < 2:
+            continue
+        inner = np.arange(start + 1, end)
+        weight = (frames[inner] - frames[start]) / (frames[end] - frames[start])
+        error = np.abs(values[inner] - (values[start] + (values[end] - values[start]) * weight))
+        split = inner[np.argmax(error)]
+        if error.max() > tolerance:
+            keep[split] = True
+            segments += [(start, split), (split, end)]
+    return keep
+
+
+def test_keyframe_decimation():
+    """Test la décimation vectorisée contre l'algorithme récursif et la tolérance"""
+    print("=== TEST DÉCIMATION DES KEYFRAMES ===")
+    import numpy as np
+    from mocap.mocap_decimation import decimate_keyframes, decimation_mask
+
+    rng = np.random.default_rng(0)
+    frames = np.cumsum(rng.random(2000) + 0.5)
+    values = np.cumsum(rng.normal(size=(2000, 4)) * 0.02, axis=0)
+    # Canal 1 : plateau, canal 3 : constant
+    values[100:250, 1] = 0.3
+    values[:, 3] = 0.0
+    for tolerance in (0.0, 0.005, 0.05):
+        keep = decimation_mask(frames, values, tolerance)
+        assert keep.shape == values.shape
+        for channel in range(4):
+            # Les valeurs supprimées restent dans la tolérance de l'interpolation linéaire.
+            kept = np.flatnonzero(keep[:, channel])
+            interpolated = np.interp(frames, frames[kept], values[kept, channel])
+            assert np.abs(interpolated - values[:, channel]).max() <= tolerance + 1e-12
+        # Les segments courts sont coupés comme par l'algorithme récursif.
+        short = decimation_mask(frames[:200], values[:200], tolerance)
+        for channel in range(4):
+            assert (short[:, channel] == _reference_decimation(frames[:200], values[:200, channel], tolerance)).all()
+    keep = decimation_mask(frames, values, 0.005)
+    assert keep[:, 3].sum() == 2 and keep[100:250, 1].sum() <= 2
+    kept_frames, kept_values = decimate_keyframes(frames, values[:, 0], 0.005)
+    assert kept_frames.tolist() == frames[keep[:, 0]].tolist() and len(kept_values) == len(kept_frames)
+    assert decimation_mask([0, 1], [0.5, 0.5]).tolist() == [True, True]
+    print(f"✅ Identique à l'algorithme récursif, {keep.sum()} keyframes sur {keep.size} gardées")
+
+
+def test_filter_channels():
+    """Test le filtrage vectorisé de toutes les colonnes contre des références par canal"""
+    print("=== TEST FILTRAGE DES CANAUX ===")
+    import numpy as np
+    from mocap.mocap_filters import filter_channels, gaussian_kernel
+
+    rng = np.random.default_rng(1)
+    values = rng.normal(size=(120, 5))
+    for smooth_filter in ('SMA', 'MEDIAN', 'GAUSSIAN'):
+        for window in (2, 3, 8, 9, 200):
+            filtered = filter_channels(values, smooth_filter, window)
+            assert filtered.shape == values.shape
+            # Toutes les colonnes en un appel = chaque colonne seule
+            for channel in range(5):
+                assert np.allclose(filtered[:, channel], filter_channels(values[:, channel], smooth_filter, window))
+            # Un signal constant est conservé, bords compris
+            assert np.allclose(filter_channels(np.full((120, 2), 0.7), smooth_filter, window), 0.7)
+    for window in (3, 8, 9):
+        before, after = window // 2, (window - 1) // 2
+        padded = np.pad(values[:, 0], (before, after), mode='edge')
+        # Moyenne mobile : np.convolve sur le signal prolongé par ses valeurs de bord
+        sma = np.convolve(padded, np.ones(window) / window, mode='valid')
+        assert np.allclose(filter_channels(values[:, 0], 'SMA', window), sma)
+        median = [np.median(padded[i:i + window]) for i in range(len(values))]
+        assert np.allclose(filter_channels(values[:, 0], 'MEDIAN', window), median)
+        gaussian = np.convolve(padded, gaussian_kernel(window)[::-1], mode='valid')
+        assert np.allclose(filter_channels(values[:, 0], 'GAUSSIAN', window), gaussian)
+        assert np.isclose(gaussian_kernel(window).sum(), 1.0)
+    assert np.array_equal(filter_channels(values, 'MEDIAN', 1), values)
+    assert filter_channels(np.empty((0, 3)), 'GAUSSIAN', 5).shape == (0, 3)
+    try:
+        filter_channels(values, 'BOX', 3)
+        assert False, "filtre inconnu accepté"
+    except ValueError:
+        pass
+    print("✅ Filtres SMA, médian et gaussien identiques aux références, bords constants")
+
+
+def test_resample_channels():
+    """Test le rééchantillonnage des prises sur les frames de la scène"""
+    print("=== TEST RÉÉCHANTILLONNAGE ===")
+    import numpy as np
+    from mocap.mocap_resample import resample_channels
+
+    # 59.94 fps vers 24 fps, deux canaux : une rampe et une sinusoïde lente
+    seconds = np.arange(600) / 59.94
+    frames = 10 + seconds * 24
+    values = np.stack((seconds, np.sin(seconds * 2)), axis=1)
+    for method in ('LINEAR', 'CUBIC', 'ANTIALIAS'):
+        grid, resampled = resample_channels(frames, values, method)
+        # Une clé par frame entière, sans doublon
+        assert grid[0] == 10 and np.array_equal(grid, np.arange(10, grid[-1] + 1))
+        assert resampled.shape == (len(grid), 2)
+        expected = (grid - 10) / 24
+        inside = grid <= frames[-1]
+        # Le filtre anti-repliement tient les valeurs de bord sur quelques échantillons
+        tolerance = 0.02 if method == 'ANTIALIAS' else 1e-3
+        assert np.abs(resampled[inside, 0] - expected[inside]).max() < tolerance
+        assert np.abs(resampled[inside, 1] - np.sin(expected[inside] * 2)).max() < tolerance
+        for channel in range(2):
+            assert np.allclose(resample_channels(frames, values[:, channel], method)[1], resampled[:, channel])
+    # Le filtre anti-repliement supprime une oscillation trop rapide pour 24 fps
+    fast = np.sin(seconds * 2 * np.pi * 20)
+    assert np.abs(resample_channels(frames, fast, 'ANTIALIAS')[1][5:-5]).max() < 0.1
+    assert np.abs(resample_channels(frames, fast, 'LINEAR')[1]).max() > 0.5
+    # Les échantillons gardés tels quels (sous-frames), les échantillons non triés
+    kept_frames, kept_values = resample_channels(frames, values, 'NONE')
+    assert np.array_equal(kept_frames, frames) and np.array_equal(kept_values, values)
+    unsorted_grid, unsorted = resample_channels([2.0, 0.0, 1.0], [4.0, 0.0, 1.0], 'CUBIC')
+    assert unsorted_grid.tolist() == [0.0, 1.0, 2.0] and np.allclose(unsorted, [0.0, 1.0, 4.0])
+    try:
+        resample_channels(frames, values, 'NEAREST')
+        assert False, "méthode inconnue acceptée"
+    except ValueError:
+        pass
+    print(f"✅ {len(frames)} échantillons à 59.94 fps → {len(grid)} frames entières, anti-repliement efficace")
+
+
+def test_merge_keyframe_arrays():
+    """Test la fusion des keyframes existantes et nouvelles (remplacement de la plage de frames)"""
+    print("=== TEST FUSION DES KEYFRAMES ===")
+    import numpy as np
+    from core.keyframe_arrays import (KEYFRAME_HANDLE_TYPE_VALUES, KEYFRAME_INTERPOLATION_VALUES,
+                                      merge_keyframe_arrays, new_keyframe_arrays)
+
+    old = new_keyframe_arrays(np.arange(0, 100, 10), np.full(10, 5.0), interpolation='CONSTANT', handle_type='FREE')
+    new = new_keyframe_arrays(np.arange(25, 61), np.linspace(0, 1, 36))
+    assert new['co'].shape == (36, 2) and np.array_equal(new['handle_left'], new['co'])
+    assert (new['interpolation'] == KEYFRAME_INTERPOLATION_VALUES['BEZIER']).all()
+    merged = merge_keyframe_arrays(old, new)
+    frames = merged['co'][:, 0]
+    # Les anciennes clés 30 à 60 sont remplacées, 0 à 20 et 70 à 90 gardent leur interpolation et leurs poignées
+    assert frames.tolist() == [0, 10, 20] + list(range(25, 61)) + [70, 80, 90]
+    assert all(len(data) == len(frames) for data in merged.values())
+    kept = np.isin(frames, [0, 10, 20, 70, 80, 90])
+    assert (merged['interpolation'][kept] == KEYFRAME_INTERPOLATION_VALUES['CONSTANT']).all()
+    assert (merged['handle_left_type'][~kept] == KEYFRAME_HANDLE_TYPE_VALUES['AUTO_CLAMPED']).all()
+    assert (merged['co'][kept, 1] == 5.0).all()
+    # Sans remplacement de la plage, toutes les clés sont gardées et triées
+    joined = merge_keyframe_arrays(old, new, overwrite_old_range=False)
+    assert len(joined['co']) == 46 and (np.diff(joined['co'][:, 0]) >= 0).all()
+    # La plage est comparée aux frames seulement, pas aux valeurs
+    old = new_keyframe_arrays([0, 100], [50.0, 50.0])
+    assert merge_keyframe_arrays(old, new_keyframe_arrays([40, 60], [0, 0]))['co'][:, 0].tolist() == [0, 40, 60, 100]
+    print(f"✅ {len(frames)} keyframes fusionnées, plage 25-60 remplacée")
+
+
+def test_remove_keyframe_range():
+    """Test la suppression d'une plage de frames (bornes incluses, sous-frames, frame 0)"""
+    print("=== TEST SUPPRESSION D'UNE PLAGE ===")
+    import numpy as np
+    from core.keyframe_arrays import frame_range_mask, new_keyframe_arrays, remove_keyframe_range
+
+    frames = np.array([-2.0, 0.0, 0.5, 1.0, 9.5, 10.0, 10.25, 20.0])
+    arrays = new_keyframe_arrays(frames, frames * 2, interpolation='LINEAR')
+    # Les bornes et les sous-frames dans la plage sont supprimées, la frame 0 comme les autres
+    remaining = remove_keyframe_range(arrays, 0, 10)
+    assert remaining['co'][:, 0].tolist() == [-2.0, 10.25, 20.0]
+    assert remaining['co'][:, 1].tolist() == [-4.0, 20.5, 40.0]
+    assert all(len(data) == 3 for data in remaining.values())
+    assert np.array_equal(remaining['handle_right'], remaining['co'])
+    # Les valeurs ne comptent pas, seulement les frames
+    assert remove_keyframe_range(new_keyframe_arrays([0, 50], [5.0, 5.0]), 2, 10)['co'][:, 0].tolist() == [0, 50]
+    assert len(remove_keyframe_range(arrays, -100, 100)['co']) == 0
+    assert len(remove_keyframe_range(arrays, 11, 19)['co']) == len(frames)
+    # Une plage inversée ne supprime rien
+    assert len(remove_keyframe_range(arrays, 10, 0)['co']) == len(frames)
+    assert frame_range_mask(frames, 1, 1).tolist() == [False, False, False, True, False, False, False, False]
+    # Une longue prise : une seule passe, le reste de la courbe est intact
+    take = new_keyframe_arrays(np.arange(100000), np.sin(np.arange(100000) * 0.01))
+    remaining = remove_keyframe_range(take, 500, 699)
+    assert len(remaining['co']) == 100000 - 200
+    assert np.array_equal(remaining['co'][500:], take['co'][700:])
+    print("✅ Plage [début, fin] supprimée, bornes et sous-frames incluses")
+
+
+def _elementary_rotation(axis, angles):
+    """Matrices de rotation autour d'un axe (0 = X, 1 = Y, 2 = Z) pour un tableau d'angles"""
+    import numpy as np
+    c, s = np.cos(angles), np.sin(angles)
+    i, j = [(1, 2), (2, 0), (0, 1)][axis]
+    matrices = np.zeros((len(angles), 3, 3))
+    matrices[:, axis, axis] = 1
+    matrices[:, i, i] = c
+    matrices[:, j, j] = c
+    matrices[:, j, i] = s
+    matrices[:, i, j] = -s
+    return matrices
+
+
+def test_rotation_conversion():
+    """Test les conversions de rotations vectorisées (euler, quaternions, matrices, axe-angle, continuité)"""
+    print("=== TEST CONVERSION DES ROTATIONS ===")
+    import numpy as np
+    from mocap.mocap_rotations import (euler_to_quaternions, expmap_to_quaternions, make_quaternions_continuous,
+                                       quaternions_to_axis_angle, quaternions_to_euler, quaternions_to_matrices,
+                                       source_rotations_to_blender)
+
+    rng = np.random.default_rng(2)
+    euler = rng.uniform(-1.5, 1.5, size=(500, 3))
+    q = euler_to_quaternions(euler)
+    # XYZ : X d'abord, puis Y, puis Z
+    expected = _elementary_rotation(2, euler[:, 2]) @ _elementary_rotation(1, euler[:, 1]) @ _elementary_rotation(0, euler[:, 0])
+    assert np.allclose(quaternions_to_matrices(q), expected)
+    assert np.allclose(quaternions_to_euler(q), euler)
+    assert np.allclose(quaternions_to_euler(-q), euler)
+    # Vecteur de rotation (axe * angle) : formule de Rodrigues
+    vectors = rng.normal(size=(500, 3))
+    angle = np.linalg.norm(vectors, axis=1)
+    axis = vectors / angle[:, None]
+    cross = np.zeros((500, 3, 3))
+    cross[:, 0, 1], cross[:, 0, 2], cross[:, 1, 2] = -axis[:, 2], axis[:, 1], -axis[:, 0]
+    cross -= cross.transpose(0, 2, 1)
+    rodrigues = np.eye(3) + np.sin(angle)[:, None, None] * cross + (1 - np.cos(angle))[:, None, None] * cross @ cross
+    assert np.allclose(quaternions_to_matrices(expmap_to_quaternions(vectors)), rodrigues)
+    assert np.allclose(expmap_to_quaternions(np.zeros((2, 3))), [1, 0, 0, 0])
+    # Axe-angle
+    axis_angle = quaternions_to_axis_angle(q)
+    half = axis_angle[:, :1] / 2
+    assert np.allclose(np.hstack((np.cos(half), axis_angle[:, 1:] * np.sin(half))), q)
+    # Continuité : les changements de signe sont annulés, les rotations ne changent pas
+    flipped = q * np.where(rng.random(500) < 0.3, -1.0, 1.0)[:, None]
+    continuous = make_quaternions_continuous(flipped)
+    assert np.allclose(np.abs(np.sum(continuous * q, axis=1)), 1)
+    assert (np.sum(continuous[1:] * continuous[:-1], axis=1) >= 0).all()
+
+    # Une prise : rotation lente autour de l'axe vertical qui passe par 180°, en degrés
+    frames = 2000
+    values = np.zeros((frames, 3))
+    values[:, 1] = np.linspace(-350, 350, frames)
+    values[:, 0] = 10 * np.sin(np.linspace(0, 20, frames))
+    radians = np.radians(values)
+    source = expmap_to_quaternions(np.stack((radians[:, 0], -radians[:, 2], radians[:, 1]), axis=1))
+    head = source_rotations_to_blender(values, 'DEG', rotation_mode='EULER')
+    assert head.shape == (frames, 3)
+    assert np.abs(np.diff(head, axis=0)).max() < 0.1
+    assert np.allclose(np.abs(np.sum(euler_to_quaternions(head) * source, axis=1)), 1)
+    quaternions = source_rotations_to_blender(values, 'DEG', rotation_mode='QUATERNION')
+    assert (np.sum(quaternions[1:] * quaternions[:-1], axis=1) >= 0).all()
+    assert source_rotations_to_blender(values, 'DEG', rotation_mode='AXIS_ANGLE').shape == (frames, 4)
+    assert np.allclose(source_rotations_to_blender(radians, 'RAD', rotation_mode='QUATERNION'), quaternions)
+    # Os : la rotation est exprimée dans l'espace de la rotation de repos
+    initial = euler_to_quaternions([[0.3, -0.2, 1.0]])[0]
+    bone = source_rotations_to_blender(values, 'DEG', initial_rotation=initial, rotation_mode='QUATERNION')
+    rest = quaternions_to_matrices(initial[None])[0]
+    assert np.allclose(quaternions_to_matrices(bone), rest.T @ quaternions_to_matrices(source) @ rest)
+    # Miroir : x, -y, -z
+    mirrored = source_rotations_to_blender(values * (1, -1, -1), 'DEG', rotation_mode='QUATERNION')
+    assert np.allclose(source_rotations_to_blender(values, 'DEG', flip=True, rotation_mode='QUATERNION'), mirrored)
+    assert source_rotations_to_blender(np.empty((0, 3)), rotation_mode='QUATERNION').shape == (0, 4)
+    print(f"✅ {frames} rotations converties, euler continus au-delà de 180°, quaternions dans le même hémisphère")
+
+
+if __name__ == "__main__":
+    print("Test du traitement des keyframes FaceIt")
+    print("=" * 40)
+
+    test_keyframe_decimation()
+    test_filter_channels()
+    test_resample_channels()
+    test_merge_keyframe_arrays()
+    test_remove_keyframe_range()
+    test_rotation_conversion()
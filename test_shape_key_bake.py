@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test du skinning NumPy (bake_skinning) et des empreintes du bake incrémental (bake_fingerprints) des shape keys
+Ne dépend pas de bpy, peut être lancé hors de Blender
+"""
+
+def _random_matrices(rng, count):
+    """Matrices 4x4 (rotation, translation) aléatoires"""
+    import numpy as np
+    matrices = np.tile(np.eye(4), (count, 1, 1))
+    for matrix in matrices:
+        q, _r = np.linalg.qr(rng.normal(size=(3, 3)))
+        matrix[:3, :3] = q * np.sign(np.linalg.det(q))
+        matrix[:3, 3] = rng.normal(size=3)
+    return matrices
+
+
+def test_blender_matrices():
+    """Test la conversion des valeurs foreach_get (colonnes) en matrices"""
+    print("=== TEST MATRICES DES OS ===")
+    import numpy as np
+    from bake.bake_skinning import blender_matrices, skinning_matrices, transform_points
+
+    rng = np.random.default_rng(0)
+    matrices = _random_matrices(rng, 5)
+    flat = matrices.transpose(0, 2, 1).ravel()
+    assert np.allclose(blender_matrices(flat, 5), matrices)
+    points = rng.normal(size=(10, 3))
+    expected = (np.c_[points, np.ones(10)] @ matrices[0].T)[:, :3]
+    assert np.allclose(transform_points(matrices[0], points), expected)
+    assert np.allclose(skinning_matrices(matrices, matrices), np.eye(4))
+    print("✅ Matrices relues en ordre colonnes, pose @ repos⁻¹ = identité au repos")
+
+
+def test_linear_blend_skin():
+    """Test le skinning vectorisé contre une boucle par vertex"""
+    print("=== TEST SKINNING LINÉAIRE ===")
+    import numpy as np
+    from bake.bake_skinning import LinearBlendSkin, transform_points
+
+    rng = np.random.default_rng(1)
+    vertex_count, bone_count = 300, 12
+    coords = rng.normal(size=(vertex_count, 3))
+    vertex_indices, bone_indices, weights = [], [], []
+    for v in range(vertex_count - 10):
+        for bone in rng.choice(bone_count, size=rng.integers(1, 4), replace=False):
+            vertex_indices.append(v)
+            bone_indices.append(bone)
+            weights.append(rng.random() * 0.9 + 0.1)
+    # Les 10 derniers vertex n'ont pas de poids, un vertex a un poids total trop faible
+    vertex_indices.append(0)
+    bone_indices.append(0)
+    weights.append(0.0)
+    object_to_armature = _random_matrices(rng, 1)[0]
+    bone_matrices = _random_matrices(rng, bone_count)
+    skin = LinearBlendSkin(coords, vertex_indices, bone_indices, weights, object_to_armature)
+    deformed = skin.deform(bone_matrices)
+
+    armature_coords = transform_points(object_to_armature, coords)
+    expected = armature_coords.copy()
+    for v in range(vertex_count):
+        total = 0.0
+        moved = np.zeros(3)
+        for vi, bone, weight in zip(vertex_indices, bone_indices, weights):
+            if vi == v and weight > 0:
+                total += weight
+                moved += weight * transform_points(bone_matrices[bone], armature_coords[v][None])[0]
+        if total > 0.0001:
+            expected[v] = moved / total
+    expected = transform_points(np.linalg.inv(object_to_armature), expected)
+    assert deformed.shape == (vertex_count, 3)
+    assert np.allclose(deformed, expected)
+    assert np.allclose(deformed[-10:], coords[-10:])
+    # Pose de repos : aucune déformation
+    assert np.allclose(skin.deform(np.tile(np.eye(4), (bone_count, 1, 1))), coords)
+    # Les poids sont normalisés
+    scaled = LinearBlendSkin(coords, vertex_indices, bone_indices, np.array(weights) * 3, object_to_armature)
+    assert np.allclose(scaled.deform(bone_matrices), deformed)
+    print(f"✅ {vertex_count} vertex, {bone_count} os : identique à la boucle, poids normalisés, vertex sans poids fixes")
+
+
+def test_bake_fingerprints():
+    """Test les empreintes et les raisons d'un nouveau bake"""
+    print("=== TEST EMPREINTES DU BAKE INCRÉMENTAL ===")
+    import numpy as np
+    from bake.bake_fingerprints import (FINGERPRINT_COMPONENTS, NO_FINGERPRINT_REASON, combine_fingerprints,
+                                        fingerprint_change_reason, hash_values)
+
+    rng = np.random.default_rng(2)
+    coords = rng.normal(size=(100, 3)).astype(np.float32)
+    digest = hash_values('Basis', coords)
+    assert digest == hash_values('Basis', coords.copy())
+    # La précision (float32 / float64) et -0.0 ne changent pas l'empreinte, une vraie modification oui
+    assert hash_values(coords) == hash_values(coords.astype(np.float64))
+    assert hash_values(np.array([-0.0])) == hash_values(np.array([0.0]))
+    moved = coords.copy()
+    moved[10, 2] += 0.001
+    assert hash_values(moved) != hash_values(coords)
+    # La forme et l'ordre des valeurs comptent
+    assert hash_values(coords) != hash_values(coords.reshape(3, 100))
+    assert hash_values('a', 'b') != hash_values('b', 'a')
+    assert combine_fingerprints('a', 'b') != combine_fingerprints('b', 'a')
+
+    fingerprint = {component: hash_values(component) for component, _reason in FINGERPRINT_COMPONENTS}
+    assert fingerprint_change_reason(dict(fingerprint), fingerprint) == ''
+    assert fingerprint_change_reason(None, fingerprint) == NO_FINGERPRINT_REASON
+    changed = dict(fingerprint, pose='x', weights='y')
+    assert fingerprint_change_reason(fingerprint, changed) == 'pose keys changed, weights changed'
+    print("✅ Empreintes stables, sensibles aux modifications, raisons du nouveau bake listées")
+
+
+if __name__ == "__main__":
+    print("Test du skinning pour le bake des shape keys FaceIt")
+    print("=" * 40)
+
+    test_blender_matrices()
+    test_linear_blend_skin()
+    test_bake_fingerprints()